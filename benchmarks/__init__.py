@@ -0,0 +1 @@
+"""主循环微基准测试套件（python -m benchmarks 或 python run_tests.py --bench）与多日浸泡测试（python -m benchmarks.soak）"""
@@ -0,0 +1,55 @@
+"""
+主循环微基准测试
+
+用法:
+    python -m benchmarks                      # 运行全部用例并与 baseline.json 比较（耗时仅展示）
+    python -m benchmarks --time-tolerance 0.5 # 同一台机器上对比时，耗时超出基线 50% 也算回归
+    python -m benchmarks --update-baseline    # 运行并把结果写入 baseline.json
+    python -m benchmarks --latency 0.001 main_loop_iteration
+"""
+import argparse
+import asyncio
+import sys
+
+from benchmarks.suite import (BENCHMARKS, TIME_TOLERANCE, compare, format_results, load_baseline,
+                              run_benchmarks, save_baseline)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='GridBNB 主循环微基准测试')
+    parser.add_argument('names', nargs='*', help=f"要运行的用例（默认全部）: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟交易所每次调用的延迟（秒）')
+    parser.add_argument('--scale', type=float, default=1.0, help='迭代次数缩放比例')
+    parser.add_argument('--rounds', type=int, default=3, help='计时轮数，取最快的一轮')
+    parser.add_argument('--time-tolerance', type=float, nargs='?', const=TIME_TOLERANCE, default=None,
+                        help=f'按耗时判断回归并指定容差比例（不带值时为 {TIME_TOLERANCE}）；默认耗时仅供参考')
+    parser.add_argument('--update-baseline', action='store_true', help='将本次结果写入基线文件')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知用例: {', '.join(unknown)}")
+
+    results = asyncio.run(run_benchmarks(args.names, latency=args.latency, scale=args.scale, rounds=args.rounds))
+    baseline = load_baseline()
+    print(format_results(results, baseline))
+
+    if args.update_baseline:
+        save_baseline({**baseline, **results})
+        print("\n基线已更新")
+        return 0
+
+    if args.time_tolerance is None:
+        print("\n（耗时随机器变化，仅供参考；只按调用次数、调用权重和内存峰值判断回归）")
+    regressions = compare(results, baseline, time_tolerance=args.time_tolerance)
+    if regressions:
+        print("\n❌ 性能回归:")
+        for name, metric, current, base in regressions:
+            print(f"  {name}.{metric}: {current} (基线 {base})")
+        return 1
+    print("\n✅ 未发现性能回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+多日浸泡测试：在虚拟时间事件循环中让真实的 GridTrader.main_loop 对着模拟交易所连续运行多天，
+跟踪整段运行期间每轮主循环的真实耗时、交易所调用次数和内存增长。
+
+用法:
+    python -m benchmarks.soak --days 7
+    python -m benchmarks.soak --days 1 --volatility 0.05 --tracemalloc
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from array import array
+from contextlib import contextmanager
+
+import psutil
+
+from benchmarks.suite import SYMBOL, BenchEnv
+from clock import VirtualClock, run_virtual
+
+DAY = 86400
+
+
+@contextmanager
+def muted_notifications():
+    """仿真期间不发送推送通知"""
+    import trader as trader_module
+    original = trader_module.send_pushplus_message
+    trader_module.send_pushplus_message = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        trader_module.send_pushplus_message = original
+
+
+@contextmanager
+def governed_by(clock):
+    """仿真期间全局下单限速器按虚拟时间计算窗口"""
+    from order_rate_governor import order_governor
+    original = order_governor.clock
+    order_governor.clock = clock
+    try:
+        yield
+    finally:
+        order_governor.clock = original
+
+
+async def drive_price(env, daily_volatility: float, step: float, seed: int):
+    """按几何布朗运动推进模拟价格（固定种子，可复现）"""
+    rng = random.Random(seed)
+    sigma = daily_volatility * math.sqrt(step / DAY)
+    price = env.simulator.prices[SYMBOL]
+    while True:
+        await asyncio.sleep(step)
+        price *= math.exp(sigma * rng.gauss(0.0, 1.0) - 0.5 * sigma * sigma)
+        env.simulator.set_price(SYMBOL, round(price, 2))
+
+
+def _memory_now(track_allocations: bool):
+    if track_allocations:
+        return tracemalloc.get_traced_memory()[0]
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+async def _soak(clock, days, daily_volatility, price_step, sample_interval, seed, track_allocations):
+    from state_persistence import state_persistence
+
+    env = BenchEnv(clock=clock)
+    trader = env.trader
+    latencies = array('d')  # 每轮耗时（秒）；紧凑存储，避免测量本身造成内存增长
+    samples = []
+
+    run_iteration = trader._run_iteration
+
+    async def timed_iteration():
+        start = time.perf_counter()
+        try:
+            return await run_iteration()
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    trader._run_iteration = timed_iteration
+
+    def sample():
+        samples.append({
+            'hours': round((clock.time() - clock.start) / 3600, 2),
+            'iterations': len(latencies),
+            'trades': len(env.simulator.trades),
+            'price': env.simulator.prices[SYMBOL],
+            'memory_kib': round(_memory_now(track_allocations) / 1024, 1)
+        })
+
+    driver = asyncio.create_task(drive_price(env, daily_volatility, price_step, seed))
+    main = asyncio.create_task(trader.main_loop())
+    wall_start = time.perf_counter()
+    try:
+        sample()
+        end = clock.time() + days * DAY
+        while clock.time() < end:
+            await asyncio.sleep(min(sample_interval, end - clock.time()))
+            sample()
+            if main.done():
+                break
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        for task in (driver, main):
+            task.cancel()
+        await asyncio.gather(driver, main, return_exceptions=True)
+        await env.client.close()
+        await state_persistence.stop()
+        env.close()
+
+    return {
+        'virtual_days': round((clock.time() - clock.start) / DAY, 3),
+        'wall_seconds': round(wall_seconds, 2),
+        'speedup': round((clock.time() - clock.start) / max(wall_seconds, 1e-9), 1),
+        'iterations': len(latencies),
+        'trades': len(env.simulator.trades),
+        'exchange_calls': env.profiler.calls(),
+        'exchange_weight': env.profiler.weight(),
+        'latency_us': _latency_summary(latencies),
+        'memory': {
+            'metric': 'tracemalloc' if track_allocations else 'rss',
+            'start_kib': samples[0]['memory_kib'],
+            'end_kib': samples[-1]['memory_kib'],
+            'growth_kib': round(samples[-1]['memory_kib'] - samples[0]['memory_kib'], 1)
+        },
+        'samples': samples,
+        'stopped_early': main.done() and not main.cancelled()
+    }
+
+
+def _latency_summary(latencies):
+    if not latencies:
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    ordered = sorted(latencies)
+    return {
+        'p50': round(statistics.median(ordered) * 1e6, 1),
+        'p95': round(ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)] * 1e6, 1),
+        'max': round(ordered[-1] * 1e6, 1)
+    }
+
+
+def run_soak(days: float = 1.0, daily_volatility: float = 0.03, price_step: float = 60.0,
+             sample_interval: float = 3600.0, seed: int = 0, track_allocations: bool = False,
+             start: float = None):
+    """
+    在新的虚拟时间事件循环中运行浸泡测试并返回报告（同步函数，不能在已有事件循环中调用）。
+    track_allocations 为 True 时用 tracemalloc 统计 Python 内存（更准确但明显更慢），否则统计进程 RSS。
+    """
+    clock = VirtualClock(start=start)
+    logging.disable(logging.CRITICAL)
+    if track_allocations:
+        tracemalloc.start()
+    try:
+        with muted_notifications(), governed_by(clock):
+            return run_virtual(
+                _soak(clock, days, daily_volatility, price_step, sample_interval, seed, track_allocations),
+                clock
+            )
+    finally:
+        if track_allocations:
+            tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+
+
+def format_report(report) -> str:
+    latency, memory = report['latency_us'], report['memory']
+    lines = [
+        f"虚拟时长: {report['virtual_days']} 天 | 实际耗时: {report['wall_seconds']}s | 加速比: {report['speedup']}x",
+        f"主循环: {report['iterations']} 轮 | 成交: {report['trades']} 笔 | "
+        f"交易所调用: {report['exchange_calls']} 次 (权重 {report['exchange_weight']})",
+        f"单轮耗时(us): P50 {latency['p50']} | P95 {latency['p95']} | 最大 {latency['max']}",
+        f"内存({memory['metric']}): {memory['start_kib']} KiB -> {memory['end_kib']} KiB "
+        f"(增长 {memory['growth_kib']} KiB)",
+    ]
+    if report['stopped_early']:
+        lines.append("⚠️ 主循环提前退出（连续失败次数达到上限）")
+    lines.append(f"{'小时':>8}{'轮次':>10}{'成交':>8}{'价格':>12}{'内存(KiB)':>14}")
+    for s in report['samples']:
+        lines.append(f"{s['hours']:>8}{s['iterations']:>10}{s['trades']:>8}{s['price']:>12}{s['memory_kib']:>14}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.soak', description='GridBNB 多日浸泡测试（虚拟时间）')
+    parser.add_argument('--days', type=float, default=1.0, help='虚拟运行天数')
+    parser.add_argument('--volatility', type=float, default=0.03, help='模拟价格的日波动率')
+    parser.add_argument('--price-step', type=float, default=60.0, help='价格更新间隔（虚拟秒）')
+    parser.add_argument('--sample-interval', type=float, default=3600.0, help='采样间隔（虚拟秒）')
+    parser.add_argument('--seed', type=int, default=0, help='价格路径随机种子')
+    parser.add_argument('--tracemalloc', action='store_true', help='用 tracemalloc 统计内存（较慢）')
+    args = parser.parse_args(argv)
+
+    report = run_soak(args.days, args.volatility, args.price_step, args.sample_interval, args.seed, args.tracemalloc)
+    print(format_report(report))
+    return 1 if report['stopped_early'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from config import TradingConfig
+from exchange_profiler import profile_client
+from exchange_simulator import SimulatedExchange, create_client
+from order_tracker import OrderTracker
+
+SYMBOL = 'BNB/USDT'
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TIME_TOLERANCE = 0.5    # 显式开启耗时门禁时，单次耗时允许比基线慢 50%（不同机器差异较大）
+ALLOC_TOLERANCE = 0.25  # 内存分配峰值允许比基线高 25%
+
+
+@contextmanager
+def instant_sleep():
+    """交易逻辑里的固定等待（下单后等待成交等）改为只让出一次事件循环"""
+    original = asyncio.sleep
+
+    async def sleep(delay, result=None):
+        return await original(0, result)
+
+    asyncio.sleep = sleep
+    try:
+        yield
+    finally:
+        asyncio.sleep = original
+
+
+class BenchEnv:
+    """
+    一个基准测试用例的运行环境：确定性的模拟交易所 + 真实 ExchangeClient + 调用计数，
+    交易器的所有持久化文件都重定向到临时目录。clock 默认为系统时钟，长时间仿真时传入虚拟时钟。
+    """
+
+    def __init__(self, latency: float = 0.0, clock=None):
+        self.tmpdir = tempfile.TemporaryDirectory(prefix='gridbnb-bench-')
+        self.clock = clock
+        self.simulator = SimulatedExchange(
+            prices={SYMBOL: 600.0}, balances={'BNB': 2.0, 'USDT': 2000.0}, funding={'USDT': 500.0}, latency=latency,
+            clock=clock.time if clock is not None else None
+        )
+        self.client = create_client(self.simulator, clock=clock)
+        self.profiler = profile_client(self.client)
+        self._trader = None
+
+    @property
+    def trader(self):
+        if self._trader is None:
+            self._trader = self._build_trader()
+        return self._trader
+
+    def _build_trader(self):
+        from trader import GridTrader
+        trader = GridTrader(self.client, TradingConfig(), SYMBOL, clock=self.clock)
+        data_dir = self.tmpdir.name
+        trader.state_file_path = os.path.join(data_dir, 'trader_state.json')
+        trader.order_tracker = OrderTracker(SYMBOL, data_dir=data_dir, clock=trader.clock)
+        trader.order_tracker.add_listener(trader.portfolio_risk.on_fill)
+        trader.order_tracker.add_listener(self.client.on_fill)
+        extrema = trader.position_controller_s1.extrema
+        extrema.data_dir = data_dir
+        extrema.state_file = os.path.join(data_dir, os.path.basename(extrema.state_file))
+        trader.initialized = True
+        trader.base_price = 600.0
+        trader.grid_size = 2.0
+        trader.symbol_info = self.simulator.market(SYMBOL)
+        trader.amount_precision = 3
+        trader.price_precision = 2
+        return trader
+
+    def close(self):
+        self.tmpdir.cleanup()
+
+
+# ----------------------------------------------------------------------
+# 基准用例：setup(env) 返回每次迭代执行的异步函数 op(i)
+# ----------------------------------------------------------------------
+
+async def setup_main_loop(env):
+    trader = env.trader
+    await trader._run_iteration()  # 预热缓存，只测稳态
+
+    async def op(i):
+        # 价格在网格上下轨之内小幅波动：只做决策，不触发交易
+        env.simulator.set_price(SYMBOL, 600.0 * (1 + 0.005 * math.sin(i / 5)))
+        await trader._run_iteration()
+    return op
+
+
+async def setup_execute_order(env):
+    trader = env.trader
+
+    async def op(i):
+        context = await trader._build_context()
+        trader._apply_context(context)
+        await trader.execute_order('buy' if i % 2 == 0 else 'sell', context)
+    return op
+
+
+async def setup_volatility(env):
+    trader = env.trader
+    await trader._calculate_volatility(600.0)
+
+    async def op(i):
+        await trader._calculate_volatility(600.0 * (1 + 0.001 * (i % 7)))
+    return op
+
+
+async def setup_add_trade(env):
+    tracker = OrderTracker(SYMBOL, data_dir=env.tmpdir.name)
+
+    async def op(i):
+        tracker.add_trade({
+            'timestamp': 1700000000 + i,
+            'side': 'buy' if i % 2 == 0 else 'sell',
+            'price': 600.0 + (i % 10),
+            'amount': 0.1,
+            'order_id': f'bench-{i}'
+        })
+    return op
+
+
+async def setup_handle_status(env):
+    from status_snapshot import StatusSnapshotService
+    from web_server import handle_status
+    traders = {SYMBOL: env.trader}
+    service = StatusSnapshotService(traders, clock=env.trader.clock)
+    await service.refresh(SYMBOL)
+    request = SimpleNamespace(app={'traders': traders, 'status_service': service},
+                              query={'symbol': SYMBOL}, headers={})
+    handler = handle_status.__wrapped__  # 跳过认证装饰器
+
+    async def op(i):
+        await handler(request)
+    return op
+
+
+async def setup_total_account_value(env):
+    client = env.client
+
+    async def op(i):
+        # 每次都让总资产缓存失效，测量完整计算（余额缓存仍然有效）
+        client.total_value_cache = {'timestamp': 0, 'data': 0.0}
+        await client.calculate_total_account_value()
+    return op
+
+
+BENCHMARKS = {
+    'main_loop_iteration': (setup_main_loop, 200),
+    'execute_order': (setup_execute_order, 40),
+    'calculate_volatility': (setup_volatility, 500),
+    'order_tracker_add_trade': (setup_add_trade, 500),
+    'handle_status': (setup_handle_status, 1000),
+    'calculate_total_account_value': (setup_total_account_value, 500),
+}
+
+
+# ----------------------------------------------------------------------
+# 运行与基线比较
+# ----------------------------------------------------------------------
+
+async def _measure(setup, iterations, latency, rounds):
+    """
+    计时轮和内存轮分开执行，避免 tracemalloc 的开销影响耗时。
+    计时重复 rounds 轮取平均耗时最低的一轮（与 timeit 相同的思路，排除机器噪声）；
+    交易所调用次数只统计第一轮（预热之后），与迭代次数无关。
+    """
+    env = BenchEnv(latency)
+    try:
+        op = await setup(env)
+        await op(-1)  # 预热一次：余额/理财/产品目录等一次性缓存不计入每次调用成本
+        env.profiler.reset()
+        best = None
+        for round_index in range(rounds):
+            durations = []
+            for i in range(round_index * iterations, (round_index + 1) * iterations):
+                start = time.perf_counter()
+                await op(i)
+                durations.append(time.perf_counter() - start)
+            if round_index == 0:
+                calls, weight = env.profiler.calls(), env.profiler.weight()
+            if best is None or statistics.fmean(durations) < statistics.fmean(best):
+                best = durations
+
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            baseline_current, _ = tracemalloc.get_traced_memory()
+            for i in range(rounds * iterations, (rounds + 1) * iterations):
+                await op(i)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        env.close()
+    durations = sorted(best)
+    return {
+        'iterations': iterations,
+        'mean_us': round(statistics.fmean(durations) * 1e6, 1),
+        'p95_us': round(durations[int(len(durations) * 0.95) - 1] * 1e6, 1),
+        'peak_kib': round((peak - baseline_current) / 1024, 1),
+        'calls_per_op': round(calls / iterations, 3),
+        'weight_per_op': round(weight / iterations, 3)
+    }
+
+
+async def run_benchmarks(names=None, latency: float = 0.0, scale: float = 1.0, rounds: int = 3):
+    """运行指定（默认全部）基准用例，返回 {名称: 结果}；scale 按比例调整迭代次数"""
+    results = {}
+    logging.disable(logging.CRITICAL)  # 交易日志会淹没计时结果
+    try:
+        with instant_sleep():
+            for name, (setup, iterations) in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                results[name] = await _measure(setup, max(1, int(iterations * scale)), latency, rounds)
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def load_baseline(path: str = BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path: str = BASELINE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, time_tolerance: float = None, alloc_tolerance: float = ALLOC_TOLERANCE):
+    """
+    与基线比较，返回回归列表 [(用例, 指标, 当前值, 基线值)]。
+    只按与机器无关的指标判断：交易所调用次数/权重不允许任何增加，内存峰值按容差比较。
+    耗时随机器和负载变化，默认只展示不判断；传入 time_tolerance 时才按容差比较（同一台机器上对比时使用）。
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['calls_per_op'] > base['calls_per_op']:
+            regressions.append((name, 'calls_per_op', result['calls_per_op'], base['calls_per_op']))
+        if result['weight_per_op'] > base['weight_per_op']:
+            regressions.append((name, 'weight_per_op', result['weight_per_op'], base['weight_per_op']))
+        if time_tolerance is not None and result['mean_us'] > base['mean_us'] * (1 + time_tolerance):
+            regressions.append((name, 'mean_us', result['mean_us'], base['mean_us']))
+        # 很小的分配量受解释器内部缓存影响较大，给 16KiB 的绝对余量
+        if result['peak_kib'] > base['peak_kib'] * (1 + alloc_tolerance) + 16:
+            regressions.append((name, 'peak_kib', result['peak_kib'], base['peak_kib']))
+    return regressions
+
+
+def format_results(results, baseline=None):
+    baseline = baseline or {}
+    header = f"{'用例':<32}{'次数':>6}{'平均(us)':>12}{'P95(us)':>12}{'峰值(KiB)':>12}{'调用/次':>10}{'权重/次':>10}{'基线平均(us)':>14}"
+    lines = [header, '-' * len(header)]
+    for name, r in results.items():
+        base = baseline.get(name, {}).get('mean_us', '--')
+        lines.append(
+            f"{name:<32}{r['iterations']:>6}{r['mean_us']:>12}{r['p95_us']:>12}{r['peak_kib']:>12}"
+            f"{r['calls_per_op']:>10}{r['weight_per_op']:>10}{base:>14}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,91 @@
+import asyncio
+import selectors
+import time
+
+
+class SystemClock:
+    """真实时钟：time() 为 Unix 时间戳（秒），monotonic() 为单调时间"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+
+class VirtualClock(SystemClock):
+    """
+    虚拟时钟：time() = 起始时间戳 + 所在 VirtualTimeEventLoop 的虚拟时间。
+    未运行在虚拟事件循环中时时间停在 start，可用 advance() 手动推进（同步测试用）。
+    """
+
+    def __init__(self, start: float = None, loop=None):
+        self.start = start if start is not None else time.time()
+        self.loop = loop
+        self._offset = 0.0
+
+    def monotonic(self) -> float:
+        return (self.loop.time() if self.loop is not None else 0.0) + self._offset
+
+    def time(self) -> float:
+        return self.start + self.monotonic()
+
+    def advance(self, seconds: float):
+        self._offset += seconds
+
+
+class _VirtualSelector:
+    """
+    包装真实的 selector：有待触发的定时器且没有就绪的 I/O 时，不再阻塞等待，
+    而是把虚拟时间直接推进到下一个定时器。没有定时器时（只等 I/O 或线程结果）照常阻塞。
+    """
+
+    def __init__(self, selector, loop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return self._selector.select(None)
+        events = self._selector.select(0)
+        if not events and timeout > 0:
+            self._loop._virtual_time += timeout
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """
+    虚拟时间事件循环：loop.time() 从 0 开始，只在事件循环空闲时跳到下一个定时器，
+    因此 asyncio.sleep / wait_for 超时等都按虚拟时间瞬间完成，代码本身不需要修改。
+    多天的交易仿真可以在几秒内跑完；线程池中的阻塞操作仍按真实时间执行。
+    """
+
+    def __init__(self):
+        self._virtual_time = 0.0
+        super().__init__(_VirtualSelector(selectors.DefaultSelector(), self))
+
+    def time(self):
+        return self._virtual_time
+
+
+def run_virtual(main, clock: VirtualClock = None):
+    """在新的虚拟时间事件循环中运行协程，clock 若提供则绑定到该循环"""
+    loop = VirtualTimeEventLoop()
+    if clock is not None:
+        clock.loop = loop
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+# 全局实例
+system_clock = SystemClock()
@@ -3,7 +3,7 @@ from dotenv import load_dotenv
 import logging
 import json
 from pydantic_settings import BaseSettings
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from pydantic import field_validator, ConfigDict, ConfigDict
 
 load_dotenv()
@@ -68,6 +68,18 @@ class Settings(BaseSettings):
                 raise ValueError(f"策略参数格式无效，必须是合法的JSON字符串。收到的值: {value}")
         return value if value else {}
 
+    @field_validator('RISK_SNAPSHOT_MAX_AGE')
+    @classmethod
+    def check_snapshot_max_age(cls, value, info):
+        """快照最大年龄必须明显大于余额缓存有效期，否则仍在有效期内的缓存余额也会触发 BLOCK_ALL"""
+        ttl = info.data.get('BALANCE_CACHE_TTL', 0)
+        margin = info.data.get('RISK_SNAPSHOT_MARGIN', 0)
+        if value < ttl + margin:
+            raise ValueError(
+                f"RISK_SNAPSHOT_MAX_AGE ({value}) 不能小于 BALANCE_CACHE_TTL ({ttl}) + RISK_SNAPSHOT_MARGIN ({margin})"
+            )
+        return value
+
     @field_validator('SAVINGS_PRECISIONS', mode='before')
     @classmethod
     def parse_savings_precisions(cls, value):
@@ -84,15 +96,33 @@ class Settings(BaseSettings):
     MAX_POSITION_PERCENT: float = 0.15
     MAX_POSITION_RATIO: float = 0.9
     MIN_POSITION_RATIO: float = 0.1
+    PORTFOLIO_MAX_EXPOSURE_RATIO: float = 0.9  # 全账户非计价货币资产占总资产的上限
+    PORTFOLIO_MAX_ASSET_RATIO: float = 0.9  # 单一资产占全账户总资产的上限
     COOLDOWN: int = 60
     SAFETY_MARGIN: float = 0.95
     AUTO_ADJUST_BASE_PRICE: bool = False
     PUSHPLUS_TIMEOUT: int = 5
     LOG_LEVEL: int = logging.INFO
+    LOG_JSON_ENABLED: bool = False  # 额外输出结构化 JSONL 日志 (trading_system.jsonl)
+    LOG_QUEUE_SIZE: int = 10000  # 日志队列容量，写盘跟不上时丢弃新日志而不阻塞
+    LOOP_WATCHDOG_THRESHOLD: float = 0.5  # 事件循环阻塞超过该秒数时抓取调用栈
     DEBUG_MODE: bool = False
     API_TIMEOUT: int = 10000
     RECV_WINDOW: int = 5000
     RISK_CHECK_INTERVAL: int = 300
+    S1_EXTREMA_LOOKBACKS: List[int] = [20, 52, 100]  # S1 同时维护的高低点回看周期（日）
+    PRODUCT_CACHE_TTL: int = 3600  # 活期理财产品目录缓存有效期（秒）
+    SAVINGS_DEBOUNCE: float = 30.0  # 成交后合并再平衡请求的等待时间（秒）
+    SAVINGS_BUFFER_TRADES: float = 2.0  # 现货预留可覆盖的预计下单次数
+    SAVINGS_UPPER_BAND: float = 0.5  # 现货超过目标的比例超过该值才申购
+    SAVINGS_LOWER_BAND: float = 0.3  # 现货低于目标的比例超过该值才赎回
+    S1_EXECUTION_MODE: str = 'twap'  # S1 调仓拆单方式: twap / iceberg
+    S1_SLICE_INTERVAL: float = 30.0  # TWAP 切片间隔（秒）
+    S1_MAX_SLICE_VALUE: float = 500.0  # 单个切片最大金额（计价货币）
+    S1_PARTICIPATION_RATE: float = 0.2  # 单个切片不超过盘口前5档对手挂单量的比例
+    BALANCE_CACHE_TTL: float = 30.0  # 交易所客户端余额/总资产缓存的有效期（秒）
+    RISK_SNAPSHOT_MARGIN: float = 15.0  # 快照年龄相对余额缓存有效期的余量，覆盖一轮循环内的行情请求与计算耗时
+    RISK_SNAPSHOT_MAX_AGE: float = 60.0  # 行情/余额快照超过该秒数视为过期，暂停交易；须比 BALANCE_CACHE_TTL 至少多 RISK_SNAPSHOT_MARGIN
     MAX_RETRIES: int = 5
     RISK_FACTOR: float = 0.1
     VOLATILITY_WINDOW: int = 52  # 52日窗口
@@ -104,6 +134,29 @@ class Settings(BaseSettings):
     SPOT_FUNDS_TARGET_RATIO: float = 0.16
     MIN_BNB_TRANSFER: float = 0.01
 
+    # 状态持久化 (异步写回)
+    STATE_FLUSH_INTERVAL: float = 0.5  # 合并窗口（秒），窗口内同一交易对的多次保存只写一次
+    STATE_FSYNC: bool = False  # 写盘后是否强制fsync
+
+    # SQLite统一存储 (状态/成交/订单/权益采样)
+    ENABLE_SQLITE_STORE: bool = False
+    SQLITE_DB_PATH: Optional[str] = None  # 默认为 data/trading.db
+
+    # 已实现盈亏的成本计算方式: fifo (先进先出) / average (平均成本)
+    PNL_COST_METHOD: str = 'fifo'
+
+    # 账户级下单速率限制 (币安现货: 每10秒50单, 每日160000单)
+    ORDER_LIMIT_PER_10S: int = 50
+    ORDER_LIMIT_PER_DAY: int = 160000
+
+    # Web状态快照的最长刷新间隔（秒），状态变化时会提前刷新
+    STATUS_REFRESH_INTERVAL: float = 5.0
+
+    # 异步通知管道
+    NOTIFY_QUEUE_SIZE: int = 100
+    NOTIFY_DIGEST_WINDOW: float = 3.0  # 该时间窗口内的多条通知合并为一条汇总
+    NOTIFY_MIN_INTERVAL: float = 1.0   # 两次推送之间的最小间隔（秒）
+
     model_config = ConfigDict(
         env_file=".env",
         env_file_encoding='utf-8',
@@ -116,6 +169,8 @@ settings = Settings()
 
 # 提供一个解析后的列表，方便使用
 SYMBOLS_LIST = [s.strip() for s in settings.SYMBOLS.split(',') if s.strip()]
+# 旧版成交记录（trade_history.json、archives/trades_YYYYMM.json）不含交易对信息，统一归属到第一个交易对
+LEGACY_TRADES_SYMBOL = SYMBOLS_LIST[0] if SYMBOLS_LIST else 'BNB/USDT'
 
 # 保留必要的向后兼容性常量，但建议逐步迁移到 settings.XXX 的形式
 FLIP_THRESHOLD = lambda grid_size: (grid_size / 5) / 100  # 网格大小的1/5的1%
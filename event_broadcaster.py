@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import threading
+
+
+class EventBroadcaster:
+    """
+    单生产者到多客户端的事件分发（供 /api/stream 推送使用）。
+
+    每个订阅者持有一个有界队列，慢客户端队列满时丢弃其最旧的事件，
+    不会阻塞发布方，也不会影响其他客户端。publish() 可在任意线程调用。
+    """
+
+    def __init__(self, max_queue: int = 200):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._loop = None
+        self._loop_thread = None
+        self.metrics = {'published': 0, 'dropped': 0}
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        """注册一个订阅者，返回其事件队列（需在事件循环中调用）"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data):
+        """向所有订阅者发布事件，没有订阅者时直接返回"""
+        if not self._subscribers:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._fan_out(event, data)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fan_out, event, data)
+
+    def _fan_out(self, event, data):
+        self.metrics['published'] += 1
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+                self.metrics['dropped'] += 1
+            queue.put_nowait((event, data))
+
+
+class BroadcastLogHandler(logging.Handler):
+    """把新的日志行作为 'log' 事件推送给已连接的页面"""
+
+    def __init__(self, broadcaster: EventBroadcaster, level=logging.INFO):
+        super().__init__(level)
+        self.broadcaster = broadcaster
+
+    def emit(self, record):
+        if not self.broadcaster.has_subscribers:
+            return
+        try:
+            self.broadcaster.publish('log', {'line': self.format(record)})
+        except Exception:
+            self.handleError(record)
+
+
+# 全局实例
+event_broadcaster = EventBroadcaster()
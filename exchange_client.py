@@ -3,12 +3,16 @@ import os
 import logging
 from config import settings
 from datetime import datetime
-import time
 import asyncio
+from order_rate_governor import order_governor, PRIORITY_NORMAL
+from clock import system_clock
+from savings_rebalancer import SavingsRebalancer
 
 class ExchangeClient:
-    def __init__(self):
+    def __init__(self, clock=None):
         self.logger = logging.getLogger(self.__class__.__name__)
+        # 缓存有效期和请求时间戳都基于该时钟，仿真时可注入虚拟时钟
+        self.clock = clock or system_clock
         # API密钥验证已由Pydantic在settings实例化时自动完成
         
         # 获取代理配置，如果环境变量中没有设置，则使用None
@@ -48,13 +52,21 @@ class ExchangeClient:
         self.time_diff = 0
         self.balance_cache = {'timestamp': 0, 'data': None}
         self.funding_balance_cache = {'timestamp': 0, 'data': {}}
-        self.cache_ttl = 30  # 缓存有效期（秒）
+        self.cache_ttl = settings.BALANCE_CACHE_TTL  # 缓存有效期（秒）
 
         # 为全局总资产计算添加缓存
         self.total_value_cache = {'timestamp': 0, 'data': 0.0}
 
+        # 活期理财产品目录缓存（资产 -> productId）
+        self.product_cache = {'timestamp': 0, 'data': {}}
+        self.product_cache_ttl = settings.PRODUCT_CACHE_TTL
+        self._product_lock = asyncio.Lock()
+
         # 【新增】用于管理后台时间同步任务
         self.time_sync_task = None
+
+        # 现货/理财再平衡服务属于该客户端（账户），使用同一客户端的交易对共享
+        self.savings_rebalancer = SavingsRebalancer(self)
     
 
 
@@ -143,14 +155,14 @@ class ExchangeClient:
             raise
     
     async def fetch_ticker(self, symbol):
-        self.logger.debug(f"获取行情数据 {symbol}...")
+        self.logger.debug("获取行情数据 %s...", symbol)
         start = datetime.now()
         try:
             # 使用市场ID进行请求
             market = self.exchange.market(symbol)
             ticker = await self.exchange.fetch_ticker(market['id'])
             latency = (datetime.now() - start).total_seconds()
-            self.logger.debug(f"获取行情成功 | 延迟: {latency:.3f}s | 最新价: {ticker['last']}")
+            self.logger.debug("获取行情成功 | 延迟: %.3fs | 最新价: %s", latency, ticker['last'])
             return ticker
         except Exception as e:
             self.logger.error(f"获取行情失败: {str(e)}")
@@ -165,7 +177,7 @@ class ExchangeClient:
             self.funding_balance_cache = {'timestamp': 0, 'data': {}}
             return {}
 
-        now = time.time()
+        now = self.clock.time()
 
         # 如果缓存有效，直接返回缓存数据
         if now - self.funding_balance_cache['timestamp'] < self.cache_ttl:
@@ -180,7 +192,7 @@ class ExchangeClient:
                 params = {'current': current_page, 'size': size_per_page}
                 # 使用Simple Earn API，并传入分页参数
                 result = await self.exchange.sapi_get_simple_earn_flexible_position(params)
-                self.logger.debug(f"理财账户原始数据 (Page {current_page}): {result}")
+                self.logger.debug("理财账户原始数据 (Page %s): %s", current_page, result)
 
                 rows = result.get('rows', [])
                 if not rows:
@@ -219,18 +231,27 @@ class ExchangeClient:
             # 返回上一次的缓存（如果有）或空字典
             return self.funding_balance_cache.get('data', {})
 
+    def balance_timestamps(self):
+        """
+        返回 (现货余额, 理财余额) 当前缓存数据的获取时间，供决策快照判断数据新鲜度。
+        获取失败时缓存不更新，返回的是上一次成功获取的时间（从未成功时为 0）；
+        理财功能关闭时理财余额恒为空，视为实时数据。
+        """
+        funding_at = self.funding_balance_cache['timestamp'] if settings.ENABLE_SAVINGS_FUNCTION else self.clock.time()
+        return self.balance_cache['timestamp'], funding_at
+
     async def fetch_balance(self, params=None):
         """[已修复] 获取现货账户余额（含缓存机制），不再合并理财余额"""
-        now = time.time()
+        now = self.clock.time()
         if now - self.balance_cache['timestamp'] < self.cache_ttl:
             return self.balance_cache['data']
 
         try:
             params = params or {}
-            params['timestamp'] = int(time.time() * 1000) + self.time_diff
+            params['timestamp'] = int(self.clock.time() * 1000) + self.time_diff
             balance = await self.exchange.fetch_balance(params)
 
-            self.logger.debug(f"现货账户余额概要: {balance.get('total', {})}")
+            self.logger.debug("现货账户余额概要: %s", balance.get('total', {}))
             self.balance_cache = {'timestamp': now, 'data': balance}
             return balance
         except Exception as e:
@@ -238,13 +259,15 @@ class ExchangeClient:
             # 出错时不抛出异常，而是返回一个空的但结构完整的余额字典
             return {'free': {}, 'used': {}, 'total': {}}
     
-    async def create_order(self, symbol, type, side, amount, price):
+    async def create_order(self, symbol, type, side, amount, price, priority=PRIORITY_NORMAL):
         try:
+            # 账户级下单限速，额度不足时排队等待
+            await order_governor.acquire(symbol, priority)
             # 在下单前重新同步时间
             await self.sync_time()
             # 添加时间戳到请求参数
             params = {
-                'timestamp': int(time.time() * 1000 + self.time_diff),
+                'timestamp': int(self.clock.time() * 1000 + self.time_diff),
                 'recvWindow': 5000
             }
             return await self.exchange.create_order(symbol, type, side, amount, price, params)
@@ -257,7 +280,8 @@ class ExchangeClient:
         symbol: str,
         side: str,          # 只能是 'buy' 或 'sell'
         amount: float,
-        params: dict | None = None
+        params: dict | None = None,
+        priority: int = PRIORITY_NORMAL
     ):
         """
         业务层需要的『市价单快捷封装』。
@@ -266,10 +290,13 @@ class ExchangeClient:
         # 确保有 params 字典
         params = params or {}
 
+        # 账户级下单限速，额度不足时排队等待
+        await order_governor.acquire(symbol, priority)
+
         # 下单前同步时间，避免 -1021 错误
         await self.sync_time()
         params.update({
-            'timestamp': int(time.time() * 1000 + self.time_diff),
+            'timestamp': int(self.clock.time() * 1000 + self.time_diff),
             'recvWindow': 5000
         })
 
@@ -287,7 +314,7 @@ class ExchangeClient:
     async def fetch_order(self, order_id, symbol, params=None):
         if params is None:
             params = {}
-        params['timestamp'] = int(time.time() * 1000 + self.time_diff)
+        params['timestamp'] = int(self.clock.time() * 1000 + self.time_diff)
         params['recvWindow'] = 5000
         return await self.exchange.fetch_order(order_id, symbol, params)
     
@@ -299,13 +326,14 @@ class ExchangeClient:
         """取消指定订单"""
         if params is None:
             params = {}
-        params['timestamp'] = int(time.time() * 1000 + self.time_diff)
+        params['timestamp'] = int(self.clock.time() * 1000 + self.time_diff)
         params['recvWindow'] = 5000
         return await self.exchange.cancel_order(order_id, symbol, params)
     
     async def close(self):
-        """关闭交易所连接"""
+        """停止再平衡服务并关闭交易所连接"""
         try:
+            await self.savings_rebalancer.stop()
             if self.exchange:
                 await self.exchange.close()
                 self.logger.info("交易所连接已安全关闭")
@@ -316,7 +344,7 @@ class ExchangeClient:
         """同步交易所服务器时间"""
         try:
             server_time = await self.exchange.fetch_time()
-            local_time = int(time.time() * 1000)
+            local_time = int(self.clock.time() * 1000)
             # 【关键】更新 self.time_diff
             self.time_diff = server_time - local_time
             # 将日志级别从 INFO 改为 DEBUG，避免频繁刷屏
@@ -333,22 +361,52 @@ class ExchangeClient:
             self.logger.error(f"获取订单簿失败: {str(e)}")
             raise
 
+    async def load_flexible_products(self, force=False):
+        """加载全部可申购的活期理财产品目录（带TTL缓存）"""
+        async with self._product_lock:
+            now = self.clock.time()
+            if not force and now - self.product_cache['timestamp'] < self.product_cache_ttl:
+                return self.product_cache['data']
+            products = {}
+            current_page = 1
+            size_per_page = 100
+            while True:
+                params = {
+                    'timestamp': int(self.clock.time() * 1000 + self.time_diff),
+                    'current': current_page,
+                    'size': size_per_page,
+                }
+                result = await self.exchange.sapi_get_simple_earn_flexible_list(params)
+                rows = result.get('rows', [])
+                for product in rows:
+                    if product['status'] == 'PURCHASING':
+                        products.setdefault(product['asset'], product['productId'])
+                if len(rows) < size_per_page:
+                    break
+                current_page += 1
+            self.product_cache = {'timestamp': now, 'data': products}
+            self.logger.info(f"活期理财产品目录已更新，共 {len(products)} 个资产")
+            return products
+
     async def get_flexible_product_id(self, asset):
-        """获取指定资产的活期理财产品ID"""
+        """获取指定资产的活期理财产品ID（优先读取产品目录缓存）"""
         try:
+            products = await self.load_flexible_products()
+            if asset in products:
+                return products[asset]
+
+            # 目录中没有时按资产单独查询一次（可能是缓存期内新上线的产品）
             params = {
                 'asset': asset,
-                'timestamp': int(time.time() * 1000 + self.time_diff),
+                'timestamp': int(self.clock.time() * 1000 + self.time_diff),
                 'current': 1,  # 当前页
                 'size': 100,   # 每页数量
             }
             result = await self.exchange.sapi_get_simple_earn_flexible_list(params)
-            products = result.get('rows', [])
-            
-            # 查找对应资产的活期理财产品
-            for product in products:
+            for product in result.get('rows', []):
                 if product['asset'] == asset and product['status'] == 'PURCHASING':
                     self.logger.info(f"找到{asset}活期理财产品: {product['productId']}")
+                    self.product_cache['data'][asset] = product['productId']
                     return product['productId']
             
             raise ValueError(f"未找到{asset}的可用活期理财产品")
@@ -356,6 +414,46 @@ class ExchangeClient:
             self.logger.error(f"获取活期理财产品失败: {str(e)}")
             raise
 
+    def _apply_transfer_to_caches(self, asset, amount, to_savings):
+        """
+        划转成功后直接修正两个余额缓存中该资产的数值，其他资产的缓存保持有效。
+        采用复制后替换的方式，不修改调用方已持有的余额字典。
+        """
+        delta = -amount if to_savings else amount  # 现货变化量
+        self._adjust_cached_spot({asset: delta})
+        if self.funding_balance_cache['timestamp']:
+            funding = dict(self.funding_balance_cache['data'])
+            funding[asset] = max(0.0, float(funding.get(asset, 0) or 0) - delta)
+            self.funding_balance_cache = {**self.funding_balance_cache, 'data': funding}
+
+    def _adjust_cached_spot(self, deltas):
+        """按 {资产: 变化量} 修正现货余额缓存（复制后替换，不修改调用方已持有的余额字典）"""
+        spot = self.balance_cache['data']
+        if not spot:
+            return
+        spot = dict(spot)
+        for asset, delta in deltas.items():
+            for key in ('free', 'total'):
+                if isinstance(spot.get(key), dict):
+                    spot[key] = {**spot[key], asset: max(0.0, float(spot[key].get(asset, 0) or 0) + delta)}
+            if isinstance(spot.get(asset), dict):
+                spot[asset] = {
+                    **spot[asset],
+                    'free': max(0.0, float(spot[asset].get('free', 0) or 0) + delta),
+                    'total': max(0.0, float(spot[asset].get('total', 0) or 0) + delta)
+                }
+        self.balance_cache = {**self.balance_cache, 'data': spot}
+
+    def on_fill(self, symbol, trade):
+        """
+        成交回调（OrderTracker 监听器签名）：按成交直接修正现货余额缓存中的基础货币和计价货币，
+        缓存有效期内的后续读取不再返回成交前的余额，也不需要额外请求交易所。
+        """
+        base_asset, quote_asset = symbol.split('/')
+        amount = float(trade['amount'])
+        sign = 1 if trade['side'] == 'buy' else -1
+        self._adjust_cached_spot({base_asset: sign * amount, quote_asset: -sign * amount * float(trade['price'])})
+
     async def transfer_to_spot(self, asset, amount):
         """从活期理财赎回到现货账户"""
         try:
@@ -369,16 +467,15 @@ class ExchangeClient:
                 'asset': asset,
                 'amount': formatted_amount,
                 'productId': product_id,
-                'timestamp': int(time.time() * 1000 + self.time_diff),
+                'timestamp': int(self.clock.time() * 1000 + self.time_diff),
                 'redeemType': 'FAST'  # 快速赎回
             }
             self.logger.info(f"开始赎回: {formatted_amount} {asset} 到现货")
             result = await self.exchange.sapi_post_simple_earn_flexible_redeem(params)
             self.logger.info(f"划转成功: {result}")
             
-            # 赎回后清除余额缓存，确保下次获取最新余额
-            self.balance_cache = {'timestamp': 0, 'data': None}
-            self.funding_balance_cache = {'timestamp': 0, 'data': {}}
+            # 只修正该资产的缓存余额，其他资产的缓存继续有效
+            self._apply_transfer_to_caches(asset, float(formatted_amount), to_savings=False)
             
             return result
         except Exception as e:
@@ -398,21 +495,37 @@ class ExchangeClient:
                 'asset': asset,
                 'amount': formatted_amount,
                 'productId': product_id,
-                'timestamp': int(time.time() * 1000 + self.time_diff)
+                'timestamp': int(self.clock.time() * 1000 + self.time_diff)
             }
             self.logger.info(f"开始申购: {formatted_amount} {asset} 到活期理财")
             result = await self.exchange.sapi_post_simple_earn_flexible_subscribe(params)
             self.logger.info(f"划转成功: {result}")
             
-            # 申购后清除余额缓存，确保下次获取最新余额
-            self.balance_cache = {'timestamp': 0, 'data': None}
-            self.funding_balance_cache = {'timestamp': 0, 'data': {}}
+            # 只修正该资产的缓存余额，其他资产的缓存继续有效
+            self._apply_transfer_to_caches(asset, float(formatted_amount), to_savings=True)
             
             return result
         except Exception as e:
             self.logger.error(f"申购失败: {str(e)}")
             raise
 
+    async def batch_transfer(self, transfers):
+        """
+        并发执行多笔申购/赎回。
+
+        Args:
+            transfers: [(资产, 'subscribe' 或 'redeem', 数量), ...]
+        Returns:
+            list: 与 transfers 一一对应的结果，失败的项为异常对象
+        """
+        if not transfers:
+            return []
+        await self.load_flexible_products()  # 所有划转共用一次产品目录查询
+        return await asyncio.gather(*[
+            self.transfer_to_savings(asset, amount) if direction == 'subscribe' else self.transfer_to_spot(asset, amount)
+            for asset, direction, amount in transfers
+        ], return_exceptions=True)
+
     async def fetch_my_trades(self, symbol, limit=10):
         """获取指定交易对的最近成交记录"""
         self.logger.debug(f"获取最近 {limit} 条成交记录 for {symbol}...")
@@ -434,7 +547,7 @@ class ExchangeClient:
         【最终修复版】计算整个账户的总资产价值。
         此版本修复了因 fetch_balance() 返回理财凭证而导致的重复计算BUG。
         """
-        now = time.time()
+        now = self.clock.time()
         if now - self.total_value_cache['timestamp'] < self.cache_ttl:
             return self.total_value_cache['data']
 
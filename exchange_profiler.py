@@ -0,0 +1,162 @@
+import contextvars
+import inspect
+import os
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 近似的 Binance 现货 REST 请求权重（按 ccxt 方法名）；未列出的方法按 1 计
+DEFAULT_WEIGHTS = {
+    'load_markets': 20,
+    'fetch_time': 1,
+    'fetch_ticker': 2,
+    'fetch_order_book': 5,
+    'fetch_ohlcv': 2,
+    'fetch_balance': 20,
+    'create_order': 1,
+    'fetch_order': 4,
+    'cancel_order': 1,
+    'fetch_open_orders': 6,
+    'fetch_my_trades': 20,
+    'sapi_get_simple_earn_flexible_position': 150,
+    'sapi_get_simple_earn_flexible_list': 150,
+    'sapi_post_simple_earn_flexible_subscribe': 1,
+    'sapi_post_simple_earn_flexible_redeem': 1,
+    # ExchangeClient 层的方法名（直接包装客户端时使用）
+    'fetch_funding_balance': 150,
+}
+
+# 调用点归属时跳过的文件：交易所封装层本身不是“调用方”
+_SKIP_FILES = {
+    os.path.join(PROJECT_DIR, name)
+    for name in ('exchange_profiler.py', 'exchange_client.py', 'exchange_simulator.py')
+}
+
+_current_path = contextvars.ContextVar('exchange_profile_path', default='(unscoped)')
+
+
+def find_caller(skip_files=_SKIP_FILES):
+    """返回最内层的项目代码调用点 'file.py:行号 in 函数名'（跳过交易所封装层和第三方库）"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(PROJECT_DIR) and filename not in skip_files and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, PROJECT_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return '(unknown)'
+
+
+class _ProfiledExchange:
+    """透明代理：异步方法调用被计数后转发给目标对象，其余属性原样返回"""
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+        profiler = self._profiler
+
+        def profiled(*args, **kwargs):
+            profiler.record(name, find_caller())
+            return attr(*args, **kwargs)
+
+        return profiled
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+class ExchangeProfiler:
+    """
+    交易所调用预算分析器。
+
+    wrap() 返回目标对象（ExchangeClient、ccxt 实例或 SimulatedExchange）的计数代理，
+    每次异步调用按 代码路径 × 方法 和 调用点 两个维度累计次数与权重：
+    - 代码路径由 section(name) 上下文管理器标记（基于 contextvar，子任务自动继承）；
+    - 调用点是发起调用的最内层项目代码行。
+    包装 ccxt 层（见 profile_client）时统计的是真实 REST 请求，客户端缓存命中不计入。
+    """
+
+    def __init__(self, weights: dict = None):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.reset()
+
+    def reset(self):
+        self.paths = defaultdict(lambda: defaultdict(int))  # path -> method -> 次数
+        self.sites = defaultdict(lambda: defaultdict(int))  # call site -> method -> 次数
+
+    def wrap(self, target):
+        return _ProfiledExchange(target, self)
+
+    def weight_of(self, method):
+        return self.weights.get(method, 1)
+
+    @contextmanager
+    def section(self, name: str):
+        """把代码块内（包括其中创建的子任务）的调用归到 name 代码路径"""
+        token = _current_path.set(name)
+        try:
+            yield self
+        finally:
+            _current_path.reset(token)
+
+    def record(self, method: str, site: str):
+        self.paths[_current_path.get()][method] += 1
+        self.sites[site][method] += 1
+
+    def calls(self, path: str = None, method: str = None) -> int:
+        paths = [self.paths.get(path, {})] if path is not None else self.paths.values()
+        return sum(count for methods in paths for name, count in methods.items() if method in (None, name))
+
+    def weight(self, path: str = None) -> int:
+        paths = [self.paths.get(path, {})] if path is not None else self.paths.values()
+        return sum(self.weight_of(name) * count for methods in paths for name, count in methods.items())
+
+    def report(self):
+        """返回预算报告：每个代码路径和调用点的调用次数、权重及方法明细"""
+        def summarize(groups):
+            return {
+                key: {
+                    'calls': sum(methods.values()),
+                    'weight': sum(self.weight_of(name) * count for name, count in methods.items()),
+                    'methods': dict(methods)
+                }
+                for key, methods in sorted(groups.items())
+            }
+        return {
+            'total_calls': self.calls(),
+            'total_weight': self.weight(),
+            'paths': summarize(self.paths),
+            'sites': summarize(self.sites)
+        }
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [f"交易所调用预算 | 总调用: {report['total_calls']} | 总权重: {report['total_weight']}"]
+        for title, key in (('代码路径', 'paths'), ('调用点', 'sites')):
+            lines.append(f"[{title}]")
+            for name, item in sorted(report[key].items(), key=lambda kv: -kv[1]['weight']):
+                methods = ', '.join(f"{m}×{c}" for m, c in sorted(item['methods'].items()))
+                lines.append(f"  {name}: 调用 {item['calls']} | 权重 {item['weight']} | {methods}")
+        return '\n'.join(lines)
+
+    def assert_budget(self, path: str, max_calls: int = None, max_weight: int = None):
+        """调用次数或权重超出预算时抛出 AssertionError，消息中附带完整报告"""
+        calls, weight = self.calls(path), self.weight(path)
+        if (max_calls is not None and calls > max_calls) or (max_weight is not None and weight > max_weight):
+            raise AssertionError(
+                f"{path} 超出交易所调用预算: 调用 {calls}/{max_calls} | 权重 {weight}/{max_weight}\n"
+                f"{self.format_report()}"
+            )
+
+
+def profile_client(client, profiler: ExchangeProfiler = None) -> ExchangeProfiler:
+    """包装 ExchangeClient 的底层 ccxt 实例，只统计真实发出的 REST 请求"""
+    profiler = profiler or ExchangeProfiler()
+    client.exchange = profiler.wrap(client.exchange)
+    return profiler
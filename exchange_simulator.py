@@ -0,0 +1,288 @@
+import asyncio
+import copy
+import itertools
+import math
+import random
+import time
+
+TIMEFRAME_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 4 * 3600, '1d': 86400}
+
+
+class SimulatedExchange:
+    """
+    确定性的内存交易所，实现 ExchangeClient 用到的 ccxt 接口子集（行情、余额、K线、盘口、下单、
+    Simple Earn 理财），用于调用预算测试、基准测试和长时间仿真。
+
+    - 价格由 set_price() 驱动，K线由价格和时间确定性生成（同一时间段总是返回相同数据）；
+    - 限价单若可立即成交（买价 >= 卖一 / 卖价 <= 买一）则按挂单价全部成交，否则挂单，
+      之后 set_price() 穿越挂单价时成交；
+    - latency 为每次调用的模拟网络延迟（秒），默认 0；
+    - clock 返回当前时间戳（秒），默认 time.time。
+    """
+
+    def __init__(self, prices: dict, balances: dict = None, funding: dict = None, latency: float = 0.0,
+                 spread: float = 0.0005, depth: float = 10.0, amount_precision: int = 3, price_precision: int = 2,
+                 min_cost: float = 10.0, seed: int = 0, clock=None):
+        self.prices = {symbol: float(price) for symbol, price in prices.items()}
+        self.balances = {asset: float(amount) for asset, amount in (balances or {}).items()}
+        self.used = {}
+        self.funding = {asset: float(amount) for asset, amount in (funding or {}).items()}
+        self.latency = latency
+        self.spread = spread
+        self.depth = depth
+        self.seed = seed
+        self.clock = clock or time.time
+        self.markets = {}
+        for symbol in self.prices:
+            base, quote = symbol.split('/')
+            self.markets[symbol] = {
+                'id': base + quote,
+                'symbol': symbol,
+                'base': base,
+                'quote': quote,
+                'precision': {'amount': amount_precision, 'price': price_precision},
+                'limits': {'cost': {'min': min_cost}, 'amount': {'min': 10 ** -amount_precision}}
+            }
+        self._ids = {market['id']: symbol for symbol, market in self.markets.items()}
+        self._order_ids = itertools.count(1)
+        self.orders = {}
+        self.trades = []
+
+    # ------------------------------------------------------------------
+    # 内部工具
+    # ------------------------------------------------------------------
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _symbol(self, symbol_or_id):
+        return self._ids.get(symbol_or_id, symbol_or_id)
+
+    def _now_ms(self):
+        return int(self.clock() * 1000)
+
+    def book_top(self, symbol):
+        """返回 (买一, 卖一)，已按价格精度对齐到最小价位"""
+        price = self.prices[symbol]
+        digits = self.markets[symbol]['precision']['price']
+        return round(price * (1 - self.spread / 2), digits), round(price * (1 + self.spread / 2), digits)
+
+    def set_price(self, symbol, price):
+        """更新价格，并撮合被穿越的挂单"""
+        self.prices[symbol] = float(price)
+        bid, ask = self.book_top(symbol)
+        for order in list(self.orders.values()):
+            if order['symbol'] != symbol or order['status'] != 'open':
+                continue
+            if (order['side'] == 'buy' and ask <= order['price']) or (order['side'] == 'sell' and bid >= order['price']):
+                self._fill(order)
+
+    def _fill(self, order):
+        market = self.markets[order['symbol']]
+        base, quote = market['base'], market['quote']
+        amount, cost = order['amount'], order['amount'] * order['price']
+        if order['side'] == 'buy':
+            self.used[quote] = self.used.get(quote, 0.0) - cost
+            self.balances[base] = self.balances.get(base, 0.0) + amount
+        else:
+            self.used[base] = self.used.get(base, 0.0) - amount
+            self.balances[quote] = self.balances.get(quote, 0.0) + cost
+        order.update(status='closed', filled=amount, remaining=0.0, cost=cost)
+        self.trades.append({
+            'id': str(len(self.trades) + 1),
+            'order': order['id'],
+            'symbol': order['symbol'],
+            'side': order['side'],
+            'price': order['price'],
+            'amount': amount,
+            'cost': cost,
+            'timestamp': self._now_ms()
+        })
+
+    # ------------------------------------------------------------------
+    # ccxt 同步接口
+    # ------------------------------------------------------------------
+
+    def market(self, symbol):
+        return self.markets[self._symbol(symbol)]
+
+    def amount_to_precision(self, symbol, amount):
+        digits = self.market(symbol)['precision']['amount']
+        return f"{math.floor(float(amount) * 10 ** digits) / 10 ** digits:.{digits}f}"
+
+    def price_to_precision(self, symbol, price):
+        digits = self.market(symbol)['precision']['price']
+        return f"{float(price):.{digits}f}"
+
+    # ------------------------------------------------------------------
+    # ccxt 异步接口
+    # ------------------------------------------------------------------
+
+    async def load_markets(self, reload=False):
+        await self._delay()
+        return self.markets
+
+    async def fetch_time(self):
+        await self._delay()
+        return self._now_ms()
+
+    async def fetch_ticker(self, symbol):
+        await self._delay()
+        symbol = self._symbol(symbol)
+        bid, ask = self.book_top(symbol)
+        return {'symbol': symbol, 'last': self.prices[symbol], 'bid': bid, 'ask': ask, 'timestamp': self._now_ms()}
+
+    async def fetch_order_book(self, symbol, limit=5):
+        await self._delay()
+        symbol = self._symbol(symbol)
+        bid, ask = self.book_top(symbol)
+        step = self.prices[symbol] * self.spread
+        return {
+            'symbol': symbol,
+            'bids': [[bid - i * step, self.depth] for i in range(limit)],
+            'asks': [[ask + i * step, self.depth] for i in range(limit)],
+            'timestamp': self._now_ms()
+        }
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None, params=None):
+        """以当前价格为终点向前生成确定性的随机游走K线，最后一根为未收盘K线"""
+        await self._delay()
+        symbol = self._symbol(symbol)
+        limit = limit or (params or {}).get('limit') or 100
+        period_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        current_open = self._now_ms() // period_ms * period_ms
+        close = self.prices[symbol]
+        candles = []
+        for i in range(limit):
+            open_time = current_open - i * period_ms
+            rng = random.Random(f"{self.seed}:{symbol}:{timeframe}:{open_time}")
+            change = rng.uniform(-0.01, 0.01)
+            open_ = close / (1 + change)
+            high = max(open_, close) * (1 + rng.uniform(0, 0.005))
+            low = min(open_, close) * (1 - rng.uniform(0, 0.005))
+            candles.append([open_time, open_, high, low, close, rng.uniform(50, 150)])
+            close = open_
+        return list(reversed(candles))
+
+    async def fetch_balance(self, params=None):
+        await self._delay()
+        assets = set(self.balances) | set(self.used)
+        free = {asset: self.balances.get(asset, 0.0) for asset in assets}
+        used = {asset: self.used.get(asset, 0.0) for asset in assets}
+        return {
+            'free': free,
+            'used': used,
+            'total': {asset: free[asset] + used[asset] for asset in assets}
+        }
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        await self._delay()
+        symbol = self._symbol(symbol)
+        market = self.markets[symbol]
+        base, quote = market['base'], market['quote']
+        amount = float(amount)
+        bid, ask = self.book_top(symbol)
+        price = float(price) if price is not None else (ask if side == 'buy' else bid)
+        # 冻结资金
+        if side == 'buy':
+            asset, locked = quote, amount * price
+        else:
+            asset, locked = base, amount
+        if self.balances.get(asset, 0.0) + 1e-12 < locked:
+            raise Exception(f"Insufficient balance for {side} {amount} {symbol}")
+        self.balances[asset] -= locked
+        self.used[asset] = self.used.get(asset, 0.0) + locked
+        order = {
+            'id': str(next(self._order_ids)),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'price': price,
+            'amount': amount,
+            'filled': 0.0,
+            'remaining': amount,
+            'cost': 0.0,
+            'status': 'open',
+            'timestamp': self._now_ms()
+        }
+        self.orders[order['id']] = order
+        if type == 'market' or (side == 'buy' and price >= ask) or (side == 'sell' and price <= bid):
+            self._fill(order)
+        return copy.deepcopy(order)
+
+    async def fetch_order(self, order_id, symbol=None, params=None):
+        await self._delay()
+        return copy.deepcopy(self.orders[str(order_id)])
+
+    async def cancel_order(self, order_id, symbol=None, params=None):
+        await self._delay()
+        order = self.orders[str(order_id)]
+        if order['status'] != 'open':
+            raise Exception(f"Order {order_id} is {order['status']}")
+        market = self.markets[order['symbol']]
+        if order['side'] == 'buy':
+            asset, locked = market['quote'], order['amount'] * order['price']
+        else:
+            asset, locked = market['base'], order['amount']
+        self.used[asset] -= locked
+        self.balances[asset] = self.balances.get(asset, 0.0) + locked
+        order['status'] = 'canceled'
+        return copy.deepcopy(order)
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        await self._delay()
+        symbol = self._symbol(symbol) if symbol else None
+        return [copy.deepcopy(o) for o in self.orders.values()
+                if o['status'] == 'open' and (symbol is None or o['symbol'] == symbol)]
+
+    async def fetch_my_trades(self, symbol=None, since=None, limit=None, params=None):
+        await self._delay()
+        symbol = self._symbol(symbol) if symbol else None
+        trades = [t for t in self.trades if symbol is None or t['symbol'] == symbol]
+        return copy.deepcopy(trades[-limit:] if limit else trades)
+
+    # Simple Earn 活期理财
+    async def sapi_get_simple_earn_flexible_position(self, params=None):
+        await self._delay()
+        params = params or {}
+        current, size = int(params.get('current', 1)), int(params.get('size', 10))
+        rows = [{'asset': asset, 'totalAmount': str(amount)} for asset, amount in sorted(self.funding.items()) if amount > 0]
+        return {'rows': rows[(current - 1) * size:current * size], 'total': len(rows)}
+
+    async def sapi_get_simple_earn_flexible_list(self, params=None):
+        await self._delay()
+        assets = sorted({m['base'] for m in self.markets.values()} | {m['quote'] for m in self.markets.values()})
+        rows = [{'asset': asset, 'productId': f"{asset}001", 'status': 'PURCHASING'} for asset in assets]
+        if params and params.get('asset'):
+            rows = [row for row in rows if row['asset'] == params['asset']]
+        return {'rows': rows, 'total': len(rows)}
+
+    async def sapi_post_simple_earn_flexible_subscribe(self, params):
+        await self._delay()
+        asset, amount = params['asset'], float(params['amount'])
+        if self.balances.get(asset, 0.0) + 1e-12 < amount:
+            raise Exception(f"Insufficient balance to subscribe {amount} {asset}")
+        self.balances[asset] -= amount
+        self.funding[asset] = self.funding.get(asset, 0.0) + amount
+        return {'success': True, 'purchaseId': len(self.trades)}
+
+    async def sapi_post_simple_earn_flexible_redeem(self, params):
+        await self._delay()
+        asset, amount = params['asset'], float(params['amount'])
+        amount = min(amount, self.funding.get(asset, 0.0))
+        self.funding[asset] = self.funding.get(asset, 0.0) - amount
+        self.balances[asset] = self.balances.get(asset, 0.0) + amount
+        return {'success': True, 'redeemId': len(self.trades)}
+
+    async def close(self):
+        return None
+
+
+def create_client(simulator: SimulatedExchange, clock=None):
+    """创建底层交易所替换为模拟器的 ExchangeClient（保留客户端自身的缓存逻辑），clock 为客户端使用的时钟"""
+    from exchange_client import ExchangeClient
+    client = ExchangeClient(clock=clock)
+    client.exchange = simulator
+    client.markets_loaded = True
+    return client
@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+
+from config import settings
+from clock import system_clock
+
+_job_ids = itertools.count(1)
+
+
+class ExecutionJob:
+    """一次拆单执行任务的进度记录"""
+
+    def __init__(self, symbol: str, side: str, amount: float, mode: str, created_at: float = None):
+        self.id = next(_job_ids)
+        self.symbol = symbol
+        self.side = side
+        self.mode = mode
+        self.total_amount = amount
+        self.filled_amount = 0.0
+        self.filled_cost = 0.0
+        self.slices = 0
+        self.failures = 0
+        self.status = 'pending'  # pending / running / done / cancelled / failed
+        self.error = None
+        self.created_at = created_at if created_at is not None else time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        self.task = None
+
+    @property
+    def remaining(self):
+        return max(0.0, self.total_amount - self.filled_amount)
+
+    @property
+    def progress(self):
+        return self.filled_amount / self.total_amount if self.total_amount > 0 else 1.0
+
+    @property
+    def avg_price(self):
+        return self.filled_cost / self.filled_amount if self.filled_amount > 0 else None
+
+    @property
+    def active(self):
+        return self.status in ('pending', 'running')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'symbol': self.symbol,
+            'side': self.side,
+            'mode': self.mode,
+            'status': self.status,
+            'total_amount': self.total_amount,
+            'filled_amount': self.filled_amount,
+            'progress': round(self.progress, 4),
+            'avg_price': self.avg_price,
+            'slices': self.slices,
+            'failures': self.failures,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ExecutionScheduler:
+    """
+    大额调仓的拆单执行器（每个交易对一个实例）。
+
+    submit() 创建后台任务后立即返回，交易主循环不等待执行结果：
+    - twap: 按 max_slice_value 估算切片数，均匀分布在 slice_interval 间隔上；
+    - iceberg: 每次只下一个不超过 max_slice_value 的切片，成交后短暂停顿再下一片；
+    两种模式的每个切片都不超过盘口前 depth_levels 档对手方挂单量的 participation_rate。
+
+    executor(side, amount) 负责实际下单，成功时返回包含 price/amount 的成交信息，失败返回假值；
+    prepare(job) 可选，在第一片之前于后台执行（如从理财赎回资金），返回假值则放弃任务。
+    """
+
+    def __init__(self, trader, executor, prepare=None, mode: str = None, slice_interval: float = None,
+                 max_slice_value: float = None, participation_rate: float = None,
+                 iceberg_interval: float = 2.0, depth_levels: int = 5, max_failures: int = 3):
+        self.logger = logging.getLogger(f"{self.__class__.__name__}[{trader.symbol}]")
+        self.trader = trader
+        self.clock = getattr(trader, 'clock', system_clock)
+        self.executor = executor
+        self.prepare = prepare
+        self.mode = mode or settings.S1_EXECUTION_MODE
+        self.slice_interval = slice_interval if slice_interval is not None else settings.S1_SLICE_INTERVAL
+        self.max_slice_value = max_slice_value if max_slice_value is not None else settings.S1_MAX_SLICE_VALUE
+        self.participation_rate = participation_rate if participation_rate is not None else settings.S1_PARTICIPATION_RATE
+        self.iceberg_interval = iceberg_interval
+        self.depth_levels = depth_levels
+        self.max_failures = max_failures
+        self.active_job = None
+        self.history = []
+
+    def _min_slice_value(self):
+        symbol_info = getattr(self.trader, 'symbol_info', None) or {}
+        return symbol_info.get('limits', {}).get('cost', {}).get('min') or 10
+
+    def submit(self, side: str, amount: float, mode: str = None):
+        """提交拆单任务并立即返回；已有进行中的任务时返回 None"""
+        if self.active_job is not None and self.active_job.active:
+            return None
+        job = ExecutionJob(self.trader.symbol, side, amount, mode or self.mode, self.clock.time())
+        self.active_job = job
+        self.history = (self.history + [job])[-20:]
+        job.task = asyncio.create_task(self._run(job))
+        self.logger.info("拆单任务 #%d 已提交 | %s %.8f | 模式: %s", job.id, side, amount, job.mode)
+        return job
+
+    def cancel(self, job_id: int = None) -> bool:
+        """请求取消进行中的任务（当前切片完成后停止）"""
+        job = self.active_job
+        if job is None or not job.active or (job_id is not None and job.id != job_id):
+            return False
+        job.cancel_requested = True
+        return True
+
+    async def wait(self, job: ExecutionJob = None):
+        job = job or self.active_job
+        if job and job.task:
+            await asyncio.shield(job.task)
+
+    async def _slice_amount(self, job, remaining_slices):
+        """根据模式和盘口深度计算本次切片数量，返回 (数量, 参考价格)"""
+        order_book = await self.trader.exchange.fetch_order_book(self.trader.symbol, limit=self.depth_levels)
+        levels = (order_book.get('asks') if job.side == 'BUY' else order_book.get('bids')) or []
+        if not levels:
+            raise RuntimeError("订单簿为空")
+        price = float(levels[0][0])
+        visible = sum(float(level[1]) for level in levels[:self.depth_levels])
+        if job.mode == 'iceberg':
+            amount = self.max_slice_value / price
+        else:
+            amount = job.remaining / max(1, remaining_slices)
+        amount = min(amount, visible * self.participation_rate, job.remaining)
+        return amount, price
+
+    async def _run(self, job: ExecutionJob):
+        job.status = 'running'
+        try:
+            if self.prepare is not None and not await self.prepare(job):
+                job.status = 'failed'
+                job.error = '执行前准备失败'
+                return
+            price = self.trader.current_price or 0
+            planned = math.ceil(job.total_amount * price / self.max_slice_value) if price else 1
+            min_value = self._min_slice_value()
+            while job.remaining > 0 and not job.cancel_requested:
+                amount, price = await self._slice_amount(job, planned - job.slices)
+                if job.remaining * price < min_value:
+                    break  # 剩余部分不足最小下单金额
+                if amount * price < min_value:
+                    # 盘口太薄，按最小金额下单（不超过剩余量）
+                    amount = min(job.remaining, min_value * 1.01 / price)
+                result = await self.executor(job.side, amount)
+                if result:
+                    filled = float(result.get('amount', amount))
+                    job.filled_amount += filled
+                    job.filled_cost += filled * float(result.get('price', price))
+                    job.slices += 1
+                else:
+                    job.failures += 1
+                    if job.failures >= self.max_failures:
+                        job.status = 'failed'
+                        job.error = f'连续 {job.failures} 个切片执行失败'
+                        return
+                if job.remaining > 0 and not job.cancel_requested:
+                    await asyncio.sleep(self.slice_interval if job.mode == 'twap' else self.iceberg_interval)
+            job.status = 'cancelled' if job.cancel_requested else 'done'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+            raise
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            self.logger.error(f"拆单任务 #{job.id} 执行异常: {str(e)}", exc_info=True)
+        finally:
+            job.finished_at = self.clock.time()
+            self.logger.info(
+                "拆单任务 #%d 结束 | 状态: %s | 已成交 %.8f/%.8f | 切片: %d | 均价: %s",
+                job.id, job.status, job.filled_amount, job.total_amount, job.slices, job.avg_price
+            )
+
+    async def stop(self):
+        """取消进行中的任务（关闭程序时调用）"""
+        job = self.active_job
+        if job and job.task and not job.task.done():
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+
+    def get_status(self):
+        return self.active_job.to_dict() if self.active_job else None
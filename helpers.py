@@ -1,11 +1,14 @@
+import contextvars
+import json
 import logging
+import queue
 import requests
 from tenacity import retry, stop_after_attempt, wait_exponential
 from config import settings
 import time
 import psutil
 import os
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 
 def format_trade_message(side, symbol, price, amount, total, grid_size, base_asset, quote_asset, retry_count=None):
     """格式化交易消息为美观的文本格式
@@ -49,6 +52,13 @@ def format_trade_message(side, symbol, price, amount, total, grid_size, base_ass
     return message
 
 def send_pushplus_message(content, title="交易信号通知", timeout=settings.PUSHPLUS_TIMEOUT):
+    """发送推送通知：在事件循环中只入队由后台异步批量发送，不阻塞调用方；否则同步发送"""
+    from notifier import notifier
+    if notifier.notify(content, title):
+        return
+    _send_pushplus_sync(content, title, timeout)
+
+def _send_pushplus_sync(content, title, timeout):
     if not settings.PUSHPLUS_TOKEN:
         logging.error("未配置PUSHPLUS_TOKEN，无法发送通知")
         return
@@ -98,14 +108,71 @@ def debug_watcher():
         return wrapper
     return decorator 
 
+# 当前协程所属的交易对，由 LogConfig.bind_symbol 设置，写入结构化日志的 symbol 字段
+_log_symbol = contextvars.ContextVar('log_symbol', default=None)
+
+
+class SymbolContextFilter(logging.Filter):
+    """为日志记录补充 symbol 字段（调用方通过 extra 传入的优先）"""
+
+    def filter(self, record):
+        if not hasattr(record, 'symbol'):
+            record.symbol = _log_symbol.get()
+        return True
+
+
+class JsonLogFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON，便于按交易对检索和机器解析"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'symbol': getattr(record, 'symbol', None),
+            'msg': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃日志并计数，保证记录日志的协程永远不会被阻塞"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 class LogConfig:
     SINGLE_LOG = True  # 强制单文件模式
     BACKUP_DAYS = 2    # 保留2天日志
     LOG_DIR = os.path.dirname(__file__)  # 与main.py相同目录
     LOG_LEVEL = logging.INFO
+    TEXT_FORMAT = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
+    _listener = None
+    _queue_handler = None
 
     @staticmethod
-    def setup_logger():
+    def setup_logger(json_log: bool = None, queue_size: int = None):
+        """
+        配置根日志器：业务代码只把日志记录放入内存队列，
+        文件/控制台/JSON 输出由 QueueListener 在后台线程完成，不占用事件循环。
+        """
+        json_log = settings.LOG_JSON_ENABLED if json_log is None else json_log
+        queue_size = queue_size or settings.LOG_QUEUE_SIZE
+
+        LogConfig.shutdown()
         logger = logging.getLogger()
         logger.setLevel(LogConfig.LOG_LEVEL)
         
@@ -123,16 +190,58 @@ class LogConfig:
             delay=True
         )
         file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s [%(name)s] %(levelname)s: %(message)s',
+            LogConfig.TEXT_FORMAT,
             datefmt='%Y-%m-%d %H:%M:%S'
         ))
         
         # 控制台处理器
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(logging.Formatter('%(message)s'))
-        
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        handlers = [file_handler, console_handler]
+
+        # 结构化 JSONL 输出（可选）
+        if json_log:
+            json_handler = TimedRotatingFileHandler(
+                os.path.join(LogConfig.LOG_DIR, 'trading_system.jsonl'),
+                when='midnight',
+                interval=1,
+                backupCount=LogConfig.BACKUP_DAYS,
+                encoding='utf-8',
+                delay=True
+            )
+            json_handler.setFormatter(JsonLogFormatter())
+            handlers.append(json_handler)
+
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        queue_handler.addFilter(SymbolContextFilter())
+        logger.addHandler(queue_handler)
+
+        LogConfig._queue_handler = queue_handler
+        LogConfig._listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        LogConfig._listener.start()
+
+    @staticmethod
+    def shutdown():
+        """停止后台写日志线程，并把队列中剩余的日志写完"""
+        listener = LogConfig._listener
+        LogConfig._listener = None
+        if listener is None:
+            return
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    @staticmethod
+    def bind_symbol(symbol):
+        """把当前协程（及其创建的子任务）的日志归属到指定交易对"""
+        return _log_symbol.set(symbol)
+
+    @staticmethod
+    def get_metrics():
+        handler = LogConfig._queue_handler
+        if handler is None:
+            return {'pending': 0, 'dropped': 0}
+        return {'pending': handler.queue.qsize(), 'dropped': handler.dropped}
 
     @staticmethod
     def clean_old_logs():
@@ -0,0 +1,56 @@
+import os
+
+
+def tail_lines(path: str, max_lines: int = 500, block_size: int = 8192):
+    """
+    从文件末尾按块向前读取，返回最后 max_lines 个完整行及其结束偏移量。
+    代价只与读取的行数有关，与日志文件大小无关。
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        # 末尾没有换行的半行还在写入中，不计入（下次增量读取时再返回）
+        end = size
+        pos = size
+        data = b''
+        while pos > 0:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            data = f.read(read_size) + data
+            if data.count(b'\n') > max_lines:
+                break
+    if not data.endswith(b'\n'):
+        cut = data.rfind(b'\n') + 1
+        end -= len(data) - cut
+        data = data[:cut]
+    lines = data.split(b'\n')[:-1] if data else []
+    if pos > 0:
+        lines = lines[1:]  # 第一行可能不完整
+    lines = lines[-max_lines:] if max_lines else []
+    return [line.decode('utf-8', errors='replace') for line in lines], end
+
+
+def read_log_delta(path: str, since: int = None, inode: int = None, max_lines: int = 500, max_bytes: int = 1024 * 1024):
+    """
+    增量读取日志。
+
+    Args:
+        since: 客户端上次拿到的字节偏移量；为空时返回末尾 max_lines 行
+        inode: 客户端上次拿到的文件 inode，用于识别 TimedRotatingFileHandler 的轮转
+    Returns:
+        dict: lines（按时间顺序）、offset、inode、reset（是否因轮转/首次/落后太多而返回的是尾部快照）
+    """
+    st = os.stat(path)
+    rotated = inode is not None and inode != st.st_ino
+    if since is None or rotated or since > st.st_size or st.st_size - since > max_bytes:
+        lines, offset = tail_lines(path, max_lines)
+        return {'lines': lines, 'offset': offset, 'inode': st.st_ino, 'reset': True}
+
+    with open(path, 'rb') as f:
+        f.seek(since)
+        data = f.read(st.st_size - since)
+    cut = data.rfind(b'\n') + 1  # 只返回完整的行
+    data = data[:cut]
+    lines = [line.decode('utf-8', errors='replace') for line in data.split(b'\n')[:-1]] if data else []
+    return {'lines': lines, 'offset': since + cut, 'inode': st.st_ino, 'reset': False}
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from config import settings
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class LoopWatchdog:
+    """
+    事件循环卡顿看门狗。
+
+    事件循环内的心跳协程每 interval 秒更新一次心跳时间，并记录实际唤醒的延迟；
+    独立的监视线程发现心跳超过 threshold 秒未更新时，说明事件循环正被同步调用阻塞，
+    此时抓取事件循环线程的调用栈，定位到项目代码中的阻塞位置，写入日志和指标。
+    """
+
+    def __init__(self, threshold: float = None, interval: float = 0.1, max_incidents: int = 20):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.threshold = threshold if threshold is not None else settings.LOOP_WATCHDOG_THRESHOLD
+        self.interval = interval
+        self.incidents = deque(maxlen=max_incidents)
+        self.metrics = {'stalls': 0, 'max_lag_ms': 0.0, 'last_lag_ms': 0.0}
+        self._last_beat = time.monotonic()
+        self._beat_seq = 0
+        self._reported_seq = -1
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, loop.time() - expected) * 1000
+            self.metrics['last_lag_ms'] = round(lag_ms, 2)
+            self.metrics['max_lag_ms'] = round(max(self.metrics['max_lag_ms'], lag_ms), 2)
+            self._last_beat = time.monotonic()
+            self._beat_seq += 1
+
+    @staticmethod
+    def find_call_site(stack):
+        """在调用栈中找出最内层的项目代码帧（跳过标准库和第三方库）"""
+        for frame in reversed(stack):
+            filename = os.path.abspath(frame.filename)
+            if filename.startswith(PROJECT_DIR) and 'site-packages' not in filename \
+                    and filename != os.path.abspath(__file__):
+                return frame
+        return stack[-1] if stack else None
+
+    def _capture(self, stalled_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        call_site = self.find_call_site(stack)
+        incident = {
+            'timestamp': time.time(),
+            'stalled_ms': round(stalled_for * 1000, 1),
+            'call_site': f"{call_site.filename}:{call_site.lineno} in {call_site.name}" if call_site else None,
+            'code': call_site.line if call_site else None,
+            'stack': traceback.format_list(stack[-15:])
+        }
+        self.incidents.append(incident)
+        self.metrics['stalls'] += 1
+        self.logger.warning(
+            "事件循环被阻塞 %.0fms | 位置: %s | 代码: %s\n%s",
+            incident['stalled_ms'], incident['call_site'], incident['code'], ''.join(incident['stack'])
+        )
+        return incident
+
+    def _watch(self):
+        check_interval = min(self.interval, self.threshold) / 2
+        while not self._stop_event.wait(check_interval):
+            seq = self._beat_seq
+            stalled_for = time.monotonic() - self._last_beat - self.interval
+            # 同一次阻塞只上报一次
+            if stalled_for > self.threshold and seq != self._reported_seq:
+                self._reported_seq = seq
+                try:
+                    self._capture(stalled_for)
+                except Exception as e:
+                    self.logger.error("抓取事件循环调用栈失败: %s", e)
+
+    def start(self):
+        """在事件循环中调用，启动心跳协程和监视线程"""
+        if self._task is None or self._task.done():
+            self._loop_thread_id = threading.get_ident()
+            self._last_beat = time.monotonic()
+            self._task = asyncio.create_task(self._heartbeat())
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._watch, name='LoopWatchdog', daemon=True)
+            self._thread.start()
+        return self._task
+
+    async def stop(self):
+        self._stop_event.set()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 1.0)
+            self._thread = None
+
+    def get_metrics(self):
+        last = self.incidents[-1] if self.incidents else None
+        return {
+            **self.metrics,
+            'threshold_ms': self.threshold * 1000,
+            'last_incident': {k: v for k, v in last.items() if k != 'stack'} if last else None
+        }
+
+
+# 全局实例
+loop_watchdog = LoopWatchdog()
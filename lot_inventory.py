@@ -0,0 +1,120 @@
+import logging
+from collections import deque
+
+
+class LotInventory:
+    """
+    单个交易对的持仓批次（lot）台账，用于逐笔计算已实现盈亏。
+
+    - fifo: 卖出按先进先出顺序冲销买入批次，每笔成交只触及被冲销的批次；
+    - average: 所有持仓合并为一个平均成本批次。
+
+    卖出数量超过台账持仓时（例如启动前已有的底仓），超出部分没有成本依据，不计盈亏。
+    """
+
+    EPSILON = 1e-12
+
+    def __init__(self, method: str = 'fifo'):
+        if method not in ('fifo', 'average'):
+            raise ValueError(f"不支持的成本计算方式: {method}")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.method = method
+        self.reset()
+
+    def reset(self):
+        self.lots = deque()  # [数量, 成本价]
+        self.position = 0.0
+        self.cost_basis = 0.0  # 未平仓批次的总成本
+        self.realized_pnl = 0.0
+        self.last_timestamp = 0.0
+
+    @property
+    def avg_cost(self):
+        return self.cost_basis / self.position if self.position > self.EPSILON else 0.0
+
+    def unrealized_pnl(self, price: float) -> float:
+        return self.position * price - self.cost_basis
+
+    def apply(self, trade: dict) -> float:
+        """计入一笔成交，返回该笔成交的已实现盈亏（买入为0）"""
+        side = str(trade['side']).lower()
+        price = float(trade['price'])
+        amount = float(trade['amount'])
+        self.last_timestamp = max(self.last_timestamp, float(trade.get('timestamp', 0)))
+
+        if side == 'buy':
+            if self.method == 'average' and self.lots:
+                lot = self.lots[0]
+                lot[1] = (lot[0] * lot[1] + amount * price) / (lot[0] + amount)
+                lot[0] += amount
+            else:
+                self.lots.append([amount, price])
+            self.position += amount
+            self.cost_basis += amount * price
+            return 0.0
+
+        profit = 0.0
+        remaining = amount
+        while remaining > self.EPSILON and self.lots:
+            lot = self.lots[0]
+            matched = min(lot[0], remaining)
+            profit += (price - lot[1]) * matched
+            self.cost_basis -= matched * lot[1]
+            self.position -= matched
+            lot[0] -= matched
+            remaining -= matched
+            if lot[0] <= self.EPSILON:
+                self.lots.popleft()
+        if not self.lots:
+            # 清仓后消除浮点累计误差
+            self.position = 0.0
+            self.cost_basis = 0.0
+        if remaining > self.EPSILON:
+            self.logger.debug(f"卖出数量超出台账持仓 {remaining:.8f}，超出部分不计盈亏")
+        self.realized_pnl += profit
+        return profit
+
+    @staticmethod
+    def profit_unknown(trade: dict) -> bool:
+        """
+        成交的盈亏是否需要由台账计算：缺少 profit，或是 profit 为 0 的卖出。
+        旧版同步逻辑给所有成交都写入了 'profit': 0，这些卖出的 0 并不是真实盈亏。
+        """
+        profit = trade.get('profit')
+        return profit is None or (not profit and str(trade['side']).lower() == 'sell')
+
+    def rebuild(self, trades):
+        """
+        按时间顺序重放成交记录重建台账。
+        盈亏未知的记录（见 profit_unknown）会被就地补上计算出的盈亏，返回盈亏发生变化的记录。
+        """
+        filled = []
+        for trade in sorted(trades, key=lambda t: t['timestamp']):
+            profit = self.apply(trade)
+            if self.profit_unknown(trade) and trade.get('profit') != profit:
+                trade['profit'] = profit
+                filled.append(trade)
+        return filled
+
+    def to_dict(self):
+        return {
+            'method': self.method,
+            'lots': [list(lot) for lot in self.lots],
+            'position': self.position,
+            'cost_basis': self.cost_basis,
+            'realized_pnl': self.realized_pnl,
+            'last_timestamp': self.last_timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, method: str = None):
+        inventory = cls(method or data.get('method', 'fifo'))
+        inventory.lots = deque([list(lot) for lot in data.get('lots', [])])
+        inventory.position = float(data.get('position', 0.0))
+        inventory.cost_basis = float(data.get('cost_basis', 0.0))
+        inventory.realized_pnl = float(data.get('realized_pnl', 0.0))
+        inventory.last_timestamp = float(data.get('last_timestamp', 0.0))
+        if inventory.method == 'average' and len(inventory.lots) > 1:
+            # 由 fifo 切换为平均成本时合并为单个批次
+            inventory.lots = deque([[inventory.position, inventory.avg_cost]])
+        return inventory
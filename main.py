@@ -8,6 +8,11 @@ from helpers import LogConfig, send_pushplus_message
 from web_server import start_web_server
 from exchange_client import ExchangeClient
 from config import TradingConfig, SYMBOLS_LIST
+from state_persistence import state_persistence
+from order_rate_governor import order_governor
+from notifier import notifier
+from loop_watchdog import loop_watchdog
+from trading_store import get_trading_store, migrate_json_to_store
 
 async def periodic_global_status_logger(interval_seconds: int = 60):
     """
@@ -40,6 +45,10 @@ async def periodic_global_status_logger(interval_seconds: int = 60):
                 )
                 last_logged_total_value = current_total_value
 
+            store = get_trading_store()
+            if store:
+                store.record_equity('ACCOUNT', current_total_value)
+
             await asyncio.sleep(interval_seconds)
 
         except asyncio.CancelledError:
@@ -81,8 +90,10 @@ async def run_trader_for_symbol(symbol: str, exchange_client: ExchangeClient):
 
 async def main():
     shared_exchange_client = None  # 在try块外部定义
+    traders = {}  # 用于存储所有trader实例，供Web服务器使用
     try:
         LogConfig.setup_logger()
+        loop_watchdog.start()
         logging.info("="*50)
         logging.info("多币种网格交易系统启动")
         logging.info(f"待运行交易对: {SYMBOLS_LIST}")
@@ -96,6 +107,12 @@ async def main():
             logging.warning("计价货币不一致，程序即将退出。")
             return
 
+        # 启用SQLite统一存储时，首次启动一次性迁移旧的JSON数据并启动批量提交任务
+        store = get_trading_store()
+        if store:
+            migrate_json_to_store(store)
+            store.start()
+
         # 在主函数中创建唯一、共享的ExchangeClient实例
         shared_exchange_client = ExchangeClient()
 
@@ -106,7 +123,6 @@ async def main():
         await shared_exchange_client.load_markets()
         logging.info("市场数据加载完成，开始创建交易器实例...")
 
-        traders = {}  # 用于存储所有trader实例，供Web服务器使用
         tasks = []
 
         # 为每个交易对创建trader实例和任务
@@ -141,6 +157,51 @@ async def main():
         logging.critical(f"主程序发生未知严重错误: {e}\n{traceback.format_exc()}")
 
     finally:
+        # 先取消各交易对进行中的分批执行任务，它们仍会访问交易所和保存状态
+        for symbol, trader_instance in traders.items():
+            controller = getattr(trader_instance, 'position_controller_s1', None)
+            if controller is None:
+                continue
+            try:
+                await controller.scheduler.stop()
+            except Exception as e:
+                logging.error(f"停止 {symbol} 分批执行任务时发生错误: {str(e)}")
+
+        # 写出所有尚未落盘的状态快照
+        try:
+            await state_persistence.stop()
+        except Exception as e:
+            logging.error(f"停止状态持久化服务时发生错误: {str(e)}")
+
+        try:
+            await order_governor.stop()
+        except Exception as e:
+            logging.error(f"停止下单限速器时发生错误: {str(e)}")
+
+        try:
+            await loop_watchdog.stop()
+        except Exception as e:
+            logging.error(f"停止事件循环卡顿看门狗时发生错误: {str(e)}")
+
+        try:
+            if shared_exchange_client:
+                await shared_exchange_client.savings_rebalancer.stop()
+        except Exception as e:
+            logging.error(f"停止现货/理财资金再平衡服务时发生错误: {str(e)}")
+
+        # 发出队列中剩余的通知
+        try:
+            await notifier.stop()
+        except Exception as e:
+            logging.error(f"停止通知服务时发生错误: {str(e)}")
+
+        store = get_trading_store()
+        if store:
+            try:
+                await store.close()
+            except Exception as e:
+                logging.error(f"关闭SQLite存储时发生错误: {str(e)}")
+
         # 统一在此处关闭共享的客户端
         if shared_exchange_client:
             try:
@@ -152,6 +213,8 @@ async def main():
                 logging.error(f"关闭共享连接时发生错误: {str(e)}")
 
         logging.info("所有交易任务已结束。程序即将退出。")
+        # 最后停止后台日志线程，确保上面的日志全部写出
+        LogConfig.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+
+from clock import system_clock
+from config import settings
+
+
+class RateLimitedError(Exception):
+    """推送服务返回限流，retry_after 为建议的等待秒数"""
+
+    def __init__(self, message, retry_after=60.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PushPlusSink:
+    """PushPlus 推送通道（aiohttp 异步发送）"""
+
+    name = 'pushplus'
+
+    def __init__(self, token: str, url: str = None, timeout: float = None):
+        self.token = token
+        self.url = url or os.getenv('PUSHPLUS_URL', 'https://www.pushplus.plus/send')
+        self.timeout = timeout if timeout is not None else settings.PUSHPLUS_TIMEOUT
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def send(self, title: str, content: str):
+        session = await self._get_session()
+        data = {
+            "token": self.token,
+            "title": title,
+            "content": content,
+            "template": "txt"  # 使用文本模板
+        }
+        async with session.post(self.url, data=data) as response:
+            if response.status == 429:
+                raise RateLimitedError("推送服务限流", float(response.headers.get('Retry-After', 60)))
+            result = await response.json(content_type=None)
+            if response.status == 200 and result.get('code') == 200:
+                return
+            if result.get('code') in (429, 900, 999):
+                raise RateLimitedError(f"推送服务限流: {result}")
+            raise RuntimeError(f"消息推送失败: 状态码={response.status}, 响应={result}")
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class Notifier:
+    """
+    异步通知管道。
+
+    - notify() 只把消息放入有界队列后立即返回，不阻塞交易协程；队列满时丢弃最旧的消息；
+    - 后台发送任务把 digest_window 秒内到达的多条消息合并为一条汇总消息；
+    - 每个通道独立重试，失败按指数退避，遇到限流按服务端建议等待，
+      两次发送之间至少间隔 min_interval 秒；
+    - 通道可插拔：任何带有 async send(title, content) 的对象都可以作为通道。
+    """
+
+    def __init__(self, sinks=None, max_queue: int = None, digest_window: float = None,
+                 min_interval: float = None, max_retries: int = 3, backoff_base: float = 1.0, clock=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.clock = clock or system_clock
+        self._sinks = sinks
+        self.max_queue = max_queue or settings.NOTIFY_QUEUE_SIZE
+        self.digest_window = digest_window if digest_window is not None else settings.NOTIFY_DIGEST_WINDOW
+        self.min_interval = min_interval if min_interval is not None else settings.NOTIFY_MIN_INTERVAL
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._last_send = float('-inf')  # 尚未发送过
+        self.metrics = {'submitted': 0, 'dropped': 0, 'sent': 0, 'digests': 0, 'failures': 0, 'retries': 0}
+
+    @property
+    def sinks(self):
+        if self._sinks is None:
+            self._sinks = [PushPlusSink(settings.PUSHPLUS_TOKEN)] if settings.PUSHPLUS_TOKEN else []
+        return self._sinks
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    def notify(self, content: str, title: str = "交易信号通知") -> bool:
+        """
+        提交一条通知，立即返回。
+        没有运行中的事件循环时返回 False，由调用方自行同步发送。
+        """
+        if not self.sinks:
+            self.logger.error("未配置PUSHPLUS_TOKEN，无法发送通知")
+            return True
+        try:
+            self._ensure_started()
+        except RuntimeError:
+            return False
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.metrics['dropped'] += 1
+            self.logger.warning("通知队列已满，丢弃最旧的一条通知")
+        self._queue.put_nowait((title, content, self.clock.time()))
+        self.metrics['submitted'] += 1
+        return True
+
+    async def _collect_batch(self):
+        """取出一条消息，并收集 digest_window 秒内陆续到达的消息"""
+        batch = [await self._queue.get()]
+        deadline = self.clock.monotonic() + self.digest_window
+        while len(batch) < self.max_queue:
+            remaining = deadline - self.clock.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    @staticmethod
+    def build_digest(batch):
+        """把多条消息合并为一条汇总消息，返回 (title, content)"""
+        if len(batch) == 1:
+            return batch[0][0], batch[0][1]
+        titles = [title for title, _, _ in batch]
+        title = f"{titles[0]} 等{len(batch)}条通知" if len(set(titles)) > 1 else f"{titles[0]} ({len(batch)}条)"
+        sections = [
+            f"【{title_}】{time.strftime('%H:%M:%S', time.localtime(ts))}\n{content}"
+            for title_, content, ts in batch
+        ]
+        return title, "\n\n".join(sections)
+
+    async def _deliver(self, sink, title, content):
+        for attempt in range(self.max_retries + 1):
+            wait = self.min_interval - (self.clock.monotonic() - self._last_send)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_send = self.clock.monotonic()
+            try:
+                await sink.send(title, content)
+                self.metrics['sent'] += 1
+                self.logger.info(f"消息推送成功: {title}")
+                return True
+            except RateLimitedError as e:
+                delay = e.retry_after
+            except Exception as e:
+                delay = self.backoff_base * (2 ** attempt)
+                self.logger.warning(f"消息推送失败（第{attempt + 1}次）: {str(e)}")
+            if attempt < self.max_retries:
+                self.metrics['retries'] += 1
+                await asyncio.sleep(delay)
+        self.metrics['failures'] += 1
+        self.logger.error(f"消息推送最终失败: {title}")
+        return False
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                title, content = self.build_digest(batch)
+                if len(batch) > 1:
+                    self.metrics['digests'] += 1
+                for sink in self.sinks:
+                    await self._deliver(sink, title, content)
+            except Exception as e:
+                self.logger.error(f"通知发送任务异常: {str(e)}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self, timeout: float = 10.0):
+        """等待队列中的通知全部发送完毕"""
+        if self._queue is not None and self._worker is not None and not self._worker.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"仍有 {self._queue.qsize()} 条通知未发送")
+
+    async def stop(self, timeout: float = 10.0):
+        await self.flush(timeout)
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        for sink in self._sinks or []:
+            close = getattr(sink, 'close', None)
+            if close:
+                await close()
+
+    def get_metrics(self):
+        return {**self.metrics, 'pending': self._queue.qsize() if self._queue else 0}
+
+
+# 全局实例
+notifier = Notifier()
@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+
+from clock import system_clock
+from config import settings
+
+# 优先级数值越小越先获得下单额度
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class OrderRateGovernor:
+    """
+    账户级下单速率控制器（所有交易对共享）。
+
+    - 每个限额（如 10 秒 50 单、每日 160000 单）使用一个滑动窗口 deque，
+      只从队首弹出过期时间戳，单次检查为摊还 O(1)；
+    - acquire() 在额度不足时排队等待而不是拒绝；
+    - 等待者按优先级调度，同优先级下在交易对之间轮转，避免单个交易对的突发占满额度。
+    """
+
+    def __init__(self, limits=None, clock=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.clock = clock or system_clock
+        if limits is None:
+            limits = [
+                (settings.ORDER_LIMIT_PER_10S, 10),
+                (settings.ORDER_LIMIT_PER_DAY, 24 * 3600),
+            ]
+        self._windows = [(limit, window, deque()) for limit, window in limits]
+        self._queues = {}       # 交易对 -> 堆 [(优先级, 序号, future)]
+        self._last_served = {}  # 交易对 -> 最近一次获得额度时的发放序号
+        self._seq = itertools.count()
+        self._grants = itertools.count()
+        self._dispatcher = None
+        self._wakeup = None
+        self._loop = None
+        self.metrics = {
+            'granted': 0,
+            'queued': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+        }
+
+    def _purge(self, now):
+        for _, window, stamps in self._windows:
+            while stamps and stamps[0] <= now - window:
+                stamps.popleft()
+
+    def _delay(self, now):
+        """距离所有窗口都有剩余额度还需等待的秒数"""
+        self._purge(now)
+        delay = 0.0
+        for limit, window, stamps in self._windows:
+            if len(stamps) >= limit:
+                delay = max(delay, stamps[len(stamps) - limit] + window - now)
+        return delay
+
+    def _record(self, now):
+        for _, _, stamps in self._windows:
+            stamps.append(now)
+        self.metrics['granted'] += 1
+
+    def _has_waiters(self):
+        return any(self._queues.values())
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = None
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch_loop())
+        self._wakeup.set()
+
+    async def acquire(self, symbol: str = '*', priority: int = PRIORITY_NORMAL):
+        """等待直到可以下一单，返回等待的秒数"""
+        now = self.clock.monotonic()
+        if not self._has_waiters() and self._delay(now) <= 0:
+            self._record(now)
+            self._last_served[symbol] = next(self._grants)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues.setdefault(symbol, []), (priority, next(self._seq), future))
+        self.metrics['queued'] += 1
+        self._ensure_started()
+        await future  # 被取消的等待者留在堆中，调度时跳过
+        waited = self.clock.monotonic() - now
+        self.metrics['total_wait'] += waited
+        self.metrics['max_wait'] = max(self.metrics['max_wait'], waited)
+        if waited > 1:
+            self.logger.info(f"下单额度排队 {waited:.2f}s | {symbol}")
+        return waited
+
+    def _pop_next(self):
+        """按 (优先级, 最近获得额度的先后, 入队顺序) 选择下一个等待者"""
+        best = None
+        for symbol, heap in self._queues.items():
+            while heap and heap[0][2].done():
+                heapq.heappop(heap)
+            if not heap:
+                continue
+            key = (heap[0][0], self._last_served.get(symbol, -1), heap[0][1])
+            if best is None or key < best[0]:
+                best = (key, symbol)
+        if best is None:
+            return None, None
+        symbol = best[1]
+        return symbol, heapq.heappop(self._queues[symbol])[2]
+
+    async def _dispatch_loop(self):
+        while True:
+            if not self._has_waiters():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._delay(self.clock.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            symbol, future = self._pop_next()
+            if future is None:
+                continue
+            self._record(self.clock.monotonic())
+            self._last_served[symbol] = next(self._grants)
+            future.set_result(None)
+
+    def get_metrics(self):
+        now = self.clock.monotonic()
+        self._purge(now)
+        return {
+            **self.metrics,
+            'avg_wait': self.metrics['total_wait'] / self.metrics['queued'] if self.metrics['queued'] else 0.0,
+            'waiting': sum(1 for heap in self._queues.values() for item in heap if not item[2].done()),
+            'windows': {f'{window}s': {'used': len(stamps), 'limit': limit} for limit, window, stamps in self._windows},
+        }
+
+    async def stop(self):
+        if self._dispatcher and not self._dispatcher.done():
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        self._dispatcher = None
+
+
+# 全局实例：同一账户下所有交易对共享
+order_governor = OrderRateGovernor()
@@ -1,45 +1,66 @@
-import time
+import asyncio
+import copy
+import csv
+import glob
+import io
 from datetime import datetime
 import logging
 import os
 import json
-
-class OrderThrottler:
-    def __init__(self, limit=10, interval=60):
-        self.order_timestamps = []
-        self.limit = limit
-        self.interval = interval
-    
-    def check_rate(self):
-        current_time = time.time()
-        self.order_timestamps = [t for t in self.order_timestamps if current_time - t < self.interval]
-        if len(self.order_timestamps) >= self.limit:
-            return False
-        self.order_timestamps.append(current_time)
-        return True
+from trade_journal import TradeJournal
+from trading_store import get_trading_store
+from trade_statistics import TradeStatistics
+from lot_inventory import LotInventory
+from trade_archive import TradeArchive
+from state_persistence import write_json_atomic
+from config import settings, LEGACY_TRADES_SYMBOL
+from clock import system_clock
 
 class OrderTracker:
-    def __init__(self):
+    def __init__(self, symbol: str = None, data_dir: str = None, clock=None):
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.symbol = symbol
+        self.clock = clock or system_clock
+        # 启用SQLite存储时，成交与订单同时写入统一存储
+        self.store = get_trading_store() if symbol else None
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
+        # 旧版的整文件JSON历史和JSON归档不含交易对信息，只由 LEGACY_TRADES_SYMBOL 的跟踪器
+        # （或未指定交易对的单交易对跟踪器）导入成交日志，导入后重命名为 .migrated
+        self.owns_legacy = symbol is None or symbol == LEGACY_TRADES_SYMBOL
         self.history_file = os.path.join(self.data_dir, 'trade_history.json')
-        self.backup_file = os.path.join(self.data_dir, 'trade_history.backup.json')
+        journal_name = f"trade_journal_{symbol.replace('/', '_')}.jsonl" if symbol else 'trade_journal.jsonl'
+        self.journal_file = os.path.join(self.data_dir, journal_name)
+        self.journal = None
+        # 已归档成交对应的持仓批次检查点，启动时只需重放日志中的近期成交
+        inventory_name = f"inventory_{symbol.replace('/', '_')}.json" if symbol else 'inventory.json'
+        self.inventory_file = os.path.join(self.data_dir, inventory_name)
+        self.inventory = LotInventory(settings.PNL_COST_METHOD)
         self.archive_dir = os.path.join(self.data_dir, 'archives')
         if not os.path.exists(self.archive_dir):
             os.makedirs(self.archive_dir)
         self.max_archive_months = 12
+        # 列式内存映射归档，按交易对分文件
+        archive_prefix = f"trades_{symbol.replace('/', '_')}_" if symbol else 'trades_'
+        self.archive = TradeArchive(self.archive_dir, archive_prefix)
+        self._archived_stats = TradeStatistics(clock=self.clock)  # 已归档成交的统计基线
+        self.max_memory_trades = 100  # 内存中保留的最近成交数
+        # 成交日志超过该条数时自动归档，只保留最近 max_memory_trades 笔，使日志和启动重放的规模有上限
+        self.archive_threshold = 1000
+        self._archive_task = None  # 后台归档任务，同一时间只运行一个
         self.order_states = {}
         self.trade_count = 0
         self.orders = {}
         self.trade_history = []
-        self.load_trade_history()
+        self._listeners = []  # 新成交回调 callback(symbol, trade)
+        self.stats = TradeStatistics(clock=self.clock)  # 增量维护的成交统计
         self.clean_old_archives()
-    
+        self.load_trade_history()
+
     def log_order(self, order):
         self.order_states[order['id']] = {
-            'created': datetime.now(),
+            'created': datetime.fromtimestamp(self.clock.time()),
             'status': 'open'
         } 
 
@@ -49,11 +70,13 @@ class OrderTracker:
             order_id = order['id']
             self.orders[order_id] = {
                 'order': order,
-                'created_at': datetime.now(),
+                'created_at': datetime.fromtimestamp(self.clock.time()),
                 'status': order['status'],
                 'profit': 0
             }
             self.trade_count += 1
+            if self.store:
+                self.store.record_order(self.symbol, order, self.clock.time())
             self.logger.info(f"订单已添加到跟踪器 | ID: {order_id} | 状态: {order['status']}")
         except Exception as e:
             self.logger.error(f"添加订单失败: {str(e)}")
@@ -69,206 +92,302 @@ class OrderTracker:
         return self.trade_history
 
     def load_trade_history(self):
-        """从文件加载历史交易记录"""
+        """从成交日志恢复历史交易记录（旧版JSON历史的归属交易对首次启动时导入）"""
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.trade_history = json.load(f)
-                self.logger.info(f"加载了 {len(self.trade_history)} 条历史交易记录")
+            self._archived_stats.rebuild(TradeArchive.to_records(self.archive.query()))
+            self.journal = TradeJournal(self.journal_file)
+            if self.owns_legacy:
+                self._import_legacy_history()
+            self._rebuild_ledgers()
+            self.logger.info(f"加载了 {len(self.journal)} 条历史交易记录")
+            self._maybe_archive()
         except Exception as e:
             self.logger.error(f"加载历史交易记录失败: {str(e)}")
 
+    def _import_legacy_history(self):
+        """
+        把旧版 trade_history.json 和 archives/trades_YYYYMM.json 导入成交日志（已有的同 order_id 记录保留），
+        随后标记为已迁移。导入的成交经台账重放补全盈亏，再由归档任务写入列式归档。
+        """
+        paths = sorted(glob.glob(os.path.join(self.archive_dir, 'trades_[0-9]*.json')))
+        paths.append(self.history_file)
+        legacy_trades = {}
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for trade in json.load(f):
+                        if all(k in trade for k in ('timestamp', 'side', 'price', 'amount', 'order_id')) \
+                                and trade['order_id'] not in self.journal:
+                            legacy_trades[trade['order_id']] = trade
+                os.replace(path, path + '.migrated')
+            except Exception as e:
+                self.logger.error(f"导入旧版交易记录失败 {path}: {str(e)}")
+        if legacy_trades:
+            self.journal.compact(self.journal.records() + list(legacy_trades.values()))
+            self.logger.info(f"已将 {len(legacy_trades)} 条旧版交易记录导入成交日志")
+
     def save_trade_history(self):
-        """将当前交易历史保存到文件"""
+        """将内存中被修改过的交易记录写入成交日志，并压缩日志"""
         try:
-            # 先备份当前文件
-            self.backup_history()
-            # 保存当前记录
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.trade_history, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"已将 {len(self.trade_history)} 条交易记录保存到 {self.history_file}")
+            for trade in self.trade_history:
+                if self.journal.get(trade['order_id']) != trade:
+                    self.journal.append(trade)
+            self.journal.compact()
+            self._rebuild_ledgers()
+            self.logger.info(f"已将 {len(self.journal)} 条交易记录保存到 {self.journal_file}")
         except Exception as e:
             self.logger.error(f"保存交易记录失败: {str(e)}")
 
-    def backup_history(self):
-        """备份交易历史"""
-        try:
-            if os.path.exists(self.history_file):
-                import shutil
-                shutil.copy2(self.history_file, self.backup_file)
-                self.logger.info("交易历史备份成功")
-        except Exception as e:
-            self.logger.error(f"备份交易历史失败: {str(e)}")
+    def _load_inventory_checkpoint(self):
+        """读取归档检查点中的持仓批次，不存在时返回空台账"""
+        if os.path.exists(self.inventory_file):
+            try:
+                with open(self.inventory_file, 'r', encoding='utf-8') as f:
+                    return LotInventory.from_dict(json.load(f), settings.PNL_COST_METHOD)
+            except Exception as e:
+                self.logger.error(f"读取持仓批次检查点失败: {str(e)}")
+        return LotInventory(settings.PNL_COST_METHOD)
 
-    def add_trade(self, trade):
-        """添加交易记录（自动去重）"""
-        # -------- NEW: 去重 ----------
-        if any(t['order_id'] == trade.get('order_id') for t in self.trade_history):
-            self.logger.debug(f"重复 order_id {trade.get('order_id')} 已忽略")
-            return
-        # -----------------------------
+    def _rebuild_ledgers(self):
+        """从检查点和成交日志重建持仓台账与统计，并补全缺少盈亏的旧记录"""
+        records = self.journal.records()
+        self.inventory = self._load_inventory_checkpoint()
+        checkpoint_ts = self.inventory.last_timestamp
+        filled = self.inventory.rebuild([t for t in records if t['timestamp'] > checkpoint_ts])
+        for trade in filled:
+            self.journal.append(trade)
+            if self.store:
+                self.store.record_trade(self.symbol, trade)
+        if filled:
+            self.logger.info(f"已为 {len(filled)} 条交易记录补全已实现盈亏")
+        self.trade_history = records[-self.max_memory_trades:]
+        self.stats = copy.deepcopy(self._archived_stats, {id(self.clock): self.clock})  # 共享时钟，不复制
+        for trade in records:
+            self.stats.add(trade)
+
+    def _attach_profit(self, trade):
+        """计入持仓台账，盈亏未知时附上按批次冲销得到的已实现盈亏"""
+        profit = self.inventory.apply(trade)
+        if LotInventory.profit_unknown(trade):
+            trade['profit'] = profit
+
+    def get_pnl(self, current_price: float = None):
+        """获取持仓台账的盈亏概况"""
+        return {
+            'method': self.inventory.method,
+            'position': self.inventory.position,
+            'avg_cost': self.inventory.avg_cost,
+            'realized_pnl': self.inventory.realized_pnl,
+            'unrealized_pnl': self.inventory.unrealized_pnl(current_price) if current_price else None
+        }
 
-        # 验证必要字段
+    def add_listener(self, callback):
+        """注册新成交回调，签名为 callback(symbol, trade)"""
+        self._listeners.append(callback)
+
+    def _notify(self, trade):
+        for callback in self._listeners:
+            try:
+                callback(self.symbol, trade)
+            except Exception as e:
+                self.logger.error(f"成交回调执行失败: {str(e)}")
+
+    def _validate_trade(self, trade):
+        """验证必要字段并规范数据类型，无效时返回False"""
         required_fields = ['timestamp', 'side', 'price', 'amount', 'order_id']
         for field in required_fields:
             if field not in trade:
                 self.logger.error(f"交易记录缺少必要字段: {field}")
-                return
+                return False
 
-        # 验证数据类型
         try:
             trade['timestamp'] = float(trade['timestamp'])
             trade['price'] = float(trade['price'])
             trade['amount'] = float(trade['amount'])
+            trade['side'] = str(trade['side']).lower()
         except (ValueError, TypeError) as e:
             self.logger.error(f"交易记录数据类型错误: {str(e)}")
+            return False
+        return True
+
+    def add_trade(self, trade):
+        """添加交易记录（基于日志索引 O(1) 去重，追加写入）"""
+        if trade.get('order_id') in self.journal:
+            self.logger.debug(f"重复 order_id {trade.get('order_id')} 已忽略")
             return
 
+        if not self._validate_trade(trade):
+            return
+
+        self._attach_profit(trade)
         self.logger.info(f"添加交易记录: {trade}")
+        try:
+            self.journal.append(trade)
+        except Exception as e:
+            self.logger.error(f"保存交易记录失败: {str(e)}")
         self.trade_history.append(trade)
-        if len(self.trade_history) > 100:
-            self.trade_history = self.trade_history[-100:]
+        if len(self.trade_history) > self.max_memory_trades:
+            del self.trade_history[0]
+        self.stats.add(trade)
+        if self.store:
+            self.store.record_trade(self.symbol, trade)
+        self._notify(trade)
+        self._maybe_archive()
+
+    def upsert_trade(self, trade):
+        """新增或覆盖同 order_id 的交易记录（用于启动时与交易所成交对账）"""
+        if not self._validate_trade(trade):
+            return
+        previous = self.journal.get(trade['order_id'])
+        computed_profit = trade.get('profit') is None
+        if previous is not None and computed_profit:
+            trade['profit'] = previous.get('profit')
+        if previous == trade:
+            return
+        in_order = previous is None and trade['timestamp'] >= self.inventory.last_timestamp
+        if in_order:
+            self._attach_profit(trade)
+        elif computed_profit:
+            trade['profit'] = None  # 由重建台账时重新计算
         try:
-            # 先备份当前文件
-            self.backup_history()
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.trade_history, f, ensure_ascii=False, indent=2)
+            self.journal.append(trade)
         except Exception as e:
             self.logger.error(f"保存交易记录失败: {str(e)}")
+            return
+        if in_order:
+            # 只在最近的内存窗口内更新，避免每次都对整个日志排序
+            self.trade_history.append(trade)
+            self.trade_history = self.trade_history[-self.max_memory_trades:]
+            self.stats.add(trade)
+        else:
+            # 修正已有记录或插入较早的成交时无法增量处理，按日志重建（仅发生在启动对账时）
+            self._rebuild_ledgers()
+        if self.store:
+            self.store.record_trade(self.symbol, trade)
+        self._notify(trade)
+        self._maybe_archive()
 
     def update_order(self, order_id, status, profit=0):
         if order_id in self.orders:
             self.orders[order_id]['status'] = status
             self.orders[order_id]['profit'] = profit
+            if self.store:
+                self.store.update_order_status(order_id, status, profit, self.clock.time())
             if status == 'closed':
                 # 更新订单状态为已关闭
                 self.logger.info(f"订单已关闭 | ID: {order_id} | 利润: {profit}")
 
     def get_statistics(self):
-        """获取交易统计信息"""
+        """获取交易统计信息（由增量统计直接给出，O(1)）"""
         try:
-            if not self.trade_history:
-                return {
-                    'total_trades': 0,
-                    'win_rate': 0,
-                    'total_profit': 0,
-                    'avg_profit': 0,
-                    'max_profit': 0,
-                    'max_loss': 0,
-                    'profit_factor': 0,
-                    'consecutive_wins': 0,
-                    'consecutive_losses': 0
-                }
-            
-            total_trades = len(self.trade_history)
-            winning_trades = len([t for t in self.trade_history if t['profit'] > 0])
-            total_profit = sum(t['profit'] for t in self.trade_history)
-            profits = [t['profit'] for t in self.trade_history]
-            
-            # 计算最大连续盈利和亏损
-            current_streak = 1
-            max_win_streak = 0
-            max_loss_streak = 0
-            
-            for i in range(1, len(profits)):
-                if (profits[i] > 0 and profits[i-1] > 0) or (profits[i] < 0 and profits[i-1] < 0):
-                    current_streak += 1
-                else:
-                    if profits[i-1] > 0:
-                        max_win_streak = max(max_win_streak, current_streak)
-                    else:
-                        max_loss_streak = max(max_loss_streak, current_streak)
-                    current_streak = 1
-            
-            return {
-                'total_trades': total_trades,
-                'win_rate': winning_trades / total_trades if total_trades > 0 else 0,
-                'total_profit': total_profit,
-                'avg_profit': total_profit / total_trades if total_trades > 0 else 0,
-                'max_profit': max(profits) if profits else 0,
-                'max_loss': min(profits) if profits else 0,
-                'profit_factor': sum(p for p in profits if p > 0) / abs(sum(p for p in profits if p < 0)) if sum(p for p in profits if p < 0) != 0 else 0,
-                'consecutive_wins': max_win_streak,
-                'consecutive_losses': max_loss_streak
-            }
+            return self.stats.summary()
         except Exception as e:
             self.logger.error(f"计算统计信息失败: {str(e)}")
             return None
 
+    def _maybe_archive(self):
+        """
+        成交日志超过 archive_threshold 条时归档较早的成交。
+        在事件循环中以后台任务执行（已有归档任务在运行时跳过），没有事件循环时（启动加载、脚本）同步执行。
+        """
+        if self.journal is None or len(self.journal) <= self.archive_threshold:
+            return
+        if self._archive_task is not None and not self._archive_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.archive_old_trades()
+            return
+        self._archive_task = loop.create_task(self.archive_old_trades_async())
+
+    def _write_archive(self, old_trades):
+        """写出持仓批次检查点和归档分段（文件I/O，可在工作线程中执行）"""
+        # 先更新持仓批次检查点，使重启后无需重放已归档的成交
+        checkpoint = self._load_inventory_checkpoint()
+        checkpoint.rebuild([t for t in old_trades if t['timestamp'] > checkpoint.last_timestamp])
+        write_json_atomic(self.inventory_file, checkpoint.to_dict())
+
+        # 只追加新的月度分段，已有归档在查询时懒合并
+        self.archive.append(old_trades)
+
+    async def archive_old_trades_async(self):
+        """archive_old_trades 的事件循环版本：检查点、归档分段和日志重写都在工作线程中进行，期间新成交照常写入"""
+        try:
+            records = self.journal.records()
+            if len(records) <= self.max_memory_trades:
+                return
+
+            old_trades = records[:-self.max_memory_trades]
+            await asyncio.to_thread(self._write_archive, old_trades)
+            for trade in old_trades:
+                self._archived_stats.add(trade)
+
+            self.journal.discard(old_trades)
+            await self.journal.compact_async()
+            self.trade_history = self.journal.records()[-self.max_memory_trades:]
+            self.logger.info(f"已归档 {len(old_trades)} 条交易记录到 {self.archive_dir}")
+        except Exception as e:
+            self.logger.error(f"归档交易记录失败: {str(e)}")
+
     def archive_old_trades(self):
-        """归档旧的交易记录"""
+        """将成交日志中最近 max_memory_trades 笔之前的记录追加到列式归档，并压缩日志"""
         try:
-            if len(self.trade_history) <= 100:
+            records = self.journal.records()
+            if len(records) <= self.max_memory_trades:
                 return
-            
-            # 获取当前月份作为归档文件名
-            current_month = datetime.now().strftime('%Y%m')
-            archive_file = os.path.join(self.archive_dir, f'trades_{current_month}.json')
-            
-            # 将旧记录移动到归档
-            old_trades = self.trade_history[:-100]
-            
-            # 如果归档文件存在，先读取并合并
-            if os.path.exists(archive_file):
-                with open(archive_file, 'r', encoding='utf-8') as f:
-                    archived_trades = json.load(f)
-                    old_trades = archived_trades + old_trades
-            
-            # 保存归档
-            with open(archive_file, 'w', encoding='utf-8') as f:
-                json.dump(old_trades, f, ensure_ascii=False, indent=2)
-            
-            # 更新当前交易历史
-            self.trade_history = self.trade_history[-100:]
-            self.logger.info(f"已归档 {len(old_trades)} 条交易记录到 {archive_file}")
+
+            old_trades = records[:-self.max_memory_trades]
+            self._write_archive(old_trades)
+            for trade in old_trades:
+                self._archived_stats.add(trade)
+
+            # 日志中只保留近期记录
+            self.journal.compact(records[-self.max_memory_trades:])
+            self.trade_history = self.journal.records()
+            self.logger.info(f"已归档 {len(old_trades)} 条交易记录到 {self.archive_dir}")
         except Exception as e:
             self.logger.error(f"归档交易记录失败: {str(e)}")
 
     def clean_old_archives(self):
         """清理过期的归档文件"""
         try:
-            archive_files = [f for f in os.listdir(self.archive_dir) if f.startswith('trades_')]
-            archive_files.sort(reverse=True)  # 按时间倒序排列
-            
-            # 保留最近12个月的归档
-            if len(archive_files) > self.max_archive_months:
-                for old_file in archive_files[self.max_archive_months:]:
-                    file_path = os.path.join(self.archive_dir, old_file)
-                    os.remove(file_path)
-                    self.logger.info(f"已删除过期归档: {old_file}")
+            self.archive.prune(self.max_archive_months)
         except Exception as e:
             self.logger.error(f"清理归档失败: {str(e)}")
 
+    def _store_trades(self, since=None, until=None, chunk_size=1000, max_id=None):
+        """从SQLite存储的 (symbol, timestamp) 索引逐块读取成交，转换为与成交日志相同的记录格式"""
+        for row in self.store.iter_trades(self.symbol, since, until, chunk_size, max_id):
+            trade = {k: row[k] for k in ('timestamp', 'side', 'price', 'amount', 'profit', 'order_id')}
+            if row['strategy'] is not None:
+                trade['strategy'] = row['strategy']
+            yield trade
+
+    def query_trades(self, since=None, until=None):
+        """
+        查询 [since, until) 时间范围内的全部成交，按时间升序。
+        启用SQLite存储时走存储索引，否则读取列式归档 + 成交日志。
+        """
+        if self.store:
+            return list(self._store_trades(since, until))
+        trades = TradeArchive.to_records(self.archive.query(since, until))
+        trades.extend(self.journal.between(since, until))
+        return trades
+
     def analyze_trades(self, days=30):
-        """分析最近交易表现"""
+        """分析最近交易表现（基于按日汇总，只遍历窗口内的日桶）"""
         try:
-            if not self.trade_history:
+            window = self.stats.daily_window(days)
+            if not window:
                 return None
-            
-            # 计算时间范围
-            now = time.time()
-            start_time = now - (days * 24 * 3600)
-            
-            # 筛选时间范围内的交易
-            recent_trades = [t for t in self.trade_history if t['timestamp'] > start_time]
-            
-            if not recent_trades:
-                return None
-            
-            # 按天统计
-            daily_stats = {}
-            for trade in recent_trades:
-                trade_date = datetime.fromtimestamp(trade['timestamp']).strftime('%Y-%m-%d')
-                if trade_date not in daily_stats:
-                    daily_stats[trade_date] = {
-                        'trades': 0,
-                        'profit': 0,
-                        'volume': 0
-                    }
-                daily_stats[trade_date]['trades'] += 1
-                daily_stats[trade_date]['profit'] += trade['profit']
-                daily_stats[trade_date]['volume'] += trade['price'] * trade['amount']
-            
+
+            daily_stats = {
+                day: {'trades': b['trades'], 'profit': b['profit'], 'volume': b['volume']}
+                for day, b in window.items()
+            }
             return {
                 'period': f'最近{days}天',
                 'total_days': len(daily_stats),
@@ -276,39 +395,131 @@ class OrderTracker:
                 'daily_stats': daily_stats,
                 'avg_daily_trades': sum(d['trades'] for d in daily_stats.values()) / len(daily_stats),
                 'avg_daily_profit': sum(d['profit'] for d in daily_stats.values()) / len(daily_stats),
-                'best_day': max(daily_stats.items(), key=lambda x: x[1]['profit']) if daily_stats else None,
-                'worst_day': min(daily_stats.items(), key=lambda x: x[1]['profit']) if daily_stats else None
+                'best_day': max(daily_stats.items(), key=lambda x: x[1]['profit']),
+                'worst_day': min(daily_stats.items(), key=lambda x: x[1]['profit'])
             }
         except Exception as e:
             self.logger.error(f"分析交易失败: {str(e)}")
             return None
 
-    def export_trades(self, format='csv'):
-        """导出交易记录"""
+    def iter_trades(self, since=None, until=None, chunk_size=1000, max_id=None):
+        """
+        返回按时间顺序逐笔产出 [since, until) 内全部成交的迭代器（存储索引，或归档 + 成交日志），内存占用恒定。
+        视图在调用时确定：成交日志的范围当即复制一份（最多约 archive_threshold 条），
+        遍历期间才被归档的成交在归档中跳过、只从副本产出，因此不会漏行或重复；
+        存储按 max_id 限定上界。
+        """
+        if self.store:
+            return self._store_trades(since, until, chunk_size, max_id)
+        return self._archive_then_journal(since, until, chunk_size, self.journal.between(since, until))
+
+    def _archive_then_journal(self, since, until, chunk_size, recent):
+        moved = {trade['order_id'] for trade in recent}
+        for chunk in self.archive.iter_chunks(since, until, chunk_size):
+            for trade in TradeArchive.to_records(chunk):
+                if trade['order_id'] not in moved:
+                    yield trade
+        yield from recent
+
+    async def snapshot_trades(self, since=None, until=None, chunk_size=1000):
+        """
+        在事件循环中取 [since, until) 成交的固定视图（成交日志副本，或存储当前的最大行 id），
+        返回的迭代器会读取归档文件或SQLite，应交给工作线程消费。
+        """
+        max_id = await self.store.query_async('max_trade_id') if self.store else None
+        return self.iter_trades(since, until, chunk_size, max_id)
+
+    def page_trades(self, since=None, limit=100, cursor=None):
+        """
+        按时间升序分页查询成交。
+        起点在归档（timestamp 列）、成交日志（有序列表）或SQLite索引上二分/索引定位，
+        只读取本页需要的记录，单页代价与历史总量无关。
+
+        Args:
+            cursor: 上一页返回的 (timestamp, 该时间戳已返回的条数)，用于在同一时间戳的多笔成交间续页
+        Returns:
+            (本页成交列表, 下一页游标或None)
+        """
+        since = cursor[0] if cursor is not None else since
+        return self._page(self.iter_trades(since=since, chunk_size=max(limit, 100)), limit, cursor)
+
+    async def page_trades_async(self, since=None, limit=100, cursor=None):
+        """page_trades 的事件循环版本：视图在事件循环中确定，归档/存储的读取在工作线程中进行"""
+        since = cursor[0] if cursor is not None else since
+        trades = await self.snapshot_trades(since=since, chunk_size=max(limit, 100))
+        return await asyncio.to_thread(self._page, trades, limit, cursor)
+
+    @staticmethod
+    def _page(trades, limit, cursor):
+        since, skip = cursor if cursor is not None else (None, 0)
+        page = []
+        next_cursor = None
+        state = None
+        current_ts, seen_at_ts = None, 0
+        for trade in trades:
+            if trade['timestamp'] != current_ts:
+                current_ts, seen_at_ts = trade['timestamp'], 0
+            seen_at_ts += 1
+            if cursor is not None and current_ts == since and seen_at_ts <= skip:
+                continue
+            if len(page) == limit:
+                next_cursor = state
+                break
+            page.append(trade)
+            state = (current_ts, seen_at_ts)
+        return page, next_cursor
+
+    def export_chunks(self, format='csv', since=None, until=None, chunk_size=1000):
+        """以文本块形式流式产出导出内容（csv 或 jsonl），导出范围在调用时确定"""
+        return self._render_chunks(self.iter_trades(since, until, chunk_size), format, chunk_size)
+
+    async def export_chunks_async(self, trades, format='csv', chunk_size=1000):
+        """把 snapshot_trades 取得的视图编码为导出文本块（异步生成器），每块的读取和编码都在工作线程中进行"""
+        chunks = self._render_chunks(trades, format, chunk_size)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    @staticmethod
+    def _render_chunks(trades, format='csv', chunk_size=1000):
+        """把成交迭代器编码为 csv 或 jsonl 文本块"""
+        fields = ['timestamp', 'side', 'price', 'amount', 'profit', 'order_id']
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore') if format == 'csv' else None
+        if writer:
+            writer.writeheader()
+        count = 0
+        for trade in trades:
+            if writer:
+                writer.writerow(trade)
+            else:
+                buffer.write(json.dumps(trade, ensure_ascii=False) + '\n')
+            count += 1
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def export_trades(self, format='csv', since=None, until=None):
+        """流式导出全部交易记录（含归档）到 data/exports，返回导出文件路径，失败时返回 None"""
         try:
-            if not self.trade_history:
-                return False
-            
             export_dir = os.path.join(self.data_dir, 'exports')
             if not os.path.exists(export_dir):
                 os.makedirs(export_dir)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            if format == 'csv':
-                export_file = os.path.join(export_dir, f'trades_export_{timestamp}.csv')
-                import csv
-                with open(export_file, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=['timestamp', 'side', 'price', 'amount', 'profit', 'order_id'])
-                    writer.writeheader()
-                    for trade in self.trade_history:
-                        writer.writerow(trade)
-            else:
-                export_file = os.path.join(export_dir, f'trades_export_{timestamp}.json')
-                with open(export_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.trade_history, f, ensure_ascii=False, indent=2)
-            
+
+            timestamp = datetime.fromtimestamp(self.clock.time()).strftime('%Y%m%d_%H%M%S')
+            ext = 'csv' if format == 'csv' else 'jsonl'
+            export_file = os.path.join(export_dir, f'trades_export_{timestamp}.{ext}')
+            with open(export_file, 'w', newline='', encoding='utf-8') as f:
+                for chunk in self.export_chunks(format, since, until):
+                    f.write(chunk)
+
             self.logger.info(f"交易记录已导出到: {export_file}")
-            return True
+            return export_file
         except Exception as e:
             self.logger.error(f"导出交易记录失败: {str(e)}")
-            return False
\ No newline at end of file
+            return None
@@ -0,0 +1,172 @@
+import itertools
+import logging
+import time
+
+from config import settings
+
+
+class PortfolioRiskEngine:
+    """
+    账户级风控引擎，所有交易对共享同一个实例。
+
+    - 维护全账户的资产余额（现货 + 理财）、各资产市值及总敞口，
+      行情、成交只调整对应资产的增量，不重新汇总；
+    - 买入前先对计价货币做预留（reservation），判断“交易对 X 现在能否花 Y”只需 O(1)；
+    - 所有方法都是同步的、内部没有 await，在单个事件循环内天然原子，不需要加锁，
+      多个交易器并发决策也不会重复占用同一笔资金。
+    """
+
+    def __init__(self, max_exposure_ratio: float = None, max_asset_ratio: float = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.max_exposure_ratio = max_exposure_ratio if max_exposure_ratio is not None else settings.PORTFOLIO_MAX_EXPOSURE_RATIO
+        self.max_asset_ratio = max_asset_ratio if max_asset_ratio is not None else settings.PORTFOLIO_MAX_ASSET_RATIO
+        self.symbols = {}         # symbol -> (base_asset, quote_asset)
+        self.balances = {}        # asset -> 数量（现货 total + 理财）
+        self.prices = {}          # base_asset -> 最新价格（以计价货币计）
+        self.asset_values = {}    # base_asset -> 市值
+        self.exposure = 0.0       # 所有非计价货币资产市值之和
+        self.quote_asset = None
+        self.reservations = {}    # reservation_id -> (symbol, base_asset, quote_amount)
+        self.reserved_quote = 0.0
+        self.reserved_by_asset = {}
+        self._ids = itertools.count(1)
+        self._balances_at = 0.0   # 当前余额所依据的交易所快照时间
+        self._fills_at = 0.0      # 最近一次计入余额的成交时间
+        self.metrics = {'granted': 0, 'rejected': 0, 'released': 0, 'fills': 0}
+
+    def register(self, symbol: str):
+        base_asset, quote_asset = symbol.split('/')
+        if self.quote_asset and quote_asset != self.quote_asset:
+            raise ValueError(f"账户级风控只支持单一计价货币: {self.quote_asset} / {quote_asset}")
+        self.quote_asset = quote_asset
+        self.symbols[symbol] = (base_asset, quote_asset)
+        self.asset_values.setdefault(base_asset, 0.0)
+        self.reserved_by_asset.setdefault(base_asset, 0.0)
+
+    # ------------------------------------------------------------------
+    # 状态更新（增量）
+    # ------------------------------------------------------------------
+
+    def _revalue(self, asset):
+        value = self.balances.get(asset, 0.0) * self.prices.get(asset, 0.0)
+        self.exposure += value - self.asset_values.get(asset, 0.0)
+        self.asset_values[asset] = value
+
+    def update_price(self, symbol: str, price: float):
+        base_asset, _ = self.symbols[symbol]
+        if price and price > 0:
+            self.prices[base_asset] = float(price)
+            self._revalue(base_asset)
+
+    def update_balances(self, spot_balance, funding_balance, timestamp: float = None):
+        """
+        余额事件：用交易所返回的全账户余额刷新相关资产，返回是否采用了该快照。
+        不晚于当前余额依据（上一份快照或已计入的成交）的快照会被忽略：
+        交易所余额缓存在有效期内会被多轮重复使用，不能让它覆盖成交后已增量调整的余额。
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        if timestamp <= max(self._balances_at, self._fills_at):
+            return False
+        totals = spot_balance.get('total', {}) or {}
+        assets = set(self.asset_values) | {self.quote_asset}
+        for asset in assets:
+            if asset is None:
+                continue
+            self.balances[asset] = float(totals.get(asset, 0) or 0) + float(funding_balance.get(asset, 0) or 0)
+            if asset in self.asset_values:
+                self._revalue(asset)
+        self._balances_at = timestamp
+        return True
+
+    def update_snapshot(self, snapshot):
+        """用交易器本轮的 MarketSnapshot 同时刷新价格和余额"""
+        self.update_price(snapshot.symbol, snapshot.price)
+        self.update_balances(snapshot.spot_balance, snapshot.funding_balance, snapshot.timestamp)
+
+    def on_fill(self, symbol: str, trade: dict):
+        """成交回调（OrderTracker 监听器签名）：增量调整余额，早于余额快照的成交已包含在余额中"""
+        if symbol not in self.symbols or trade.get('timestamp', 0) <= self._balances_at:
+            return
+        base_asset, quote_asset = self.symbols[symbol]
+        amount = float(trade['amount'])
+        cost = amount * float(trade['price'])
+        sign = 1 if trade['side'] == 'buy' else -1
+        self.balances[base_asset] = self.balances.get(base_asset, 0.0) + sign * amount
+        self.balances[quote_asset] = self.balances.get(quote_asset, 0.0) - sign * cost
+        self._revalue(base_asset)
+        self._fills_at = max(self._fills_at, trade.get('timestamp', 0))
+        self.metrics['fills'] += 1
+
+    # ------------------------------------------------------------------
+    # 额度判断与预留
+    # ------------------------------------------------------------------
+
+    @property
+    def total_value(self):
+        return self.balances.get(self.quote_asset, 0.0) + self.exposure
+
+    @property
+    def available_quote(self):
+        return self.balances.get(self.quote_asset, 0.0) - self.reserved_quote
+
+    def check_spend(self, symbol: str, quote_amount: float):
+        """返回 (是否允许, 原因)；只读取预先维护好的汇总值"""
+        base_asset, _ = self.symbols[symbol]
+        total = self.total_value
+        if quote_amount > self.available_quote:
+            return False, f"可用{self.quote_asset}不足 ({self.available_quote:.2f} < {quote_amount:.2f})"
+        if total <= 0:
+            return False, "账户总资产未知"
+        exposure_ratio = (self.exposure + self.reserved_quote + quote_amount) / total
+        if exposure_ratio > self.max_exposure_ratio:
+            return False, f"账户总敞口将达 {exposure_ratio:.2%}，超过上限 {self.max_exposure_ratio:.2%}"
+        asset_ratio = (self.asset_values[base_asset] + self.reserved_by_asset[base_asset] + quote_amount) / total
+        if asset_ratio > self.max_asset_ratio:
+            return False, f"{base_asset} 集中度将达 {asset_ratio:.2%}，超过上限 {self.max_asset_ratio:.2%}"
+        return True, None
+
+    def can_spend(self, symbol: str, quote_amount: float) -> bool:
+        return self.check_spend(symbol, quote_amount)[0]
+
+    def try_reserve(self, symbol: str, quote_amount: float):
+        """检查通过则立即预留额度并返回预留ID，否则返回 None"""
+        allowed, reason = self.check_spend(symbol, quote_amount)
+        if not allowed:
+            self.metrics['rejected'] += 1
+            self.logger.warning("账户级风控拒绝 %s 买入 %.2f: %s", symbol, quote_amount, reason)
+            return None
+        base_asset, _ = self.symbols[symbol]
+        reservation_id = next(self._ids)
+        self.reservations[reservation_id] = (symbol, base_asset, quote_amount)
+        self.reserved_quote += quote_amount
+        self.reserved_by_asset[base_asset] += quote_amount
+        self.metrics['granted'] += 1
+        return reservation_id
+
+    def release(self, reservation_id):
+        """释放预留（订单成交、失败或取消后调用），重复释放无副作用"""
+        reservation = self.reservations.pop(reservation_id, None)
+        if reservation is None:
+            return
+        _, base_asset, quote_amount = reservation
+        self.reserved_quote -= quote_amount
+        self.reserved_by_asset[base_asset] -= quote_amount
+        self.metrics['released'] += 1
+
+    def get_metrics(self):
+        total = self.total_value
+        return {
+            **self.metrics,
+            'total_value': round(total, 2),
+            'exposure_ratio': round(self.exposure / total, 4) if total > 0 else 0,
+            'reserved_quote': round(self.reserved_quote, 2),
+            'open_reservations': len(self.reservations),
+            'asset_ratios': {
+                asset: round(value / total, 4) if total > 0 else 0
+                for asset, value in self.asset_values.items()
+            }
+        }
+
+
+# 全局实例
+portfolio_risk = PortfolioRiskEngine()
@@ -1,14 +1,17 @@
 # position_controller_s1.py
-import time
 import asyncio
 import logging
 import math # 需要 math 来处理精度
-from risk_manager import RiskState
+from risk_manager import RiskState, MarketSnapshot
+from order_rate_governor import PRIORITY_LOW
+from rolling_extrema import RollingExtrema
+from execution_scheduler import ExecutionScheduler
+from config import settings
 
 class PositionControllerS1:
     """
     独立的仓位控制策略 (S1)。
-    基于每日更新的52日高低点，高频检查仓位并执行调整。
+    基于按日线收盘滚动更新的52日高低点，高频检查仓位并执行调整。
     独立于主网格策略运行，不修改网格的 base_price。
     """
     def __init__(self, trader_instance):
@@ -21,6 +24,7 @@ class PositionControllerS1:
         """
         self.trader = trader_instance  # 保存对主 trader 实例的引用
         self.config = trader_instance.config # 访问配置
+        self.clock = trader_instance.clock  # 与交易器共用时钟（仿真时为虚拟时钟）
         self.logger = logging.getLogger(self.__class__.__name__) # 创建独立的 logger
 
         # S1 策略参数 (从配置或直接赋值)
@@ -33,39 +37,30 @@ class PositionControllerS1:
         self.s1_daily_high = None
         self.s1_daily_low = None
         self.s1_last_data_update_ts = 0
-        # 每日更新时间间隔（秒），略小于24小时确保不会错过
-        self.daily_update_interval = 23.9 * 60 * 60 
+        self._next_sync_ts = 0  # 补拉日线失败后的下次重试时间
+
+        # 多周期滚动高低点（按 UTC 日线收盘更新，持久化到 data/）
+        lookbacks = set(settings.S1_EXTREMA_LOOKBACKS) | {self.s1_lookback}
+        self.extrema = RollingExtrema(self.trader.symbol, lookbacks)
+        self.extrema.load()
+
+        # 调仓交由后台拆单执行，主循环不等待
+        self.scheduler = ExecutionScheduler(self.trader, self._execute_s1_adjustment, prepare=self._prepare_s1_job)
 
         self.logger.info(f"S1 Position Controller initialized. Lookback={self.s1_lookback} days, Sell Target={self.s1_sell_target_pct*100}%, Buy Target={self.s1_buy_target_pct*100}%.")
 
     async def _fetch_and_calculate_s1_levels(self):
-        """获取日线数据并计算52日高低点"""
+        """补拉缺失的已收盘日线并从滚动窗口读取52日高低点"""
         try:
-            # 获取比回看期稍多的日线数据 (+2 buffer)
-            limit = self.s1_lookback + 2
-            klines = await self.trader.exchange.fetch_ohlcv(
-                self.trader.symbol, 
-                timeframe='1d', 
-                limit=limit
-            )
-
-            if not klines or len(klines) < self.s1_lookback + 1:
-                self.logger.warning(f"S1: Insufficient daily klines received ({len(klines)}), cannot update levels.")
+            added = await self.extrema.sync(self.trader.exchange, int(self.clock.time() * 1000))
+            levels = self.extrema.levels(self.s1_lookback)
+            if levels is None:
+                self.logger.warning(f"S1: Not enough closed daily klines ({len(self.extrema.candles)}) for lookback {self.s1_lookback}.")
                 return False
 
-            # 使用倒数第2根K线往前数 s1_lookback 根来计算 (排除最新未完成K线)
-            # klines[-1] 是当前未完成日线，klines[-2] 是昨天收盘的日线
-            relevant_klines = klines[-(self.s1_lookback + 1) : -1]
-
-            if len(relevant_klines) < self.s1_lookback:
-                 self.logger.warning(f"S1: Not enough relevant klines ({len(relevant_klines)}) for lookback {self.s1_lookback}.")
-                 return False
-
-            # 计算高低点 (索引 2 是 high, 3 是 low)
-            self.s1_daily_high = max(float(k[2]) for k in relevant_klines)
-            self.s1_daily_low = min(float(k[3]) for k in relevant_klines)
-            self.s1_last_data_update_ts = time.time()
-            self.logger.info(f"S1 Levels Updated: High={self.s1_daily_high:.4f}, Low={self.s1_daily_low:.4f}")
+            self.s1_daily_high, self.s1_daily_low = levels
+            self.s1_last_data_update_ts = self.clock.time()
+            self.logger.info(f"S1 Levels Updated: High={self.s1_daily_high:.4f}, Low={self.s1_daily_low:.4f} (new candles: {added})")
             return True
 
         except Exception as e:
@@ -73,12 +68,15 @@ class PositionControllerS1:
             return False
 
     async def update_daily_s1_levels(self):
-        """每日检查并更新一次S1所需的52日高低价"""
-        now = time.time()
-        if now - self.s1_last_data_update_ts >= self.daily_update_interval:
-            self.logger.info("S1: Time to update daily high/low levels...")
-            await self._fetch_and_calculate_s1_levels()
-        # else: 不需要更新
+        """在每个 UTC 日线收盘后更新一次S1所需的52日高低价"""
+        now = self.clock.time()
+        if self.s1_daily_high is not None and self.extrema.missing_days(int(now * 1000)) == 0:
+            return  # 已包含最近一根收盘日线
+        if now < self._next_sync_ts:
+            return
+        self.logger.info("S1: Time to update daily high/low levels...")
+        if not await self._fetch_and_calculate_s1_levels():
+            self._next_sync_ts = now + 60  # 交易所可能尚未生成收盘K线，稍后重试
 
     async def _execute_s1_adjustment(self, side, amount_base_asset):
         """
@@ -156,44 +154,62 @@ class PositionControllerS1:
 
             self.logger.info(f"S1: Placing {side} order for {adjusted_amount:.8f} {self.trader.base_asset} at market price (approx {current_price})...")
 
-            # 5. 使用 trader 的 exchange 客户端直接下单 (使用市价单确保执行调整)
+            # 5. 买单先向账户级风控预留额度，避免与其他交易对同时占用共享资金
+            reservation = None
+            portfolio_risk = getattr(self.trader, 'portfolio_risk', None)
+            if side == 'BUY' and portfolio_risk is not None:
+                reservation = portfolio_risk.try_reserve(self.trader.symbol, adjusted_amount * current_price)
+                if reservation is None:
+                    return False
+
+            # 使用 trader 的 exchange 客户端直接下单 (使用市价单确保执行调整)
             # 注意：市价单可能有滑点风险，对于大额调整需谨慎
-            order = await self.trader.exchange.create_market_order(
-                symbol=self.trader.symbol,
-                side=side.lower(), # ccxt 通常需要小写
-                amount=adjusted_amount
-            )
+            try:
+                order = await self.trader.exchange.create_market_order(
+                    symbol=self.trader.symbol,
+                    side=side.lower(), # ccxt 通常需要小写
+                    amount=adjusted_amount,
+                    priority=PRIORITY_LOW  # 仓位调整不紧急，让位于网格订单
+                )
+            finally:
+                if reservation is not None:
+                    portfolio_risk.release(reservation)
 
             self.logger.info(f"S1: Adjustment order placed successfully. Order ID: {order.get('id', 'N/A')}")
             
-            # 6. （可选）更新交易记录器 (如果希望S1交易也记录在案)
+            # 6. 更新交易记录器 (S1交易也记录在案)
+            trade_info = {
+                'timestamp': self.clock.time(),
+                'strategy': 'S1', # 标记来源
+                'side': side,
+                'price': float(order.get('average') or current_price), # 使用成交均价或市价
+                'amount': float(order.get('filled') or adjusted_amount), # 使用实际成交量
+                'order_id': order.get('id')
+                # 可以添加更多信息，如 cost, fee (如果API返回)
+            }
             if hasattr(self.trader, 'order_tracker'):
-                 trade_info = {
-                     'timestamp': time.time(),
-                     'strategy': 'S1', # 标记来源
-                     'side': side,
-                     'price': float(order.get('average', current_price)), # 使用成交均价或市价
-                     'amount': float(order.get('filled', adjusted_amount)), # 使用实际成交量
-                     'order_id': order.get('id')
-                     # 可以添加更多信息，如 cost, fee (如果API返回)
-                 }
                  self.trader.order_tracker.add_trade(trade_info)
                  self.logger.info("S1: Trade logged in OrderTracker.")
                  
-            # 7. 买入后如有多余资金，转入理财
-            if side == 'BUY' and hasattr(self.trader, '_transfer_excess_funds'):
-                try:
-                    await self.trader._transfer_excess_funds()
-                    self.logger.info("S1: 交易完成后尝试将多余资金转入理财")
-                except Exception as e:
-                    self.logger.warning(f"S1: 转移多余资金到理财失败: {e}")
+            # 7. 多余资金转入理财由成交回调触发的 savings_rebalancer 统一处理
 
-            return True # 表示成功执行
+            return trade_info # 表示成功执行，供拆单执行器统计成交
 
         except Exception as e:
             self.logger.error(f"S1: Failed to execute adjustment order ({side} {amount_base_asset:.8f}): {e}", exc_info=True)
             return False
 
+    async def _prepare_s1_job(self, job):
+        """拆单开始前在后台准备卖出所需的基础资产（可能需要从理财赎回并等待到账）"""
+        if job.side != 'SELL':
+            return True
+        available_balance = await self.check_s1_balance_and_transfer(job.total_amount, self.trader.base_asset)
+        if available_balance <= 0:
+            self.logger.warning(f"S1: Insufficient {self.trader.base_asset} balance for sell adjustment.")
+            return False
+        job.total_amount = min(job.total_amount, available_balance)
+        return True
+
     async def check_s1_balance_and_transfer(self, value_needed, currency='USDT'):
         """
         检查S1策略触发后可用余额, 如果不够则尝试从理财账户赎回资金。
@@ -233,14 +249,24 @@ class PositionControllerS1:
             return 0
 
 
-    async def check_and_execute(self, risk_state: RiskState = RiskState.ALLOW_ALL):
+    async def check_and_execute(self, risk_state: RiskState = RiskState.ALLOW_ALL, snapshot: MarketSnapshot = None):
         """
         高频检查 S1 仓位控制条件并执行调仓。
         应在主交易循环中频繁调用。
 
         Args:
             risk_state: 当前的风控状态，决定允许执行的操作类型
+            snapshot: 主循环本轮的行情/账户快照，提供时不再重复查询余额和行情
         """
+        # 已有拆单任务在执行：风控不再允许该方向时取消，否则等待其完成
+        job = self.scheduler.active_job
+        if job is not None and job.active:
+            allowed = risk_state.allows_sell if job.side == 'SELL' else risk_state.allows_buy
+            if not allowed and self.scheduler.cancel(job.id):
+                self.logger.info(f"S1: Execution job #{job.id} cancelled by risk control (state: {risk_state.name})")
+            return
+        if risk_state == RiskState.BLOCK_ALL:
+            return
         # 0. 确保我们有当天的 S1 边界值
         if self.s1_daily_high is None or self.s1_daily_low is None:
             self.logger.debug("S1: Daily high/low levels not available yet.")
@@ -254,14 +280,20 @@ class PositionControllerS1:
                 return
 
             # 获取账户快照用于仓位计算
-            spot_balance = await self.trader.exchange.fetch_balance()
-            funding_balance = await self.trader.exchange.fetch_funding_balance()
-
-            # 使用风控管理器的仓位计算方法
-            position_pct = await self.trader.risk_manager._get_position_ratio(spot_balance, funding_balance)
-            position_value = await self.trader.risk_manager._get_position_value(spot_balance, funding_balance)
-            total_assets = await self.trader._get_pair_specific_assets_value()
-            base_asset_balance = await self.trader.get_available_balance(self.trader.base_asset)
+            if snapshot is None:
+                snapshot = MarketSnapshot.capture(
+                    self.trader.symbol, current_price,
+                    await self.trader.exchange.fetch_balance(),
+                    await self.trader.exchange.fetch_funding_balance(),
+                    clock=self.trader.clock
+                )
+
+            # 使用风控管理器的仓位计算方法（纯计算）
+            position_pct = self.trader.risk_manager.position_ratio(snapshot)
+            position_value = self.trader.risk_manager.position_value(snapshot)
+            total_assets = await self.trader._get_pair_specific_assets_value(snapshot)
+            base_free = snapshot.spot_balance.get('free', {}) or {}
+            base_asset_balance = float(base_free.get(self.trader.base_asset, 0) or 0) * settings.SAFETY_MARGIN
 
             if total_assets <= 0:
                 self.logger.warning("S1: Invalid total assets value.")
@@ -280,15 +312,10 @@ class PositionControllerS1:
             s1_action = 'SELL'
             target_position_value = total_assets * self.s1_sell_target_pct
             sell_value_needed = position_value - target_position_value
-            # 确保不会卖出负数或零 (以防万一)
+            # 确保不会卖出负数或零 (以防万一)；余额检查和理财赎回在拆单任务中进行
             if sell_value_needed > 0:
-                available_balance = await self.check_s1_balance_and_transfer(sell_value_needed / current_price, self.trader.base_asset)
-                if available_balance > 0:
-                    s1_trade_amount_base_asset = min(sell_value_needed / current_price, available_balance)
-                    self.logger.info(f"S1: High level breached. Need to SELL {s1_trade_amount_base_asset:.8f} {self.trader.base_asset} to reach {self.s1_sell_target_pct*100:.0f}% target.")
-                else:
-                    self.logger.warning(f"S1: Insufficient {self.trader.base_asset} balance for sell adjustment. Available: {available_balance:.8f} {self.trader.base_asset}")
-                    s1_action = 'NONE'
+                s1_trade_amount_base_asset = sell_value_needed / current_price
+                self.logger.info(f"S1: High level breached. Need to SELL {s1_trade_amount_base_asset:.8f} {self.trader.base_asset} to reach {self.s1_sell_target_pct*100:.0f}% target.")
             else:
                 s1_action = 'NONE' # 重置，因为计算结果无效
 
@@ -305,14 +332,14 @@ class PositionControllerS1:
                 s1_action = 'NONE' # 重置
 
         # 3. 如果触发，并且风控允许，才执行 S1 调仓
-        if s1_action == 'SELL' and risk_state != RiskState.ALLOW_BUY_ONLY:
+        if s1_action == 'SELL' and risk_state.allows_sell:
             if s1_trade_amount_base_asset > 1e-9:
                 self.logger.info(f"S1: Condition met for SELL adjustment.")
-                await self._execute_s1_adjustment('SELL', s1_trade_amount_base_asset)
-        elif s1_action == 'BUY' and risk_state != RiskState.ALLOW_SELL_ONLY:
+                self.scheduler.submit('SELL', s1_trade_amount_base_asset)
+        elif s1_action == 'BUY' and risk_state.allows_buy:
             if s1_trade_amount_base_asset > 1e-9:
                 self.logger.info(f"S1: Condition met for BUY adjustment.")
-                await self._execute_s1_adjustment('BUY', s1_trade_amount_base_asset)
+                self.scheduler.submit('BUY', s1_trade_amount_base_asset)
         elif s1_action != 'NONE' and s1_trade_amount_base_asset > 1e-9:
             # 记录被风控阻止的操作
             self.logger.info(f"S1: {s1_action} signal detected but blocked by risk control (state: {risk_state.name})")
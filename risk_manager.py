@@ -1,6 +1,9 @@
 import logging
 import enum
+from dataclasses import dataclass, field
+from types import MappingProxyType
 from config import settings
+from clock import system_clock
 
 
 class RiskState(enum.Enum):
@@ -8,6 +11,77 @@ class RiskState(enum.Enum):
     ALLOW_ALL = 0        # 允许所有操作
     ALLOW_SELL_ONLY = 1  # 只允许卖出 (仓位已满)
     ALLOW_BUY_ONLY = 2   # 只允许买入 (底仓保护)
+    BLOCK_ALL = 3        # 禁止所有操作 (行情/余额快照过期)
+
+    @property
+    def allows_buy(self):
+        return self in (RiskState.ALLOW_ALL, RiskState.ALLOW_BUY_ONLY)
+
+    @property
+    def allows_sell(self):
+        return self in (RiskState.ALLOW_ALL, RiskState.ALLOW_SELL_ONLY)
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    单轮循环的行情与账户快照（不可变）。
+    timestamp 为快照中最早一项数据的获取时间，用于风控的新鲜度检查。
+    未显式给出时间时使用注入的 clock（默认系统时钟），以便在虚拟时间下回放。
+    """
+    symbol: str
+    price: float
+    spot_balance: MappingProxyType
+    funding_balance: MappingProxyType
+    timestamp: float
+
+    @classmethod
+    def capture(cls, symbol, price, spot_balance, funding_balance, timestamp=None, clock=None):
+        return cls(
+            symbol=symbol,
+            price=float(price or 0),
+            spot_balance=MappingProxyType(dict(spot_balance or {})),
+            funding_balance=MappingProxyType(dict(funding_balance or {})),
+            timestamp=timestamp if timestamp is not None else (clock or system_clock).time()
+        )
+
+    def age(self, now=None, clock=None):
+        return (now if now is not None else (clock or system_clock).time()) - self.timestamp
+
+
+@dataclass(frozen=True)
+class DecisionContext(MarketSnapshot):
+    """
+    单轮循环的决策上下文（不可变），每轮只构建一次，
+    风控、信号、下单金额、S1 和下单执行都只读这一份数据。
+    在 MarketSnapshot 基础上增加盘口买一/卖一、波动率、4小时K线视图和 S1 高低点。
+    """
+    bid: float = None
+    ask: float = None
+    volatility: float = None
+    klines: tuple = ()
+    s1_levels: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def build(cls, symbol, price, spot_balance, funding_balance, timestamp=None, bid=None, ask=None,
+              volatility=None, klines=(), s1_levels=None, clock=None):
+        snapshot = MarketSnapshot.capture(symbol, price, spot_balance, funding_balance, timestamp, clock)
+        return cls(
+            symbol=snapshot.symbol,
+            price=snapshot.price,
+            spot_balance=snapshot.spot_balance,
+            funding_balance=snapshot.funding_balance,
+            timestamp=snapshot.timestamp,
+            bid=float(bid) if bid else None,
+            ask=float(ask) if ask else None,
+            volatility=volatility,
+            klines=tuple(tuple(k) for k in klines or ()),
+            s1_levels=MappingProxyType(dict(s1_levels or {}))
+        )
+
+    def order_price(self, side):
+        """买单用卖一价、卖单用买一价；盘口缺失时返回 None"""
+        return self.ask if side == 'buy' else self.bid
 
 
 class AdvancedRiskManager:
@@ -17,59 +91,13 @@ class AdvancedRiskManager:
         # 初始化日志状态标记
         self._min_limit_warning_logged = False
         self._max_limit_warning_logged = False
+        self._stale_logged = False
     
     async def check_position_limits(self, spot_balance, funding_balance) -> RiskState:
         """检查仓位限制并返回相应的风险状态，同时控制日志频率"""
         try:
             position_ratio = await self._get_position_ratio(spot_balance, funding_balance) # 传递参数
-
-            # 保存上次的仓位比例
-            if not hasattr(self, 'last_position_ratio'):
-                self.last_position_ratio = position_ratio
-
-            # 只在仓位比例变化超过0.1%时打印日志
-            if abs(position_ratio - self.last_position_ratio) > 0.001:
-                self.logger.info(
-                    f"风控检查 | "
-                    f"当前仓位比例: {position_ratio:.2%} | "
-                    f"最大允许比例: {settings.MAX_POSITION_RATIO:.2%} | "
-                    f"最小底仓比例: {settings.MIN_POSITION_RATIO:.2%}"
-                )
-                self.last_position_ratio = position_ratio
-
-            # 检查仓位是否超限 (> 90%)
-            if position_ratio > settings.MAX_POSITION_RATIO:
-                # 只有在没打印过日志时才打印
-                if not self._max_limit_warning_logged:
-                    self.logger.warning(f"仓位超限 ({position_ratio:.2%})，暂停新的买入操作。")
-                    self._max_limit_warning_logged = True  # 标记为已打印
-
-                # 无论是否打印日志，都要重置另一个标记
-                self._min_limit_warning_logged = False
-                return RiskState.ALLOW_SELL_ONLY
-
-            # 检查是否触发底仓保护 (< 10%)
-            elif position_ratio < settings.MIN_POSITION_RATIO:
-                # 只有在没打印过日志时才打印
-                if not self._min_limit_warning_logged:
-                    self.logger.warning(f"底仓保护触发 ({position_ratio:.2%})，暂停新的卖出操作。")
-                    self._min_limit_warning_logged = True  # 标记为已打印
-
-                # 无论是否打印日志，都要重置另一个标记
-                self._max_limit_warning_logged = False
-                return RiskState.ALLOW_BUY_ONLY
-
-            # 如果仓位在安全范围内 (10% ~ 90%)
-            else:
-                # 如果之前有警告，现在恢复正常了，就打印一条恢复信息
-                if self._min_limit_warning_logged or self._max_limit_warning_logged:
-                    self.logger.info(f"仓位已恢复至正常范围 ({position_ratio:.2%})。")
-
-                # 将所有日志标记重置为False
-                self._min_limit_warning_logged = False
-                self._max_limit_warning_logged = False
-                return RiskState.ALLOW_ALL
-
+            return self._state_for_ratio(position_ratio)
         except Exception as e:
             self.logger.error(f"风控检查失败: {str(e)}")
             # 在异常情况下也重置标记，以防状态锁死
@@ -77,6 +105,76 @@ class AdvancedRiskManager:
             self._max_limit_warning_logged = False
             return RiskState.ALLOW_ALL  # 出现异常时，默认为允许所有操作以避免卡死
 
+    def evaluate(self, snapshot: MarketSnapshot, now: float = None) -> RiskState:
+        """
+        基于单轮快照做风控判断，纯计算、不访问交易所。
+        快照超过 RISK_SNAPSHOT_MAX_AGE 秒时返回 BLOCK_ALL，避免用过期数据下单。
+        未传入 now 时按交易器的时钟计算快照年龄。
+        """
+        age = snapshot.age(now, self.trader.clock)
+        if age > settings.RISK_SNAPSHOT_MAX_AGE:
+            if not self._stale_logged:
+                self.logger.warning("行情快照已过期 (%.1fs)，暂停所有交易操作。", age)
+                self._stale_logged = True
+            return RiskState.BLOCK_ALL
+        if self._stale_logged:
+            self.logger.info("行情快照已恢复正常，恢复交易。")
+            self._stale_logged = False
+        try:
+            return self._state_for_ratio(self.position_ratio(snapshot))
+        except Exception as e:
+            self.logger.error(f"风控检查失败: {str(e)}")
+            self._min_limit_warning_logged = False
+            self._max_limit_warning_logged = False
+            return RiskState.ALLOW_ALL
+
+    def _state_for_ratio(self, position_ratio) -> RiskState:
+        """根据仓位比例得出风控状态（只在状态切换时打印日志）"""
+        # 保存上次的仓位比例
+        if not hasattr(self, 'last_position_ratio'):
+            self.last_position_ratio = position_ratio
+
+        # 只在仓位比例变化超过0.1%时打印日志
+        if abs(position_ratio - self.last_position_ratio) > 0.001:
+            self.logger.info(
+                "风控检查 | 当前仓位比例: %.2f%% | 最大允许比例: %.2f%% | 最小底仓比例: %.2f%%",
+                position_ratio * 100, settings.MAX_POSITION_RATIO * 100, settings.MIN_POSITION_RATIO * 100
+            )
+            self.last_position_ratio = position_ratio
+
+        # 检查仓位是否超限 (> 90%)
+        if position_ratio > settings.MAX_POSITION_RATIO:
+            # 只有在没打印过日志时才打印
+            if not self._max_limit_warning_logged:
+                self.logger.warning("仓位超限 (%.2f%%)，暂停新的买入操作。", position_ratio * 100)
+                self._max_limit_warning_logged = True  # 标记为已打印
+
+            # 无论是否打印日志，都要重置另一个标记
+            self._min_limit_warning_logged = False
+            return RiskState.ALLOW_SELL_ONLY
+
+        # 检查是否触发底仓保护 (< 10%)
+        elif position_ratio < settings.MIN_POSITION_RATIO:
+            # 只有在没打印过日志时才打印
+            if not self._min_limit_warning_logged:
+                self.logger.warning("底仓保护触发 (%.2f%%)，暂停新的卖出操作。", position_ratio * 100)
+                self._min_limit_warning_logged = True  # 标记为已打印
+
+            # 无论是否打印日志，都要重置另一个标记
+            self._max_limit_warning_logged = False
+            return RiskState.ALLOW_BUY_ONLY
+
+        # 如果仓位在安全范围内 (10% ~ 90%)
+        else:
+            # 如果之前有警告，现在恢复正常了，就打印一条恢复信息
+            if self._min_limit_warning_logged or self._max_limit_warning_logged:
+                self.logger.info("仓位已恢复至正常范围 (%.2f%%)。", position_ratio * 100)
+
+            # 将所有日志标记重置为False
+            self._min_limit_warning_logged = False
+            self._max_limit_warning_logged = False
+            return RiskState.ALLOW_ALL
+
     # 保留原方法以保持向后兼容性
     async def multi_layer_check(self):
         """向后兼容的方法，将新的风控状态转换为布尔值"""
@@ -87,44 +185,58 @@ class AdvancedRiskManager:
         risk_state = await self.check_position_limits(spot_balance, funding_balance)
         return risk_state != RiskState.ALLOW_ALL
 
-    async def _get_position_value(self, spot_balance, funding_balance):
-        # balance = await self.trader.exchange.fetch_balance() # 删除，使用参数
-        # funding_balance = await self.trader.exchange.fetch_funding_balance() # 删除，使用参数
+    def _base_amount(self, spot_balance, funding_balance):
+        return (
+            float(spot_balance.get('free', {}).get(self.trader.base_asset, 0)) +
+            float(funding_balance.get(self.trader.base_asset, 0))
+        )
+
+    def _quote_amount(self, spot_balance, funding_balance):
+        return (
+            float(spot_balance.get('free', {}).get(self.trader.quote_asset, 0)) +
+            float(funding_balance.get(self.trader.quote_asset, 0))
+        )
+
+    def _ratio(self, position_value, quote_balance):
+        total_assets = position_value + quote_balance
+        if total_assets == 0:
+            return 0
+        ratio = position_value / total_assets
+        self.logger.debug(
+            "仓位计算 | %s价值: %.2f %s | %s余额: %.2f | 总资产: %.2f | 仓位比例: %.2f%%",
+            self.trader.base_asset, position_value, self.trader.quote_asset,
+            self.trader.quote_asset, quote_balance, total_assets, ratio * 100
+        )
+        return ratio
+
+    def position_value(self, snapshot: MarketSnapshot):
+        """快照中基础资产（现货可用 + 理财）的计价货币价值"""
         if not self.trader.base_asset:
             self.trader.logger.error("基础资产信息未初始化")
             return 0
-        base_amount = (
-            float(spot_balance.get('free', {}).get(self.trader.base_asset, 0)) +
-            float(funding_balance.get(self.trader.base_asset, 0))
+        return self._base_amount(snapshot.spot_balance, snapshot.funding_balance) * snapshot.price
+
+    def position_ratio(self, snapshot: MarketSnapshot):
+        """快照中的仓位比例（纯计算）"""
+        return self._ratio(
+            self.position_value(snapshot),
+            self._quote_amount(snapshot.spot_balance, snapshot.funding_balance)
         )
-        current_price = await self.trader._get_latest_price()
+
+    async def _get_position_value(self, spot_balance, funding_balance, current_price=None):
+        if not self.trader.base_asset:
+            self.trader.logger.error("基础资产信息未初始化")
+            return 0
+        base_amount = self._base_amount(spot_balance, funding_balance)
+        if current_price is None:
+            current_price = await self.trader._get_latest_price()
         return base_amount * current_price
 
-    async def _get_position_ratio(self, spot_balance, funding_balance):
-        """获取当前仓位占总资产比例"""
+    async def _get_position_ratio(self, spot_balance, funding_balance, current_price=None):
+        """获取当前仓位占总资产比例（未提供价格时才会查询行情）"""
         try:
-            position_value = await self._get_position_value(spot_balance, funding_balance) # 传递参数
-            # balance = await self.trader.exchange.fetch_balance() # 删除，使用参数
-            # funding_balance = await self.trader.exchange.fetch_funding_balance() # 删除，使用参数
-
-            quote_balance = (
-                float(spot_balance.get('free', {}).get(self.trader.quote_asset, 0)) +
-                float(funding_balance.get(self.trader.quote_asset, 0))
-            )
-
-            total_assets = position_value + quote_balance
-            if total_assets == 0:
-                return 0
-
-            ratio = position_value / total_assets
-            self.logger.debug(
-                f"仓位计算 | "
-                f"{self.trader.base_asset}价值: {position_value:.2f} {self.trader.quote_asset} | "
-                f"{self.trader.quote_asset}余额: {quote_balance:.2f} | "
-                f"总资产: {total_assets:.2f} | "
-                f"仓位比例: {ratio:.2%}"
-            )
-            return ratio
+            position_value = await self._get_position_value(spot_balance, funding_balance, current_price)
+            return self._ratio(position_value, self._quote_amount(spot_balance, funding_balance))
         except Exception as e:
             self.logger.error(f"计算仓位比例失败: {str(e)}")
             return 0
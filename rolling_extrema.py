@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+from collections import deque
+
+from state_persistence import state_persistence, write_json_atomic
+
+DAY_MS = 86400 * 1000
+
+
+class MonotonicWindow:
+    """
+    固定长度滑动窗口的最大值/最小值。
+    最大值队列单调递减、最小值队列单调递增，每加入一个值均摊 O(1)，查询 O(1)。
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0  # 已加入的值的总数，同时作为值的序号
+        self._max = deque()  # (序号, 值)
+        self._min = deque()
+
+    def push(self, high: float, low: float):
+        index = self.count
+        self.count += 1
+        while self._max and self._max[-1][1] <= high:
+            self._max.pop()
+        self._max.append((index, high))
+        while self._min and self._min[-1][1] >= low:
+            self._min.pop()
+        self._min.append((index, low))
+        # 移出窗口之外的值
+        oldest = self.count - self.size
+        while self._max[0][0] < oldest:
+            self._max.popleft()
+        while self._min[0][0] < oldest:
+            self._min.popleft()
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    @property
+    def high(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def low(self):
+        return self._min[0][1] if self._min else None
+
+
+class RollingExtrema:
+    """
+    按日线收盘滚动维护多个回看周期（默认 20/52/100 日）的最高价/最低价。
+
+    只保存最长回看期所需的已收盘日线，落盘到 data/extrema_{SYMBOL}.json；
+    重启后只补拉缺失的日线。每根新收盘的日线对所有回看周期都是 O(1) 更新。
+    """
+
+    def __init__(self, symbol: str, lookbacks=(20, 52, 100), data_dir: str = None):
+        self.logger = logging.getLogger(f"{self.__class__.__name__}[{symbol}]")
+        self.symbol = symbol
+        self.lookbacks = tuple(sorted(set(lookbacks)))
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
+        self.state_file = os.path.join(self.data_dir, f"extrema_{symbol.replace('/', '_')}.json")
+        self.candles = deque(maxlen=max(self.lookbacks))  # [开盘时间ms, high, low]
+        self.windows = {n: MonotonicWindow(n) for n in self.lookbacks}
+
+    @property
+    def last_open_time(self):
+        return self.candles[-1][0] if self.candles else None
+
+    def add_candle(self, open_time: int, high: float, low: float) -> bool:
+        """加入一根已收盘的日线；重复或更早的K线直接忽略"""
+        if self.candles and open_time <= self.candles[-1][0]:
+            return False
+        self.candles.append([int(open_time), float(high), float(low)])
+        for window in self.windows.values():
+            window.push(float(high), float(low))
+        return True
+
+    def levels(self, lookback: int):
+        """返回 (最高价, 最低价)；已收盘日线不足回看期时返回 None"""
+        window = self.windows[lookback]
+        if not window.full:
+            return None
+        return window.high, window.low
+
+    def all_levels(self):
+        return {n: self.levels(n) for n in self.lookbacks}
+
+    @staticmethod
+    def current_day_open(now_ms: int) -> int:
+        """当前（未收盘）UTC日线的开盘时间"""
+        return now_ms - now_ms % DAY_MS
+
+    def missing_days(self, now_ms: int) -> int:
+        """距离最近一根已收盘日线还缺多少根"""
+        latest_closed = self.current_day_open(now_ms) - DAY_MS
+        if self.last_open_time is None:
+            return max(self.lookbacks)
+        return max(0, (latest_closed - self.last_open_time) // DAY_MS)
+
+    async def sync(self, exchange, now_ms: int) -> int:
+        """从交易所补拉缺失的已收盘日线，返回新加入的K线数量"""
+        missing = self.missing_days(now_ms)
+        if missing == 0:
+            return 0
+        # 多取一根未收盘的当日K线；已有数据时再多取一根与已有数据重叠的K线作为缓冲
+        limit = min(missing, max(self.lookbacks)) + (2 if self.candles else 1)
+        klines = await exchange.fetch_ohlcv(self.symbol, timeframe='1d', limit=limit)
+        current_open = self.current_day_open(now_ms)
+        added = 0
+        for k in klines or []:
+            if int(k[0]) < current_open and self.add_candle(int(k[0]), k[2], k[3]):
+                added += 1
+        if added:
+            self.save()
+        return added
+
+    def to_dict(self):
+        return {'symbol': self.symbol, 'candles': list(self.candles)}
+
+    def save(self):
+        state = self.to_dict()
+        if not state_persistence.submit(self.state_file, state):
+            write_json_atomic(self.state_file, state)
+
+    def load(self) -> bool:
+        """从文件恢复已收盘日线，并重建各回看窗口"""
+        if not os.path.exists(self.state_file):
+            return False
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载高低点数据失败: {str(e)}")
+            return False
+        for open_time, high, low in data.get('candles', []):
+            self.add_candle(open_time, high, low)
+        return True
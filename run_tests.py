@@ -65,8 +65,25 @@ def run_specific_test(test_file):
         return 1
 
 
+def run_benchmarks(args):
+    """运行主循环微基准测试并与基线比较（参数透传给 python -m benchmarks）"""
+    print("⏱️ 运行主循环微基准测试...")
+    print("=" * 60)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        result = subprocess.run([sys.executable, '-m', 'benchmarks', *args], capture_output=False, text=True)
+        return result.returncode
+    except Exception as e:
+        print(f"❌ 运行基准测试时发生错误: {e}")
+        return 1
+
+
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        # 运行基准测试，例如: python run_tests.py --bench --update-baseline
+        exit_code = run_benchmarks(sys.argv[2:])
+    elif len(sys.argv) > 1:
         # 运行特定测试
         test_file = sys.argv[1]
         if not test_file.startswith('test_'):
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from config import settings
+
+
+class SavingsRebalancer:
+    """
+    现货/理财资金再平衡服务，由 ExchangeClient 持有，同一客户端（账户）下的所有交易对共享。
+
+    - 成交后只调用 request() 标记需要再平衡，debounce 秒内的多次请求合并为一次；
+    - 每个资产的现货目标 = 各交易对预计下单金额 × buffer_trades 之和（计价货币按所有交易对净额计算），
+      保证交易路径上通常不需要临时赎回；
+    - 滞回区间：现货高于目标的 (1 + upper_band) 才申购、低于目标的 (1 - lower_band) 才赎回，
+      每次都调整回目标值，避免在阈值附近来回申购赎回；
+    - 每个资产每轮最多一笔划转，各资产的划转通过 batch_transfer 并发执行。
+    """
+
+    def __init__(self, exchange, debounce: float = None, upper_band: float = None, lower_band: float = None,
+                 buffer_trades: float = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.debounce = debounce if debounce is not None else settings.SAVINGS_DEBOUNCE
+        self.upper_band = upper_band if upper_band is not None else settings.SAVINGS_UPPER_BAND
+        self.lower_band = lower_band if lower_band is not None else settings.SAVINGS_LOWER_BAND
+        self.buffer_trades = buffer_trades if buffer_trades is not None else settings.SAVINGS_BUFFER_TRADES
+        self.traders = {}
+        self.exchange = exchange
+        self._task = None
+        self._loop = None
+        self._dirty = None
+        self._lock = None
+        self.metrics = {'requests': 0, 'runs': 0, 'subscriptions': 0, 'redemptions': 0, 'failures': 0}
+
+    def register(self, trader):
+        if trader.exchange is not self.exchange:
+            raise ValueError(f"交易对 {trader.symbol} 使用的交易所客户端与该再平衡服务不一致")
+        self.traders[trader.symbol] = trader
+        # 任何成交（网格或S1）都会触发一次（合并后的）再平衡
+        trader.order_tracker.add_listener(lambda symbol, trade: self.request())
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._dirty = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def request(self) -> bool:
+        """请求一次再平衡，立即返回；理财功能关闭或没有事件循环时返回 False"""
+        if not settings.ENABLE_SAVINGS_FUNCTION:
+            return False
+        try:
+            self._ensure_started()
+        except RuntimeError:
+            return False
+        self.metrics['requests'] += 1
+        self._dirty.set()
+        return True
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.debounce)
+            self._dirty.clear()
+            try:
+                await self.rebalance()
+            except Exception as e:
+                self.metrics['failures'] += 1
+                self.logger.error(f"资金再平衡失败: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def min_transfer(asset: str, quote_asset: str) -> float:
+        if asset == quote_asset:
+            return 1.0
+        return settings.MIN_BNB_TRANSFER if asset == 'BNB' else 0.01
+
+    async def spot_targets(self):
+        """按各交易对的预计下单金额汇总每个资产应保留在现货的数量"""
+        targets = defaultdict(float)
+        for trader in self.traders.values():
+            price = trader.current_price
+            if not price or price <= 0:
+                continue
+            order_quote = await trader._calculate_order_amount('buy')
+            targets[trader.quote_asset] += order_quote * self.buffer_trades
+            targets[trader.base_asset] += order_quote / price * self.buffer_trades
+        return dict(targets)
+
+    def plan(self, targets: dict, spot_balance: dict, funding_balance: dict, quote_asset: str):
+        """根据目标和滞回区间生成划转计划 [(资产, 'subscribe'/'redeem', 数量)]"""
+        transfers = []
+        free = spot_balance.get('free', {}) or {}
+        for asset, target in targets.items():
+            spot = float(free.get(asset, 0) or 0)
+            if spot > target * (1 + self.upper_band):
+                amount = spot - target
+                direction = 'subscribe'
+            elif spot < target * (1 - self.lower_band):
+                amount = min(target - spot, float(funding_balance.get(asset, 0) or 0))
+                direction = 'redeem'
+            else:
+                continue
+            if amount >= self.min_transfer(asset, quote_asset):
+                transfers.append((asset, direction, amount))
+        return transfers
+
+    async def _execute(self, transfers):
+        """所有资产的划转并发执行，一轮只需一次往返"""
+        results = await self.exchange.batch_transfer(transfers)
+        for (asset, direction, amount), result in zip(transfers, results):
+            if isinstance(result, Exception):
+                self.metrics['failures'] += 1
+                self.logger.error(f"资金再平衡划转失败 {direction} {asset}: {str(result)}")
+                continue
+            self.metrics['subscriptions' if direction == 'subscribe' else 'redemptions'] += 1
+            self.logger.info("资金再平衡 | %s %.8f %s", '申购' if direction == 'subscribe' else '赎回', amount, asset)
+
+    async def rebalance(self):
+        """立即执行一轮再平衡，返回执行的划转计划"""
+        if not self.traders or self.exchange is None:
+            return []
+        async with self._lock or asyncio.Lock():
+            self.metrics['runs'] += 1
+            targets = await self.spot_targets()
+            if not targets:
+                return []
+            quote_asset = next(iter(self.traders.values())).quote_asset
+            spot_balance = await self.exchange.fetch_balance()
+            funding_balance = await self.exchange.fetch_funding_balance()
+            transfers = self.plan(targets, spot_balance, funding_balance, quote_asset)
+            if transfers:
+                await self._execute(transfers)
+            else:
+                self.logger.debug("资金再平衡 | 所有资产均在目标区间内")
+            return transfers
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def get_metrics(self):
+        return {**self.metrics, 'pending': bool(self._dirty and self._dirty.is_set())}
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import settings
+
+
+def write_json_atomic(path, data, fsync=False):
+    """以原子方式将数据写入JSON文件：先写临时文件，再重命名覆盖正式文件
+
+    Args:
+        path (str): 目标文件路径
+        data: 可JSON序列化的数据
+        fsync (bool): 是否在重命名前强制刷盘，防止掉电后出现空文件
+    """
+    temp_path = path + ".tmp"
+    try:
+        # 确保目录存在
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # 1. 写入临时文件
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        # 2. 原子性地重命名临时文件为正式文件
+        os.replace(temp_path, path)
+    finally:
+        # 3. 确保临时文件在任何情况下都被删除
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+class StatePersistenceService:
+    """
+    异步写回 (write-behind) 状态持久化服务。
+
+    调用方通过 submit() 提交状态快照后立即返回，不在事件循环中做任何磁盘I/O。
+    同一文件在合并窗口内的多次提交只保留最新快照，由后台任务统一交给
+    单线程执行器写盘（保证同一文件的写入顺序）。
+    """
+
+    def __init__(self, flush_interval: float = None, fsync: bool = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.flush_interval = settings.STATE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.fsync = settings.STATE_FSYNC if fsync is None else fsync
+        self.slow_write_threshold = 0.5  # 单次写入超过该耗时（秒）时告警
+
+        self._pending = {}  # 文件路径 -> 最新的状态快照
+        self._wakeup = None
+        self._task = None
+        self._loop = None
+        self._flush_lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state-writer')
+
+        self.metrics = {
+            'submitted': 0,      # 提交的快照总数
+            'coalesced': 0,      # 被后续快照合并掉的次数
+            'writes': 0,         # 实际写盘次数
+            'failures': 0,       # 写盘失败次数
+            'last_latency': 0.0,
+            'max_latency': 0.0,
+            'total_latency': 0.0,
+        }
+
+    def submit(self, path: str, state: dict) -> bool:
+        """
+        提交一份状态快照，非阻塞。
+
+        Returns:
+            bool: 已被服务接收返回True；当前线程没有运行中的事件循环时返回False，
+                  由调用方自行同步写入。
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        self._ensure_started(loop)
+        if path in self._pending:
+            self.metrics['coalesced'] += 1
+        self._pending[path] = dict(state)
+        self.metrics['submitted'] += 1
+        self._wakeup.set()
+        return True
+
+    def _ensure_started(self, loop):
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # 合并窗口：给连续的状态变更留出合并的时间
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_pending()
+
+    async def _flush_pending(self):
+        async with self._flush_lock:
+            self._wakeup.clear()
+            loop = asyncio.get_running_loop()
+            while self._pending:
+                path, state = self._pending.popitem()
+                try:
+                    await loop.run_in_executor(self._executor, self._write, path, state)
+                except asyncio.CancelledError:
+                    # 被取消时放回未确认写出的快照（若已有更新的快照则以新的为准）
+                    self._pending.setdefault(path, state)
+                    raise
+
+    def _write(self, path, state):
+        """在执行器线程中执行的实际写盘操作"""
+        start = time.perf_counter()
+        try:
+            write_json_atomic(path, state, fsync=self.fsync)
+        except Exception as e:
+            self.metrics['failures'] += 1
+            self.logger.error(f"后台保存状态失败 {path}: {e}")
+            return
+        latency = time.perf_counter() - start
+        self.metrics['writes'] += 1
+        self.metrics['last_latency'] = latency
+        self.metrics['max_latency'] = max(self.metrics['max_latency'], latency)
+        self.metrics['total_latency'] += latency
+        if latency > self.slow_write_threshold:
+            self.logger.warning(f"状态写入耗时过长: {latency:.3f}s | {path}")
+        else:
+            self.logger.debug(f"状态已写入 {path} | 耗时: {latency * 1000:.1f}ms")
+
+    async def flush(self):
+        """立即写出所有待保存的快照"""
+        if self._wakeup is None:
+            return
+        await self._flush_pending()
+
+    async def stop(self):
+        """停止后台任务，并在退出前写出所有未保存的快照"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+        self.logger.info(f"状态持久化服务已停止 | 指标: {self.get_metrics()}")
+
+    def get_metrics(self) -> dict:
+        """返回写入延迟等运行指标"""
+        writes = self.metrics['writes']
+        return {
+            **self.metrics,
+            'pending': len(self._pending),
+            'avg_latency': self.metrics['total_latency'] / writes if writes else 0.0,
+        }
+
+
+# 所有交易对共享的全局持久化服务实例
+state_persistence = StatePersistenceService()
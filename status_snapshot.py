@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from clock import system_clock
+from config import settings
+from risk_manager import MarketSnapshot
+
+
+async def build_status(trader):
+    """
+    汇总单个交易对的状态数据。
+    优先复用交易器本轮循环的决策上下文（价格、现货和理财余额），
+    交易器尚未完成第一轮循环时才向交易所获取一次。
+    """
+    s1_controller = trader.position_controller_s1  # 获取 S1 控制器实例
+
+    snapshot = getattr(trader, 'market_snapshot', None)
+    if snapshot is None:
+        snapshot = MarketSnapshot.capture(
+            trader.symbol,
+            await trader._get_latest_price() or 0,  # 提供默认值以防失败
+            await trader.exchange.fetch_balance(),
+            await trader.exchange.fetch_funding_balance(),
+            clock=getattr(trader, 'clock', None)
+        )
+    balance, funding_balance, current_price = snapshot.spot_balance, snapshot.funding_balance, snapshot.price
+
+    # 获取网格参数
+    grid_size = trader.grid_size
+    grid_size_decimal = grid_size / 100 if grid_size else 0
+    threshold = grid_size_decimal / 5
+
+    # 计算网格上下轨
+    upper_band = None
+    lower_band = None
+    if trader.base_price is not None and trader.grid_size is not None:
+        try:
+            upper_band = trader._get_upper_band()
+            lower_band = trader._get_lower_band()
+        except Exception as band_e:
+            logging.warning(f"计算网格上下轨失败: {band_e}")
+
+    # 【双轨制资产计算 - 第一轨：全局报告】
+    global_total_assets = await trader.exchange.calculate_total_account_value()
+
+    base_asset = trader.base_asset
+    quote_asset = trader.quote_asset
+
+    # 合并计算用于显示的各项余额
+    spot_quote = float(balance.get('total', {}).get(quote_asset, 0))
+    funding_quote = float(funding_balance.get(quote_asset, 0))
+    display_quote_balance = spot_quote + funding_quote
+
+    spot_base = float(balance.get('total', {}).get(base_asset, 0))
+    funding_base = float(funding_balance.get(base_asset, 0))
+    display_base_balance = spot_base + funding_base
+
+    # 计算全局总盈亏和盈亏率（基于全账户资产）
+    initial_principal = settings.INITIAL_PRINCIPAL
+    total_profit = 0.0
+    profit_rate = 0.0
+    if initial_principal > 0:
+        total_profit = global_total_assets - initial_principal
+        profit_rate = (total_profit / initial_principal) * 100
+
+    # 获取最近交易信息
+    last_trade_price = trader.last_trade_price
+    last_trade_time = trader.last_trade_time
+    last_trade_time_str = datetime.fromtimestamp(last_trade_time).strftime('%Y-%m-%d %H:%M:%S') if last_trade_time else '--'
+
+    trade_history = []
+    if hasattr(trader, 'order_tracker'):
+        trades = trader.order_tracker.get_trade_history()
+        trade_history = [{
+            'timestamp': datetime.fromtimestamp(trade['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
+            'side': trade.get('side', '--'),
+            'price': trade.get('price', 0),
+            'amount': trade.get('amount', 0),
+            'profit': trade.get('profit', 0)
+        } for trade in trades[-10:]]  # 只取最近10笔交易
+
+    # 【双轨制资产计算 - 第二轨：交易决策】
+    target_order_amount = await trader._calculate_order_amount('buy', snapshot)  # buy/sell 结果一样
+
+    # 仓位比例复用同一份快照（纯计算）
+    position_ratio = trader.risk_manager.position_ratio(snapshot)
+
+    return {
+        "symbol": trader.symbol,
+        "base_asset": base_asset,
+        "quote_asset": quote_asset,
+        "base_price": trader.base_price,
+        "current_price": current_price,
+        "grid_size": grid_size_decimal,
+        "threshold": threshold,
+        "total_assets": global_total_assets,
+        "quote_balance": display_quote_balance,
+        "base_balance": display_base_balance,
+        "target_order_amount": target_order_amount,
+        "trade_history": trade_history,
+        "last_trade_price": last_trade_price,
+        "last_trade_time": last_trade_time,
+        "last_trade_time_str": last_trade_time_str,
+        "total_profit": total_profit,
+        "profit_rate": profit_rate,
+        "s1_daily_high": s1_controller.s1_daily_high if s1_controller else None,
+        "s1_daily_low": s1_controller.s1_daily_low if s1_controller else None,
+        "s1_execution": s1_controller.scheduler.get_status() if s1_controller and hasattr(s1_controller, 'scheduler') else None,
+        "position_percentage": position_ratio * 100,
+        "grid_upper_band": upper_band,
+        "grid_lower_band": lower_band,
+        # 快照只保存启动时间，运行时长在返回时由 uptime_fields() 计算：快照内容不随时间流逝变化，ETag 和推送差异才稳定
+        "start_time": trader.start_time
+    }
+
+
+def uptime_fields(trader, now):
+    """计算系统运行时长字段（不写入快照，返回响应时附加）"""
+    uptime_seconds = max(0, int(now - trader.start_time))
+    days, remainder = divmod(uptime_seconds, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return {
+        "uptime": f"{days}天 {hours}小时 {minutes}分钟 {seconds}秒",
+        "uptime_seconds": uptime_seconds
+    }
+
+
+class StatusSnapshotService:
+    """
+    按需构建各交易对的状态快照，/api/status 直接从内存返回。
+
+    快照在以下情况视为过期：交易器状态版本号变化（成交、基准价调整等会调用 _save_state），
+    或距上次构建超过 refresh_interval。过期快照只在有人读取时重建：
+    /api/status 请求时当场重建，后台任务只在有 SSE 订阅者时才刷新并推送差异。
+    没有人查看时不做任何计算，也不访问交易所。
+    """
+
+    def __init__(self, traders: dict, refresh_interval: float = None, poll_interval: float = 1.0, broadcaster=None,
+                 clock=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.clock = clock or system_clock
+        self.traders = traders
+        self.broadcaster = broadcaster  # 若提供，快照变化时推送差异字段
+        self.refresh_interval = refresh_interval if refresh_interval is not None else settings.STATUS_REFRESH_INTERVAL
+        self.poll_interval = poll_interval
+        self.snapshots = {}  # symbol -> {'data': dict, 'body': bytes, 'etag': str, 'version': int, 'built_at': float}
+        self._locks = {}
+        self._task = None
+        self.metrics = {'builds': 0, 'failures': 0, 'served': 0, 'not_modified': 0}
+
+    def _lock(self, symbol):
+        if symbol not in self._locks:
+            self._locks[symbol] = asyncio.Lock()
+        return self._locks[symbol]
+
+    def _is_stale(self, symbol, now):
+        snapshot = self.snapshots.get(symbol)
+        if snapshot is None:
+            return True
+        version = getattr(self.traders[symbol], 'state_version', 0)
+        return version != snapshot['version'] or now - snapshot['built_at'] >= self.refresh_interval
+
+    async def refresh(self, symbol):
+        """重建指定交易对的快照，返回快照；失败时保留旧快照"""
+        async with self._lock(symbol):
+            trader = self.traders[symbol]
+            version = getattr(trader, 'state_version', 0)
+            try:
+                status = await build_status(trader)
+            except Exception as e:
+                self.metrics['failures'] += 1
+                self.logger.error(f"构建 {symbol} 状态快照失败: {str(e)}")
+                return self.snapshots.get(symbol)
+            body = json.dumps(status, ensure_ascii=False).encode('utf-8')
+            previous = self.snapshots.get(symbol)
+            snapshot = {
+                'data': status,
+                'body': body,
+                'etag': '"' + hashlib.sha1(body).hexdigest() + '"',
+                'version': version,
+                'built_at': self.clock.time()
+            }
+            self.snapshots[symbol] = snapshot
+            self.metrics['builds'] += 1
+            if self.broadcaster and previous and previous['etag'] != snapshot['etag']:
+                changes = {k: v for k, v in status.items() if previous['data'].get(k) != v}
+                self.broadcaster.publish('status', {'symbol': symbol, 'changes': changes})
+            return snapshot
+
+    async def get(self, symbol):
+        """返回快照；尚未构建或已过期时先重建"""
+        if self._is_stale(symbol, self.clock.time()):
+            return await self.refresh(symbol)
+        return self.snapshots[symbol]
+
+    def uptime(self, symbol):
+        """按服务时钟计算指定交易对的运行时长字段"""
+        return uptime_fields(self.traders[symbol], self.clock.time())
+
+    def render(self, symbol, snapshot):
+        """返回附加了运行时长的响应体：直接拼接到预编码的快照 JSON 末尾，快照本身和 ETag 不变"""
+        extra = json.dumps(self.uptime(symbol), ensure_ascii=False).encode('utf-8')
+        return snapshot['body'][:-1] + b', ' + extra[1:]
+
+    def _has_viewers(self):
+        return self.broadcaster is not None and self.broadcaster.has_subscribers
+
+    async def _run(self):
+        while True:
+            if self._has_viewers():
+                now = self.clock.time()
+                for symbol in list(self.traders):
+                    if self._is_stale(symbol, now):
+                        await self.refresh(symbol)
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
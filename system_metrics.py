@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import psutil
+
+
+class SystemMetricsSampler:
+    """
+    后台系统指标采样器。
+
+    按固定间隔采集 CPU、内存、进程RSS、打开的文件描述符数以及事件循环延迟，
+    保存在一个定长环形缓冲中。请求处理函数直接读取最近一次采样，不会阻塞事件循环。
+    """
+
+    def __init__(self, interval: float = 5.0, history_size: int = 120):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.interval = interval
+        self.samples = deque(maxlen=history_size)
+        self._process = psutil.Process(os.getpid())
+        self._task = None
+        # cpu_percent(interval=None) 返回与上一次调用之间的平均值，首次调用仅用于建立基准
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+
+    def _collect(self, loop_lag: float = 0.0):
+        memory = psutil.virtual_memory()
+        try:
+            open_fds = self._process.num_fds()
+        except AttributeError:  # Windows 没有 num_fds
+            open_fds = self._process.num_handles()
+        return {
+            'timestamp': time.time(),
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'process_cpu_percent': self._process.cpu_percent(interval=None),
+            'memory_used': round(memory.used / (1024 ** 3), 2),  # GB
+            'memory_total': round(memory.total / (1024 ** 3), 2),
+            'memory_percent': memory.percent,
+            'process_rss_mb': round(self._process.memory_info().rss / (1024 ** 2), 1),
+            'open_fds': open_fds,
+            'loop_lag_ms': round(loop_lag * 1000, 2)
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            # 实际醒来时间比预期晚多少即为事件循环被阻塞的时长
+            lag = max(0.0, loop.time() - expected)
+            try:
+                self.samples.append(self._collect(lag))
+            except Exception as e:
+                self.logger.error(f"采集系统指标失败: {str(e)}")
+            if lag > 1:
+                self.logger.warning(f"事件循环延迟 {lag:.2f}s")
+
+    def latest(self):
+        """返回最近一次采样；采样器尚未产生数据时立即采集一次（非阻塞）"""
+        if not self.samples:
+            self.samples.append(self._collect())
+        return self.samples[-1]
+
+    def history(self, limit: int = None):
+        samples = list(self.samples)
+        return samples[-limit:] if limit else samples
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+# 全局实例
+system_metrics = SystemMetricsSampler()
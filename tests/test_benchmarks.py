@@ -0,0 +1,42 @@
+"""
+微基准测试套件的冒烟测试与基线比较逻辑
+"""
+import pytest
+
+from benchmarks.suite import compare, run_benchmarks
+
+
+def make_result(**overrides):
+    result = {'iterations': 10, 'mean_us': 100.0, 'p95_us': 120.0, 'peak_kib': 10.0,
+              'calls_per_op': 1.0, 'weight_per_op': 2.0}
+    result.update(overrides)
+    return result
+
+
+class TestBenchmarkSuite:
+    """测试基准用例可以在模拟交易所上运行，以及回归判断"""
+
+    @pytest.mark.asyncio
+    async def test_main_loop_benchmark_runs(self):
+        results = await run_benchmarks(['main_loop_iteration'], scale=0.02, rounds=1)
+        result = results['main_loop_iteration']
+        assert result['iterations'] == 4
+        assert result['mean_us'] > 0
+        assert result['calls_per_op'] == 1.0  # 稳态只请求一次行情
+
+    def test_compare_flags_call_count_increase_strictly(self):
+        baseline = {'loop': make_result()}
+        assert compare({'loop': make_result(calls_per_op=1.5)}, baseline)[0][1] == 'calls_per_op'
+        assert compare({'loop': make_result()}, baseline) == []
+
+    def test_compare_ignores_timing_by_default(self):
+        baseline = {'loop': make_result()}
+        assert compare({'loop': make_result(mean_us=1000.0, p95_us=2000.0)}, baseline) == []
+
+    def test_compare_applies_time_and_alloc_tolerance(self):
+        baseline = {'loop': make_result()}
+        assert compare({'loop': make_result(mean_us=140.0)}, baseline, time_tolerance=0.5) == []
+        slow = compare({'loop': make_result(mean_us=160.0)}, baseline, time_tolerance=0.5)
+        assert [r[1] for r in slow] == ['mean_us']
+        assert [r[1] for r in compare({'loop': make_result(peak_kib=40.0)}, baseline)] == ['peak_kib']
+        assert compare({'new_case': make_result()}, baseline) == []  # 没有基线的新用例不判断
@@ -0,0 +1,79 @@
+"""
+时钟抽象、虚拟时间事件循环与浸泡测试的测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.soak import run_soak
+from clock import SystemClock, VirtualClock, run_virtual
+from exchange_profiler import profile_client
+from exchange_simulator import SimulatedExchange, create_client
+
+SYMBOL = 'BNB/USDT'
+
+
+class TestVirtualClock:
+    """测试虚拟时间按事件循环推进，且不真实等待"""
+
+    def test_system_clock_follows_wall_time(self):
+        assert abs(SystemClock().time() - time.time()) < 1
+
+    def test_advance_without_loop(self):
+        clock = VirtualClock(start=1_700_000_000)
+        clock.advance(90)
+        assert clock.time() == 1_700_000_090
+
+    def test_sleep_is_instant(self):
+        clock = VirtualClock(start=1_700_000_000)
+
+        async def main():
+            await asyncio.sleep(3 * 86400)
+            return clock.time()
+
+        start = time.perf_counter()
+        assert run_virtual(main(), clock) == 1_700_000_000 + 3 * 86400
+        assert time.perf_counter() - start < 1
+
+    def test_wait_for_timeout_uses_virtual_time(self):
+        clock = VirtualClock(start=0)
+
+        async def main():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.Event().wait(), timeout=600)
+            return clock.time()
+
+        assert run_virtual(main(), clock) == 600
+
+    def test_exchange_client_cache_expires_in_virtual_time(self):
+        clock = VirtualClock(start=1_700_000_000)
+        simulator = SimulatedExchange(prices={SYMBOL: 600.0}, balances={'USDT': 1000.0}, clock=clock.time)
+        client = create_client(simulator, clock=clock)
+        profiler = profile_client(client)
+
+        async def main():
+            await client.fetch_balance()
+            await asyncio.sleep(client.cache_ttl - 1)
+            await client.fetch_balance()  # 仍在缓存有效期内
+            assert profiler.calls(method='fetch_balance') == 1
+            await asyncio.sleep(2)
+            await client.fetch_balance()
+            return profiler.calls(method='fetch_balance')
+
+        assert run_virtual(main(), clock) == 2
+
+
+class TestSoak:
+    """测试浸泡测试在虚拟时间中运行真实主循环"""
+
+    def test_short_soak_runs_main_loop(self):
+        report = run_soak(days=2 / 24, sample_interval=3600, start=1_700_000_000)
+
+        # 主循环每 5 秒一轮：2 小时约 1440 轮
+        assert 1400 <= report['iterations'] <= 1441
+        assert report['virtual_days'] == pytest.approx(2 / 24, abs=1e-3)
+        assert [s['hours'] for s in report['samples']] == [0.0, 1.0, 2.0]
+        assert report['exchange_calls'] >= report['iterations']
+        assert report['latency_us']['p50'] > 0
+        assert not report['stopped_early']
@@ -50,6 +50,23 @@ class TestSettings:
             assert settings.BINANCE_API_KEY == 'test_key'
             assert settings.BINANCE_API_SECRET == 'test_secret'
 
+    def test_snapshot_max_age_must_exceed_balance_cache_ttl(self):
+        """快照最大年龄不得小于余额缓存有效期加余量"""
+        with patch.dict(os.environ, {
+            'BINANCE_API_KEY': 'test_key',
+            'BINANCE_API_SECRET': 'test_secret',
+        }, clear=True):
+            settings = Settings()
+            assert settings.RISK_SNAPSHOT_MAX_AGE >= settings.BALANCE_CACHE_TTL + settings.RISK_SNAPSHOT_MARGIN
+        with patch.dict(os.environ, {
+            'BINANCE_API_KEY': 'test_key',
+            'BINANCE_API_SECRET': 'test_secret',
+            'BALANCE_CACHE_TTL': '30',
+            'RISK_SNAPSHOT_MAX_AGE': '30',
+        }, clear=True):
+            with pytest.raises(ValidationError):
+                Settings()
+
 
 class TestTradingConfig:
     """测试TradingConfig类"""
@@ -0,0 +1,126 @@
+"""
+事件推送通道测试
+"""
+import pytest
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from event_broadcaster import EventBroadcaster, BroadcastLogHandler
+from order_tracker import OrderTracker
+from web_server import handle_stream
+
+
+class TestEventBroadcaster:
+    """测试一对多分发与有界队列"""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_to_all_subscribers(self):
+        broadcaster = EventBroadcaster()
+        q1, q2 = broadcaster.subscribe(), broadcaster.subscribe()
+        broadcaster.publish('status', {'symbol': 'BNB/USDT'})
+        assert q1.get_nowait() == ('status', {'symbol': 'BNB/USDT'})
+        assert q2.get_nowait() == ('status', {'symbol': 'BNB/USDT'})
+
+        broadcaster.unsubscribe(q1)
+        broadcaster.publish('log', {'line': 'x'})
+        assert q1.empty() and q2.qsize() == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_client_drops_oldest(self):
+        broadcaster = EventBroadcaster(max_queue=2)
+        queue = broadcaster.subscribe()
+        for i in range(3):
+            broadcaster.publish('log', {'line': i})
+        assert [queue.get_nowait()[1]['line'] for _ in range(2)] == [1, 2]
+        assert broadcaster.metrics['dropped'] == 1
+
+    @pytest.mark.asyncio
+    async def test_publish_from_other_thread_and_log_handler(self):
+        broadcaster = EventBroadcaster()
+        queue = broadcaster.subscribe()
+        logger = logging.getLogger('test_broadcast')
+        handler = BroadcastLogHandler(broadcaster)
+        logger.addHandler(handler)
+        try:
+            thread = threading.Thread(target=lambda: logger.warning('来自线程的日志'))
+            thread.start()
+            thread.join()
+            event, data = await asyncio.wait_for(queue.get(), timeout=1)
+        finally:
+            logger.removeHandler(handler)
+        assert event == 'log'
+        assert '来自线程的日志' in data['line']
+
+
+class TestStreamEndpoint(AioHTTPTestCase):
+    """测试 /api/stream SSE 推送"""
+
+    async def get_application(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tracker = OrderTracker('BNB/USDT', data_dir=self._tmp.name)
+        self.broadcaster = EventBroadcaster()
+        snapshot = {'data': {'symbol': 'BNB/USDT', 'current_price': 600.0}}
+        app = web.Application()
+        app['traders'] = {'BNB/USDT': SimpleNamespace(symbol='BNB/USDT', order_tracker=self.tracker)}
+        app['broadcaster'] = self.broadcaster
+        app['status_service'] = SimpleNamespace(
+            get=AsyncMock(return_value=snapshot),
+            uptime=MagicMock(return_value={'uptime': '0天 0小时 0分钟 5秒', 'uptime_seconds': 5})
+        )
+        app.router.add_get('/api/stream', handle_stream)
+        return app
+
+    async def tearDownAsync(self):
+        self.tracker.journal.close()
+        self._tmp.cleanup()
+
+    async def _read_event(self, resp):
+        lines = []
+        while True:
+            line = (await asyncio.wait_for(resp.content.readline(), timeout=2)).decode().strip()
+            if not line:
+                if lines:
+                    break
+                continue
+            lines.append(line)
+        return lines[0].split(': ', 1)[1], json.loads(lines[1].split(': ', 1)[1])
+
+    async def test_initial_full_status_then_filtered_events(self):
+        resp = await self.client.request("GET", "/api/stream?symbol=BNB/USDT")
+        assert resp.headers['Content-Type'] == 'text/event-stream'
+        event, data = await self._read_event(resp)
+        assert event == 'status' and data['full']['current_price'] == 600.0
+        assert data['full']['uptime_seconds'] == 5
+
+        self.broadcaster.publish('status', {'symbol': 'ETH/USDT', 'changes': {}})
+        self.broadcaster.publish('status', {'symbol': 'BNB/USDT', 'changes': {'current_price': 601.0}})
+        event, data = await self._read_event(resp)
+        assert data == {'symbol': 'BNB/USDT', 'changes': {'current_price': 601.0}}
+        resp.close()
+
+
+class TestTrackerListeners:
+    """测试成交回调"""
+
+    def test_listener_called_for_new_trades(self):
+        with tempfile.TemporaryDirectory() as d:
+            tracker = OrderTracker('BNB/USDT', data_dir=d)
+            received = []
+            tracker.add_listener(lambda symbol, trade: received.append((symbol, trade['order_id'])))
+            tracker.add_trade({'order_id': '1', 'timestamp': time.time(), 'side': 'buy', 'price': 600.0, 'amount': 0.1})
+            tracker.add_trade({'order_id': '1', 'timestamp': time.time(), 'side': 'buy', 'price': 600.0, 'amount': 0.1})
+            assert received == [('BNB/USDT', '1')]
+            tracker.journal.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
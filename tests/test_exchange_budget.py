@@ -0,0 +1,132 @@
+"""
+交易所调用预算回归测试：主循环、下单和状态快照的 REST 调用次数超出预算即失败
+"""
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from config import TradingConfig
+from exchange_profiler import ExchangeProfiler, profile_client
+from exchange_simulator import SimulatedExchange, create_client
+from status_snapshot import build_status
+from trader import GridTrader
+
+SYMBOL = 'BNB/USDT'
+
+
+@pytest.fixture
+def simulator():
+    return SimulatedExchange(prices={SYMBOL: 600.0}, balances={'BNB': 1.0, 'USDT': 1000.0},
+                             funding={'USDT': 500.0})
+
+
+@pytest.fixture
+def profiled(simulator, tmp_path, monkeypatch):
+    """返回 (交易器, 分析器)；交易器通过真实的 ExchangeClient 访问模拟交易所"""
+    client = create_client(simulator)
+    profiler = profile_client(client)
+    monkeypatch.setattr('trader.send_pushplus_message', MagicMock())
+    with patch('trader.OrderTracker'), \
+         patch('trader.TradingMonitor'), \
+         patch('trader.PositionControllerS1') as s1_cls:
+        s1 = s1_cls.return_value
+        s1.update_daily_s1_levels = AsyncMock()
+        s1.check_and_execute = AsyncMock()
+        s1.extrema.all_levels.return_value = {}
+        trader = GridTrader(client, TradingConfig(), SYMBOL)
+    trader.initialized = True
+    trader.base_price = 600.0
+    trader.grid_size = 2.0
+    trader.amount_precision = 3
+    trader.price_precision = 2
+    trader.state_file_path = str(tmp_path / 'state.json')
+    return trader, profiler
+
+
+@pytest.fixture
+def fast_sleep(monkeypatch):
+    """下单流程中的等待改为立即返回"""
+    original = asyncio.sleep
+
+    async def sleep(delay, result=None):
+        return await original(0, result)
+
+    monkeypatch.setattr(asyncio, 'sleep', sleep)
+
+
+class TestExchangeProfiler:
+    """测试计数代理、代码路径与调用点归属"""
+
+    @pytest.mark.asyncio
+    async def test_counts_calls_weight_and_call_site(self, simulator):
+        profiler = ExchangeProfiler()
+        exchange = profiler.wrap(simulator)
+        with profiler.section('demo'):
+            await exchange.fetch_ticker(SYMBOL)
+            await exchange.fetch_balance()
+        exchange.market(SYMBOL)  # 同步方法不计数
+
+        report = profiler.report()
+        assert report['paths']['demo'] == {
+            'calls': 2, 'weight': 22, 'methods': {'fetch_ticker': 1, 'fetch_balance': 1}
+        }
+        assert all(site.startswith('tests/test_exchange_budget.py:') for site in report['sites'])
+        assert 'demo' in profiler.format_report()
+
+    @pytest.mark.asyncio
+    async def test_section_propagates_to_child_tasks(self, simulator):
+        profiler = ExchangeProfiler()
+        exchange = profiler.wrap(simulator)
+        with profiler.section('parent'):
+            await asyncio.gather(exchange.fetch_ticker(SYMBOL), exchange.fetch_ticker(SYMBOL))
+        assert profiler.calls('parent') == 2
+
+    def test_assert_budget_includes_report(self):
+        profiler = ExchangeProfiler()
+        with profiler.section('loop'):
+            profiler.record('fetch_balance', 'trader.py:1 in demo')
+        profiler.assert_budget('loop', max_calls=1, max_weight=20)
+        with pytest.raises(AssertionError, match='trader.py:1 in demo'):
+            profiler.assert_budget('loop', max_weight=1)
+
+
+class TestCallBudgets:
+    """各代码路径的 REST 调用预算（缓存预热后的稳态）"""
+
+    @pytest.mark.asyncio
+    async def test_idle_main_loop_iteration(self, profiled):
+        trader, profiler = profiled
+        await trader._run_iteration()  # 预热余额缓存和K线视图
+        profiler.reset()
+
+        with profiler.section('main_loop'):
+            assert await trader._run_iteration() is True
+
+        # 空闲循环每个交易对只允许一次行情请求
+        profiler.assert_budget('main_loop', max_calls=1, max_weight=profiler.weight_of('fetch_ticker'))
+        assert profiler.calls('main_loop', 'fetch_ticker') == 1
+
+    @pytest.mark.asyncio
+    async def test_execute_order_attempt(self, profiled, fast_sleep):
+        trader, profiler = profiled
+        context = await trader._build_context()
+        profiler.reset()
+
+        with profiler.section('execute_order'):
+            assert await trader.execute_order('buy', context)
+
+        # 同步时间 + 下单 + 查询订单 + 成交后刷新总资产的行情
+        profiler.assert_budget('execute_order', max_calls=4, max_weight=8)
+        assert profiler.calls('execute_order', 'fetch_order_book') == 0
+        assert profiler.calls('execute_order', 'fetch_balance') == 0
+
+    @pytest.mark.asyncio
+    async def test_status_snapshot_build(self, profiled):
+        trader, profiler = profiled
+        await build_status(trader)
+        profiler.reset()
+
+        with profiler.section('status'):
+            await build_status(trader)
+
+        profiler.assert_budget('status', max_calls=1, max_weight=profiler.weight_of('fetch_ticker'))
@@ -0,0 +1,91 @@
+"""
+交易所客户端理财相关缓存测试
+"""
+import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+from exchange_client import ExchangeClient
+
+
+@pytest.fixture
+def client():
+    client = ExchangeClient()
+    client.exchange = MagicMock()
+    client.exchange.sapi_get_simple_earn_flexible_list = AsyncMock(return_value={'rows': [
+        {'asset': 'USDT', 'productId': 'USDT001', 'status': 'PURCHASING'},
+        {'asset': 'BNB', 'productId': 'BNB001', 'status': 'PURCHASING'},
+        {'asset': 'ETH', 'productId': 'ETH001', 'status': 'SOLD_OUT'},
+    ]})
+    client.exchange.sapi_post_simple_earn_flexible_subscribe = AsyncMock(return_value={'success': True})
+    client.exchange.sapi_post_simple_earn_flexible_redeem = AsyncMock(return_value={'success': True})
+    return client
+
+
+class TestSavingsCaches:
+    """测试产品目录缓存、余额缓存原地更新与批量划转"""
+
+    @pytest.mark.asyncio
+    async def test_product_catalog_is_cached(self, client):
+        assert await client.get_flexible_product_id('USDT') == 'USDT001'
+        assert await client.get_flexible_product_id('BNB') == 'BNB001'
+        assert client.exchange.sapi_get_simple_earn_flexible_list.await_count == 1
+
+        with pytest.raises(ValueError):
+            await client.get_flexible_product_id('ETH')  # 未在申购状态
+
+    @pytest.mark.asyncio
+    async def test_transfer_updates_cached_balances_in_place(self, client):
+        now = time.time()
+        original_spot = {'free': {'USDT': 1000.0, 'BNB': 1.0}, 'total': {'USDT': 1000.0, 'BNB': 1.0},
+                         'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0}}
+        client.balance_cache = {'timestamp': now, 'data': original_spot}
+        client.funding_balance_cache = {'timestamp': now, 'data': {'USDT': 500.0, 'BNB': 2.0}}
+
+        await client.transfer_to_savings('USDT', 300)
+        spot = await client.fetch_balance()
+        funding = await client.fetch_funding_balance()
+        assert spot['free']['USDT'] == pytest.approx(700.0)
+        assert spot['USDT']['free'] == pytest.approx(700.0)
+        assert spot['free']['BNB'] == 1.0
+        assert funding['USDT'] == pytest.approx(800.0)
+        # 缓存仍然有效，且调用方持有的旧字典不被修改
+        assert client.balance_cache['timestamp'] == now
+        assert original_spot['free']['USDT'] == 1000.0
+
+        await client.transfer_to_spot('BNB', 0.5)
+        assert client.balance_cache['data']['free']['BNB'] == pytest.approx(1.5)
+        assert client.funding_balance_cache['data']['BNB'] == pytest.approx(1.5)
+
+    @pytest.mark.asyncio
+    async def test_fill_adjusts_cached_spot_balance(self, client):
+        client.exchange.fetch_balance = AsyncMock(return_value={
+            'free': {'USDT': 1000.0, 'BNB': 1.0}, 'total': {'USDT': 1000.0, 'BNB': 1.0}
+        })
+        await client.fetch_balance()
+
+        client.on_fill('BNB/USDT', {'timestamp': time.time(), 'side': 'buy', 'price': 500.0, 'amount': 1.0})
+        spot = await client.fetch_balance()
+        assert spot['total']['USDT'] == pytest.approx(500.0)
+        assert spot['free']['BNB'] == pytest.approx(2.0)
+        assert client.exchange.fetch_balance.await_count == 1  # 修正缓存，不额外请求交易所
+
+    @pytest.mark.asyncio
+    async def test_batch_transfer_runs_concurrently(self, client):
+        in_flight = []
+        peak = []
+
+        async def slow_call(params):
+            in_flight.append(params['asset'])
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.05)
+            in_flight.remove(params['asset'])
+            return {'success': True}
+
+        client.exchange.sapi_post_simple_earn_flexible_subscribe = AsyncMock(side_effect=slow_call)
+        client.exchange.sapi_post_simple_earn_flexible_redeem = AsyncMock(side_effect=slow_call)
+        results = await client.batch_transfer([('USDT', 'subscribe', 100), ('BNB', 'redeem', 1)])
+        assert results == [{'success': True}, {'success': True}]
+        assert max(peak) == 2
+        assert client.exchange.sapi_get_simple_earn_flexible_list.await_count == 1
@@ -0,0 +1,92 @@
+"""
+S1 拆单执行器测试
+"""
+import pytest
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from execution_scheduler import ExecutionScheduler
+
+
+def make_trader(ask_depth=10.0):
+    order_book = {'asks': [[100.0, ask_depth]] * 5, 'bids': [[99.9, ask_depth]] * 5}
+    return SimpleNamespace(
+        symbol='BNB/USDT',
+        current_price=100.0,
+        symbol_info={'limits': {'cost': {'min': 10}}},
+        exchange=SimpleNamespace(fetch_order_book=AsyncMock(return_value=order_book))
+    )
+
+
+class RecordingExecutor:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, side, amount):
+        self.calls.append((side, amount))
+        if self.fail:
+            return False
+        return {'price': 100.0, 'amount': amount}
+
+
+class TestExecutionScheduler:
+    """测试切片、参与率限制、取消与失败处理"""
+
+    @pytest.mark.asyncio
+    async def test_twap_slices_evenly(self):
+        executor = RecordingExecutor()
+        scheduler = ExecutionScheduler(make_trader(), executor, mode='twap', slice_interval=0,
+                                       max_slice_value=500, participation_rate=1.0)
+        job = scheduler.submit('BUY', 20.0)  # 价值 2000，拆成 4 片
+        assert scheduler.submit('BUY', 1.0) is None  # 同时只允许一个任务
+        await scheduler.wait(job)
+
+        assert job.status == 'done'
+        assert [amount for _, amount in executor.calls] == pytest.approx([5.0] * 4)
+        assert job.progress == pytest.approx(1.0)
+        assert job.avg_price == pytest.approx(100.0)
+
+    @pytest.mark.asyncio
+    async def test_participation_limit_caps_slices(self):
+        executor = RecordingExecutor()
+        # 前5档共 5 个，参与率 20% => 每片最多 1 个
+        scheduler = ExecutionScheduler(make_trader(ask_depth=1.0), executor, mode='iceberg',
+                                       max_slice_value=10000, participation_rate=0.2, iceberg_interval=0)
+        job = scheduler.submit('BUY', 3.0)
+        await scheduler.wait(job)
+        assert max(amount for _, amount in executor.calls) <= 1.0 + 1e-9
+        assert job.slices == 3
+
+    @pytest.mark.asyncio
+    async def test_cancel_and_prepare(self):
+        executor = RecordingExecutor()
+        prepared = []
+
+        async def prepare(job):
+            prepared.append(job.id)
+            job.total_amount = 10.0  # 例如可用余额不足时缩减总量
+            return True
+
+        scheduler = ExecutionScheduler(make_trader(), executor, prepare=prepare, mode='twap',
+                                       slice_interval=0.05, max_slice_value=100, participation_rate=1.0)
+        job = scheduler.submit('SELL', 50.0)
+        await asyncio.sleep(0.08)
+        assert scheduler.cancel(job.id)
+        await scheduler.wait(job)
+
+        assert prepared == [job.id]
+        assert job.status == 'cancelled'
+        assert 0 < job.filled_amount < 10.0
+        assert scheduler.get_status()['status'] == 'cancelled'
+
+    @pytest.mark.asyncio
+    async def test_repeated_failures_abort_job(self):
+        executor = RecordingExecutor(fail=True)
+        scheduler = ExecutionScheduler(make_trader(), executor, mode='iceberg', max_slice_value=100,
+                                       participation_rate=1.0, iceberg_interval=0, max_failures=3)
+        job = scheduler.submit('BUY', 5.0)
+        await scheduler.wait(job)
+        assert job.status == 'failed'
+        assert len(executor.calls) == 3
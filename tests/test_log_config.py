@@ -0,0 +1,65 @@
+"""
+日志队列管道测试
+"""
+import pytest
+import json
+import logging
+import os
+import tempfile
+
+from helpers import LogConfig
+
+
+@pytest.fixture
+def log_dir():
+    old_dir = LogConfig.LOG_DIR
+    with tempfile.TemporaryDirectory() as d:
+        LogConfig.LOG_DIR = d
+        yield d
+        LogConfig.shutdown()
+        LogConfig.LOG_DIR = old_dir
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+
+
+class TestLogConfig:
+    """测试基于 QueueHandler/QueueListener 的日志配置"""
+
+    def test_root_logger_only_enqueues(self, log_dir):
+        LogConfig.setup_logger(json_log=False)
+        handlers = logging.getLogger().handlers
+        assert len(handlers) == 1
+        assert handlers[0].__class__.__name__ == 'NonBlockingQueueHandler'
+
+        logging.getLogger('Test').info("价格 %.2f", 600.0)
+        LogConfig.shutdown()
+        with open(os.path.join(log_dir, 'trading_system.log'), encoding='utf-8') as f:
+            content = f.read()
+        assert '[Test] INFO: 价格 600.00' in content
+
+    def test_json_sink_with_symbol(self, log_dir):
+        LogConfig.setup_logger(json_log=True)
+        LogConfig.bind_symbol('BNB/USDT')
+        logging.getLogger('GridTrader').warning("余额不足 %s", 'USDT')
+        logging.getLogger('Other').info("显式指定", extra={'symbol': 'ETH/USDT'})
+        LogConfig.shutdown()
+
+        with open(os.path.join(log_dir, 'trading_system.jsonl'), encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        assert entries[0]['msg'] == '余额不足 USDT'
+        assert entries[0]['level'] == 'WARNING'
+        assert entries[0]['symbol'] == 'BNB/USDT'
+        assert entries[1]['symbol'] == 'ETH/USDT'
+
+    def test_full_queue_drops_instead_of_blocking(self, log_dir):
+        LogConfig.setup_logger(json_log=False, queue_size=1)
+        listener = LogConfig._listener
+        LogConfig._listener = None
+        listener.stop()  # 模拟写盘线程停滞
+        logger = logging.getLogger('Test')
+        for i in range(5):
+            logger.info("第%d条", i)
+        assert LogConfig.get_metrics()['dropped'] == 4
+        for handler in listener.handlers:
+            handler.close()
@@ -0,0 +1,66 @@
+"""
+日志尾部读取测试
+"""
+import pytest
+import os
+import tempfile
+
+from log_tail import tail_lines, read_log_delta
+
+
+@pytest.fixture
+def log_path():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'trading_system.log')
+        with open(path, 'w', encoding='utf-8') as f:
+            for i in range(1000):
+                f.write(f'第{i}行 日志内容\n')
+        yield path
+
+
+class TestLogTail:
+    """测试按块倒读与增量读取"""
+
+    def test_tail_reads_last_lines_across_blocks(self, log_path):
+        lines, offset = tail_lines(log_path, max_lines=300, block_size=512)
+        assert len(lines) == 300
+        assert lines[0] == '第700行 日志内容'
+        assert lines[-1] == '第999行 日志内容'
+        assert offset == os.path.getsize(log_path)
+
+    def test_tail_ignores_partial_last_line(self, log_path):
+        size = os.path.getsize(log_path)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write('写了一半')
+        lines, offset = tail_lines(log_path, max_lines=1)
+        assert lines == ['第999行 日志内容']
+        assert offset == size
+
+    def test_incremental_since_offset(self, log_path):
+        first = read_log_delta(log_path, max_lines=5)
+        assert first['reset'] and len(first['lines']) == 5
+
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write('新增一行\n半行')
+        delta = read_log_delta(log_path, since=first['offset'], inode=first['inode'])
+        assert delta['lines'] == ['新增一行']
+        assert not delta['reset']
+
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write('补完\n')
+        delta = read_log_delta(log_path, since=delta['offset'], inode=delta['inode'])
+        assert delta['lines'] == ['半行补完']
+
+    def test_rotation_detected_by_inode_or_size(self, log_path):
+        first = read_log_delta(log_path)
+        os.rename(log_path, log_path + '.2024-01-01')
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.write('轮转后的第一行\n')
+
+        delta = read_log_delta(log_path, since=first['offset'], inode=first['inode'])
+        assert delta['reset']
+        assert delta['lines'] == ['轮转后的第一行']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,47 @@
+"""
+事件循环看门狗测试
+"""
+import pytest
+import asyncio
+import time
+
+from loop_watchdog import LoopWatchdog
+
+
+def blocking_helper(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopWatchdog:
+    """测试阻塞检测与调用栈定位"""
+
+    @pytest.mark.asyncio
+    async def test_reports_blocking_call_site(self):
+        watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            blocking_helper(0.4)
+            await asyncio.sleep(0.05)
+        finally:
+            await watchdog.stop()
+
+        assert watchdog.metrics['stalls'] == 1
+        incident = watchdog.incidents[-1]
+        assert 'test_loop_watchdog.py' in incident['call_site']
+        assert 'blocking_helper' in incident['call_site']
+        assert incident['stalled_ms'] >= 100
+        assert watchdog.metrics['max_lag_ms'] >= 300
+
+    @pytest.mark.asyncio
+    async def test_no_report_when_loop_is_responsive(self):
+        watchdog = LoopWatchdog(threshold=0.2, interval=0.02)
+        watchdog.start()
+        try:
+            for _ in range(10):
+                await asyncio.sleep(0.02)
+        finally:
+            await watchdog.stop()
+
+        assert watchdog.metrics['stalls'] == 0
+        assert watchdog.get_metrics()['last_incident'] is None
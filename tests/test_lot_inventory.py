@@ -0,0 +1,122 @@
+"""
+持仓批次台账（已实现盈亏）测试
+"""
+import pytest
+import json
+import os
+import tempfile
+
+from lot_inventory import LotInventory
+from order_tracker import OrderTracker
+
+
+def make_trade(order_id, ts, side, price, amount, **extra):
+    return {'order_id': order_id, 'timestamp': ts, 'side': side, 'price': price, 'amount': amount, **extra}
+
+
+class TestLotInventory:
+    """测试批次冲销"""
+
+    def test_fifo_matches_oldest_lots_first(self):
+        inv = LotInventory('fifo')
+        inv.apply(make_trade('1', 1.0, 'buy', 100.0, 1.0))
+        inv.apply(make_trade('2', 2.0, 'buy', 110.0, 1.0))
+
+        profit = inv.apply(make_trade('3', 3.0, 'sell', 120.0, 1.5))
+        assert profit == pytest.approx(20.0 + 5.0)
+        assert inv.position == pytest.approx(0.5)
+        assert inv.avg_cost == pytest.approx(110.0)
+        assert inv.unrealized_pnl(120.0) == pytest.approx(5.0)
+        assert len(inv.lots) == 1
+
+    def test_average_cost_mode(self):
+        inv = LotInventory('average')
+        inv.apply(make_trade('1', 1.0, 'BUY', 100.0, 1.0))
+        inv.apply(make_trade('2', 2.0, 'BUY', 110.0, 1.0))
+
+        assert len(inv.lots) == 1
+        assert inv.apply(make_trade('3', 3.0, 'SELL', 120.0, 1.0)) == pytest.approx(15.0)
+
+    def test_oversell_has_no_cost_basis(self):
+        inv = LotInventory()
+        inv.apply(make_trade('1', 1.0, 'buy', 100.0, 1.0))
+        assert inv.apply(make_trade('2', 2.0, 'sell', 105.0, 3.0)) == pytest.approx(5.0)
+        assert inv.position == 0.0
+
+    def test_rebuild_fills_missing_profit_only(self):
+        trades = [
+            make_trade('2', 2.0, 'sell', 110.0, 1.0),
+            make_trade('1', 1.0, 'buy', 100.0, 1.0),
+            make_trade('3', 3.0, 'sell', 120.0, 1.0, profit=9.0),
+        ]
+        inv = LotInventory()
+        filled = inv.rebuild(trades)
+        assert [t['order_id'] for t in filled] == ['1', '2']
+        assert trades[0]['profit'] == pytest.approx(10.0)
+        assert trades[2]['profit'] == 9.0
+
+    def test_round_trip_dict(self):
+        inv = LotInventory()
+        inv.apply(make_trade('1', 1.0, 'buy', 100.0, 1.0))
+        inv.apply(make_trade('2', 2.0, 'buy', 120.0, 1.0))
+        restored = LotInventory.from_dict(inv.to_dict(), 'average')
+        assert len(restored.lots) == 1
+        assert restored.avg_cost == pytest.approx(110.0)
+
+
+class TestOrderTrackerProfit:
+    """测试订单跟踪器为成交附加盈亏"""
+
+    def test_profit_attached_and_survives_archive(self):
+        with tempfile.TemporaryDirectory() as d:
+            tracker = OrderTracker(data_dir=d)
+            tracker.max_memory_trades = 2
+            tracker.add_trade(make_trade('1', 1.0, 'buy', 100.0, 1.0))
+            tracker.add_trade(make_trade('2', 2.0, 'buy', 110.0, 1.0))
+            tracker.add_trade(make_trade('3', 3.0, 'sell', 105.0, 1.0))
+            assert tracker.journal.get('3')['profit'] == pytest.approx(5.0)
+
+            tracker.archive_old_trades()  # 归档买入批次 '1'
+            tracker.journal.close()
+
+            reloaded = OrderTracker(data_dir=d)
+            reloaded.add_trade(make_trade('4', 4.0, 'sell', 120.0, 1.0))
+            assert reloaded.journal.get('4')['profit'] == pytest.approx(10.0)
+            assert reloaded.get_pnl(120.0)['position'] == 0.0
+            reloaded.journal.close()
+
+    def test_sync_correction_recomputes_profit(self):
+        with tempfile.TemporaryDirectory() as d:
+            tracker = OrderTracker(data_dir=d)
+            tracker.add_trade(make_trade('1', 1.0, 'buy', 100.0, 1.0))
+            tracker.upsert_trade(make_trade('0', 0.5, 'buy', 90.0, 1.0))
+            tracker.upsert_trade(make_trade('2', 2.0, 'sell', 95.0, 1.0))
+
+            assert tracker.journal.get('2')['profit'] == pytest.approx(5.0)
+            assert tracker.inventory.avg_cost == pytest.approx(100.0)
+            tracker.journal.close()
+
+    def test_legacy_zero_profit_sells_are_recomputed(self):
+        with tempfile.TemporaryDirectory() as d:
+            # 旧版同步逻辑写入的记录：所有成交 profit 都是 0
+            legacy = [make_trade('1', 1.0, 'buy', 100.0, 1.0, profit=0),
+                      make_trade('2', 2.0, 'sell', 120.0, 0.5, profit=0),
+                      make_trade('3', 3.0, 'sell', 90.0, 0.5, profit=-4.0)]
+            with open(os.path.join(d, 'trade_history.json'), 'w', encoding='utf-8') as f:
+                json.dump(legacy, f)
+
+            tracker = OrderTracker(data_dir=d)
+            assert tracker.journal.get('2')['profit'] == pytest.approx(10.0)
+            assert tracker.journal.get('3')['profit'] == -4.0  # 已有的非零盈亏保留
+            assert tracker.journal.get('1')['profit'] == 0
+            tracker.journal.close()
+
+            # 补全结果已写回日志，重启后不再重复补全
+            reloaded = OrderTracker(data_dir=d)
+            assert reloaded.journal.get('2')['profit'] == pytest.approx(10.0)
+            assert reloaded.stats.summary()['total_profit'] == pytest.approx(6.0)
+            reloaded.journal.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,122 @@
+"""
+异步通知管道测试
+"""
+import pytest
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from clock import VirtualClock, run_virtual
+from notifier import Notifier, PushPlusSink, RateLimitedError
+
+
+class RecordingSink:
+    """记录发送内容的测试通道"""
+
+    def __init__(self, failures=0, rate_limited=0):
+        self.sent = []
+        self.failures = failures
+        self.rate_limited = rate_limited
+
+    async def send(self, title, content):
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise RateLimitedError("limited", retry_after=0.01)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("boom")
+        self.sent.append((title, content))
+
+
+class TestNotifier:
+    """测试入队、合并与重试"""
+
+    @pytest.mark.asyncio
+    async def test_notify_does_not_block_and_coalesces_burst(self):
+        sink = RecordingSink()
+        notifier = Notifier(sinks=[sink], digest_window=0.05, min_interval=0)
+        start = time.monotonic()
+        for i in range(5):
+            assert notifier.notify(f"消息{i}", "交易执行通知")
+        assert time.monotonic() - start < 0.01
+
+        await notifier.stop()
+        assert len(sink.sent) == 1
+        title, content = sink.sent[0]
+        assert title == "交易执行通知 (5条)"
+        assert all(f"消息{i}" in content for i in range(5))
+        assert notifier.metrics['digests'] == 1
+
+    @pytest.mark.asyncio
+    async def test_retries_with_backoff_and_rate_limit(self):
+        sink = RecordingSink(failures=1, rate_limited=1)
+        notifier = Notifier(sinks=[sink], digest_window=0, min_interval=0, backoff_base=0.01)
+        notifier.notify("hello", "t")
+        await notifier.stop()
+        assert sink.sent == [("t", "hello")]
+        assert notifier.metrics['retries'] == 2
+
+    @pytest.mark.asyncio
+    async def test_bounded_queue_drops_oldest(self):
+        sink = RecordingSink()
+        notifier = Notifier(sinks=[sink], max_queue=2, digest_window=0, min_interval=0)
+        for i in range(3):
+            notifier.notify(str(i), "t")
+        assert notifier.metrics['dropped'] == 1
+        await notifier.stop()
+        assert "0" not in "".join(c for _, c in sink.sent)
+
+    def test_min_interval_follows_injected_clock(self):
+        clock = VirtualClock(start=1_700_000_000)
+        sink = RecordingSink()
+        notifier = Notifier(sinks=[sink], digest_window=0, min_interval=5, clock=clock)
+
+        async def main():
+            notifier.notify("a", "t")
+            await asyncio.sleep(1)
+            notifier.notify("b", "t")
+            await notifier.stop()
+            return clock.monotonic()
+
+        start = time.perf_counter()
+        assert run_virtual(main(), clock) >= 5  # 第二条按虚拟时间间隔发送
+        assert sink.sent == [("t", "a"), ("t", "b")]
+        assert time.perf_counter() - start < 1
+
+    def test_without_loop_returns_false(self):
+        notifier = Notifier(sinks=[RecordingSink()])
+        assert notifier.notify("x") is False
+
+
+class TestPushPlusSink:
+    """用本地HTTP服务替代PushPlus验证发送"""
+
+    @pytest.mark.asyncio
+    async def test_send_against_local_server(self):
+        received = []
+        responses = [web.json_response({'code': 900, 'msg': 'limited'}), web.json_response({'code': 200})]
+
+        async def handler(request):
+            received.append(dict(await request.post()))
+            return responses.pop(0)
+
+        app = web.Application()
+        app.router.add_post('/send', handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            sink = PushPlusSink('token', url=str(server.make_url('/send')), timeout=5)
+            with pytest.raises(RateLimitedError):
+                await sink.send('标题', '内容')
+            await sink.send('标题', '内容')
+            await sink.close()
+        finally:
+            await server.close()
+
+        assert received[1] == {'token': 'token', 'title': '标题', 'content': '内容', 'template': 'txt'}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,85 @@
+"""
+账户级下单限速测试
+"""
+import pytest
+import asyncio
+import time
+
+from clock import VirtualClock, run_virtual
+from order_rate_governor import OrderRateGovernor, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class TestOrderRateGovernor:
+    """测试滑动窗口限速与公平调度"""
+
+    @pytest.mark.asyncio
+    async def test_immediate_within_limit(self):
+        governor = OrderRateGovernor(limits=[(3, 1.0)])
+        for _ in range(3):
+            assert await governor.acquire('BNB/USDT') == 0.0
+        assert governor.get_metrics()['windows']['1.0s']['used'] == 3
+        await governor.stop()
+
+    @pytest.mark.asyncio
+    async def test_waits_instead_of_rejecting(self):
+        governor = OrderRateGovernor(limits=[(2, 0.2)])
+        start = time.monotonic()
+        for _ in range(4):
+            await governor.acquire('BNB/USDT')
+        assert time.monotonic() - start >= 0.18
+        assert governor.metrics['granted'] == 4
+        await governor.stop()
+
+    def test_windows_follow_injected_clock(self):
+        clock = VirtualClock(start=1_700_000_000)
+        governor = OrderRateGovernor(limits=[(2, 10.0)], clock=clock)
+
+        async def main():
+            waits = [await governor.acquire('BNB/USDT') for _ in range(4)]
+            await governor.stop()
+            return waits
+
+        start = time.perf_counter()
+        waits = run_virtual(main(), clock)
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2] == pytest.approx(10.0, abs=0.01)  # 按虚拟时间等待整个窗口
+        assert time.perf_counter() - start < 1
+
+    @pytest.mark.asyncio
+    async def test_priority_and_round_robin_across_symbols(self):
+        governor = OrderRateGovernor(limits=[(1, 0.05)])
+        await governor.acquire('X')  # 占满窗口，后续请求全部排队
+        order = []
+
+        async def request(symbol, priority, tag):
+            await governor.acquire(symbol, priority)
+            order.append(tag)
+
+        tasks = [
+            asyncio.create_task(request('BNB/USDT', PRIORITY_LOW, 'bnb-s1')),
+            asyncio.create_task(request('BNB/USDT', 1, 'bnb-1')),
+            asyncio.create_task(request('BNB/USDT', 1, 'bnb-2')),
+            asyncio.create_task(request('ETH/USDT', 1, 'eth-1')),
+            asyncio.create_task(request('ETH/USDT', PRIORITY_HIGH, 'eth-high')),
+        ]
+        await asyncio.gather(*tasks)
+
+        assert order[0] == 'eth-high'
+        assert order[1:4] == ['bnb-1', 'eth-1', 'bnb-2']
+        assert order[-1] == 'bnb-s1'
+        await governor.stop()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_is_skipped(self):
+        governor = OrderRateGovernor(limits=[(1, 0.05)])
+        await governor.acquire('BNB/USDT')
+        waiter = asyncio.create_task(governor.acquire('BNB/USDT'))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait_for(governor.acquire('ETH/USDT'), timeout=1)
+        assert governor.get_metrics()['waiting'] == 0
+        await governor.stop()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,409 @@
+"""
+订单跟踪器与成交日志测试
+"""
+import pytest
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import MagicMock, patch
+
+from clock import VirtualClock
+from order_tracker import OrderTracker
+from trade_journal import TradeJournal
+from trade_statistics import TradeStatistics
+
+
+@pytest.fixture
+def temp_dir():
+    with tempfile.TemporaryDirectory() as d:
+        yield d
+
+
+@pytest.fixture
+def tracker(temp_dir):
+    t = OrderTracker(data_dir=temp_dir)
+    yield t
+    t.journal.close()
+
+
+def make_trade(order_id, ts, side='buy', price=600.0, amount=0.1, **extra):
+    return {'order_id': order_id, 'timestamp': ts, 'side': side, 'price': price, 'amount': amount, **extra}
+
+
+class TestTradeJournal:
+    """测试追加写入的成交日志"""
+
+    def test_append_and_recover(self, temp_dir):
+        path = os.path.join(temp_dir, 'journal.jsonl')
+        journal = TradeJournal(path)
+        journal.append(make_trade('1', 1.0))
+        journal.append(make_trade('2', 2.0))
+        journal.close()
+
+        recovered = TradeJournal(path)
+        assert '1' in recovered and '2' in recovered
+        assert [t['order_id'] for t in recovered.records()] == ['1', '2']
+
+    def test_recover_truncates_partial_last_line(self, temp_dir):
+        path = os.path.join(temp_dir, 'journal.jsonl')
+        journal = TradeJournal(path)
+        journal.append(make_trade('1', 1.0))
+        journal.close()
+        # 模拟写入一半时崩溃
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"order_id": "2", "timest')
+
+        recovered = TradeJournal(path)
+        assert len(recovered) == 1
+        recovered.append(make_trade('3', 3.0))
+        recovered.close()
+
+        # 截断后追加的记录仍然可以正常解析
+        assert [t['order_id'] for t in TradeJournal(path).records()] == ['1', '3']
+
+    def test_later_record_overrides_and_compaction(self, temp_dir):
+        path = os.path.join(temp_dir, 'journal.jsonl')
+        journal = TradeJournal(path, compact_ratio=2.0, min_compact_lines=4)
+        journal.append(make_trade('1', 1.0, price=600.0))
+        journal.append(make_trade('1', 1.0, price=601.0))
+        journal.append(make_trade('1', 1.0, price=602.0))
+        assert journal.line_count == 3
+        journal.append(make_trade('1', 1.0, price=603.0))  # 第4行触发压缩
+
+        assert journal.line_count == 1
+        assert journal.get('1')['price'] == 603.0
+        journal.close()
+        with open(path, 'r', encoding='utf-8') as f:
+            assert len(f.readlines()) == 1
+
+    def test_records_stay_in_time_order_without_resorting(self, temp_dir):
+        journal = TradeJournal(os.path.join(temp_dir, 'journal.jsonl'))
+        for order_id, ts in (('1', 1.0), ('3', 3.0), ('2', 2.0), ('4', 3.0)):
+            journal.append(make_trade(order_id, ts))
+        journal.append(make_trade('1', 5.0))  # 修正时间戳的记录移动到新位置
+
+        assert [t['order_id'] for t in journal.records()] == ['2', '3', '4', '1']
+        assert [t['order_id'] for t in journal.between(2.5, 5.0)] == ['3', '4']
+        journal.close()
+        assert [t['order_id'] for t in TradeJournal(journal.path).records()] == ['2', '3', '4', '1']
+
+    @pytest.mark.asyncio
+    async def test_background_compaction_keeps_concurrent_appends(self, temp_dir):
+        journal = TradeJournal(os.path.join(temp_dir, 'journal.jsonl'))
+        old = [make_trade(str(i), float(i)) for i in range(5)]
+        for trade in old:
+            journal.append(trade)
+        journal.discard(old[:3])
+
+        compaction = asyncio.ensure_future(journal.compact_async())
+        await asyncio.sleep(0)  # 临时文件正在工作线程中写入
+        journal.append(make_trade('5', 5.0))
+        await compaction
+
+        assert journal.line_count == 3
+        journal.close()
+        assert [t['order_id'] for t in TradeJournal(journal.path).records()] == ['3', '4', '5']
+
+
+class TestOrderTracker:
+    """测试基于日志的订单跟踪器"""
+
+    def test_add_trade_dedupes_by_order_id(self, tracker):
+        tracker.add_trade(make_trade('1', 1.0))
+        tracker.add_trade(make_trade('1', 2.0, price=700.0))
+
+        assert len(tracker.trade_history) == 1
+        assert tracker.trade_history[0]['price'] == 600.0
+        assert len(tracker.journal) == 1
+
+    def test_add_trade_rejects_invalid(self, tracker):
+        tracker.add_trade({'order_id': '1', 'side': 'buy'})
+        tracker.add_trade(make_trade('2', 'bad'))
+        assert tracker.trade_history == []
+        assert len(tracker.journal) == 0
+
+    def test_memory_window_and_persistence(self, temp_dir):
+        tracker = OrderTracker(data_dir=temp_dir)
+        for i in range(120):
+            tracker.add_trade(make_trade(str(i), float(i)))
+        assert len(tracker.trade_history) == 100
+        assert tracker.trade_history[0]['order_id'] == '20'
+        tracker.journal.close()
+
+        reloaded = OrderTracker(data_dir=temp_dir)
+        assert len(reloaded.journal) == 120
+        assert [t['order_id'] for t in reloaded.trade_history] == [str(i) for i in range(20, 120)]
+        reloaded.journal.close()
+
+    def test_upsert_overrides_existing(self, tracker):
+        tracker.add_trade(make_trade('1', 1.0, price=600.0))
+        tracker.upsert_trade(make_trade('1', 1.0, price=605.0))
+        tracker.upsert_trade(make_trade('2', 0.5))
+
+        assert [t['order_id'] for t in tracker.trade_history] == ['2', '1']
+        assert tracker.journal.get('1')['price'] == 605.0
+
+    def test_imports_legacy_history_once(self, temp_dir):
+        with open(os.path.join(temp_dir, 'trade_history.json'), 'w', encoding='utf-8') as f:
+            json.dump([make_trade('1', 1.0), make_trade('2', 2.0)], f)
+
+        tracker = OrderTracker(data_dir=temp_dir)
+        assert len(tracker.journal) == 2
+        assert len(tracker.trade_history) == 2
+        assert os.path.exists(os.path.join(temp_dir, 'trade_history.json.migrated'))
+        tracker.journal.close()
+
+    def test_legacy_history_belongs_to_one_symbol(self, temp_dir):
+        with open(os.path.join(temp_dir, 'trade_history.json'), 'w', encoding='utf-8') as f:
+            json.dump([make_trade('1', 1.0), make_trade('2', 2.0)], f)
+        os.makedirs(os.path.join(temp_dir, 'archives'))
+        with open(os.path.join(temp_dir, 'archives', 'trades_202401.json'), 'w', encoding='utf-8') as f:
+            json.dump([make_trade('0', 1_704_100_000.0)], f)
+
+        with patch('order_tracker.LEGACY_TRADES_SYMBOL', 'BNB/USDT'):
+            eth = OrderTracker('ETH/USDT', data_dir=temp_dir)
+            bnb = OrderTracker('BNB/USDT', data_dir=temp_dir)
+            bnb.journal.close()
+            reopened = OrderTracker('BNB/USDT', data_dir=temp_dir)
+
+        assert len(eth.journal) == 0 and len(eth.archive) == 0
+        assert [t['order_id'] for t in bnb.journal.records()] == ['1', '2', '0']
+        assert len(reopened.journal) == 3  # 已标记为迁移，不会重复导入
+        assert not os.path.exists(os.path.join(temp_dir, 'trade_history.json'))
+        assert os.path.exists(os.path.join(temp_dir, 'archives', 'trades_202401.json.migrated'))
+        for t in (eth, reopened):
+            t.journal.close()
+
+    def test_journal_is_archived_automatically(self, temp_dir):
+        tracker = OrderTracker(data_dir=temp_dir)
+        tracker.max_memory_trades = 5
+        tracker.archive_threshold = 20
+        base = 1_700_000_000.0
+        for i in range(45):
+            tracker.add_trade(make_trade(str(i), base + i * 60, side='buy' if i % 2 == 0 else 'sell'))
+
+        # 日志规模有上限，较早的成交进入列式归档
+        assert len(tracker.journal) <= tracker.archive_threshold
+        assert len(tracker.archive) + len(tracker.journal) == 45
+        assert [t['order_id'] for t in tracker.query_trades()] == [str(i) for i in range(45)]
+        tracker.journal.close()
+
+        # 重启后只重放日志中的近期成交，统计和持仓台账与归档前一致
+        reloaded = OrderTracker(data_dir=temp_dir)
+        assert reloaded.stats.summary()['total_trades'] == 45
+        assert reloaded.get_pnl()['position'] == pytest.approx(tracker.get_pnl()['position'])
+        reloaded.journal.close()
+
+    @pytest.mark.asyncio
+    async def test_archiving_runs_off_the_event_loop(self, temp_dir):
+        tracker = OrderTracker(data_dir=temp_dir)
+        tracker.max_memory_trades = 5
+        tracker.archive_threshold = 20
+        loop_thread = threading.get_ident()
+        writers = []
+        write_archive = tracker._write_archive
+        tracker._write_archive = lambda trades: (writers.append(threading.get_ident()), write_archive(trades))
+
+        base = 1_700_000_000.0
+        for i in range(21):
+            tracker.add_trade(make_trade(str(i), base + i * 60))
+        assert len(tracker.archive) == 0  # add_trade 不等待归档
+        task = tracker._archive_task
+        await asyncio.sleep(0)  # 归档任务已取走待归档记录，正在工作线程中写文件
+        tracker.add_trade(make_trade('21', base + 21 * 60))
+        assert tracker._archive_task is task  # 同一时间只运行一个归档任务
+        await task
+
+        assert writers and loop_thread not in writers
+        assert len(tracker.archive) == 16
+        assert [t['order_id'] for t in tracker.query_trades()] == [str(i) for i in range(22)]
+        tracker.journal.close()
+
+        # 归档期间写入的成交在日志重写后仍在文件中
+        reopened = TradeJournal(tracker.journal.path)
+        assert sorted(reopened.index, key=int) == [str(i) for i in range(16, 22)]
+        reopened.close()
+
+    def test_per_symbol_journal_files(self, temp_dir):
+        bnb = OrderTracker('BNB/USDT', data_dir=temp_dir)
+        eth = OrderTracker('ETH/USDT', data_dir=temp_dir)
+        bnb.add_trade(make_trade('1', 1.0))
+
+        assert len(eth.journal) == 0
+        assert os.path.basename(bnb.journal_file) == 'trade_journal_BNB_USDT.jsonl'
+        bnb.journal.close()
+        eth.journal.close()
+
+    def test_archive_old_trades_compacts_journal(self, tracker):
+        for i in range(150):
+            tracker.add_trade(make_trade(str(i), float(i)))
+        tracker.archive_old_trades()
+
+        assert len(tracker.journal) == 100
+        assert len(tracker.archive) == 50
+        assert all(f.endswith('.npy') for f in os.listdir(tracker.archive_dir))
+        # 归档与日志合起来仍能查询到全部成交
+        assert [t['order_id'] for t in tracker.query_trades(since=40.0, until=60.0)] == [str(i) for i in range(40, 60)]
+
+    def test_statistics_include_archive_after_reload(self, temp_dir):
+        tracker = OrderTracker(data_dir=temp_dir)
+        for i in range(150):
+            tracker.add_trade(make_trade(str(i), float(i), profit=1.0))
+        tracker.archive_old_trades()
+        tracker.journal.close()
+
+        reloaded = OrderTracker(data_dir=temp_dir)
+        assert reloaded.get_statistics()['total_trades'] == 150
+        reloaded.journal.close()
+
+class TestTradeQueries:
+    """测试跨归档的流式遍历、分页与导出"""
+
+    @pytest.fixture
+    def archived_tracker(self, tracker):
+        for i in range(150):
+            tracker.add_trade(make_trade(str(i), float(i // 2)))  # 每个时间戳两笔成交
+        tracker.archive_old_trades()
+        return tracker
+
+    def test_iter_trades_spans_archive_and_journal(self, archived_tracker):
+        ids = [t['order_id'] for t in archived_tracker.iter_trades(chunk_size=7)]
+        assert ids == [str(i) for i in range(150)]
+
+    def test_page_trades_with_cursor(self, archived_tracker):
+        pages, cursor = [], None
+        while True:
+            page, cursor = archived_tracker.page_trades(limit=7, cursor=cursor)
+            pages.extend(t['order_id'] for t in page)
+            if cursor is None:
+                break
+        assert pages == [str(i) for i in range(150)]
+
+    def test_page_trades_does_not_scan_whole_journal(self, tracker, monkeypatch):
+        for i in range(50):
+            tracker.add_trade(make_trade(str(i), float(i)))
+        monkeypatch.setattr(tracker.journal, 'records', MagicMock(side_effect=AssertionError('全量扫描')))
+
+        page, cursor = tracker.page_trades(since=40.0, limit=5)
+        assert [t['order_id'] for t in page] == ['40', '41', '42', '43', '44']
+        page, cursor = tracker.page_trades(limit=5, cursor=cursor)
+        assert [t['order_id'] for t in page] == ['45', '46', '47', '48', '49']
+        assert [t['order_id'] for t in tracker.query_trades(since=10.0, until=13.0)] == ['10', '11', '12']
+
+    def test_view_is_fixed_while_trades_are_added_and_archived(self, archived_tracker):
+        trades = archived_tracker.iter_trades(chunk_size=7)
+        head = [next(trades)['order_id'] for _ in range(10)]
+
+        # 导出进行中：新增成交并把日志中较早的成交移入归档
+        archived_tracker.max_memory_trades = 20
+        archived_tracker.add_trade(make_trade('new', 1000.0))
+        archived_tracker.archive_old_trades()
+
+        ids = head + [t['order_id'] for t in trades]
+        assert ids == [str(i) for i in range(150)]
+
+    @pytest.mark.asyncio
+    async def test_async_paging_and_export_match_sync(self, archived_tracker):
+        page, cursor = await archived_tracker.page_trades_async(limit=7)
+        assert (page, cursor) == archived_tracker.page_trades(limit=7)
+        page, _ = await archived_tracker.page_trades_async(limit=7, cursor=cursor)
+        assert [t['order_id'] for t in page] == [str(i) for i in range(7, 14)]
+
+        trades = await archived_tracker.snapshot_trades(since=10.0, until=20.0)
+        archived_tracker.add_trade(make_trade('late', 15.0))  # 视图确定之后才写入
+        chunks = [c async for c in archived_tracker.export_chunks_async(trades, 'jsonl', chunk_size=5)]
+        assert len(chunks) == 4
+        assert [json.loads(l)['order_id'] for l in ''.join(chunks).splitlines()] == [str(i) for i in range(20, 40)]
+
+    def test_export_chunks_csv_and_jsonl(self, archived_tracker):
+        csv_text = ''.join(archived_tracker.export_chunks('csv', chunk_size=10))
+        lines = csv_text.strip().splitlines()
+        assert lines[0].startswith('timestamp,side,price')
+        assert len(lines) == 151
+
+        jsonl = ''.join(archived_tracker.export_chunks('jsonl', since=10.0, until=20.0))
+        assert [json.loads(l)['order_id'] for l in jsonl.splitlines()] == [str(i) for i in range(20, 40)]
+
+        path = archived_tracker.export_trades('csv')
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            assert f.read() == csv_text
+
+
+class TestTradeStatistics:
+    """测试增量成交统计"""
+
+    def test_counts_streaks_and_payoff(self):
+        stats = TradeStatistics()
+        for i, profit in enumerate([2.0, 3.0, -1.0, -1.0, -2.0, 0, 4.0]):
+            stats.add(make_trade(str(i), 1000.0 + i, profit=profit))
+
+        summary = stats.summary()
+        assert summary['total_trades'] == 7
+        assert summary['win_rate'] == pytest.approx(3 / 7)
+        assert summary['total_profit'] == pytest.approx(5.0)
+        assert summary['max_profit'] == 4.0
+        assert summary['max_loss'] == -2.0
+        assert summary['consecutive_wins'] == 2
+        assert summary['consecutive_losses'] == 3
+        assert summary['profit_factor'] == pytest.approx(9.0 / 4.0)
+        assert stats.payoff_ratio == pytest.approx(3.0 / (4.0 / 3))
+
+    def test_daily_window(self):
+        stats = TradeStatistics()
+        day = 24 * 3600
+        now = 100 * day
+        stats.add(make_trade('old', now - 10 * day, profit=5.0))
+        stats.add(make_trade('a', now - 2 * day, profit=1.0))
+        stats.add(make_trade('b', now - 1 * day, profit=-0.5))
+
+        window = stats.window_summary(3, now=now)
+        assert window['total_trades'] == 2
+        assert window['total_profit'] == pytest.approx(0.5)
+        assert len(stats.daily_window(30, now=now)) == 3
+
+    def test_daily_window_defaults_to_injected_clock(self):
+        day = 24 * 3600
+        stats = TradeStatistics(clock=VirtualClock(start=100 * day))
+        stats.add(make_trade('old', 90 * day, profit=5.0))
+        stats.add(make_trade('a', 99 * day, profit=1.0))
+        assert stats.window_summary(3)['total_trades'] == 1
+
+    def test_ring_evicts_oldest_days(self):
+        stats = TradeStatistics(retention_days=2)
+        day = 24 * 3600
+        for i in range(3):
+            stats.add(make_trade(str(i), 100 * day + i * day))
+        assert len(stats.daily) == 2
+        assert stats.total_trades == 3
+
+
+class TestOrderTrackerStatistics:
+    """测试订单跟踪器与增量统计的联动"""
+
+    def test_statistics_follow_add_and_reload(self, temp_dir):
+        tracker = OrderTracker(data_dir=temp_dir)
+        for i in range(150):
+            tracker.add_trade(make_trade(str(i), float(i), profit=1.0 if i % 3 else -1.0))
+        stats = tracker.get_statistics()
+        assert stats['total_trades'] == 150  # 统计覆盖全部日志，而不仅是内存窗口
+        assert stats['win_rate'] == pytest.approx(100 / 150)
+        tracker.journal.close()
+
+        reloaded = OrderTracker(data_dir=temp_dir)
+        assert reloaded.get_statistics() == stats
+        reloaded.journal.close()
+
+    def test_upsert_correction_rebuilds_statistics(self, tracker):
+        tracker.add_trade(make_trade('1', 1.0, profit=-1.0))
+        tracker.upsert_trade(make_trade('1', 1.0, profit=2.0))
+        tracker.upsert_trade(make_trade('2', 2.0, profit=1.0))
+
+        assert tracker.stats.total_trades == 2
+        assert tracker.stats.wins == 2
+        assert tracker.stats.total_profit == pytest.approx(3.0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,86 @@
+"""
+账户级风控引擎测试
+"""
+import pytest
+import time
+
+from portfolio_risk import PortfolioRiskEngine
+
+
+@pytest.fixture
+def engine():
+    engine = PortfolioRiskEngine(max_exposure_ratio=0.9, max_asset_ratio=0.6)
+    engine.register('BNB/USDT')
+    engine.register('ETH/USDT')
+    engine.update_price('BNB/USDT', 500.0)
+    engine.update_price('ETH/USDT', 2000.0)
+    engine.update_balances(
+        {'total': {'BNB': 2.0, 'ETH': 0.5, 'USDT': 1000.0}},
+        {'USDT': 1000.0},
+        timestamp=time.time() - 1
+    )
+    return engine
+
+
+class TestPortfolioRiskEngine:
+    """测试敞口汇总、集中度与资金预留"""
+
+    def test_aggregates_exposure(self, engine):
+        assert engine.exposure == pytest.approx(2000.0)
+        assert engine.total_value == pytest.approx(4000.0)
+        assert engine.available_quote == pytest.approx(2000.0)
+
+    def test_reservations_prevent_overcommit(self, engine):
+        first = engine.try_reserve('ETH/USDT', 800.0)
+        second = engine.try_reserve('BNB/USDT', 800.0)
+        assert first is not None and second is not None
+        # 剩余可用 400，第三笔无法通过
+        assert engine.try_reserve('ETH/USDT', 500.0) is None
+        engine.release(first)
+        engine.release(first)  # 重复释放无副作用
+        assert engine.available_quote == pytest.approx(1200.0)
+        assert engine.metrics['rejected'] == 1
+
+    def test_concentration_and_exposure_limits(self, engine):
+        # BNB 已占 25%，再买 1500 将达 62.5% > 60%
+        allowed, reason = engine.check_spend('BNB/USDT', 1500.0)
+        assert not allowed and 'BNB' in reason
+        engine.max_asset_ratio = 1.0
+        # 总敞口 (2000 + 1700) / 4000 = 92.5% > 90%
+        allowed, reason = engine.check_spend('BNB/USDT', 1700.0)
+        assert not allowed and '敞口' in reason
+
+    def test_fill_updates_incrementally(self, engine):
+        engine.on_fill('BNB/USDT', {'timestamp': time.time(), 'side': 'buy', 'price': 500.0, 'amount': 1.0})
+        assert engine.balances['BNB'] == pytest.approx(3.0)
+        assert engine.balances['USDT'] == pytest.approx(1500.0)
+        assert engine.exposure == pytest.approx(2500.0)
+        assert engine.total_value == pytest.approx(4000.0)
+
+        engine.update_price('BNB/USDT', 600.0)
+        assert engine.exposure == pytest.approx(2800.0)
+
+    def test_fill_before_balance_snapshot_is_ignored(self, engine):
+        engine.on_fill('BNB/USDT', {'timestamp': time.time() - 60, 'side': 'buy', 'price': 500.0, 'amount': 1.0})
+        assert engine.balances['BNB'] == pytest.approx(2.0)
+
+    def test_cached_snapshot_does_not_undo_fill(self, engine):
+        spot = {'total': {'BNB': 2.0, 'ETH': 0.5, 'USDT': 1000.0}}
+        snapshot_at = engine._balances_at
+        engine.on_fill('BNB/USDT', {'timestamp': time.time(), 'side': 'buy', 'price': 500.0, 'amount': 1.0})
+
+        # 下一轮仍拿到同一份缓存余额：不能把已花掉的 500 USDT 加回来
+        assert not engine.update_balances(spot, {'USDT': 1000.0}, timestamp=snapshot_at)
+        assert engine.balances['USDT'] == pytest.approx(1500.0)
+        allowed, reason = engine.check_spend('ETH/USDT', 1600.0)
+        assert not allowed and '不足' in reason
+        assert engine.try_reserve('ETH/USDT', 1600.0) is None
+
+        # 成交之后的新快照照常采用
+        assert engine.update_balances({'total': {'BNB': 3.0, 'ETH': 0.5, 'USDT': 500.0}}, {'USDT': 1000.0},
+                                      timestamp=time.time() + 1)
+        assert engine.balances['USDT'] == pytest.approx(1500.0)
+
+    def test_rejects_mixed_quote_currencies(self, engine):
+        with pytest.raises(ValueError):
+            engine.register('BTC/FDUSD')
@@ -1,11 +1,13 @@
 """
 精细化风控机制测试
 """
+import time
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
 
-from risk_manager import AdvancedRiskManager, RiskState
-from config import TradingConfig
+from risk_manager import AdvancedRiskManager, RiskState, MarketSnapshot
+from config import TradingConfig, settings
+from clock import VirtualClock, system_clock
 
 
 @pytest.fixture
@@ -14,6 +16,7 @@ def mock_trader():
     trader = MagicMock()
     trader.config = TradingConfig()
     trader.logger = MagicMock()
+    trader.clock = system_clock
     return trader
 
 
@@ -196,5 +199,61 @@ class TestRiskStateIntegration:
         assert str(RiskState.ALLOW_BUY_ONLY) == "RiskState.ALLOW_BUY_ONLY"
 
 
+
+class TestSnapshotEvaluation:
+    """测试基于不可变快照的同步风控判断"""
+
+    @pytest.fixture
+    def snapshot_risk_manager(self, mock_trader):
+        mock_trader.base_asset = 'BNB'
+        mock_trader.quote_asset = 'USDT'
+        mock_trader._get_latest_price = AsyncMock(side_effect=AssertionError("不应访问行情"))
+        rm = AdvancedRiskManager(mock_trader)
+        rm.logger = MagicMock()
+        return rm
+
+    def _snapshot(self, bnb, usdt, price=600.0, timestamp=None):
+        return MarketSnapshot.capture('BNB/USDT', price, {'free': {'BNB': bnb, 'USDT': usdt}},
+                                      {'BNB': 0.0, 'USDT': 0.0}, timestamp)
+
+    def test_evaluate_uses_snapshot_only(self, snapshot_risk_manager):
+        snapshot = self._snapshot(bnb=1.0, usdt=600.0)
+        assert snapshot_risk_manager.position_ratio(snapshot) == pytest.approx(0.5)
+        assert snapshot_risk_manager.evaluate(snapshot) == RiskState.ALLOW_ALL
+        assert snapshot_risk_manager.evaluate(self._snapshot(bnb=10.0, usdt=100.0)) == RiskState.ALLOW_SELL_ONLY
+        assert snapshot_risk_manager.evaluate(self._snapshot(bnb=0.01, usdt=1000.0)) == RiskState.ALLOW_BUY_ONLY
+
+    def test_stale_snapshot_blocks_all(self, snapshot_risk_manager):
+        snapshot = self._snapshot(bnb=1.0, usdt=600.0, timestamp=time.time() - settings.RISK_SNAPSHOT_MAX_AGE - 1)
+        state = snapshot_risk_manager.evaluate(snapshot)
+        assert state == RiskState.BLOCK_ALL
+        assert not state.allows_buy and not state.allows_sell
+        snapshot_risk_manager.logger.warning.assert_called_once()
+
+    def test_cached_balance_within_ttl_is_not_stale(self, snapshot_risk_manager):
+        clock = VirtualClock(start=1_700_000_000)
+        snapshot_risk_manager.trader.clock = clock
+        # 余额缓存在有效期末尾被复用，再加上本轮行情请求与计算的耗时
+        snapshot = self._snapshot(bnb=1.0, usdt=600.0, timestamp=clock.time())
+        clock.advance(settings.BALANCE_CACHE_TTL - 0.1 + 5)
+        assert snapshot_risk_manager.evaluate(snapshot) is not RiskState.BLOCK_ALL
+        clock.advance(settings.RISK_SNAPSHOT_MAX_AGE)
+        assert snapshot_risk_manager.evaluate(snapshot) is RiskState.BLOCK_ALL
+
+    def test_capture_and_age_use_injected_clock(self):
+        clock = VirtualClock(start=1_000.0)
+        snapshot = MarketSnapshot.capture('BNB/USDT', 600.0, {}, {}, clock=clock)
+        assert snapshot.timestamp == 1_000.0
+        clock.advance(12)
+        assert snapshot.age(clock=clock) == 12
+
+    def test_snapshot_is_immutable(self):
+        snapshot = self._snapshot(bnb=1.0, usdt=600.0)
+        with pytest.raises(Exception):
+            snapshot.price = 1.0
+        with pytest.raises(TypeError):
+            snapshot.spot_balance['free'] = {}
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
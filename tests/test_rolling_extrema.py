@@ -0,0 +1,72 @@
+"""
+滚动高低点测试
+"""
+import pytest
+import random
+import tempfile
+from unittest.mock import AsyncMock
+
+from rolling_extrema import MonotonicWindow, RollingExtrema, DAY_MS
+from state_persistence import state_persistence
+
+
+def make_klines(start_day, days):
+    """生成日线数据 [开盘时间, open, high, low, close, volume]"""
+    rng = random.Random(start_day)
+    klines = []
+    for i in range(days):
+        high = 500 + rng.random() * 100
+        klines.append([(start_day + i) * DAY_MS, 0, high, high - rng.random() * 50, 0, 0])
+    return klines
+
+
+class TestRollingExtrema:
+    """测试单调队列窗口与增量同步"""
+
+    def test_monotonic_window_matches_brute_force(self):
+        rng = random.Random(1)
+        values = [rng.random() for _ in range(500)]
+        window = MonotonicWindow(52)
+        for i, v in enumerate(values):
+            window.push(v, v)
+            recent = values[max(0, i - 51):i + 1]
+            assert window.high == max(recent)
+            assert window.low == min(recent)
+
+    @pytest.mark.asyncio
+    async def test_sync_fetches_only_missing_and_persists(self):
+        klines = make_klines(19000, 130)
+        now_ms = 19129 * DAY_MS + 3600 * 1000  # 最后一根是当日未收盘K线
+        exchange = AsyncMock()
+        exchange.fetch_ohlcv = AsyncMock(side_effect=lambda symbol, timeframe, limit: klines[-limit:])
+
+        with tempfile.TemporaryDirectory() as d:
+            extrema = RollingExtrema('BNB/USDT', (20, 52, 100), data_dir=d)
+            assert await extrema.sync(exchange, now_ms) == 100
+            closed = klines[:-1]
+            for n in (20, 52, 100):
+                assert extrema.levels(n) == (max(k[2] for k in closed[-n:]), min(k[3] for k in closed[-n:]))
+
+            # 同一天内再次同步不访问交易所
+            exchange.fetch_ohlcv.reset_mock()
+            assert await extrema.sync(exchange, now_ms) == 0
+            exchange.fetch_ohlcv.assert_not_called()
+
+            # 重启后恢复，并在下一个收盘后只补拉缺失的日线
+            await state_persistence.flush()
+            restored = RollingExtrema('BNB/USDT', (20, 52, 100), data_dir=d)
+            assert restored.load()
+            assert restored.levels(52) == extrema.levels(52)
+            klines[-1][2] = 700.0  # 第19129日收盘，成为新的最高价
+            klines.append([19130 * DAY_MS, 0, 900.0, 400.0, 0, 0])  # 新的未收盘K线不计入
+            assert await restored.sync(exchange, now_ms + DAY_MS) == 1
+            assert exchange.fetch_ohlcv.call_args.kwargs['limit'] == 3
+            assert restored.levels(20)[0] == 700.0
+
+    def test_levels_require_full_window(self):
+        with tempfile.TemporaryDirectory() as d:
+            extrema = RollingExtrema('BNB/USDT', (20, 52), data_dir=d)
+            for k in make_klines(19000, 30):
+                extrema.add_candle(k[0], k[2], k[3])
+            assert extrema.levels(20) is not None
+            assert extrema.levels(52) is None
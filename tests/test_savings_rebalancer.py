@@ -0,0 +1,112 @@
+"""
+现货/理财再平衡服务测试
+"""
+import pytest
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from config import settings
+from exchange_simulator import SimulatedExchange, create_client
+from savings_rebalancer import SavingsRebalancer
+
+
+def make_trader(symbol, exchange, price, order_quote):
+    base, quote = symbol.split('/')
+    return SimpleNamespace(
+        symbol=symbol, base_asset=base, quote_asset=quote, exchange=exchange, current_price=price,
+        _calculate_order_amount=AsyncMock(return_value=order_quote),
+        order_tracker=SimpleNamespace(add_listener=lambda callback: None)
+    )
+
+
+@pytest.fixture
+def exchange():
+    exchange = SimpleNamespace(
+        fetch_balance=AsyncMock(return_value={'free': {'USDT': 1000.0, 'BNB': 1.0, 'ETH': 0.02}}),
+        fetch_funding_balance=AsyncMock(return_value={'USDT': 5000.0, 'BNB': 10.0, 'ETH': 5.0}),
+        transfer_to_savings=AsyncMock(),
+        transfer_to_spot=AsyncMock()
+    )
+    # 与 ExchangeClient.batch_transfer 相同的语义：并发执行并逐项返回结果
+    async def batch_transfer(transfers):
+        return await asyncio.gather(*[
+            (exchange.transfer_to_savings if direction == 'subscribe' else exchange.transfer_to_spot)(asset, amount)
+            for asset, direction, amount in transfers
+        ], return_exceptions=True)
+
+    exchange.batch_transfer = batch_transfer
+    return exchange
+
+
+@pytest.fixture
+def rebalancer(exchange):
+    rebalancer = SavingsRebalancer(exchange, debounce=0.05, upper_band=0.5, lower_band=0.3, buffer_trades=2)
+    rebalancer.register(make_trader('BNB/USDT', exchange, 500.0, 100.0))
+    rebalancer.register(make_trader('ETH/USDT', exchange, 2000.0, 200.0))
+    return rebalancer
+
+
+class TestSavingsRebalancer:
+    """测试净额目标、滞回区间与去抖"""
+
+    @pytest.mark.asyncio
+    async def test_targets_are_netted_across_traders(self, rebalancer):
+        targets = await rebalancer.spot_targets()
+        assert targets['USDT'] == pytest.approx(600.0)  # (100 + 200) × 2
+        assert targets['BNB'] == pytest.approx(0.4)
+        assert targets['ETH'] == pytest.approx(0.2)
+
+    @pytest.mark.asyncio
+    async def test_plan_respects_hysteresis(self, rebalancer, exchange):
+        transfers = await rebalancer.rebalance()
+        plan = {asset: (direction, amount) for asset, direction, amount in transfers}
+        # USDT 1000 > 600 × 1.5 => 申购到目标
+        assert plan['USDT'] == ('subscribe', pytest.approx(400.0))
+        # BNB 1.0 > 0.4 × 1.5 => 申购 0.6 (高于最小申购额)
+        assert plan['BNB'][0] == 'subscribe'
+        # ETH 0.02 < 0.2 × 0.7 => 赎回到目标
+        assert plan['ETH'] == ('redeem', pytest.approx(0.18))
+        assert exchange.transfer_to_savings.await_count == 2
+        exchange.transfer_to_spot.assert_awaited_once()
+
+        # 在区间内时不划转
+        exchange.fetch_balance.return_value = {'free': {'USDT': 700.0, 'BNB': 0.45, 'ETH': 0.18}}
+        assert await rebalancer.rebalance() == []
+
+    @pytest.mark.asyncio
+    async def test_requests_are_debounced(self, rebalancer, exchange):
+        for _ in range(10):
+            assert rebalancer.request()
+        await asyncio.sleep(0.15)
+        await rebalancer.stop()
+        assert rebalancer.metrics['requests'] == 10
+        assert rebalancer.metrics['runs'] == 1
+        exchange.fetch_balance.assert_awaited_once()
+
+
+class TestRebalancerOwnership:
+    """测试再平衡服务按交易所客户端隔离"""
+
+    def test_each_client_owns_its_rebalancer(self):
+        first = create_client(SimulatedExchange(prices={'BNB/USDT': 600.0}))
+        second = create_client(SimulatedExchange(prices={'BNB/USDT': 600.0}))
+        assert first.savings_rebalancer is not second.savings_rebalancer
+        assert first.savings_rebalancer.exchange is first
+
+        trader = make_trader('BNB/USDT', second, 600.0, 100.0)
+        second.savings_rebalancer.register(trader)
+        with pytest.raises(ValueError):
+            first.savings_rebalancer.register(trader)
+        assert list(second.savings_rebalancer.traders) == ['BNB/USDT']
+        assert first.savings_rebalancer.traders == {}
+
+    @pytest.mark.asyncio
+    async def test_client_close_stops_rebalancer(self):
+        client = create_client(SimulatedExchange(prices={'BNB/USDT': 600.0}))
+        with patch.object(settings, 'ENABLE_SAVINGS_FUNCTION', True):
+            assert client.savings_rebalancer.request()
+        task = client.savings_rebalancer._task
+        await client.close()
+        assert task.cancelled()
+        assert client.savings_rebalancer._task is None
@@ -0,0 +1,85 @@
+"""
+异步状态持久化服务测试
+"""
+import pytest
+import json
+import os
+import tempfile
+
+from state_persistence import StatePersistenceService, write_json_atomic
+
+
+@pytest.fixture
+def temp_dir():
+    with tempfile.TemporaryDirectory() as d:
+        yield d
+
+
+class TestWriteJsonAtomic:
+    """测试原子写入"""
+
+    def test_write_and_overwrite(self, temp_dir):
+        path = os.path.join(temp_dir, 'sub', 'state.json')
+        write_json_atomic(path, {'a': 1})
+        write_json_atomic(path, {'a': 2}, fsync=True)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f) == {'a': 2}
+        # 不应残留临时文件
+        assert not os.path.exists(path + '.tmp')
+
+
+class TestStatePersistenceService:
+    """测试写回服务"""
+
+    def test_submit_without_loop_returns_false(self, temp_dir):
+        service = StatePersistenceService(flush_interval=0)
+        assert service.submit(os.path.join(temp_dir, 'state.json'), {'a': 1}) is False
+
+    @pytest.mark.asyncio
+    async def test_coalesces_successive_snapshots(self, temp_dir):
+        service = StatePersistenceService(flush_interval=0.05)
+        path = os.path.join(temp_dir, 'state.json')
+
+        for i in range(5):
+            assert service.submit(path, {'base_price': i})
+        await service.stop()
+
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f) == {'base_price': 4}
+        metrics = service.get_metrics()
+        assert metrics['submitted'] == 5
+        assert metrics['coalesced'] == 4
+        assert metrics['writes'] == 1
+        assert metrics['pending'] == 0
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_decoupled_from_caller(self, temp_dir):
+        service = StatePersistenceService(flush_interval=0.05)
+        path = os.path.join(temp_dir, 'state.json')
+
+        state = {'base_price': 600.0}
+        service.submit(path, state)
+        state['base_price'] = 0  # 提交后修改原字典不应影响待写快照
+        await service.flush()
+
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f)['base_price'] == 600.0
+        await service.stop()
+
+    @pytest.mark.asyncio
+    async def test_write_failure_is_counted(self, temp_dir):
+        service = StatePersistenceService(flush_interval=0)
+        blocker = os.path.join(temp_dir, 'file')
+        open(blocker, 'w').close()
+
+        # 父路径是普通文件，写入必然失败
+        service.submit(os.path.join(blocker, 'state.json'), {'a': 1})
+        await service.stop()
+
+        assert service.get_metrics()['failures'] == 1
+        assert service.get_metrics()['writes'] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
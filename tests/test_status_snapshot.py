@@ -0,0 +1,171 @@
+"""
+状态快照服务测试
+"""
+import asyncio
+import json
+import pytest
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from clock import VirtualClock
+from risk_manager import MarketSnapshot
+from status_snapshot import StatusSnapshotService
+from web_server import handle_status
+
+
+def make_trader():
+    exchange = SimpleNamespace(
+        fetch_balance=AsyncMock(return_value={'total': {'USDT': 100.0, 'BNB': 1.0}}),
+        fetch_funding_balance=AsyncMock(return_value={'USDT': 50.0}),
+        calculate_total_account_value=AsyncMock(return_value=750.0),
+    )
+    return SimpleNamespace(
+        symbol='BNB/USDT', base_asset='BNB', quote_asset='USDT',
+        exchange=exchange,
+        position_controller_s1=None,
+        grid_size=2.0, base_price=600.0,
+        _get_upper_band=MagicMock(return_value=612.0),
+        _get_lower_band=MagicMock(return_value=588.0),
+        _get_latest_price=AsyncMock(return_value=601.0),
+        _calculate_order_amount=AsyncMock(return_value=75.0),
+        risk_manager=SimpleNamespace(position_ratio=MagicMock(return_value=0.4)),
+        market_snapshot=None,
+        start_time=time.time(),
+        last_trade_price=None, last_trade_time=None,
+        order_tracker=SimpleNamespace(get_trade_history=lambda: []),
+        state_version=0,
+    )
+
+
+class TestStatusSnapshotService:
+    """测试快照的构建与失效"""
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_only_on_version_change_or_age(self):
+        trader = make_trader()
+        service = StatusSnapshotService({'BNB/USDT': trader}, refresh_interval=60)
+        await service.get('BNB/USDT')
+        assert not service._is_stale('BNB/USDT', time.time())
+
+        # 重复读取不访问交易所
+        await service.get('BNB/USDT')
+        assert trader.exchange.fetch_balance.await_count == 1
+
+        trader.state_version += 1
+        assert service._is_stale('BNB/USDT', time.time())
+        assert service._is_stale('BNB/USDT', time.time() + 61)
+        second = await service.refresh('BNB/USDT')
+        assert second['version'] == 1
+
+    @pytest.mark.asyncio
+    async def test_snapshot_age_follows_injected_clock(self):
+        clock = VirtualClock(start=1_700_000_000)
+        service = StatusSnapshotService({'BNB/USDT': make_trader()}, refresh_interval=60, clock=clock)
+        snapshot = await service.refresh('BNB/USDT')
+        assert snapshot['built_at'] == 1_700_000_000
+        clock.advance(61)
+        assert service._is_stale('BNB/USDT', clock.time())
+
+    @pytest.mark.asyncio
+    async def test_etag_and_deltas_stable_as_time_passes(self):
+        clock = VirtualClock(start=1_700_000_000)
+        trader = make_trader()
+        trader.clock, trader.start_time = clock, clock.time()
+        broadcaster = MagicMock()
+        service = StatusSnapshotService({'BNB/USDT': trader}, broadcaster=broadcaster, clock=clock)
+        first = await service.refresh('BNB/USDT')
+        clock.advance(3600)
+        second = await service.refresh('BNB/USDT')
+        assert second['etag'] == first['etag']
+        assert second['data']['start_time'] == trader.start_time
+        broadcaster.publish.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_reuses_trader_context_without_fetching(self):
+        trader = make_trader()
+        trader.market_snapshot = MarketSnapshot.capture('BNB/USDT', 605.0, {'total': {'USDT': 10.0, 'BNB': 2.0}},
+                                                        {'USDT': 5.0}, timestamp=1.0)
+        snapshot = await StatusSnapshotService({'BNB/USDT': trader}).refresh('BNB/USDT')
+        assert snapshot['data']['current_price'] == 605.0
+        assert snapshot['data']['quote_balance'] == pytest.approx(15.0)
+        trader.exchange.fetch_balance.assert_not_awaited()
+        trader.exchange.fetch_funding_balance.assert_not_awaited()
+        trader._get_latest_price.assert_not_awaited()
+        trader._calculate_order_amount.assert_awaited_once_with('buy', trader.market_snapshot)
+
+    @pytest.mark.asyncio
+    async def test_background_refresh_only_with_subscribers(self):
+        trader = make_trader()
+        broadcaster = SimpleNamespace(has_subscribers=False, publish=MagicMock())
+        service = StatusSnapshotService({'BNB/USDT': trader}, broadcaster=broadcaster, poll_interval=0.01)
+        service.start()
+        await asyncio.sleep(0.05)
+        assert service.metrics['builds'] == 0
+        trader.exchange.calculate_total_account_value.assert_not_awaited()
+
+        broadcaster.has_subscribers = True
+        await asyncio.sleep(0.05)
+        await service.stop()
+        assert service.metrics['builds'] == 1
+
+    @pytest.mark.asyncio
+    async def test_get_rebuilds_stale_snapshot_on_request(self):
+        clock = VirtualClock(start=1_700_000_000)
+        trader = make_trader()
+        service = StatusSnapshotService({'BNB/USDT': trader}, refresh_interval=60, clock=clock)
+        first = await service.get('BNB/USDT')
+        assert await service.get('BNB/USDT') is first
+        clock.advance(61)
+        assert (await service.get('BNB/USDT'))['built_at'] == clock.time()
+        assert service.metrics['builds'] == 2
+
+    @pytest.mark.asyncio
+    async def test_failure_keeps_previous_snapshot(self):
+        trader = make_trader()
+        service = StatusSnapshotService({'BNB/USDT': trader})
+        good = await service.refresh('BNB/USDT')
+        trader.exchange.fetch_balance.side_effect = RuntimeError('boom')
+        assert await service.refresh('BNB/USDT') is good
+        assert service.metrics['failures'] == 1
+
+
+class TestStatusEndpoint(AioHTTPTestCase):
+    """测试 /api/status 的 ETag 支持"""
+
+    async def get_application(self):
+        self.trader = make_trader()
+        app = web.Application()
+        app['traders'] = {'BNB/USDT': self.trader}
+        app['status_service'] = StatusSnapshotService(app['traders'], refresh_interval=60)
+        app.router.add_get('/api/status', handle_status)
+        return app
+
+    async def test_etag_and_not_modified(self):
+        resp = await self.client.request("GET", "/api/status?symbol=BNB/USDT")
+        assert resp.status == 200
+        data = await resp.json()
+        assert data['position_percentage'] == pytest.approx(40.0)
+        assert data['quote_balance'] == pytest.approx(150.0)
+        etag = resp.headers['ETag']
+
+        resp = await self.client.request("GET", "/api/status", headers={'If-None-Match': etag})
+        assert resp.status == 304
+        assert self.trader.exchange.fetch_balance.await_count == 1
+
+    async def test_uptime_added_at_serve_time(self):
+        self.trader.start_time = time.time() - 90061
+        resp = await self.client.request("GET", "/api/status?symbol=BNB/USDT")
+        data = await resp.json()
+        assert data['uptime_seconds'] >= 90061
+        assert data['uptime'].startswith('1天 1小时 1分钟')
+        snapshot = self.app['status_service'].snapshots['BNB/USDT']
+        assert 'uptime' not in snapshot['data'] and 'uptime' not in json.loads(snapshot['body'])
+        assert resp.headers['ETag'] == snapshot['etag']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
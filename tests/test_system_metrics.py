@@ -0,0 +1,77 @@
+"""
+系统指标采样器测试
+"""
+import pytest
+import asyncio
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from system_metrics import SystemMetricsSampler
+from web_server import handle_system, get_system_stats
+
+
+class TestSystemMetricsSampler:
+    """测试后台采样与环形缓冲"""
+
+    def test_latest_is_non_blocking(self):
+        sampler = SystemMetricsSampler()
+        start = time.monotonic()
+        sample = sampler.latest()
+        assert time.monotonic() - start < 0.5
+        for key in ('cpu_percent', 'memory_percent', 'process_rss_mb', 'open_fds', 'loop_lag_ms'):
+            assert key in sample
+
+    @pytest.mark.asyncio
+    async def test_ring_buffer_and_loop_lag(self):
+        sampler = SystemMetricsSampler(interval=0.02, history_size=3)
+        sampler.start()
+        await asyncio.sleep(0.15)
+        await sampler.stop()
+
+        assert len(sampler.samples) == 3
+        assert sampler.history(2) == list(sampler.samples)[-2:]
+
+    @pytest.mark.asyncio
+    async def test_blocked_loop_reports_lag(self):
+        sampler = SystemMetricsSampler(interval=0.02, history_size=10)
+        sampler.start()
+        await asyncio.sleep(0.005)
+        time.sleep(0.1)  # 模拟阻塞事件循环
+        await asyncio.sleep(0.03)
+        await sampler.stop()
+        assert sampler.samples[0]['loop_lag_ms'] >= 50
+
+
+class TestSystemEndpoint(AioHTTPTestCase):
+    """测试 /api/system"""
+
+    async def get_application(self):
+        app = web.Application()
+        app['status_service'] = SimpleNamespace(metrics={'builds': 0})
+        app['broadcaster'] = SimpleNamespace(metrics={'published': 0})
+        shared = SimpleNamespace(get_metrics=lambda: {'requests': 2, 'runs': 1, 'pending': False})
+        other = SimpleNamespace(get_metrics=lambda: {'requests': 3, 'runs': 0, 'pending': True})
+        app['traders'] = {
+            'BNB/USDT': SimpleNamespace(savings_rebalancer=shared),
+            'ETH/USDT': SimpleNamespace(savings_rebalancer=shared),
+            'BTC/USDT': SimpleNamespace(savings_rebalancer=other),
+        }
+        app.router.add_get('/api/system', handle_system)
+        return app
+
+    async def test_system_endpoint(self):
+        resp = await self.client.request("GET", "/api/system?limit=5")
+        assert resp.status == 200
+        data = await resp.json()
+        assert 'latest' in data and 'history' in data
+        assert 'state_persistence' in data['components']
+        # 共享同一交易所客户端的交易对只统计一次
+        assert data['components']['savings_rebalancer'] == {'requests': 5, 'runs': 1, 'pending': True}
+        assert set(get_system_stats()) == {'cpu_percent', 'memory_used', 'memory_total', 'memory_percent'}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
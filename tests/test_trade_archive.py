@@ -0,0 +1,74 @@
+"""
+列式成交归档测试
+"""
+import pytest
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from trade_archive import TradeArchive
+
+
+@pytest.fixture
+def archive_dir():
+    with tempfile.TemporaryDirectory() as d:
+        yield d
+
+
+def ts(year, month, day):
+    return datetime(year, month, day, 12).timestamp()
+
+
+def make_trade(order_id, timestamp, price=600.0, side='buy', profit=0.0):
+    return {'order_id': order_id, 'timestamp': timestamp, 'side': side, 'price': price, 'amount': 0.1, 'profit': profit}
+
+
+class TestTradeArchive:
+    """测试列式归档的追加、懒合并与范围查询"""
+
+    def test_append_writes_monthly_parts_and_merges_lazily(self, archive_dir):
+        archive = TradeArchive(archive_dir)
+        archive.append([make_trade('1', ts(2024, 1, 5)), make_trade('2', ts(2024, 2, 5))])
+        archive.append([make_trade('3', ts(2024, 1, 20))])
+
+        files = sorted(os.listdir(archive_dir))
+        assert files == ['trades_202401.part0001.npy', 'trades_202401.part0002.npy', 'trades_202402.part0001.npy']
+
+        jan = archive.query(ts(2024, 1, 1), ts(2024, 2, 1))
+        assert [o.decode() for o in jan['order_id']] == ['1', '3']
+        assert isinstance(jan, np.memmap)
+        assert 'trades_202401.npy' in os.listdir(archive_dir)
+        assert 'trades_202401.part0001.npy' not in os.listdir(archive_dir)
+
+    def test_range_query_across_months(self, archive_dir):
+        archive = TradeArchive(archive_dir)
+        archive.append([make_trade(str(d), ts(2024, 1 + d % 3, 1 + d)) for d in range(20)])
+
+        result = archive.query(ts(2024, 1, 10), ts(2024, 3, 15))
+        assert np.all(result['timestamp'] >= ts(2024, 1, 10))
+        assert np.all(result['timestamp'] < ts(2024, 3, 15))
+        assert len(result) == len([d for d in range(20) if ts(2024, 1, 10) <= ts(2024, 1 + d % 3, 1 + d) < ts(2024, 3, 15)])
+        assert len(archive.query()) == 20
+
+    def test_merge_dedupes_by_order_id(self, archive_dir):
+        archive = TradeArchive(archive_dir)
+        archive.append([make_trade('1', ts(2024, 1, 5), price=600.0)])
+        archive.append([make_trade('1', ts(2024, 1, 5), price=610.0)])
+
+        records = TradeArchive.to_records(archive.query())
+        assert len(records) == 1
+        assert records[0]['price'] == 610.0
+
+    def test_prune_old_months(self, archive_dir):
+        archive = TradeArchive(archive_dir)
+        archive.append([make_trade('old', ts(2023, 1, 5))])
+        archive.append([make_trade('new', ts(2024, 1, 5))])
+
+        archive.prune(1)
+        assert archive.months() == ['202401']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
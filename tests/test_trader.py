@@ -10,7 +10,11 @@ import tempfile
 
 # 导入被测试的模块
 from trader import GridTrader
-from config import TradingConfig
+from config import TradingConfig, settings
+from clock import VirtualClock
+from exchange_simulator import SimulatedExchange, create_client
+from portfolio_risk import PortfolioRiskEngine
+from risk_manager import RiskState
 
 
 @pytest.fixture
@@ -179,5 +183,148 @@ class TestConfigValidation:
         assert config.GRID_PARAMS['min'] <= config.GRID_PARAMS['max']
 
 
+
+def make_counting_exchange(mock_exchange, price=600.0):
+    """在模拟交易所上挂接可计数的异步接口"""
+    klines = [[i * 4 * 3600 * 1000, price, price * 1.01, price * 0.99, price * (1 + 0.001 * (i % 3)), 100.0]
+              for i in range(42)]
+    mock_exchange.fetch_ticker = AsyncMock(return_value={'last': price, 'bid': price - 0.1, 'ask': price + 0.1})
+    mock_exchange.fetch_balance = AsyncMock(return_value={
+        'free': {'BNB': 1.0, 'USDT': 600.0}, 'used': {}, 'total': {'BNB': 1.0, 'USDT': 600.0}
+    })
+    mock_exchange.fetch_funding_balance = AsyncMock(return_value={})
+    mock_exchange.balance_timestamps = MagicMock(side_effect=lambda: (time.time(), time.time()))
+    mock_exchange.fetch_ohlcv = AsyncMock(return_value=klines)
+    mock_exchange.fetch_order_book = AsyncMock(return_value={'asks': [[price + 0.1, 1]], 'bids': [[price - 0.1, 1]]})
+    return mock_exchange
+
+
+@pytest.fixture
+def context_trader(mock_exchange, mock_config):
+    """使用真实风控的交易器，S1 为可等待的模拟对象"""
+    make_counting_exchange(mock_exchange)
+    with patch('trader.OrderTracker'), \
+         patch('trader.TradingMonitor'), \
+         patch('trader.PositionControllerS1') as s1_cls:
+        s1 = s1_cls.return_value
+        s1.update_daily_s1_levels = AsyncMock()
+        s1.check_and_execute = AsyncMock()
+        s1.extrema.all_levels.return_value = {20: (650.0, 550.0)}
+        trader = GridTrader(mock_exchange, mock_config, 'BNB/USDT')
+        trader.initialized = True
+        trader.base_price = 600.0
+        trader.grid_size = 2.0
+        trader.amount_precision = 3
+        trader.price_precision = 2
+        return trader
+
+
+class TestDecisionContext:
+    """测试每轮决策上下文：同一轮内每类数据只向交易所请求一次"""
+
+    @pytest.mark.asyncio
+    async def test_exchange_calls_per_iteration(self, context_trader):
+        exchange = context_trader.exchange
+        assert await context_trader._run_iteration() is True
+
+        assert exchange.fetch_ticker.await_count == 1
+        assert exchange.fetch_balance.await_count == 1
+        assert exchange.fetch_funding_balance.await_count == 1
+        assert exchange.fetch_ohlcv.await_count == 1
+        assert exchange.fetch_order_book.await_count == 0
+
+        # S1 收到的是同一份上下文
+        context = context_trader.position_controller_s1.check_and_execute.await_args.args[1]
+        assert context is context_trader.market_snapshot
+        assert context.ask == 600.1 and context.bid == 599.9
+        assert context.s1_levels[20] == (650.0, 550.0)
+        assert len(context.klines) == 42
+
+    @pytest.mark.asyncio
+    async def test_klines_fetched_once_per_4h_candle(self, context_trader):
+        exchange = context_trader.exchange
+        await context_trader._run_iteration()
+        exchange.fetch_ticker.return_value = {'last': 610.0, 'bid': 609.9, 'ask': 610.1}
+        await context_trader._run_iteration()
+
+        assert exchange.fetch_ticker.await_count == 2
+        assert exchange.fetch_ohlcv.await_count == 1
+        # 未收盘K线用最新价更新
+        last = context_trader.market_snapshot.klines[-1]
+        assert last[4] == 610.0 and last[2] == 610.0
+
+    @pytest.mark.asyncio
+    async def test_order_sizing_uses_context(self, context_trader):
+        exchange = context_trader.exchange
+        context = await context_trader._build_context()
+        calls = exchange.fetch_balance.await_count
+
+        amount = await context_trader._calculate_order_amount('buy', context)
+
+        assert amount == pytest.approx((600.0 + 1.0 * 600.0) * 0.1)
+        assert exchange.fetch_balance.await_count == calls
+        assert context.order_price('buy') == 600.1
+        assert context.order_price('sell') == 599.9
+
+    @pytest.mark.asyncio
+    async def test_ticker_failure_skips_iteration(self, context_trader):
+        context_trader.exchange.fetch_ticker.side_effect = Exception('timeout')
+
+        assert await context_trader._build_context() is None
+        assert await context_trader._run_iteration() is False
+        context_trader.position_controller_s1.check_and_execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_stale_cached_balance_trips_freshness_guard(self, mock_config):
+        clock = VirtualClock(start=1_700_000_000)
+        simulator = SimulatedExchange(prices={'BNB/USDT': 600.0}, balances={'BNB': 1.0, 'USDT': 600.0},
+                                      funding={'USDT': 100.0}, clock=clock.time)
+        with patch('trader.OrderTracker'), \
+             patch('trader.TradingMonitor'), \
+             patch('trader.PositionControllerS1') as s1_cls:
+            s1_cls.return_value.extrema.all_levels.return_value = {}
+            trader = GridTrader(create_client(simulator, clock=clock), mock_config, 'BNB/USDT', clock=clock)
+        trader.base_price = 600.0
+
+        fresh = await trader._build_context()
+        assert fresh.timestamp == clock.time()
+        assert trader.risk_manager.evaluate(fresh, clock.time()) is not RiskState.BLOCK_ALL
+
+        # 余额刷新失败：客户端返回空余额且缓存时间不变，快照时间停留在上一次成功获取余额的时刻
+        simulator.fetch_balance = AsyncMock(side_effect=Exception('timeout'))
+        clock.advance(settings.RISK_SNAPSHOT_MAX_AGE + 5)
+        stale = await trader._build_context()
+
+        assert stale.timestamp == fresh.timestamp
+        assert trader.risk_manager.evaluate(stale, clock.time()) is RiskState.BLOCK_ALL
+
+    @pytest.mark.asyncio
+    async def test_fill_survives_cached_balance_refresh(self, mock_config):
+        clock = VirtualClock(start=1_700_000_000)
+        simulator = SimulatedExchange(prices={'BNB/USDT': 600.0}, balances={'BNB': 1.0, 'USDT': 600.0},
+                                      funding={'USDT': 100.0}, clock=clock.time)
+        with patch('trader.OrderTracker'), \
+             patch('trader.TradingMonitor'), \
+             patch('trader.PositionControllerS1') as s1_cls:
+            s1_cls.return_value.extrema.all_levels.return_value = {}
+            trader = GridTrader(create_client(simulator, clock=clock), mock_config, 'BNB/USDT', clock=clock)
+        trader.base_price = 600.0
+        trader.portfolio_risk = PortfolioRiskEngine(max_exposure_ratio=1.0, max_asset_ratio=1.0)
+        trader.portfolio_risk.register('BNB/USDT')
+
+        trader._apply_context(await trader._build_context())
+        assert trader.portfolio_risk.available_quote == pytest.approx(700.0)
+
+        clock.advance(1)
+        fill = {'timestamp': clock.time(), 'side': 'buy', 'price': 600.0, 'amount': 0.5, 'order_id': '1'}
+        trader.portfolio_risk.on_fill('BNB/USDT', fill)
+        trader.exchange.on_fill('BNB/USDT', fill)
+
+        # 余额缓存仍在有效期内，下一轮拿到的是同一份快照
+        trader._apply_context(await trader._build_context())
+        assert trader.portfolio_risk.available_quote == pytest.approx(400.0)
+        assert trader.portfolio_risk.try_reserve('BNB/USDT', 500.0) is None
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
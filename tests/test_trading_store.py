@@ -0,0 +1,261 @@
+"""
+SQLite统一存储测试
+"""
+import pytest
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from clock import VirtualClock
+from config import TradingConfig
+from order_tracker import OrderTracker
+from trade_archive import TradeArchive
+from trade_journal import TradeJournal
+from trader import GridTrader
+from trading_store import TradingStore, migrate_json_to_store
+
+
+@pytest.fixture
+def temp_dir():
+    with tempfile.TemporaryDirectory() as d:
+        yield d
+
+
+@pytest.fixture
+def store(temp_dir):
+    s = TradingStore(db_path=os.path.join(temp_dir, 'trading.db'), batch_size=1000)
+    yield s
+    s._conn.close()
+
+
+def make_trade(order_id, ts, side='buy', price=600.0, amount=0.1, profit=0):
+    return {'order_id': order_id, 'timestamp': ts, 'side': side, 'price': price, 'amount': amount, 'profit': profit}
+
+
+class TestTradingStore:
+    """测试存储读写"""
+
+    def test_wal_mode_enabled(self, store):
+        mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode.lower() == 'wal'
+
+    def test_writes_are_buffered_until_flush(self, store):
+        store.record_trade('BNB/USDT', make_trade('1', 1000.0))
+        assert len(store._pending) == 1
+
+        assert store.flush() == 1
+        assert store._pending == []
+        assert store.count_trades('BNB/USDT') == 1
+
+    def test_trade_upsert_by_order_id(self, store):
+        store.record_trade('BNB/USDT', make_trade('1', 1000.0, price=600.0))
+        store.record_trade('BNB/USDT', make_trade('1', 1000.0, price=610.0))
+        store.record_trade('ETH/USDT', make_trade('1', 1000.0, price=3000.0))
+
+        assert store.count_trades('BNB/USDT') == 1
+        assert store.count_trades() == 2
+        assert store.query_trades('BNB/USDT')[0]['price'] == 610.0
+
+    def test_query_trades_by_time_range(self, store):
+        for i in range(10):
+            store.record_trade('BNB/USDT', make_trade(str(i), 1000.0 + i))
+
+        trades = store.query_trades('BNB/USDT', since=1003.0, until=1007.0)
+        assert [t['order_id'] for t in trades] == ['3', '4', '5', '6']
+
+        limited = store.query_trades('BNB/USDT', since=1000.0, limit=2)
+        assert [t['order_id'] for t in limited] == ['0', '1']
+
+    def test_state_orders_and_equity(self, store):
+        store.save_state('BNB/USDT', {'base_price': 600.0})
+        store.save_state('BNB/USDT', {'base_price': 610.0})
+        assert store.load_state('BNB/USDT') == {'base_price': 610.0}
+        assert store.load_state('ETH/USDT') is None
+
+        store.record_order('BNB/USDT', {'id': 'A1', 'side': 'buy', 'type': 'limit',
+                                        'price': 600.0, 'amount': 0.1, 'status': 'open'})
+        store.update_order_status('A1', 'closed', 1.5)
+        order = store.get_order('A1')
+        assert order['status'] == 'closed'
+        assert order['profit'] == 1.5
+
+        store.record_equity('BNB/USDT', 1000.0, timestamp=1.0)
+        store.record_equity('BNB/USDT', 1010.0, timestamp=2.0)
+        assert [e['value'] for e in store.query_equity('BNB/USDT', since=2.0)] == [1010.0]
+
+    def test_default_timestamps_follow_injected_clock(self, temp_dir):
+        clock = VirtualClock(start=1_700_000_000)
+        s = TradingStore(db_path=os.path.join(temp_dir, 'clock.db'), clock=clock)
+        s.record_order('BNB/USDT', {'id': 'A1', 'side': 'buy', 'price': 600.0, 'amount': 0.1, 'status': 'open'})
+        clock.advance(30)
+        s.update_order_status('A1', 'closed')
+        s.record_equity('BNB/USDT', 1000.0)
+        order = s.get_order('A1')
+        assert (order['created_at'], order['updated_at']) == (1_700_000_000, 1_700_000_030)
+        assert [e['timestamp'] for e in s.query_equity('BNB/USDT')] == [1_700_000_030]
+        s._conn.close()
+
+    @pytest.mark.asyncio
+    async def test_background_flush_and_close(self, temp_dir):
+        s = TradingStore(db_path=os.path.join(temp_dir, 'bg.db'))
+        s.start(interval=0.01)
+        s.record_trade('BNB/USDT', make_trade('1', 1000.0))
+        await s.close()
+
+        reopened = TradingStore(db_path=os.path.join(temp_dir, 'bg.db'))
+        assert reopened.count_trades('BNB/USDT') == 1
+        reopened._conn.close()
+
+    def test_overflow_flush_runs_on_writer_thread(self, temp_dir):
+        s = TradingStore(db_path=os.path.join(temp_dir, 'overflow.db'), batch_size=2)
+        writers = []
+        original = s.flush
+
+        def flush():
+            writers.append(threading.current_thread().name)
+            return original()
+
+        s.flush = flush
+        s.record_trade('BNB/USDT', make_trade('1', 1000.0))
+        s.record_trade('BNB/USDT', make_trade('2', 1001.0))  # 缓冲区满，提交交给写线程
+        s._executor.submit(lambda: None).result()
+
+        assert writers and all(name.startswith('sqlite-writer') for name in writers)
+        assert s._pending == []
+        assert s.count_trades('BNB/USDT') == 2
+        s._conn.close()
+
+    @pytest.mark.asyncio
+    async def test_enqueue_does_not_wait_for_commit(self, store):
+        class SlowConnection:
+            """executemany 耗时 0.3 秒的连接代理，模拟慢速磁盘提交"""
+            def __init__(self, conn):
+                self._conn = conn
+
+            def executemany(self, sql, params):
+                time.sleep(0.3)
+                return self._conn.executemany(sql, params)
+
+            def __getattr__(self, name):
+                return getattr(self._conn, name)
+
+            def __enter__(self):
+                return self._conn.__enter__()
+
+            def __exit__(self, *exc):
+                return self._conn.__exit__(*exc)
+
+        store._conn = SlowConnection(store._conn)
+        store.record_trade('BNB/USDT', make_trade('1', 1000.0))
+        flush = asyncio.ensure_future(store.flush_async())
+        await asyncio.sleep(0.05)  # 写线程正在提交
+
+        start = time.perf_counter()
+        store.record_trade('BNB/USDT', make_trade('2', 1001.0))
+        assert time.perf_counter() - start < 0.05
+
+        assert await flush == 1
+        assert await store.query_async('count_trades', 'BNB/USDT') == 2
+        store._conn = store._conn._conn
+
+    def test_iter_trades_keyset_chunks(self, store):
+        for i in range(7):
+            store.record_trade('BNB/USDT', make_trade(str(i), 1000.0 + i // 2))
+        store.record_trade('ETH/USDT', make_trade('x', 1000.0))
+
+        trades = list(store.iter_trades('BNB/USDT', chunk_size=3))
+        assert [t['order_id'] for t in trades] == [str(i) for i in range(7)]
+        assert [t['order_id'] for t in store.iter_trades('BNB/USDT', since=1001.0, chunk_size=2)] == \
+            ['2', '3', '4', '5', '6']
+
+    def test_iter_trades_bounded_by_max_id(self, store):
+        store.record_trade('BNB/USDT', make_trade('1', 1000.0))
+        max_id = store.max_trade_id()
+        store.record_trade('BNB/USDT', make_trade('2', 999.0))
+        assert [t['order_id'] for t in store.iter_trades('BNB/USDT', max_id=max_id)] == ['1']
+
+
+class TestStoreReads:
+    """测试状态和成交历史经由存储读取"""
+
+    def test_order_tracker_queries_history_from_store(self, store, temp_dir):
+        with patch('order_tracker.get_trading_store', return_value=store):
+            tracker = OrderTracker('BNB/USDT', data_dir=temp_dir)
+        tracker.add_trade(make_trade('1', 1000.0, profit=None))
+        # 只存在于存储中的成交（如迁移导入的历史）同样能查到
+        store.record_trade('BNB/USDT', make_trade('0', 900.0, profit=1.0))
+
+        assert [t['order_id'] for t in tracker.query_trades()] == ['0', '1']
+        assert [t['order_id'] for t in tracker.iter_trades(since=950.0)] == ['1']
+
+    def test_trader_loads_state_from_store(self, store, temp_dir):
+        store.save_state('BNB/USDT', {'base_price': 612.0, 'grid_size': 3.0})
+        with patch('trader.OrderTracker'), patch('trader.TradingMonitor'), \
+             patch('trader.PositionControllerS1'), patch('trader.get_trading_store', return_value=store):
+            trader = GridTrader(MagicMock(), TradingConfig(), 'BNB/USDT')
+            trader.state_file_path = os.path.join(temp_dir, 'missing.json')
+            trader._load_state()
+
+        assert trader.base_price == 612.0
+        assert trader.grid_size == 3.0
+
+    @pytest.mark.asyncio
+    async def test_trader_stamps_equity_and_state_with_its_clock(self, store, temp_dir):
+        clock = VirtualClock(start=1_600_000_000)
+        exchange = MagicMock()
+        exchange.fetch_balance = AsyncMock(return_value={'total': {'BNB': 1.0, 'USDT': 400.0}})
+        exchange.fetch_funding_balance = AsyncMock(return_value={})
+        with patch('trader.OrderTracker'), patch('trader.TradingMonitor'), \
+             patch('trader.PositionControllerS1'), patch('trader.get_trading_store', return_value=store):
+            trader = GridTrader(exchange, TradingConfig(), 'BNB/USDT', clock=clock)
+            trader._get_latest_price = AsyncMock(return_value=600.0)
+            trader.state_file_path = os.path.join(temp_dir, 'state.json')
+            await trader._update_total_assets()
+            trader._save_state()
+
+        assert store.query_equity('BNB/USDT') == [{'timestamp': 1_600_000_000, 'value': 1000.0}]
+        updated_at = store._query("SELECT updated_at FROM trader_state WHERE symbol = ?", ('BNB/USDT',))
+        assert updated_at[0]['updated_at'] == 1_600_000_000
+
+
+class TestJsonMigration:
+    """测试JSON数据一次性迁移"""
+
+    def test_migrate_states_history_and_archives(self, store, temp_dir):
+        data_dir = os.path.join(temp_dir, 'data')
+        os.makedirs(os.path.join(data_dir, 'archives'))
+        with open(os.path.join(data_dir, 'trader_state_ETH_USDT.json'), 'w') as f:
+            json.dump({'base_price': 3000.0}, f)
+        with open(os.path.join(data_dir, 'trade_history.json'), 'w') as f:
+            json.dump([make_trade('2', 2000.0)], f)
+        with open(os.path.join(data_dir, 'archives', 'trades_202401.json'), 'w') as f:
+            json.dump([make_trade('1', 1000.0), {'order_id': 'bad'}], f)
+
+        result = migrate_json_to_store(store, data_dir=data_dir, default_symbol='BNB/USDT')
+        assert result == {'states': 1, 'trades': 2}
+        assert store.load_state('ETH/USDT') == {'base_price': 3000.0}
+        assert [t['order_id'] for t in store.query_trades('BNB/USDT')] == ['1', '2']
+
+        # 第二次调用不会重复迁移
+        assert migrate_json_to_store(store, data_dir=data_dir) is None
+
+    def test_migrate_journals_and_columnar_archives(self, store, temp_dir):
+        archive_dir = os.path.join(temp_dir, 'archives')
+        journal = TradeJournal(os.path.join(temp_dir, 'trade_journal_ETH_USDT.jsonl'))
+        journal.append(make_trade('j1', 3000.0))
+        journal.close()
+        TradeArchive(archive_dir, 'trades_ETH_USDT_').append([make_trade('a1', 1_700_000_000.0)])
+
+        result = migrate_json_to_store(store, data_dir=temp_dir, default_symbol='BNB/USDT')
+
+        assert result['trades'] == 2
+        assert [t['order_id'] for t in store.query_trades('ETH/USDT')] == ['j1', 'a1']
+        assert store.count_trades('BNB/USDT') == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,66 @@
+"""
+Web成交查询与导出接口测试
+"""
+import pytest
+import tempfile
+from types import SimpleNamespace
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from order_tracker import OrderTracker
+from web_server import handle_trades, handle_trades_export
+
+
+class TestTradeApi(AioHTTPTestCase):
+    """测试 /api/trades 分页与 /api/trades/export 流式导出"""
+
+    async def get_application(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tracker = OrderTracker(data_dir=self._tmp.name)
+        for i in range(25):
+            tracker.add_trade({'order_id': str(i), 'timestamp': 1000.0 + i, 'side': 'buy', 'price': 600.0, 'amount': 0.1})
+        self.tracker = tracker
+
+        app = web.Application()
+        app['traders'] = {'BNB/USDT': SimpleNamespace(symbol='BNB/USDT', order_tracker=tracker)}
+        app.router.add_get('/api/trades', handle_trades)
+        app.router.add_get('/api/trades/export', handle_trades_export)
+        return app
+
+    async def tearDownAsync(self):
+        self.tracker.journal.close()
+        self._tmp.cleanup()
+
+    async def test_cursor_pagination(self):
+        ids, cursor = [], None
+        while True:
+            url = '/api/trades?symbol=BNB/USDT&limit=10' + (f'&cursor={cursor}' if cursor else '')
+            resp = await self.client.request("GET", url)
+            assert resp.status == 200
+            data = await resp.json()
+            ids.extend(t['order_id'] for t in data['trades'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert ids == [str(i) for i in range(25)]
+
+    async def test_since_and_bad_params(self):
+        resp = await self.client.request("GET", "/api/trades?since=1020&limit=100")
+        data = await resp.json()
+        assert [t['order_id'] for t in data['trades']] == ['20', '21', '22', '23', '24']
+
+        resp = await self.client.request("GET", "/api/trades?limit=abc")
+        assert resp.status == 400
+
+    async def test_streaming_csv_export(self):
+        resp = await self.client.request("GET", "/api/trades/export?format=csv")
+        assert resp.status == 200
+        assert 'attachment' in resp.headers['Content-Disposition']
+        assert resp.headers.get('Transfer-Encoding') == 'chunked'
+        lines = (await resp.text()).strip().splitlines()
+        assert len(lines) == 26
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
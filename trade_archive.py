@@ -0,0 +1,179 @@
+import glob
+import logging
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+
+# 归档成交的列式结构，按 timestamp 升序存放
+TRADE_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('price', 'f8'),
+    ('amount', 'f8'),
+    ('profit', 'f8'),
+    ('side', 'S4'),
+    ('order_id', 'S64'),
+])
+
+
+class TradeArchive:
+    """
+    列式、内存映射的成交归档。
+
+    - 每个自然月一个主段文件 {prefix}YYYYMM.npy（结构化数组，按时间升序）；
+    - 追加归档时只写新的分段文件 {prefix}YYYYMM.partNNNN.npy，不重写已有数据；
+    - 查询某月时才把分段懒合并进主段（排序 + 按 order_id 去重，原子替换）；
+    - 读取使用 np.load(mmap_mode='r')，时间范围查询在 timestamp 列上二分查找，
+      单月查询返回的是内存映射切片，不需要解析JSON。
+    """
+
+    def __init__(self, archive_dir: str, prefix: str = 'trades_'):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.archive_dir = archive_dir
+        self.prefix = prefix
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._pattern = re.compile(re.escape(prefix) + r'(\d{6})(?:\.part(\d+))?\.npy$')
+        self._cache = {}  # 月份 -> 主段内存映射
+
+    @staticmethod
+    def to_array(trades):
+        """将成交字典列表转换为按时间排序的结构化数组"""
+        arr = np.empty(len(trades), dtype=TRADE_DTYPE)
+        for i, t in enumerate(trades):
+            arr[i] = (
+                float(t['timestamp']),
+                float(t['price']),
+                float(t['amount']),
+                float(t.get('profit') or 0),
+                str(t['side']).lower().encode(),
+                str(t['order_id']).encode(),
+            )
+        arr.sort(order='timestamp', kind='stable')
+        return arr
+
+    @staticmethod
+    def to_records(arr):
+        """将结构化数组转换回成交字典列表"""
+        return [{
+            'timestamp': float(row['timestamp']),
+            'side': row['side'].decode(),
+            'price': float(row['price']),
+            'amount': float(row['amount']),
+            'profit': float(row['profit']),
+            'order_id': row['order_id'].decode(),
+        } for row in arr]
+
+    def _files(self):
+        """返回 {月份: {'base': 路径或None, 'parts': [路径...]}}"""
+        months = {}
+        for path in glob.glob(os.path.join(self.archive_dir, f'{self.prefix}*.npy')):
+            match = self._pattern.match(os.path.basename(path))
+            if not match:
+                continue
+            entry = months.setdefault(match.group(1), {'base': None, 'parts': []})
+            if match.group(2) is None:
+                entry['base'] = path
+            else:
+                entry['parts'].append(path)
+        for entry in months.values():
+            entry['parts'].sort()
+        return months
+
+    def months(self):
+        return sorted(self._files())
+
+    def _base_path(self, month):
+        return os.path.join(self.archive_dir, f'{self.prefix}{month}.npy')
+
+    def append(self, trades):
+        """把成交按月份写入新的分段文件（只追加，不读取已有归档）"""
+        if not len(trades):
+            return 0
+        arr = self.to_array(trades)
+        month_keys = np.array([datetime.fromtimestamp(ts).strftime('%Y%m') for ts in arr['timestamp']])
+        files = self._files()
+        for month in np.unique(month_keys):
+            existing = files.get(month, {'parts': []})['parts']
+            seq = 1 + max((int(self._pattern.match(os.path.basename(p)).group(2)) for p in existing), default=0)
+            path = os.path.join(self.archive_dir, f'{self.prefix}{month}.part{seq:04d}.npy')
+            self._save_atomic(path, arr[month_keys == month])
+        return len(arr)
+
+    @staticmethod
+    def _save_atomic(path, arr):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.save(f, arr)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def _merge_month(self, month, entry):
+        """把某月的分段合并进主段（同一 order_id 以后写入的为准）"""
+        chunks = []
+        if entry['base']:
+            chunks.append(np.load(entry['base']))
+        chunks.extend(np.load(p) for p in entry['parts'])
+        merged = np.concatenate(chunks) if chunks else np.empty(0, dtype=TRADE_DTYPE)
+        # 倒序取首次出现即为最后写入的记录
+        _, last_idx = np.unique(merged['order_id'][::-1], return_index=True)
+        merged = merged[len(merged) - 1 - last_idx]
+        merged.sort(order='timestamp', kind='stable')
+        self._cache.pop(month, None)
+        self._save_atomic(self._base_path(month), merged)
+        for p in entry['parts']:
+            os.remove(p)
+        self.logger.info(f"归档分段已合并: {month}，共 {len(merged)} 条")
+
+    def _load_month(self, month, entry=None):
+        entry = entry or self._files().get(month)
+        if entry is None:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        if entry['parts']:
+            self._merge_month(month, entry)
+        if month not in self._cache:
+            self._cache[month] = np.load(self._base_path(month), mmap_mode='r')
+        return self._cache[month]
+
+    def _month_slices(self, since=None, until=None):
+        """按月份顺序逐个产出 [since, until) 范围内的内存映射切片"""
+        first = datetime.fromtimestamp(since).strftime('%Y%m') if since is not None else None
+        last = datetime.fromtimestamp(until).strftime('%Y%m') if until is not None else None
+        for month, entry in sorted(self._files().items()):
+            if (first and month < first) or (last and month > last):
+                continue
+            arr = self._load_month(month, entry)
+            ts = arr['timestamp']
+            lo = int(np.searchsorted(ts, since, side='left')) if since is not None else 0
+            hi = int(np.searchsorted(ts, until, side='left')) if until is not None else len(arr)
+            if hi > lo:
+                yield arr[lo:hi]
+
+    def query(self, since=None, until=None):
+        """
+        查询 [since, until) 时间范围内的归档成交，返回结构化数组。
+        只涉及单个月份时直接返回内存映射切片。
+        """
+        slices = list(self._month_slices(since, until))
+        if not slices:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        return slices[0] if len(slices) == 1 else np.concatenate(slices)
+
+    def iter_chunks(self, since=None, until=None, chunk_size=1000):
+        """按时间顺序分块产出归档成交，任意时刻只有一个块被读入内存"""
+        for arr in self._month_slices(since, until):
+            for start in range(0, len(arr), chunk_size):
+                yield arr[start:start + chunk_size]
+
+    def __len__(self):
+        return sum(len(self._load_month(m, e)) for m, e in self._files().items())
+
+    def prune(self, max_months):
+        """只保留最近 max_months 个月的归档"""
+        months = self.months()
+        for month in months[:-max_months] if max_months else months:
+            self._cache.pop(month, None)
+            for path in glob.glob(os.path.join(self.archive_dir, f'{self.prefix}{month}*.npy')):
+                os.remove(path)
+            self.logger.info(f"已删除过期归档: {self.prefix}{month}")
@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+
+
+class TradeJournal:
+    """
+    追加写入的成交日志 (JSON Lines)。
+
+    - 每笔成交以一行JSON追加到文件末尾，写入代价为 O(1)，不再整文件重写；
+    - 内存中维护 order_id -> 成交记录 的哈希索引，去重为 O(1)；
+      同一 order_id 的后写记录覆盖先写记录（用于启动同步时修正成交）；
+    - 有效记录同时按时间顺序保存在列表中：新成交直接追加（O(1)），
+      只有较早的补录成交才按时间戳二分插入，读取时不再整体排序；
+    - 被覆盖的旧行累积到一定比例后自动压缩（写临时文件 + 原子重命名）；
+    - 启动恢复时丢弃因崩溃写了一半的末行，保证文件始终可解析。
+    """
+
+    def __init__(self, path: str, fsync: bool = False, compact_ratio: float = 2.0, min_compact_lines: int = 1000):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio  # 文件行数超过有效记录数的倍数时触发压缩
+        self.min_compact_lines = min_compact_lines
+        self.index = {}  # order_id -> 成交记录
+        self._records = []  # 按时间升序的有效记录（同一时间戳按写入顺序）
+        self._timestamps = []  # 与 _records 对应的时间戳，用于二分查找
+        self.line_count = 0
+        self._file = None
+        self._carry = None  # 后台压缩期间追加的行，压缩完成前补写到新文件
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.recover()
+
+    def __contains__(self, order_id):
+        return order_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, order_id):
+        return self.index.get(order_id)
+
+    def recover(self):
+        """从日志文件重建内存索引，并截断崩溃时残留的不完整末行"""
+        self.index = {}
+        self._records = []
+        self._timestamps = []
+        self.line_count = 0
+        if not os.path.exists(self.path):
+            return
+
+        valid_size = 0
+        skipped = 0
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    # 没有换行符的末行说明写入过程中发生了崩溃
+                    break
+                valid_size += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    skipped += 1
+                    continue
+                self.line_count += 1
+                self._put(record)
+
+        if valid_size < os.path.getsize(self.path):
+            self.logger.warning(f"成交日志末尾存在不完整记录，已截断: {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_size)
+        if skipped:
+            self.logger.warning(f"成交日志中有 {skipped} 行无法解析，已忽略")
+
+    def _position(self, record):
+        """返回记录在有序列表中的下标"""
+        ts = self._timestamps
+        i = bisect.bisect_left(ts, record['timestamp'])
+        while i < len(ts) and ts[i] == record['timestamp']:
+            if self._records[i] is record:
+                return i
+            i += 1
+        # 记录的时间戳在外部被修改过，退回线性查找
+        return next(i for i, r in enumerate(self._records) if r is record)
+
+    def _put(self, trade):
+        """更新索引和有序列表：覆盖同 order_id 的旧记录，按时间戳放到正确位置"""
+        previous = self.index.get(trade['order_id'])
+        if previous is not None:
+            i = self._position(previous)
+            if previous['timestamp'] == trade['timestamp'] == self._timestamps[i]:
+                self._records[i] = trade
+                self.index[trade['order_id']] = trade
+                return
+            del self._records[i]
+            del self._timestamps[i]
+        self.index[trade['order_id']] = trade
+        ts = trade['timestamp']
+        if not self._timestamps or ts >= self._timestamps[-1]:
+            self._records.append(trade)
+            self._timestamps.append(ts)
+        else:
+            i = bisect.bisect_right(self._timestamps, ts)
+            self._records.insert(i, trade)
+            self._timestamps.insert(i, ts)
+
+    def _handle(self):
+        if self._file is None or self._file.closed:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def append(self, trade: dict):
+        """追加（或覆盖）一笔成交记录"""
+        line = json.dumps(trade, ensure_ascii=False) + '\n'
+        f = self._handle()
+        f.write(line)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self._put(trade)
+        self.line_count += 1
+        if self._carry is not None:
+            self._carry.append(line)
+        elif self.line_count >= self.min_compact_lines and self.line_count > self.compact_ratio * len(self.index):
+            self.compact()
+
+    def discard(self, records):
+        """从内存中移除这些记录（仍是当前版本的才移除，之后被覆盖的新版本保留），文件由随后的压缩重写"""
+        removed = {id(r) for r in records if self.index.get(r['order_id']) is r}
+        if not removed:
+            return
+        for record in records:
+            if id(record) in removed:
+                del self.index[record['order_id']]
+        kept = [(r, ts) for r, ts in zip(self._records, self._timestamps) if id(r) not in removed]
+        self._records = [r for r, _ in kept]
+        self._timestamps = [ts for _, ts in kept]
+
+    def records(self):
+        """按时间升序返回所有有效成交记录"""
+        return list(self._records)
+
+    def between(self, since=None, until=None):
+        """按时间升序返回 [since, until) 内的记录（二分定位，只复制范围内的记录）"""
+        lo = bisect.bisect_left(self._timestamps, since) if since is not None else 0
+        hi = bisect.bisect_left(self._timestamps, until) if until is not None else len(self._records)
+        return self._records[lo:hi]
+
+    def compact(self, records=None):
+        """
+        重写日志，只保留每个 order_id 的最新记录。
+
+        Args:
+            records: 若提供，则用该列表替换日志中的全部记录（如归档后只保留近期记录）
+        """
+        if records is not None:
+            self.index = {}
+            self._records = []
+            self._timestamps = []
+            for trade in sorted(records, key=lambda t: t['timestamp']):
+                self._put(trade)
+        temp_path = self.path + '.tmp'
+        self.close()
+        try:
+            self._write_lines(temp_path, [json.dumps(t, ensure_ascii=False) + '\n' for t in self._records])
+            os.replace(temp_path, self.path)
+            self.line_count = len(self.index)
+            self.logger.info(f"成交日志已压缩，保留 {self.line_count} 条记录")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def compact_async(self):
+        """
+        compact 的事件循环版本：临时文件的写入和 fsync 在工作线程中进行，期间的追加照常写入旧文件，
+        并在原子替换前补写到新文件末尾，因此不会丢行。
+        """
+        lines = [json.dumps(t, ensure_ascii=False) + '\n' for t in self._records]
+        temp_path = self.path + '.tmp'
+        self._carry = []
+        try:
+            await asyncio.to_thread(self._write_lines, temp_path, lines)
+            carried = self._carry
+            if carried:
+                self._write_lines(temp_path, carried, mode='a', fsync=self.fsync)
+            self.close()
+            os.replace(temp_path, self.path)
+            self.line_count = len(lines) + len(carried)
+            self.logger.info(f"成交日志已压缩，保留 {len(self.index)} 条记录")
+        finally:
+            self._carry = None
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def _write_lines(path, lines, mode='w', fsync=True):
+        with open(path, mode, encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        self._file = None
@@ -0,0 +1,150 @@
+from collections import deque
+from datetime import datetime
+
+from clock import system_clock
+
+
+class TradeStatistics:
+    """
+    成交统计累加器。
+
+    每笔成交通过 add() 增量更新胜负计数、盈亏合计、连胜/连亏、最大盈亏和按日汇总，
+    因此胜率、盈亏比、统计摘要等查询都是 O(1)，不再需要反复扫描全部成交记录。
+    按日汇总保存在一个以日期为索引的环形缓冲中（最多保留 retention_days 天），
+    窗口统计只需遍历窗口内的日桶。
+    """
+
+    def __init__(self, retention_days: int = 400, clock=None):
+        self.retention_days = retention_days
+        self.clock = clock or system_clock
+        self.reset()
+
+    def reset(self):
+        self.total_trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.total_profit = 0.0
+        self.gross_profit = 0.0  # 盈利交易的利润合计
+        self.gross_loss = 0.0    # 亏损交易的亏损合计（正数）
+        self.max_profit = None
+        self.max_loss = None
+        self.current_win_streak = 0
+        self.current_loss_streak = 0
+        self.max_win_streak = 0
+        self.max_loss_streak = 0
+        self.daily = {}          # 'YYYY-MM-DD' -> 日桶
+        self._day_ring = deque()  # 日期键，按时间先后排列
+
+    def rebuild(self, trades):
+        """根据完整成交列表重建统计（仅在启动或历史记录被修正时使用）"""
+        self.reset()
+        for trade in sorted(trades, key=lambda t: t['timestamp']):
+            self.add(trade)
+
+    def add(self, trade):
+        """用一笔新成交增量更新统计"""
+        profit = float(trade.get('profit') or 0)
+        self.total_trades += 1
+        self.total_profit += profit
+        self.max_profit = profit if self.max_profit is None else max(self.max_profit, profit)
+        self.max_loss = profit if self.max_loss is None else min(self.max_loss, profit)
+
+        if profit > 0:
+            self.wins += 1
+            self.gross_profit += profit
+            self.current_win_streak += 1
+            self.current_loss_streak = 0
+            self.max_win_streak = max(self.max_win_streak, self.current_win_streak)
+        elif profit < 0:
+            self.losses += 1
+            self.gross_loss += -profit
+            self.current_loss_streak += 1
+            self.current_win_streak = 0
+            self.max_loss_streak = max(self.max_loss_streak, self.current_loss_streak)
+        else:
+            self.current_win_streak = 0
+            self.current_loss_streak = 0
+
+        bucket = self._day_bucket(trade['timestamp'])
+        bucket['trades'] += 1
+        bucket['profit'] += profit
+        bucket['volume'] += float(trade['price']) * float(trade['amount'])
+        if profit > 0:
+            bucket['wins'] += 1
+            bucket['gross_profit'] += profit
+        elif profit < 0:
+            bucket['losses'] += 1
+            bucket['gross_loss'] += -profit
+
+    def _day_bucket(self, timestamp):
+        day = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+        bucket = self.daily.get(day)
+        if bucket is None:
+            bucket = {'trades': 0, 'profit': 0.0, 'volume': 0.0,
+                      'wins': 0, 'losses': 0, 'gross_profit': 0.0, 'gross_loss': 0.0}
+            self.daily[day] = bucket
+            if not self._day_ring or day > self._day_ring[-1]:
+                self._day_ring.append(day)
+            else:
+                # 乱序到达的旧日期（极少发生），插入到正确位置
+                self._day_ring = deque(sorted([*self._day_ring, day]))
+            while len(self._day_ring) > self.retention_days:
+                self.daily.pop(self._day_ring.popleft(), None)
+        return bucket
+
+    @property
+    def win_rate(self):
+        return self.wins / self.total_trades if self.total_trades else 0
+
+    @property
+    def payoff_ratio(self):
+        """盈亏比 = 平均盈利 / 平均亏损；缺少盈利或亏损样本时返回中性值1.0"""
+        if not self.wins or not self.losses:
+            return 1.0
+        return (self.gross_profit / self.wins) / (self.gross_loss / self.losses)
+
+    @property
+    def profit_factor(self):
+        return self.gross_profit / self.gross_loss if self.gross_loss else 0
+
+    def summary(self):
+        """返回与 OrderTracker.get_statistics 兼容的统计摘要"""
+        return {
+            'total_trades': self.total_trades,
+            'win_rate': self.win_rate,
+            'total_profit': self.total_profit,
+            'avg_profit': self.total_profit / self.total_trades if self.total_trades else 0,
+            'max_profit': self.max_profit or 0,
+            'max_loss': self.max_loss or 0,
+            'profit_factor': self.profit_factor,
+            'consecutive_wins': self.max_win_streak,
+            'consecutive_losses': self.max_loss_streak
+        }
+
+    def daily_window(self, days, now=None):
+        """返回最近 days 天内有成交的日桶 {日期: 日桶}，按日期升序"""
+        now = now if now is not None else self.clock.time()
+        start_day = datetime.fromtimestamp(now - days * 24 * 3600).strftime('%Y-%m-%d')
+        window = {}
+        for day in reversed(self._day_ring):
+            if day < start_day:
+                break
+            window[day] = self.daily[day]
+        return dict(reversed(list(window.items())))
+
+    def window_summary(self, days, now=None):
+        """最近 days 天的窗口统计"""
+        window = self.daily_window(days, now)
+        trades = sum(b['trades'] for b in window.values())
+        wins = sum(b['wins'] for b in window.values())
+        losses = sum(b['losses'] for b in window.values())
+        gross_profit = sum(b['gross_profit'] for b in window.values())
+        gross_loss = sum(b['gross_loss'] for b in window.values())
+        return {
+            'days': days,
+            'total_trades': trades,
+            'win_rate': wins / trades if trades else 0,
+            'total_profit': sum(b['profit'] for b in window.values()),
+            'volume': sum(b['volume'] for b in window.values()),
+            'payoff_ratio': (gross_profit / wins) / (gross_loss / losses) if wins and losses else 1.0,
+        }
@@ -1,26 +1,30 @@
 from config import TradingConfig, FLIP_THRESHOLD, settings
 from exchange_client import ExchangeClient
-from order_tracker import OrderTracker, OrderThrottler
-from risk_manager import AdvancedRiskManager, RiskState
+from order_tracker import OrderTracker
+from risk_manager import AdvancedRiskManager, RiskState, DecisionContext
+from portfolio_risk import portfolio_risk
 import logging
 import asyncio
 import numpy as np
 from datetime import datetime
-import time
 import math
-from helpers import send_pushplus_message, format_trade_message
+from helpers import send_pushplus_message, format_trade_message, LogConfig
 import json
 import os
 from monitor import TradingMonitor
 from position_controller_s1 import PositionControllerS1
+from state_persistence import state_persistence, write_json_atomic
+from clock import system_clock
+from trading_store import get_trading_store
 
 
 class GridTrader:
-    def __init__(self, exchange, config, symbol: str):
-        """初始化网格交易器"""
+    def __init__(self, exchange, config, symbol: str, clock=None):
+        """初始化网格交易器；clock 默认为系统时钟，仿真时可注入虚拟时钟"""
         self.exchange = exchange
         self.config = config
         self.symbol = symbol  # 使用传入的symbol参数
+        self.clock = clock or system_clock
 
         # 解析并存储基础和计价货币
         try:
@@ -39,14 +43,25 @@ class GridTrader:
         self.lowest = None
         self.current_price = None
         self.active_orders = {'buy': None, 'sell': None}
-        self.order_tracker = OrderTracker()
+        self.order_tracker = OrderTracker(self.symbol, clock=self.clock)
         self.risk_manager = AdvancedRiskManager(self)
+        # 账户级风控：所有交易对共享，成交时增量更新敞口
+        self.portfolio_risk = portfolio_risk
+        self.portfolio_risk.register(self.symbol)
+        self.order_tracker.add_listener(self.portfolio_risk.on_fill)
+        # 成交后同步修正交易所客户端的现货余额缓存
+        self.order_tracker.add_listener(self.exchange.on_fill)
+        # 现货/理财再平衡：成交后由交易所客户端持有的服务合并、去抖后统一划转
+        self.savings_rebalancer = self.exchange.savings_rebalancer
+        self.savings_rebalancer.register(self)
         self.total_assets = 0
         self.last_trade_time = None
         self.last_trade_price = None
         self.price_history = []
-        self.last_grid_adjust_time = time.time()
-        self.start_time = time.time()
+        self.last_grid_adjust_time = self.clock.time()
+        self.start_time = self.clock.time()
+        self.state_version = 0  # 每次保存状态时递增，供状态快照判断是否需要重建
+        self.market_snapshot = None  # 最近一轮的决策上下文，状态页复用，避免额外访问交易所
 
         # EWMA波动率状态变量
         self.ewma_volatility = None  # EWMA波动率
@@ -62,7 +77,6 @@ class GridTrader:
         self.monitored_orders = []
         self.pending_orders = {}
         self.order_timestamps = {}
-        self.throttler = OrderThrottler(limit=10, interval=60)
         self.last_price_check = 0  # 新增价格检查时间戳
         self.ORDER_TIMEOUT = 10  # 订单超时时间（秒）
         self.MIN_TRADE_INTERVAL = 30  # 两次交易之间的最小间隔（秒）
@@ -90,14 +104,16 @@ class GridTrader:
         # 【新增】波动率平滑化相关变量
         self.volatility_history = []  # 用于存储最近的波动率值
         self.volatility_smoothing_window = 3  # 平滑窗口大小，取最近3次的平均值
+        # 波动率用的4小时K线视图：每根4小时K线开盘后只拉取一次，期间用最新价更新未收盘K线
+        self._volatility_klines = {'bucket': None, 'data': ()}
 
         # 状态持久化相关 - 状态文件名与交易对挂钩
         state_filename = f"trader_state_{self.symbol.replace('/', '_')}.json"
         self.state_file_path = os.path.join(os.path.dirname(__file__), 'data', state_filename)
 
-    def _save_state(self):
-        """【重构后】以原子方式安全地保存当前核心策略状态到文件"""
-        state = {
+    def _build_state_snapshot(self):
+        """构建当前核心策略状态的快照（与实例状态解耦，可安全地交给后台线程写盘）"""
+        return {
             'base_price': self.base_price,
             'grid_size': self.grid_size,
             'highest': self.highest,
@@ -105,7 +121,7 @@ class GridTrader:
             'last_grid_adjust_time': self.last_grid_adjust_time,
             'last_trade_time': self.last_trade_time,
             'last_trade_price': self.last_trade_price,
-            'timestamp': time.time(),
+            'timestamp': self.clock.time(),
             # EWMA波动率状态
             'ewma_volatility': self.ewma_volatility,
             'last_price': self.last_price,
@@ -114,44 +130,48 @@ class GridTrader:
             'is_monitoring_buy': self.is_monitoring_buy,
             'is_monitoring_sell': self.is_monitoring_sell,
             # 波动率平滑相关
-            'volatility_history': self.volatility_history
+            'volatility_history': list(self.volatility_history)
         }
 
-        temp_file_path = self.state_file_path + ".tmp"
-
-        try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(self.state_file_path), exist_ok=True)
+    def _save_state(self):
+        """保存当前核心策略状态：交给后台持久化服务异步写盘，不阻塞事件循环"""
+        state = self._build_state_snapshot()
+        self.state_version += 1
 
-            # 1. 写入临时文件
-            with open(temp_file_path, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2, ensure_ascii=False)
+        store = get_trading_store()
+        if store:
+            store.save_state(self.symbol, state, self.clock.time())
 
-            # 2. 原子性地重命名临时文件为正式文件
-            os.rename(temp_file_path, self.state_file_path)
+        if state_persistence.submit(self.state_file_path, state):
+            self.logger.info(f"核心状态已提交保存。基准价: {self.base_price:.2f}, 网格: {self.grid_size:.2f}%")
+            return
 
+        # 没有运行中的事件循环（如同步调用场景）时，退回同步原子写入
+        try:
+            write_json_atomic(self.state_file_path, state, fsync=settings.STATE_FSYNC)
             self.logger.info(f"核心状态已安全保存。基准价: {self.base_price:.2f}, 网格: {self.grid_size:.2f}%")
-
         except Exception as e:
             self.logger.error(f"保存核心状态失败: {e}")
 
-        finally:
-            # 3. 确保临时文件在任何情况下都被删除
-            if os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                except OSError as e:
-                    self.logger.error(f"删除临时状态文件失败: {e}")
-
-    def _load_state(self):
-        """从文件加载核心策略状态"""
+    def _read_saved_state(self):
+        """读取保存的核心状态：启用SQLite存储时优先从存储读取，否则（或存储中没有时）读取状态文件"""
+        store = get_trading_store()
+        if store:
+            state = store.load_state(self.symbol)
+            if state is not None:
+                return state
         if not os.path.exists(self.state_file_path):
-            self.logger.info("未找到状态文件，将使用默认配置启动。")
-            return
+            return None
+        with open(self.state_file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
 
+    def _load_state(self):
+        """加载核心策略状态"""
         try:
-            with open(self.state_file_path, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+            state = self._read_saved_state()
+            if state is None:
+                self.logger.info("未找到状态文件，将使用默认配置启动。")
+                return
 
             # 加载并验证状态值
             saved_base_price = state.get('base_price')
@@ -298,15 +318,20 @@ class GridTrader:
             raise
 
     async def _get_latest_price(self):
+        ticker = await self._get_latest_ticker()
+        return ticker['last'] if ticker else self.base_price
+
+    async def _get_latest_ticker(self):
+        """获取最新行情（包含买一/卖一），失败或格式不正确时返回 None"""
         try:
             ticker = await self.exchange.fetch_ticker(self.symbol)
             if ticker and 'last' in ticker:
-                return ticker['last']
+                return ticker
             self.logger.error("获取价格失败: 返回数据格式不正确")
-            return self.base_price
+            return None
         except Exception as e:
             self.logger.error(f"获取最新价格失败: {str(e)}")
-            return self.base_price
+            return None
 
     def _get_upper_band(self):
         return self.base_price * (1 + self.grid_size / 100)
@@ -331,7 +356,7 @@ class GridTrader:
         启动同步：
         1) 把交易所最近 N 条 fill 聚合为整单；
         2) cost < MIN_TRADE_AMOUNT 的跳过；
-        3) 用聚合结果覆盖本地同 id 旧记录，然后保存。
+        3) 用聚合结果覆盖本地同 id 旧记录（追加到成交日志）。
         """
         try:
             latest_fills = await self.exchange.fetch_my_trades(self.symbol, limit=limit)
@@ -360,26 +385,18 @@ class GridTrader:
                 entry['cost'] += cost
                 entry['timestamp'] = min(entry['timestamp'], tr['timestamp'] / 1000)
 
-            # ---------- 本地字典 ----------
-            local = {t['order_id']: t for t in self.order_tracker.trade_history}
-
             # ---------- 覆盖写入 ----------
             for oid, info in aggregated.items():
                 avg_price = info['cost'] / info['amount']
-                local[oid] = {  # 直接覆盖或新增
+                self.order_tracker.upsert_trade({  # 直接覆盖或新增
                     'timestamp': info['timestamp'],
                     'side': info['side'],
                     'price': avg_price,
                     'amount': info['amount'],
-                    'order_id': oid,
-                    'profit': 0
-                }
+                    'order_id': oid
+                })
 
-            # ---------- 保存 ----------
-            merged = sorted(local.values(), key=lambda x: x['timestamp'])
-            self.order_tracker.trade_history = merged
-            self.order_tracker.save_trade_history()
-            self.logger.info(f"启动同步：本地历史共 {len(merged)} 条记录")
+            self.logger.info(f"启动同步：本地历史共 {len(self.order_tracker.journal)} 条记录")
 
         except Exception as e:
             self.logger.error(f"同步最近成交失败: {e}")
@@ -401,11 +418,8 @@ class GridTrader:
             if self.lowest < old_lowest:
                 threshold = FLIP_THRESHOLD(self.grid_size)
                 self.logger.info(
-                    f"买入监测 | "
-                    f"当前价: {current_price:.2f} | "
-                    f"触发价: {initial_lower_band:.5f} | "
-                    f"最低价: {self.lowest:.2f} (已更新) | "
-                    f"反弹阈值: {threshold * 100:.2f}%"
+                    "买入监测 | 当前价: %.2f | 触发价: %.5f | 最低价: %.2f (已更新) | 反弹阈值: %.2f%%",
+                    current_price, initial_lower_band, self.lowest, threshold * 100
                 )
             # --- END OF CORRECTION ---
 
@@ -413,14 +427,14 @@ class GridTrader:
             threshold = FLIP_THRESHOLD(self.grid_size)
             if self.lowest and current_price >= self.lowest * (1 + threshold):
                 self.is_monitoring_buy = False # 准备交易，退出监测
-                self.logger.info(
-                    f"触发买入信号 | 当前价: {current_price:.2f} | 已反弹: {(current_price / self.lowest - 1) * 100:.2f}%")
+                self.logger.info("触发买入信号 | 当前价: %.2f | 已反弹: %.2f%%",
+                                 current_price, (current_price / self.lowest - 1) * 100)
                 # 只返回价格条件是否满足，余额检查在execute_order中进行
                 return True
         else:
             # 只有当价格回升，并且我们之前正处于"买入监测"状态时，才重置
             if self.is_monitoring_buy:
-                self.logger.info(f"价格已回升至 {current_price:.2f}，高于下轨 {initial_lower_band:.2f}。重置买入监测状态。")
+                self.logger.info("价格已回升至 %.2f，高于下轨 %.2f。重置买入监测状态。", current_price, initial_lower_band)
                 self.is_monitoring_buy = False
                 self._reset_extremes()
 
@@ -446,10 +460,8 @@ class GridTrader:
                 threshold = FLIP_THRESHOLD(self.grid_size)
                 dynamic_trigger_price = self.highest * (1 - threshold)
                 self.logger.info(
-                    f"卖出监测 | "
-                    f"当前价: {current_price:.2f} | "
-                    f"触发价(动态): {dynamic_trigger_price:.5f} | "
-                    f"最高价: {self.highest:.2f} (已更新)"
+                    "卖出监测 | 当前价: %.2f | 触发价(动态): %.5f | 最高价: %.2f (已更新)",
+                    current_price, dynamic_trigger_price, self.highest
                 )
             # --- END OF CORRECTION ---
 
@@ -457,23 +469,23 @@ class GridTrader:
             threshold = FLIP_THRESHOLD(self.grid_size)
             if self.highest and current_price <= self.highest * (1 - threshold):
                 self.is_monitoring_sell = False  # 准备交易，退出监测
-                self.logger.info(
-                    f"触发卖出信号 | 当前价: {current_price:.2f} | 目标价: {self.highest * (1 - threshold):.5f} | 已下跌: {(1 - current_price / self.highest) * 100:.2f}%")
+                self.logger.info("触发卖出信号 | 当前价: %.2f | 目标价: %.5f | 已下跌: %.2f%%",
+                                 current_price, self.highest * (1 - threshold), (1 - current_price / self.highest) * 100)
                 # 只返回价格条件是否满足，余额检查在execute_order中进行
                 return True
         else:
             # 只有当价格回落，并且我们之前正处于"卖出监测"状态时，才意味着本次机会结束，可以重置了
             if self.is_monitoring_sell:
-                self.logger.info(f"价格已回落至 {current_price:.2f}，低于上轨 {initial_upper_band:.2f}。重置卖出监测状态。")
+                self.logger.info("价格已回落至 %.2f，低于上轨 %.2f。重置卖出监测状态。", current_price, initial_upper_band)
                 self.is_monitoring_sell = False
                 self._reset_extremes()
 
         return False
 
-    async def _calculate_order_amount(self, order_type):
-        """计算目标订单金额 (总资产的10%)\n"""
+    async def _calculate_order_amount(self, order_type, context=None):
+        """计算目标订单金额 (总资产的10%)；提供本轮决策上下文时缓存过期也不再查询交易所\n"""
         try:
-            current_time = time.time()
+            current_time = self.clock.time()
 
             # 使用缓存避免频繁计算和日志输出
             cache_key = f'order_amount_target'  # 使用不同的缓存键
@@ -481,7 +493,7 @@ class GridTrader:
                     current_time - getattr(self, f'{cache_key}_time') < 60:  # 1分钟缓存
                 return getattr(self, cache_key)
 
-            total_assets = await self._get_pair_specific_assets_value()
+            total_assets = await self._get_pair_specific_assets_value(context)
 
             # 目标金额严格等于总资产的10%
             amount = total_assets * 0.1
@@ -513,10 +525,11 @@ class GridTrader:
         balance = await self.exchange.fetch_balance({'type': 'spot'})
         return balance.get('free', {}).get(currency, 0) * settings.SAFETY_MARGIN
 
-    async def _calculate_dynamic_interval_seconds(self):
-        """根据波动率动态计算网格调整的时间间隔（秒）"""
+    async def _calculate_dynamic_interval_seconds(self, volatility=None):
+        """根据波动率动态计算网格调整的时间间隔（秒）；volatility 为本轮上下文中已算好的波动率"""
         try:
-            volatility = await self._calculate_volatility()
+            if volatility is None:
+                volatility = await self._calculate_volatility()
             if volatility is None:  # Handle case where volatility calculation failed
                 raise ValueError("波动率计算失败")  # Volatility calculation failed
 
@@ -550,81 +563,113 @@ class GridTrader:
             default_interval_hours = TradingConfig.DYNAMIC_INTERVAL_PARAMS.get('default_interval_hours', 1.0)
             return default_interval_hours * 3600
 
+    async def _build_context(self):
+        """
+        构建本轮循环的决策上下文：行情和余额并发获取，波动率基于缓存的4小时K线视图计算。
+        上下文时间戳取行情、现货余额、理财余额中最早一项的获取时间（余额可能来自缓存），
+        余额刷新失败时快照随之变旧，由风控的新鲜度检查暂停交易；行情获取失败时返回 None
+        """
+        requested_at = self.clock.time()
+        ticker, spot_balance, funding_balance = await asyncio.gather(
+            self._get_latest_ticker(),
+            self.exchange.fetch_balance(),
+            self.exchange.fetch_funding_balance()
+        )
+        if not ticker or not ticker['last']:
+            self.logger.warning("本轮行情不可用，跳过决策")
+            return None
+        current_price = ticker['last']
+        captured_at = min(requested_at, *self.exchange.balance_timestamps())
+        volatility = await self._calculate_volatility(current_price)
+        return DecisionContext.build(
+            self.symbol, current_price, spot_balance, funding_balance, captured_at,
+            bid=ticker.get('bid'),
+            ask=ticker.get('ask'),
+            volatility=volatility,
+            klines=self._volatility_klines['data'],
+            s1_levels=self.position_controller_s1.extrema.all_levels(),
+            clock=self.clock
+        )
+
+    def _apply_context(self, context):
+        """将本轮上下文设为交易器的当前行情，并同步给账户级风控"""
+        self.current_price = context.price
+        self.market_snapshot = context
+        self.portfolio_risk.update_snapshot(context)
+
+    async def _run_iteration(self) -> bool:
+        """执行一轮主循环逻辑，价格不可用时返回 False"""
+        # ------------------------------------------------------------------
+        # 阶段一：初始化与状态更新
+        # ------------------------------------------------------------------
+        if not self.initialized:
+            await self.initialize()
+
+        # 1. 更新S1策略的每日高低点（每天只在日线收盘后访问一次交易所）
+        await self.position_controller_s1.update_daily_s1_levels()
+
+        # 2. 本轮循环的统一决策上下文，风控、信号、下单金额、S1和下单执行都只读这一份数据
+        context = await self._build_context()
+        if context is None:
+            return False
+        self._apply_context(context)
+
+        # --- 核心理念：维护任务与交易任务分离 ---
+
+        # ------------------------------------------------------------------
+        # 阶段二：周期性维护模块 (始终运行，保证机器人认知更新)
+        # ------------------------------------------------------------------
+
+        # 检查是否需要调整网格大小，直接复用上下文中的波动率
+        dynamic_interval_seconds = await self._calculate_dynamic_interval_seconds(context.volatility)
+        if self.clock.time() - self.last_grid_adjust_time > dynamic_interval_seconds:
+            self.logger.info(
+                f"维护时间到达，准备更新波动率并调整网格 (间隔: {dynamic_interval_seconds / 3600:.2f} 小时).")
+            await self.adjust_grid_size(context.volatility)
+            self.last_grid_adjust_time = self.clock.time() # 更新时间戳
+
+        # ------------------------------------------------------------------
+        # 阶段三：交易决策模块 (根据风控和市场信号执行)
+        # ------------------------------------------------------------------
+
+        # 1. 【核心】首先获取唯一的风控许可
+        risk_state = self.risk_manager.evaluate(context, self.clock.time())
+
+        # 2. 定义标志位，确保一轮循环只做一次主网格交易
+        trade_executed_this_loop = False
+
+        # 3. 卖出逻辑：只有在风控允许的情况下，才去检查信号
+        if risk_state.allows_sell:
+            sell_signal = await self._check_signal_with_retry(
+                lambda: self._check_sell_signal(), "卖出检测")
+            if sell_signal:
+                if await self.execute_order('sell', context):
+                    trade_executed_this_loop = True
+
+        # 4. 买入逻辑：如果没卖出，且风控允许，才去检查买入信号
+        if not trade_executed_this_loop and risk_state.allows_buy:
+            buy_signal = await self._check_signal_with_retry(
+                lambda: self._check_buy_signal(), "买入检测")
+            if buy_signal:
+                if await self.execute_order('buy', context):
+                    trade_executed_this_loop = True
+
+        # 5. S1辅助策略：它也是一种交易，但独立于主网格
+        # 只有在本轮没有发生主网格交易时才考虑执行S1，避免冲突
+        if not trade_executed_this_loop:
+            await self.position_controller_s1.check_and_execute(risk_state, context)
+        return True
+
     async def main_loop(self):
+        LogConfig.bind_symbol(self.symbol)
         consecutive_errors = 0
         max_consecutive_errors = 5
 
         while True:
             try:
-                # ------------------------------------------------------------------
-                # 阶段一：初始化与状态更新
-                # ------------------------------------------------------------------
-                if not self.initialized:
-                    await self.initialize()
-
-                # 获取最新的价格，这是后续所有决策的基础
-                current_price = await self._get_latest_price()
-                if not current_price:
+                if not await self._run_iteration():
                     await asyncio.sleep(5)
                     continue
-                self.current_price = current_price
-
-                # ========== 新增：获取本轮循环的统一账户快照 ==========
-                spot_balance = await self.exchange.fetch_balance()
-                funding_balance = await self.exchange.fetch_funding_balance()
-                # ========== 新增结束 ==========
-
-                # --- 核心理念：维护任务与交易任务分离 ---
-
-                # ------------------------------------------------------------------
-                # 阶段二：周期性维护模块 (始终运行，保证机器人认知更新)
-                # ------------------------------------------------------------------
-
-                # 1. 更新S1策略的每日高低点
-                await self.position_controller_s1.update_daily_s1_levels()
-
-                # 2. 检查是否需要调整网格大小 (包含波动率计算)
-                # 这个任务现在独立运行，不再被交易状态阻塞
-                dynamic_interval_seconds = await self._calculate_dynamic_interval_seconds()
-                if time.time() - self.last_grid_adjust_time > dynamic_interval_seconds:
-                    self.logger.info(
-                        f"维护时间到达，准备更新波动率并调整网格 (间隔: {dynamic_interval_seconds / 3600:.2f} 小时).")
-                    # adjust_grid_size 内部会调用 _calculate_volatility
-                    await self.adjust_grid_size()
-                    self.last_grid_adjust_time = time.time() # 更新时间戳
-
-                # ------------------------------------------------------------------
-                # 阶段三：交易决策模块 (根据风控和市场信号执行)
-                # ------------------------------------------------------------------
-
-                # 1. 【核心】首先获取唯一的风控许可
-                risk_state = await self.risk_manager.check_position_limits(spot_balance, funding_balance)
-
-                # 2. 定义标志位，确保一轮循环只做一次主网格交易
-                trade_executed_this_loop = False
-
-                # 3. 卖出逻辑：只有在风控允许的情况下，才去检查信号
-                if risk_state != RiskState.ALLOW_BUY_ONLY:
-                    sell_signal = await self._check_signal_with_retry(
-                        lambda: self._check_sell_signal(), "卖出检测")
-                    if sell_signal:
-                        if await self.execute_order('sell'):
-                            trade_executed_this_loop = True
-
-                # 4. 买入逻辑：如果没卖出，且风控允许，才去检查买入信号
-                if not trade_executed_this_loop and risk_state != RiskState.ALLOW_SELL_ONLY:
-                    buy_signal = await self._check_signal_with_retry(
-                        lambda: self._check_buy_signal(), "买入检测")
-                    if buy_signal:
-                        if await self.execute_order('buy'):
-                            trade_executed_this_loop = True
-
-                # 5. S1辅助策略：它也是一种交易，但独立于主网格
-                # 只有在本轮没有发生主网格交易时才考虑执行S1，避免冲突
-                if not trade_executed_this_loop:
-                    await self.position_controller_s1.check_and_execute(risk_state)
-
-                # --- 逻辑执行完毕 ---
 
                 # 循环成功，重置错误计数器
                 consecutive_errors = 0
@@ -754,7 +799,7 @@ class GridTrader:
 
         # 3) 记录交易
         trade_info = {
-            'timestamp': time.time(),
+            'timestamp': self.clock.time(),
             'side': side,
             'price': order_price,
             'amount': order_amount,
@@ -763,7 +808,7 @@ class GridTrader:
         self.order_tracker.add_trade(trade_info)
 
         # 4) 更新时间戳 / 总资产
-        self.last_trade_time = time.time()
+        self.last_trade_time = self.clock.time()
         self.last_trade_price = order_price
         await self._update_total_assets()
         self.logger.info(f"基准价已更新: {self.base_price}")
@@ -785,46 +830,63 @@ class GridTrader:
         )
         send_pushplus_message(msg, "交易成功通知")
 
-        # 6) 将多余资金转入理财 (如果功能开启)
-        if settings.ENABLE_SAVINGS_FUNCTION:
-            await self._transfer_excess_funds()
-        else:
-            self.logger.info("理财功能已禁用，跳过资金转移。")
+        # 6) 现货/理财再平衡由 savings_rebalancer 在成交回调中合并触发，不阻塞下一笔交易
 
         return order_dict
 
-    async def execute_order(self, side):
-        """执行订单，带重试机制"""
+    async def execute_order(self, side, context=None):
+        """执行订单；买单先向账户级风控预留计价货币额度，结束后释放"""
+        reservation = None
+        if side == 'buy':
+            amount_quote = await self._calculate_order_amount('buy', context)
+            reservation = self.portfolio_risk.try_reserve(self.symbol, amount_quote)
+            if reservation is None:
+                return False
+        try:
+            return await self._execute_order(side, context)
+        finally:
+            self.portfolio_risk.release(reservation)
+
+    async def _execute_order(self, side, context=None):
+        """执行订单，带重试机制；第一次尝试直接使用本轮决策上下文中的盘口和余额，重试时再重新查询"""
         max_retries = 10  # 最大重试次数
         retry_count = 0
         check_interval = 3  # 下单后等待检查时间（秒）
 
         while retry_count < max_retries:
             try:
-                # 获取最新订单簿数据
-                order_book = await self.exchange.fetch_order_book(self.symbol, limit=5)
-                if not order_book or not order_book.get('asks') or not order_book.get('bids'):
-                    self.logger.error("获取订单簿数据失败或数据不完整")
-                    retry_count += 1
-                    await asyncio.sleep(3)
-                    continue
+                # 上下文只用于第一次尝试，之后的重试都重新获取盘口和余额
+                attempt_context, context = context, None
+                order_price = attempt_context.order_price(side) if attempt_context else None
+                if order_price is None:
+                    # 获取最新订单簿数据
+                    order_book = await self.exchange.fetch_order_book(self.symbol, limit=5)
+                    if not order_book or not order_book.get('asks') or not order_book.get('bids'):
+                        self.logger.error("获取订单簿数据失败或数据不完整")
+                        retry_count += 1
+                        await asyncio.sleep(3)
+                        continue
 
-                # 使用买1/卖1价格
-                if side == 'buy':
-                    order_price = order_book['asks'][0][0]  # 卖1价买入
-                else:
-                    order_price = order_book['bids'][0][0]  # 买1价卖出
+                    # 使用买1/卖1价格
+                    if side == 'buy':
+                        order_price = order_book['asks'][0][0]  # 卖1价买入
+                    else:
+                        order_price = order_book['bids'][0][0]  # 买1价卖出
 
                 # 计算交易数量
-                amount_quote = await self._calculate_order_amount(side)
+                amount_quote = await self._calculate_order_amount(side, attempt_context)
                 amount = self._adjust_amount_precision(amount_quote / order_price)
 
                 # 调整价格精度
                 order_price = self._adjust_price_precision(order_price)
 
-                # 检查余额是否足够 - 需要获取最新的余额信息
-                spot_balance = await self.exchange.fetch_balance({'type': 'spot'})
-                funding_balance = await self.exchange.fetch_funding_balance()
+                # 检查余额是否足够 - 第一次尝试使用上下文中的余额，重试时获取最新余额
+                if attempt_context is not None:
+                    spot_balance = attempt_context.spot_balance
+                    funding_balance = attempt_context.funding_balance
+                else:
+                    spot_balance = await self.exchange.fetch_balance({'type': 'spot'})
+                    funding_balance = await self.exchange.fetch_funding_balance()
 
                 if not await self._ensure_balance_for_trade(side, spot_balance, funding_balance):
                     self.logger.warning(f"{side}余额不足，第 {retry_count + 1} 次尝试中止")
@@ -1018,7 +1080,7 @@ class GridTrader:
 
             # 只在这里添加交易记录
             self.order_tracker.add_trade({
-                'timestamp': time.time(),
+                'timestamp': self.clock.time(),
                 'side': side,
                 'price': price,
                 'amount': amount,
@@ -1067,12 +1129,12 @@ class GridTrader:
 
     async def _check_and_cancel_timeout_orders(self):
         """检查并取消超时订单"""
-        current_time = time.time()
+        current_time = self.clock.time()
         for order_id, timestamp in list(self.order_timestamps.items()):
             if current_time - timestamp > self.ORDER_TIMEOUT:
                 try:
                     params = {
-                        'timestamp': int(time.time() * 1000 + self.exchange.time_diff),
+                        'timestamp': int(self.clock.time() * 1000 + self.exchange.time_diff),
                         'recvWindow': 5000
                     }
                     order = await self.exchange.fetch_order(order_id, self.symbol, params)
@@ -1098,7 +1160,7 @@ class GridTrader:
                     elif order['status'] == 'open':
                         # 取消未成交订单
                         params = {
-                            'timestamp': int(time.time() * 1000 + self.exchange.time_diff),
+                            'timestamp': int(self.clock.time() * 1000 + self.exchange.time_diff),
                             'recvWindow': 5000
                         }
                         await self.exchange.cancel_order(order_id, self.symbol, params)
@@ -1118,11 +1180,11 @@ class GridTrader:
                         await asyncio.sleep(1)
                         continue
 
-    async def adjust_grid_size(self):
-        """根据【平滑后】的波动率和市场趋势调整网格大小"""
+    async def adjust_grid_size(self, volatility=None):
+        """根据【平滑后】的波动率和市场趋势调整网格大小；volatility 为本轮上下文中已算好的波动率"""
         try:
-            # 1. 计算当前的瞬时波动率
-            current_volatility = await self._calculate_volatility()
+            # 1. 计算当前的瞬时波动率（主循环已计算时直接复用，避免重复更新EWMA）
+            current_volatility = volatility if volatility is not None else await self._calculate_volatility()
             if current_volatility is None:
                 self.logger.warning("无法计算当前波动率，跳过网格调整。")
                 return
@@ -1175,26 +1237,46 @@ class GridTrader:
                     f"新网格 (限定范围后): {new_grid:.2f}%"
                 )
                 self.grid_size = new_grid
-                self.last_grid_adjust_time = time.time()  # 更新时间
+                self.last_grid_adjust_time = self.clock.time()  # 更新时间
                 # 保存状态
                 self._save_state()
 
         except Exception as e:
             self.logger.error(f"调整网格大小失败: {str(e)}")
 
-    async def _calculate_volatility(self):
+    async def _get_volatility_klines(self, current_price=None):
         """
-        计算改进的混合波动率：7天4小时线传统波动率 + EWMA波动率
-        使用4小时K线数据计算7天年化波动率，结合EWMA提供敏感性
-        更短的时间窗口让机器人更敏感地响应短期市场变化
+        返回7天4小时K线视图 (7天 * 6根4小时K线 = 42根)。
+        同一根4小时K线期间只请求一次交易所，之后用最新价更新最后一根未收盘K线的收盘/最高/最低价。
         """
-        try:
-            # 获取7天4小时K线数据 (7天 * 6根4小时K线 = 42根)
+        bucket = int(self.clock.time() // (4 * 3600))
+        if self._volatility_klines['bucket'] != bucket or not self._volatility_klines['data']:
             klines = await self.exchange.fetch_ohlcv(
                 self.symbol,
                 timeframe='4h',  # 从'1d'改为'4h'
                 limit=42         # 7天 * 6根4小时K线 = 42
             )
+            self._volatility_klines = {
+                'bucket': bucket if klines else None,
+                'data': tuple(tuple(k) for k in klines or ())
+            }
+        klines = self._volatility_klines['data']
+        if current_price and klines:
+            open_time, open_, high, low, _, volume = klines[-1][:6]
+            last = (open_time, open_, max(high, current_price), min(low, current_price), current_price, volume)
+            klines = klines[:-1] + (last,)
+            self._volatility_klines = {**self._volatility_klines, 'data': klines}
+        return klines
+
+    async def _calculate_volatility(self, current_price=None):
+        """
+        计算改进的混合波动率：7天4小时线传统波动率 + EWMA波动率
+        使用4小时K线数据计算7天年化波动率，结合EWMA提供敏感性
+        更短的时间窗口让机器人更敏感地响应短期市场变化
+        current_price 为本轮上下文中的最新价，用于更新K线视图，避免每轮都重新拉取K线
+        """
+        try:
+            klines = await self._get_volatility_klines(current_price)
 
             if not klines or len(klines) < 2:
                 self.logger.warning("K线数据不足，返回默认波动率")
@@ -1217,13 +1299,13 @@ class GridTrader:
                     (1 - settings.VOLATILITY_HYBRID_WEIGHT) * traditional_volatility
                 )
                 self.logger.debug(
-                    f"混合波动率计算 | 传统: {traditional_volatility:.4f} | "
-                    f"EWMA: {ewma_volatility:.4f} | 混合: {hybrid_volatility:.4f}"
+                    "混合波动率计算 | 传统: %.4f | EWMA: %.4f | 混合: %.4f",
+                    traditional_volatility, ewma_volatility, hybrid_volatility
                 )
             else:
                 # EWMA未初始化时使用传统波动率
                 hybrid_volatility = traditional_volatility
-                self.logger.debug(f"使用传统波动率: {traditional_volatility:.4f}")
+                self.logger.debug("使用传统波动率: %.4f", traditional_volatility)
 
             return hybrid_volatility
 
@@ -1269,7 +1351,9 @@ class GridTrader:
         # 计算加权后的收益率
         weighted_log_returns = log_returns * volume_factors
 
-        self.logger.debug(f"成交量加权计算 | 平均成交量: {average_volume:.2f} | 成交量权重范围: [{np.min(volume_factors):.2f}, {np.max(volume_factors):.2f}]")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("成交量加权计算 | 平均成交量: %.2f | 成交量权重范围: [%.2f, %.2f]",
+                              average_volume, np.min(volume_factors), np.max(volume_factors))
 
         # 基于加权收益率计算年化波动率
         volatility = np.std(weighted_log_returns) * np.sqrt(365 * 6)
@@ -1379,35 +1463,24 @@ class GridTrader:
         return amount_quote
 
     async def calculate_win_rate(self):
-        """计算胜率"""
+        """计算胜率（读取订单跟踪器的增量统计）"""
         try:
-            trades = self.order_tracker.get_trade_history()
-            if not trades:
-                return 0
-
-            # 计算盈利交易数量
-            winning_trades = [t for t in trades if t['profit'] > 0]
-            win_rate = len(winning_trades) / len(trades)
-
-            return win_rate
+            return self.order_tracker.stats.win_rate
         except Exception as e:
             self.logger.error(f"计算胜率失败: {str(e)}")
             return 0
 
     async def calculate_payoff_ratio(self):
-        """计算盈亏比"""
-        trades = self.order_tracker.get_trade_history()
-        if len(trades) < 10:
+        """计算盈亏比（读取订单跟踪器的增量统计）"""
+        stats = self.order_tracker.stats
+        if stats.total_trades < 10:
             return 1.0
-
-        avg_win = np.mean([t['profit'] for t in trades if t['profit'] > 0])
-        avg_loss = np.mean([abs(t['profit']) for t in trades if t['profit'] < 0])
-        return avg_win / avg_loss if avg_loss != 0 else 1.0
+        return stats.payoff_ratio
 
     async def save_trade_stats(self):
         """保存交易统计数据"""
         stats = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.fromtimestamp(self.clock.time()).isoformat(),
             'grid_size': self.grid_size,
             'position_size': self.current_position,
             'volatility': await self._calculate_volatility(),
@@ -1485,79 +1558,6 @@ class GridTrader:
         required = amount_quote * 1.05  # 增加5%缓冲
         return min(required, settings.MAX_POSITION_RATIO * total_assets)
 
-    async def _transfer_excess_funds(self):
-        """将超出总资产16%目标的部分资金转回理财账户"""
-        # 功能开关检查
-        if not settings.ENABLE_SAVINGS_FUNCTION:
-            return
-
-        try:
-            balance = await self.exchange.fetch_balance()
-            current_price = await self._get_latest_price()
-            total_assets = await self._get_pair_specific_assets_value()
-
-            # 如果无法获取价格或总资产，则跳过
-            if not current_price or current_price <= 0 or total_assets <= 0:
-                self.logger.warning("无法获取价格或总资产，跳过资金转移检查")
-                return
-
-            # 计算目标保留金额 (总资产的16%)
-            target_quote_hold = total_assets * 0.16
-            target_base_hold_value = total_assets * 0.16
-            target_base_hold_amount = target_base_hold_value / current_price
-
-            # 获取当前现货可用余额
-            spot_quote_balance = float(balance.get('free', {}).get(self.quote_asset, 0))
-            spot_base_balance = float(balance.get('free', {}).get(self.base_asset, 0))
-
-            self.logger.info(
-                f"资金转移检查 | 总资产: {total_assets:.2f} {self.quote_asset} | "
-                f"目标{self.quote_asset}持有: {target_quote_hold:.2f} | 现货{self.quote_asset}: {spot_quote_balance:.2f} | "
-                f"目标{self.base_asset}持有(等值): {target_base_hold_value:.2f} {self.quote_asset} ({target_base_hold_amount:.4f} {self.base_asset}) | "
-                f"现货{self.base_asset}: {spot_base_balance:.4f}"
-            )
-
-            transfer_executed = False  # 标记是否执行了划转
-
-            # 处理计价货币：如果现货超出目标，转移多余部分
-            if spot_quote_balance > target_quote_hold:
-                transfer_amount = spot_quote_balance - target_quote_hold
-                # 增加最小划转金额判断，避免无效操作
-                # 将阈值提高到 1.0
-                if transfer_amount > 1.0:
-                    self.logger.info(f"转移多余{self.quote_asset}到理财: {transfer_amount:.2f}")
-                    try:
-                        await self.exchange.transfer_to_savings(self.quote_asset, transfer_amount)
-                        transfer_executed = True
-                    except Exception as transfer_e:
-                        self.logger.error(f"转移{self.quote_asset}到理财失败: {str(transfer_e)}")
-                else:
-                    self.logger.info(f"{self.quote_asset}超出部分 ({transfer_amount:.2f}) 过小，不执行划转")
-
-            # 处理基础货币：如果现货超出目标，转移多余部分
-            if spot_base_balance > target_base_hold_amount:
-                transfer_amount = spot_base_balance - target_base_hold_amount
-                # 检查转移金额是否大于等于最小申购额
-                min_transfer = settings.MIN_BNB_TRANSFER if self.base_asset == 'BNB' else 0.01
-                if transfer_amount >= min_transfer:
-                    self.logger.info(f"转移多余{self.base_asset}到理财: {transfer_amount:.4f}")
-                    try:
-                        await self.exchange.transfer_to_savings(self.base_asset, transfer_amount)
-                        transfer_executed = True
-                    except Exception as transfer_e:
-                        self.logger.error(f"转移{self.base_asset}到理财失败: {str(transfer_e)}")
-                else:
-                    # 修改日志消息以反映新的阈值
-                    self.logger.info(f"{self.base_asset}超出部分 ({transfer_amount:.4f}) 低于最小申购额 {min_transfer}，不执行划转")
-
-            if transfer_executed:
-                self.logger.info("多余资金已尝试转移到理财账户")
-            else:
-                self.logger.info("无需转移资金到理财账户")
-
-        except Exception as e:
-            self.logger.error(f"转移多余资金检查失败: {str(e)}")
-
     async def _check_flip_signal(self):
         """检查是否需要翻转交易方向"""
         try:
@@ -1729,28 +1729,32 @@ class GridTrader:
         except Exception as e:
             self.logger.error(f"初始资金检查失败: {str(e)}")
 
-    async def _get_pair_specific_assets_value(self):
+    async def _get_pair_specific_assets_value(self, snapshot=None):
         """
         获取当前交易对相关资产价值（以计价货币计算）- 用于交易决策
 
         此方法仅计算当前交易对（self.base_asset和self.quote_asset）的资产价值，
         用于该交易对的交易决策和风险控制，实现交易对之间的风险隔离。
+        提供本轮的 MarketSnapshot/DecisionContext 时直接用其中的余额和价格计算，不访问交易所。
 
         如需获取全账户总资产（用于报告），请使用 exchange.calculate_total_account_value() 方法。
         """
         try:
             # 使用缓存避免频繁请求
-            current_time = time.time()
-            if hasattr(self, '_assets_cache') and \
+            current_time = self.clock.time()
+            if snapshot is None and hasattr(self, '_assets_cache') and \
                     current_time - self._assets_cache['time'] < 60:  # 1分钟缓存
                 return self._assets_cache['value']
 
             # 设置一个默认返回值，以防发生异常
             default_total = self._assets_cache['value'] if hasattr(self, '_assets_cache') else 0
 
-            balance = await self.exchange.fetch_balance()
-            funding_balance = await self.exchange.fetch_funding_balance()
-            current_price = await self._get_latest_price()
+            if snapshot is not None:
+                balance, funding_balance, current_price = snapshot.spot_balance, snapshot.funding_balance, snapshot.price
+            else:
+                balance = await self.exchange.fetch_balance()
+                funding_balance = await self.exchange.fetch_funding_balance()
+                current_price = await self._get_latest_price()
 
             # 防御性检查：确保返回的价格是有效的
             if not current_price or current_price <= 0:
@@ -1792,11 +1796,10 @@ class GridTrader:
             if not hasattr(self, '_last_logged_assets') or \
                     abs(total_assets - self._last_logged_assets) / max(self._last_logged_assets, 0.01) > 0.01:
                 self.logger.info(
-                    f"【{self.symbol}】交易对资产: {total_assets:.2f} {self.quote_asset} | "
-                    f"现货: {spot_value:.2f} {self.quote_asset} "
-                    f"({self.base_asset}: {spot_base:.4f}, {self.quote_asset}: {spot_quote:.2f}) | "
-                    f"理财: {fund_value:.2f} {self.quote_asset} "
-                    f"({self.base_asset}: {fund_base:.4f}, {self.quote_asset}: {fund_quote:.2f})"
+                    "【%s】交易对资产: %.2f %s | 现货: %.2f %s (%s: %.4f, %s: %.2f) | 理财: %.2f %s (%s: %.4f, %s: %.2f)",
+                    self.symbol, total_assets, self.quote_asset,
+                    spot_value, self.quote_asset, self.base_asset, spot_base, self.quote_asset, spot_quote,
+                    fund_value, self.quote_asset, self.base_asset, fund_base, self.quote_asset, fund_quote
                 )
                 self._last_logged_assets = total_assets
 
@@ -1820,6 +1823,10 @@ class GridTrader:
             self.total_assets = quote_balance + (base_balance * current_price)
             self.logger.info(f"更新总资产: {self.total_assets:.2f} {self.quote_asset}")
 
+            store = get_trading_store()
+            if store:
+                store.record_equity(self.symbol, self.total_assets, self.clock.time())
+
         except Exception as e:
             self.logger.error(f"更新总资产失败: {str(e)}")
 
@@ -0,0 +1,463 @@
+import asyncio
+import functools
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from clock import system_clock
+from config import settings, LEGACY_TRADES_SYMBOL
+from trade_archive import TradeArchive
+from trade_journal import TradeJournal
+
+
+class TradingStore:
+    """
+    基于嵌入式SQLite (WAL模式) 的统一存储层。
+
+    所有交易对的核心状态、成交记录、订单和权益采样都存放在同一个数据库中。
+    写操作只在内存缓冲区中追加（O(1)，只持有交换缓冲区用的短锁），
+    所有数据库读写都在单个写线程中执行：缓冲区按批次在单个事务中提交，
+    事件循环上的调用方永远不会等待磁盘提交；
+    历史查询直接走 (symbol, timestamp) / order_id 索引，不再需要整文件加载。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS trader_state (
+            symbol TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            order_id TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            side TEXT NOT NULL,
+            price REAL NOT NULL,
+            amount REAL NOT NULL,
+            profit REAL,
+            strategy TEXT,
+            UNIQUE (symbol, order_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_trades_symbol_ts ON trades (symbol, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_trades_order_id ON trades (order_id);
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            symbol TEXT NOT NULL,
+            side TEXT,
+            type TEXT,
+            price REAL,
+            amount REAL,
+            status TEXT,
+            profit REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_orders_symbol_ts ON orders (symbol, created_at);
+        CREATE TABLE IF NOT EXISTS equity_samples (
+            symbol TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (symbol, timestamp)
+        );
+    """
+
+    _UPSERT_STATE = (
+        "INSERT INTO trader_state (symbol, state, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(symbol) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at"
+    )
+    _UPSERT_TRADE = (
+        "INSERT INTO trades (symbol, order_id, timestamp, side, price, amount, profit, strategy) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(symbol, order_id) DO UPDATE SET timestamp = excluded.timestamp, side = excluded.side, "
+        "price = excluded.price, amount = excluded.amount, profit = excluded.profit, strategy = excluded.strategy"
+    )
+    _UPSERT_ORDER = (
+        "INSERT INTO orders (order_id, symbol, side, type, price, amount, status, profit, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(order_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at"
+    )
+    _UPDATE_ORDER_STATUS = "UPDATE orders SET status = ?, profit = ?, updated_at = ? WHERE order_id = ?"
+    _INSERT_EQUITY = "INSERT OR REPLACE INTO equity_samples (symbol, timestamp, value) VALUES (?, ?, ?)"
+
+    TRADE_COLUMNS = ('symbol', 'order_id', 'timestamp', 'side', 'price', 'amount', 'profit', 'strategy')
+
+    def __init__(self, db_path: str = None, batch_size: int = 500, clock=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.clock = clock or system_clock  # 调用方未给出时间戳时用于标记写入时间
+        self.db_path = db_path or settings.SQLITE_DB_PATH or os.path.join(
+            os.path.dirname(__file__), 'data', 'trading.db')
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()  # 只保护 _pending 缓冲区，从不在持有期间做磁盘I/O
+        self._pending = []  # [(sql, params), ...] 等待批量提交的写操作
+        self._flush_scheduled = False
+        self._writer_ident = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer',
+                                            initializer=self._init_writer)
+        self._flush_task = None
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def _init_writer(self):
+        self._writer_ident = threading.get_ident()
+
+    def _on_writer(self):
+        return threading.get_ident() == self._writer_ident
+
+    # ------------------------------------------------------------------
+    # 写入（只追加到缓冲区，批量提交）
+    # ------------------------------------------------------------------
+    def _enqueue(self, sql, params):
+        with self._lock:
+            self._pending.append((sql, params))
+            schedule = len(self._pending) >= self.batch_size and not self._flush_scheduled
+            if schedule:
+                self._flush_scheduled = True
+        if schedule:
+            # 缓冲区满时把提交交给写线程，调用方立即返回
+            self._executor.submit(self.flush)
+
+    def _now(self, timestamp):
+        return timestamp if timestamp is not None else self.clock.time()
+
+    def save_state(self, symbol: str, state: dict, timestamp: float = None):
+        """保存交易对核心状态（同一交易对只保留最新一份）"""
+        self._enqueue(self._UPSERT_STATE, (symbol, json.dumps(state, ensure_ascii=False), self._now(timestamp)))
+
+    def record_trade(self, symbol: str, trade: dict):
+        """记录一笔成交（同一交易对的同一 order_id 会被覆盖）"""
+        self._enqueue(self._UPSERT_TRADE, (
+            symbol,
+            str(trade['order_id']),
+            float(trade['timestamp']),
+            str(trade['side']).lower(),
+            float(trade['price']),
+            float(trade['amount']),
+            float(trade['profit']) if trade.get('profit') is not None else None,
+            trade.get('strategy'),
+        ))
+
+    def record_order(self, symbol: str, order: dict, timestamp: float = None):
+        """记录新订单"""
+        now = self._now(timestamp)
+        self._enqueue(self._UPSERT_ORDER, (
+            str(order['id']),
+            symbol,
+            order.get('side'),
+            order.get('type'),
+            float(order['price']) if order.get('price') is not None else None,
+            float(order['amount']) if order.get('amount') is not None else None,
+            order.get('status'),
+            0.0,
+            now,
+            now,
+        ))
+
+    def update_order_status(self, order_id, status: str, profit: float = 0, timestamp: float = None):
+        """更新订单状态"""
+        self._enqueue(self._UPDATE_ORDER_STATUS, (status, float(profit or 0), self._now(timestamp), str(order_id)))
+
+    def record_equity(self, symbol: str, value: float, timestamp: float = None):
+        """记录一次权益采样"""
+        self._enqueue(self._INSERT_EQUITY, (symbol, self._now(timestamp), float(value)))
+
+    def flush(self):
+        """
+        在单个事务中提交缓冲区内的所有写操作，返回提交条数。
+        在写线程之外调用时交给写线程执行并等待结果（离线脚本/测试使用，事件循环中请用 flush_async）。
+        """
+        if not self._on_writer():
+            return self._executor.submit(self.flush).result()
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._flush_scheduled = False
+        if not batch:
+            return 0
+        try:
+            with self._conn:
+                # 相邻的同类语句合并为一次 executemany
+                start = 0
+                while start < len(batch):
+                    sql = batch[start][0]
+                    end = start
+                    while end < len(batch) and batch[end][0] == sql:
+                        end += 1
+                    self._conn.executemany(sql, [params for _, params in batch[start:end]])
+                    start = end
+        except Exception as e:
+            self.logger.error(f"批量写入SQLite失败，{len(batch)} 条记录将在下次重试: {e}")
+            with self._lock:
+                self._pending[:0] = batch
+            return 0
+        return len(batch)
+
+    async def flush_async(self):
+        """在后台线程中提交缓冲区，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.flush)
+
+    async def _flush_loop(self, interval):
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await self.flush_async()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.logger.error(f"SQLite后台提交任务出错: {e}")
+
+    def start(self, interval: float = 1.0):
+        """启动周期性的后台批量提交任务"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop(interval))
+            self.logger.info(f"SQLite存储已启动: {self.db_path} | 批量提交间隔 {interval}s")
+
+    async def close(self):
+        """停止后台任务、提交剩余写操作并关闭连接"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush_async()
+        self._executor.submit(self._conn.close).result()
+        self._executor.shutdown(wait=True)
+        self.logger.info("SQLite存储已关闭")
+
+    # ------------------------------------------------------------------
+    # 查询（走索引，不需要全量加载）
+    # ------------------------------------------------------------------
+    def _read(self, sql, params):
+        # 先提交缓冲区，保证读到自己的写入；只在写线程中执行
+        self.flush()
+        return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _query(self, sql, params=()):
+        """
+        同步查询：在写线程中执行并等待结果，调用线程上不会发生提交。
+        用于启动加载、离线脚本和工作线程；事件循环中请使用 query_async。
+        """
+        if self._on_writer():
+            return self._read(sql, params)
+        return self._executor.submit(self._read, sql, params).result()
+
+    async def query_async(self, method: str, *args, **kwargs):
+        """在写线程中执行任一查询方法（如 'query_trades'），不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(getattr(self, method), *args, **kwargs))
+
+    def load_state(self, symbol: str):
+        rows = self._query("SELECT state FROM trader_state WHERE symbol = ?", (symbol,))
+        return json.loads(rows[0]['state']) if rows else None
+
+    def query_trades(self, symbol: str, since: float = None, until: float = None, limit: int = None):
+        """按时间范围查询某交易对的成交记录（按时间升序）"""
+        sql = "SELECT " + ", ".join(self.TRADE_COLUMNS) + " FROM trades WHERE symbol = ?"
+        params = [symbol]
+        if since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND timestamp < ?"
+            params.append(until)
+        sql += " ORDER BY timestamp"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self._query(sql, params)
+
+    def max_trade_id(self):
+        """当前最大的成交行 id（尚无成交时为 0），用作 iter_trades 固定视图的上界"""
+        rows = self._query("SELECT MAX(id) AS id FROM trades")
+        return rows[0]['id'] or 0
+
+    def iter_trades(self, symbol: str, since: float = None, until: float = None, chunk_size: int = 1000,
+                    max_id: int = None):
+        """
+        按 (timestamp, id) 键集逐块读取某交易对的成交（按时间升序），每块一次索引查询，内存占用恒定。
+        指定 max_id 时只读取 id 不超过它的行，遍历期间新写入的成交不会出现在结果中。
+        """
+        columns = "id, " + ", ".join(self.TRADE_COLUMNS)
+        last = None
+        while True:
+            sql = f"SELECT {columns} FROM trades WHERE symbol = ?"
+            params = [symbol]
+            if max_id is not None:
+                sql += " AND id <= ?"
+                params.append(max_id)
+            if since is not None:
+                sql += " AND timestamp >= ?"
+                params.append(since)
+            if until is not None:
+                sql += " AND timestamp < ?"
+                params.append(until)
+            if last is not None:
+                sql += " AND (timestamp > ? OR (timestamp = ? AND id > ?))"
+                params.extend((last[0], last[0], last[1]))
+            rows = self._query(sql + " ORDER BY timestamp, id LIMIT ?", params + [int(chunk_size)])
+            for row in rows:
+                yield {k: row[k] for k in self.TRADE_COLUMNS}
+            if len(rows) < chunk_size:
+                return
+            last = (rows[-1]['timestamp'], rows[-1]['id'])
+
+    def get_trade(self, order_id):
+        rows = self._query(
+            "SELECT " + ", ".join(self.TRADE_COLUMNS) + " FROM trades WHERE order_id = ?", (str(order_id),))
+        return rows[0] if rows else None
+
+    def count_trades(self, symbol: str = None) -> int:
+        if symbol is None:
+            rows = self._query("SELECT COUNT(*) AS n FROM trades")
+        else:
+            rows = self._query("SELECT COUNT(*) AS n FROM trades WHERE symbol = ?", (symbol,))
+        return rows[0]['n']
+
+    def get_order(self, order_id):
+        rows = self._query("SELECT * FROM orders WHERE order_id = ?", (str(order_id),))
+        return rows[0] if rows else None
+
+    def query_equity(self, symbol: str, since: float = None):
+        sql = "SELECT timestamp, value FROM equity_samples WHERE symbol = ?"
+        params = [symbol]
+        if since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(since)
+        return self._query(sql + " ORDER BY timestamp", params)
+
+    def get_meta(self, key: str):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]['value'] if rows else None
+
+    def set_meta(self, key: str, value: str):
+        self._enqueue("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _symbol_from_filename(name: str) -> str:
+    """'BNB_USDT' -> 'BNB/USDT'（与 trader_state_*.json 的命名规则一致）"""
+    return name.replace('_', '/', 1)
+
+
+def migrate_json_to_store(store: TradingStore, data_dir: str = None, default_symbol: str = None, force: bool = False):
+    """
+    一次性将现有文件数据迁移到SQLite存储：
+    - data/trader_state_*.json                      -> trader_state
+    - data/trade_history.json、archives/trades_YYYYMM.json（旧版，无交易对信息） -> trades
+    - data/trade_journal_{SYMBOL}.jsonl             -> trades（按文件名确定交易对）
+    - data/archives/trades_{SYMBOL}_YYYYMM*.npy      -> trades（列式归档）
+
+    旧版成交记录不包含交易对信息，按 LEGACY_TRADES_SYMBOL 的约定统一归属到 default_symbol
+    （默认取配置中的第一个交易对），与 OrderTracker 导入旧版历史的规则一致。
+    成交按 (symbol, order_id) 去重，重复导入是幂等的。
+
+    Returns:
+        dict: 各类记录的迁移条数；已迁移过且未指定 force 时返回 None
+    """
+    logger = logging.getLogger('TradingStoreMigrator')
+    if store.get_meta('json_migrated') and not force:
+        logger.info("JSON数据已迁移过，跳过。")
+        return None
+
+    data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
+    default_symbol = default_symbol or LEGACY_TRADES_SYMBOL
+    result = {'states': 0, 'trades': 0}
+
+    def record(symbol, trade):
+        try:
+            store.record_trade(symbol, trade)
+            result['trades'] += 1
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"跳过无效成交记录 {trade}: {e}")
+
+    for path in glob.glob(os.path.join(data_dir, 'trader_state_*.json')):
+        symbol = _symbol_from_filename(os.path.basename(path)[len('trader_state_'):-len('.json')])
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                store.save_state(symbol, json.load(f))
+            result['states'] += 1
+        except Exception as e:
+            logger.error(f"迁移状态文件失败 {path}: {e}")
+
+    # 旧版JSON（已被 OrderTracker 导入过的带 .migrated 后缀，同样读取，重复记录由唯一键去重）
+    archive_dir = os.path.join(data_dir, 'archives')
+    trade_files = []
+    for suffix in ('', '.migrated'):
+        trade_files.extend(sorted(glob.glob(os.path.join(archive_dir, f'trades_[0-9]*.json{suffix}'))))
+        trade_files.append(os.path.join(data_dir, f'trade_history.json{suffix}'))
+    for path in trade_files:
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                trades = json.load(f)
+        except Exception as e:
+            logger.error(f"读取成交文件失败 {path}: {e}")
+            continue
+        for trade in trades:
+            record(default_symbol, trade)
+
+    # 各交易对的成交日志（无交易对后缀的日志属于旧版单交易对部署）
+    for path in sorted(glob.glob(os.path.join(data_dir, 'trade_journal*.jsonl'))):
+        name = os.path.basename(path)[len('trade_journal'):-len('.jsonl')]
+        symbol = _symbol_from_filename(name[1:]) if name else default_symbol
+        for trade in TradeJournal(path).records():
+            record(symbol, trade)
+
+    # 列式归档（无交易对前缀的归档属于旧版单交易对部署）
+    prefixes = {'trades_'}
+    for path in glob.glob(os.path.join(archive_dir, 'trades_*.npy')):
+        match = re.match(r'(trades_(?:.+_)?)\d{6}(?:\.part\d+)?\.npy$', os.path.basename(path))
+        if match:
+            prefixes.add(match.group(1))
+    for prefix in sorted(prefixes):
+        symbol = _symbol_from_filename(prefix[len('trades_'):-1]) if prefix != 'trades_' else default_symbol
+        for chunk in TradeArchive(archive_dir, prefix).iter_chunks():
+            for trade in TradeArchive.to_records(chunk):
+                record(symbol, trade)
+
+    store.set_meta('json_migrated', str(store.clock.time()))
+    store.flush()
+    logger.info(f"数据迁移完成: {result}")
+    return result
+
+
+_store = None
+
+
+def get_trading_store():
+    """返回全局共享的SQLite存储实例；未启用 ENABLE_SQLITE_STORE 时返回 None"""
+    global _store
+    if not settings.ENABLE_SQLITE_STORE:
+        return None
+    if _store is None:
+        _store = TradingStore()
+    return _store
+
+
+if __name__ == '__main__':
+    # 用法: python trading_store.py migrate [--force]
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("用法: python trading_store.py migrate [--force]")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    migrate_store = TradingStore()
+    print(migrate_json_to_store(migrate_store, force='--force' in sys.argv))
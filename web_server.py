@@ -1,14 +1,23 @@
 from aiohttp import web
 import os
 from helpers import LogConfig
-import aiofiles
 import logging
 from datetime import datetime
-import psutil
 import time
 import base64
 from functools import wraps
 from config import settings
+from status_snapshot import StatusSnapshotService
+from event_broadcaster import event_broadcaster, BroadcastLogHandler
+from log_tail import tail_lines, read_log_delta
+from system_metrics import system_metrics
+from state_persistence import state_persistence
+from order_rate_governor import order_governor
+from notifier import notifier
+from loop_watchdog import loop_watchdog
+from portfolio_risk import portfolio_risk
+import asyncio
+import json
 
 def auth_required(func):
     """基础认证装饰器"""
@@ -80,29 +89,25 @@ class IPLogger:
         return self.ip_records
 
 def get_system_stats():
-    """获取系统资源使用情况"""
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory = psutil.virtual_memory()
-    memory_used = memory.used / (1024 * 1024 * 1024)  # 转换为GB
-    memory_total = memory.total / (1024 * 1024 * 1024)
+    """获取系统资源使用情况（读取后台采样器的最近一次结果，不阻塞事件循环）"""
+    sample = system_metrics.latest()
     return {
-        'cpu_percent': cpu_percent,
-        'memory_used': round(memory_used, 2),
-        'memory_total': round(memory_total, 2),
-        'memory_percent': memory.percent
+        'cpu_percent': sample['cpu_percent'],
+        'memory_used': sample['memory_used'],
+        'memory_total': sample['memory_total'],
+        'memory_percent': sample['memory_percent']
     }
 
-async def _read_log_content():
-    """公共的日志读取函数"""
-    log_path = os.path.join(LogConfig.LOG_DIR, 'trading_system.log')
+def _log_path():
+    return os.path.join(LogConfig.LOG_DIR, 'trading_system.log')
+
+async def _read_log_content(max_lines=500):
+    """公共的日志读取函数：从文件末尾读取最近 max_lines 行，按时间倒序返回"""
+    log_path = _log_path()
     if not os.path.exists(log_path):
         return None
-        
-    async with aiofiles.open(log_path, mode='r', encoding='utf-8') as f:
-        content = await f.read()
-        
-    # 将日志按行分割并倒序排列
-    lines = content.strip().split('\n')
+
+    lines, _ = await asyncio.to_thread(tail_lines, log_path, max_lines)
     lines.reverse()
     return '\n'.join(lines)
 
@@ -281,7 +286,10 @@ async def handle_log(request):
 
                 <!-- 最近交易记录 -->
                 <div class="card mt-4 mb-8">
-                    <h2 class="text-lg font-semibold mb-4">最近交易</h2>
+                    <div class="flex justify-between items-center mb-4">
+                        <h2 class="text-lg font-semibold">最近交易</h2>
+                        <a id="export-link" href="/api/trades/export?format=csv" class="text-sm text-blue-500">导出全部(CSV)</a>
+                    </div>
                     <div class="overflow-x-auto">
                         <table class="min-w-full">
                             <thead>
@@ -343,7 +351,25 @@ async def handle_log(request):
                     document.title = `监控 - ${{symbol}}`;
                 }}
 
-                // 更新整个页面的状态
+                let lastStatus = null;
+                let eventSource = null;
+                let pollTimer = null;
+
+                function tradeRowHtml(trade) {{
+                    return `
+                        <tr class="border-b">
+                            <td class="py-2">${{trade.timestamp}}</td>
+                            <td class="py-2 ${{trade.side === 'buy' ? 'text-green-500' : 'text-red-500'}}">
+                                ${{trade.side === 'buy' ? '买入' : '卖出'}}
+                            </td>
+                            <td class="py-2">${{parseFloat(trade.price).toFixed(2)}}</td>
+                            <td class="py-2">${{parseFloat(trade.amount).toFixed(4)}}</td>
+                            <td class="py-2">${{(parseFloat(trade.price) * parseFloat(trade.amount)).toFixed(2)}}</td>
+                        </tr>
+                    `;
+                }}
+
+                // 拉取完整状态（首次加载及推送不可用时的轮询）
                 async function updateStatus() {{
                     if (!currentSymbol) return;
                     try {{
@@ -354,92 +380,166 @@ async def handle_log(request):
                             console.error(`获取 ${{currentSymbol}} 状态失败:`, data.error);
                             return;
                         }}
-
-                        // 更新页面标题
-                        updatePageTitle(data.symbol || currentSymbol);
-                        
-                        // 更新基本信息
-                        document.querySelector('#symbol-display').textContent = data.symbol || '--';
-                        document.querySelector('#base-price').textContent =
-                            data.base_price ? data.base_price.toFixed(2) + ' ' + (data.quote_asset || '') : '--';
-                        document.querySelector('#current-price-label').textContent =
-                            `当前价格 (${{data.quote_asset || ''}})`;
-                        document.querySelector('#current-price').textContent =
-                            data.current_price ? data.current_price.toFixed(2) : '--';
-                        
-                        // 更新 S1 信息和仓位
-                        document.querySelector('#s1-high').textContent = 
-                            data.s1_daily_high ? data.s1_daily_high.toFixed(2) : '--';
-                        document.querySelector('#s1-low').textContent = 
-                            data.s1_daily_low ? data.s1_daily_low.toFixed(2) : '--';
-                        document.querySelector('#position-percentage').textContent = 
-                            data.position_percentage != null ? data.position_percentage.toFixed(2) + '%' : '--';
-                        
-                        // 更新网格参数
-                        document.querySelector('#grid-size').textContent = 
-                            data.grid_size ? (data.grid_size * 100).toFixed(2) + '%' : '--';
-                        document.querySelector('#threshold').textContent = 
-                            data.threshold ? (data.threshold * 100).toFixed(2) + '%' : '--';
-
-                        // ---> 新增：更新网格上下轨 <---
-                        document.querySelector('#grid-upper-band').textContent =
-                            data.grid_upper_band != null ? data.grid_upper_band.toFixed(2) : '--';
-                        document.querySelector('#grid-lower-band').textContent =
-                            data.grid_lower_band != null ? data.grid_lower_band.toFixed(2) : '--';
-                        
-                        // 更新资金状况标签和数据
-                        document.querySelector('#total-assets-label').textContent =
-                            `总资产(${{data.quote_asset || ''}})`;
-                        document.querySelector('#total-assets').textContent =
-                            data.total_assets ? data.total_assets.toFixed(2) + ' ' + (data.quote_asset || '') : '--';
-                        document.querySelector('#quote-balance-label').textContent =
-                            `${{data.quote_asset || '计价货币'}}余额`;
-                        document.querySelector('#quote-balance').textContent =
-                            data.quote_balance != null ? data.quote_balance.toFixed(2) : '--';
-                        document.querySelector('#base-balance-label').textContent =
-                            `${{data.base_asset || '基础货币'}}余额`;
-                        document.querySelector('#base-balance').textContent =
-                            data.base_balance != null ? data.base_balance.toFixed(4) : '--';
-                        document.querySelector('#total-profit-label').textContent =
-                            `总盈亏(${{data.quote_asset || ''}})`;
-
-                        // 更新目标委托金额
-                        document.querySelector('#target-order-amount').textContent =
-                            data.target_order_amount ? data.target_order_amount.toFixed(2) + ' ' + (data.quote_asset || '') : '--';
-                        
-                        // 更新盈亏信息
-                        const totalProfitElement = document.querySelector('#total-profit');
-                        totalProfitElement.textContent = data.total_profit ? data.total_profit.toFixed(2) : '--';
-                        totalProfitElement.className = `status-value ${{data.total_profit >= 0 ? 'profit' : 'loss'}}`;
-
-                        const profitRateElement = document.querySelector('#profit-rate');
-                        profitRateElement.textContent = data.profit_rate ? data.profit_rate.toFixed(2) + '%' : '--';
-                        profitRateElement.className = `status-value ${{data.profit_rate >= 0 ? 'profit' : 'loss'}}`;
-                        
-                        // 更新交易历史
-                        document.querySelector('#trade-history').innerHTML = data.trade_history.map(function(trade) {{ return ` 
-                            <tr class="border-b">
-                                <td class="py-2">${{trade.timestamp}}</td>
-                                <td class="py-2 ${{trade.side === 'buy' ? 'text-green-500' : 'text-red-500'}}">
-                                    ${{trade.side === 'buy' ? '买入' : '卖出'}}
-                                </td>
-                                <td class="py-2">${{parseFloat(trade.price).toFixed(2)}}</td>
-                                <td class="py-2">${{parseFloat(trade.amount).toFixed(4)}}</td>
-                                <td class="py-2">${{(parseFloat(trade.price) * parseFloat(trade.amount)).toFixed(2)}}</td>
-                            </tr>
-                        `; }}).join('');
-                        
-
-                        
-                        // 更新系统运行时间
-                        document.querySelector('#system-uptime').textContent = data.uptime;
-                        
-                        console.log(`状态更新成功: ${{currentSymbol}}`);
+                        lastStatus = data;
+                        renderStatus(data);
                     }} catch (error) {{
                         console.error(`更新 ${{currentSymbol}} 状态失败:`, error);
                     }}
                 }}
 
+                // 渲染整个页面的状态
+                function renderStatus(data) {{
+                    // 更新页面标题
+                    updatePageTitle(data.symbol || currentSymbol);
+                    
+                    // 更新基本信息
+                    document.querySelector('#symbol-display').textContent = data.symbol || '--';
+                    document.querySelector('#base-price').textContent =
+                        data.base_price ? data.base_price.toFixed(2) + ' ' + (data.quote_asset || '') : '--';
+                    document.querySelector('#current-price-label').textContent =
+                        `当前价格 (${{data.quote_asset || ''}})`;
+                    document.querySelector('#current-price').textContent =
+                        data.current_price ? data.current_price.toFixed(2) : '--';
+                    
+                    // 更新 S1 信息和仓位
+                    document.querySelector('#s1-high').textContent = 
+                        data.s1_daily_high ? data.s1_daily_high.toFixed(2) : '--';
+                    document.querySelector('#s1-low').textContent = 
+                        data.s1_daily_low ? data.s1_daily_low.toFixed(2) : '--';
+                    document.querySelector('#position-percentage').textContent = 
+                        data.position_percentage != null ? data.position_percentage.toFixed(2) + '%' : '--';
+                    
+                    // 更新网格参数
+                    document.querySelector('#grid-size').textContent = 
+                        data.grid_size ? (data.grid_size * 100).toFixed(2) + '%' : '--';
+                    document.querySelector('#threshold').textContent = 
+                        data.threshold ? (data.threshold * 100).toFixed(2) + '%' : '--';
+
+                    // ---> 新增：更新网格上下轨 <---
+                    document.querySelector('#grid-upper-band').textContent =
+                        data.grid_upper_band != null ? data.grid_upper_band.toFixed(2) : '--';
+                    document.querySelector('#grid-lower-band').textContent =
+                        data.grid_lower_band != null ? data.grid_lower_band.toFixed(2) : '--';
+                    
+                    // 更新资金状况标签和数据
+                    document.querySelector('#total-assets-label').textContent =
+                        `总资产(${{data.quote_asset || ''}})`;
+                    document.querySelector('#total-assets').textContent =
+                        data.total_assets ? data.total_assets.toFixed(2) + ' ' + (data.quote_asset || '') : '--';
+                    document.querySelector('#quote-balance-label').textContent =
+                        `${{data.quote_asset || '计价货币'}}余额`;
+                    document.querySelector('#quote-balance').textContent =
+                        data.quote_balance != null ? data.quote_balance.toFixed(2) : '--';
+                    document.querySelector('#base-balance-label').textContent =
+                        `${{data.base_asset || '基础货币'}}余额`;
+                    document.querySelector('#base-balance').textContent =
+                        data.base_balance != null ? data.base_balance.toFixed(4) : '--';
+                    document.querySelector('#total-profit-label').textContent =
+                        `总盈亏(${{data.quote_asset || ''}})`;
+
+                    // 更新目标委托金额
+                    document.querySelector('#target-order-amount').textContent =
+                        data.target_order_amount ? data.target_order_amount.toFixed(2) + ' ' + (data.quote_asset || '') : '--';
+                    
+                    // 更新盈亏信息
+                    const totalProfitElement = document.querySelector('#total-profit');
+                    totalProfitElement.textContent = data.total_profit ? data.total_profit.toFixed(2) : '--';
+                    totalProfitElement.className = `status-value ${{data.total_profit >= 0 ? 'profit' : 'loss'}}`;
+
+                    const profitRateElement = document.querySelector('#profit-rate');
+                    profitRateElement.textContent = data.profit_rate ? data.profit_rate.toFixed(2) + '%' : '--';
+                    profitRateElement.className = `status-value ${{data.profit_rate >= 0 ? 'profit' : 'loss'}}`;
+                    
+                    // 更新交易历史
+                    document.querySelector('#export-link').href = `/api/trades/export?format=csv&symbol=${{encodeURIComponent(currentSymbol)}}`;
+                    document.querySelector('#trade-history').innerHTML = data.trade_history.map(tradeRowHtml).join('');
+
+                    // 更新系统运行时间
+                    renderUptime();
+                    
+                }}
+
+                // 运行时长由启动时间在本地计算，每秒刷新，不依赖状态推送
+                function renderUptime() {{
+                    if (!lastStatus || !lastStatus.start_time) return;
+                    let rest = Math.max(0, Math.floor(Date.now() / 1000 - lastStatus.start_time));
+                    const days = Math.floor(rest / 86400); rest %= 86400;
+                    const hours = Math.floor(rest / 3600); rest %= 3600;
+                    const minutes = Math.floor(rest / 60);
+                    document.querySelector('#system-uptime').textContent =
+                        `${{days}}天 ${{hours}}小时 ${{minutes}}分钟 ${{rest % 60}}秒`;
+                }}
+                setInterval(renderUptime, 1000);
+
+                let logOffset = null;
+                let logInode = null;
+
+                // 增量拉取日志：只请求上次偏移量之后的新行，文件轮转时整体替换
+                async function pollLogs() {{
+                    try {{
+                        const url = logOffset === null
+                            ? '/api/logs?lines=0'
+                            : `/api/logs?since=${{logOffset}}&inode=${{logInode}}`;
+                        const response = await fetch(url);
+                        if (!response.ok) return;
+                        const text = await response.text();
+                        const reset = response.headers.get('X-Log-Reset') === '1';
+                        const pre = document.querySelector('#log-content pre');
+                        if (logOffset !== null && text) {{
+                            pre.textContent = reset ? text : text + '\\n' + pre.textContent;
+                        }}
+                        logOffset = response.headers.get('X-Log-Offset');
+                        logInode = response.headers.get('X-Log-Inode');
+                    }} catch (error) {{
+                        console.error('更新日志失败:', error);
+                    }}
+                }}
+
+                function startPolling() {{
+                    if (!pollTimer) {{
+                        pollLogs();
+                        pollTimer = setInterval(() => {{ updateStatus(); pollLogs(); }}, 5000); // 5秒更新一次
+                    }}
+                }}
+
+                function stopPolling() {{
+                    if (pollTimer) {{
+                        clearInterval(pollTimer);
+                        pollTimer = null;
+                        logOffset = null;
+                    }}
+                }}
+
+                // 通过 SSE 接收状态差异、成交和日志推送，不可用时退回轮询
+                function connectStream() {{
+                    if (eventSource) eventSource.close();
+                    if (!window.EventSource) {{
+                        startPolling();
+                        return;
+                    }}
+                    eventSource = new EventSource(`/api/stream?symbol=${{encodeURIComponent(currentSymbol)}}`);
+                    eventSource.onopen = stopPolling;
+                    eventSource.onerror = startPolling;
+                    eventSource.addEventListener('status', (e) => {{
+                        const msg = JSON.parse(e.data);
+                        if (msg.symbol !== currentSymbol) return;
+                        lastStatus = Object.assign(lastStatus || {{}}, msg.full || msg.changes);
+                        renderStatus(lastStatus);
+                    }});
+                    eventSource.addEventListener('trade', (e) => {{
+                        const msg = JSON.parse(e.data);
+                        if (msg.symbol !== currentSymbol) return;
+                        const tbody = document.querySelector('#trade-history');
+                        tbody.insertAdjacentHTML('beforeend', tradeRowHtml(msg.trade));
+                        while (tbody.rows.length > 10) tbody.deleteRow(0);
+                    }});
+                    eventSource.addEventListener('log', (e) => {{
+                        const pre = document.querySelector('#log-content pre');
+                        pre.textContent = JSON.parse(e.data).line + '\\n' + pre.textContent;
+                        if (pre.textContent.length > 200000) pre.textContent = pre.textContent.slice(0, 200000);
+                    }});
+                }}
+
                 // 初始化函数
                 async function initialize() {{
                     try {{
@@ -460,11 +560,9 @@ async def handle_log(request):
                             currentSymbol = symbols[0];
                             symbolSelector.value = currentSymbol;
 
-                            // 首次加载数据
+                            // 首次加载数据，之后由推送通道增量更新
                             updateStatus();
-
-                            // 启动定时更新
-                            setInterval(updateStatus, 5000); // 5秒更新一次
+                            connectStream();
                         }} else {{
                             document.body.innerHTML = '<h1 class="text-center text-2xl mt-12">没有正在运行的交易对。</h1>';
                         }}
@@ -478,6 +576,7 @@ async def handle_log(request):
                 symbolSelector.addEventListener('change', (event) => {{
                     currentSymbol = event.target.value;
                     updateStatus(); // 立即更新
+                    connectStream();
                 }});
 
                 // 页面加载时执行初始化
@@ -492,144 +591,169 @@ async def handle_log(request):
 
 @auth_required
 async def handle_status(request):
-    """处理状态API请求"""
+    """处理状态API请求：直接返回后台构建的快照，支持 ETag/If-None-Match"""
     try:
-        traders = request.app['traders']
+        trader = _get_trader(request)
+        service = request.app['status_service']
+        snapshot = await service.get(trader.symbol)
+        if snapshot is None:
+            return web.json_response({"error": "状态快照尚未就绪"}, status=503)
+
+        headers = {'ETag': snapshot['etag'], 'Cache-Control': 'no-cache'}
+        if request.headers.get('If-None-Match') == snapshot['etag']:
+            service.metrics['not_modified'] += 1
+            return web.Response(status=304, headers=headers)
+        service.metrics['served'] += 1
+        return web.Response(body=service.render(trader.symbol, snapshot), content_type='application/json',
+                            headers=headers)
+    except Exception as e:
+        logging.error(f"获取状态数据失败: {str(e)}", exc_info=True)
+        return web.json_response({"error": str(e)}, status=500)
 
-        # 从查询参数获取交易对，默认使用第一个
-        symbol = request.query.get('symbol')
-        if not symbol or symbol not in traders:
-            symbol = list(traders.keys())[0]  # 默认使用第一个交易对
+def _encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(f"{cursor[0]!r}:{cursor[1]}".encode()).decode()
 
-        trader = traders[symbol]
-        s1_controller = trader.position_controller_s1 # 获取 S1 控制器实例
+def _decode_cursor(value):
+    ts, count = base64.urlsafe_b64decode(value.encode()).decode().split(':')
+    return float(ts), int(count)
 
-        # 获取交易所数据
-        balance = await trader.exchange.fetch_balance()
-        current_price = await trader._get_latest_price() or 0 # 提供默认值以防失败
+def _get_trader(request):
+    traders = request.app['traders']
+    symbol = request.query.get('symbol')
+    if not symbol or symbol not in traders:
+        symbol = list(traders.keys())[0]  # 默认使用第一个交易对
+    return traders[symbol]
 
-        # 获取理财账户余额
-        funding_balance = await trader.exchange.fetch_funding_balance()
-        
-        # 获取网格参数
-        grid_size = trader.grid_size
-        grid_size_decimal = grid_size / 100 if grid_size else 0
-        threshold = grid_size_decimal / 5
-        
-        # ---> 新增：计算网格上下轨 <---
-        # 确保 trader.base_price 和 trader.grid_size 是有效的
-        upper_band = None
-        lower_band = None
-        if trader.base_price is not None and trader.grid_size is not None:
-             try:
-                 # 调用 trader.py 中已有的方法
-                 upper_band = trader._get_upper_band()
-                 lower_band = trader._get_lower_band()
-             except Exception as band_e:
-                 logging.warning(f"计算网格上下轨失败: {band_e}")
-        
-        # 计算系统运行时间
-        current_time = time.time()
-        uptime_seconds = int(current_time - trader.start_time)
-        days, remainder = divmod(uptime_seconds, 86400)
-        hours, remainder = divmod(remainder, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        uptime_str = f"{days}天 {hours}小时 {minutes}分钟 {seconds}秒"
-        
-        # 【双轨制资产计算 - 第一轨：全局报告】
-        # 使用全局方法获取真正的账户总资产（包括所有币种），用于准确的盈亏报告
-        global_total_assets = await trader.exchange.calculate_total_account_value()
-
-        # 使用动态资产名称计算余额
-        base_asset = trader.base_asset
-        quote_asset = trader.quote_asset
-
-        # 合并计算用于显示的各项余额
-        spot_quote = float(balance.get('total', {}).get(quote_asset, 0))
-        funding_quote = float(funding_balance.get(quote_asset, 0))
-        display_quote_balance = spot_quote + funding_quote
-
-        spot_base = float(balance.get('total', {}).get(base_asset, 0))
-        funding_base = float(funding_balance.get(base_asset, 0))
-        display_base_balance = spot_base + funding_base
-
-        # 计算全局总盈亏和盈亏率（基于全账户资产）
-        initial_principal = settings.INITIAL_PRINCIPAL
-        total_profit = 0.0
-        profit_rate = 0.0
-        if initial_principal > 0:
-            total_profit = global_total_assets - initial_principal
-            profit_rate = (total_profit / initial_principal) * 100
-        else:
-            logging.warning("初始本金未设置或为0，无法计算盈亏率")
-        
-        # 获取最近交易信息
-        last_trade_price = trader.last_trade_price
-        last_trade_time = trader.last_trade_time
-        last_trade_time_str = datetime.fromtimestamp(last_trade_time).strftime('%Y-%m-%d %H:%M:%S') if last_trade_time else '--'
-        
-        # 获取交易历史
-        trade_history = []
-        if hasattr(trader, 'order_tracker'):
-            trades = trader.order_tracker.get_trade_history()
-            trade_history = [{
-                'timestamp': datetime.fromtimestamp(trade['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
-                'side': trade.get('side', '--'),
-                'price': trade.get('price', 0),
-                'amount': trade.get('amount', 0),
-                'profit': trade.get('profit', 0)
-            } for trade in trades[-10:]]  # 只取最近10笔交易
-        
-        # 【双轨制资产计算 - 第二轨：交易决策】
-        # 计算目标委托金额 (交易对相关资产的10%)，这里会调用 _get_pair_specific_assets_value 方法
-        # 确保交易决策只基于交易对相关资产，实现风险隔离
-        target_order_amount = await trader._calculate_order_amount('buy') # buy/sell 结果一样
-        
-        # 获取账户快照用于仓位计算
-        spot_balance = await trader.exchange.fetch_balance()
-        funding_balance = await trader.exchange.fetch_funding_balance()
+@auth_required
+async def handle_trades(request):
+    """分页查询成交记录: /api/trades?symbol=&since=&limit=&cursor="""
+    try:
+        trader = _get_trader(request)
+        since = float(request.query['since']) if request.query.get('since') else None
+        limit = min(max(int(request.query.get('limit', 100)), 1), 1000)
+        cursor = _decode_cursor(request.query['cursor']) if request.query.get('cursor') else None
+    except (ValueError, TypeError) as e:
+        return web.json_response({"error": f"参数无效: {e}"}, status=400)
 
-        # 获取仓位百分比 - 使用风控管理器的方法获取最准确的仓位比例
-        position_ratio = await trader.risk_manager._get_position_ratio(spot_balance, funding_balance)
-        position_percentage = position_ratio * 100
-        
-        # 获取 S1 高低价
-        s1_high = s1_controller.s1_daily_high if s1_controller else None
-        s1_low = s1_controller.s1_daily_low if s1_controller else None
-        
-        # 构建响应数据
-        status = {
-            "symbol": trader.symbol,  # 新增：交易对信息
-            "base_asset": base_asset,  # 新增：基础货币名称
-            "quote_asset": quote_asset,  # 新增：计价货币名称
-            "base_price": trader.base_price,
-            "current_price": current_price,
-            "grid_size": grid_size_decimal,
-            "threshold": threshold,
-            "total_assets": global_total_assets,  # 使用全局总资产用于报告
-            "quote_balance": display_quote_balance,  # 使用动态计价货币余额
-            "base_balance": display_base_balance,    # 使用动态基础货币余额
-            "target_order_amount": target_order_amount,
-            "trade_history": trade_history or [],
-            "last_trade_price": last_trade_price,
-            "last_trade_time": last_trade_time,
-            "last_trade_time_str": last_trade_time_str,
-            "total_profit": total_profit,
-            "profit_rate": profit_rate,
-            "s1_daily_high": s1_high,
-            "s1_daily_low": s1_low,
-            "position_percentage": position_percentage,
-            "grid_upper_band": upper_band,
-            "grid_lower_band": lower_band,
-            "uptime": uptime_str,
-            "uptime_seconds": uptime_seconds
-        }
-        
-        return web.json_response(status)
+    try:
+        trades, next_cursor = await trader.order_tracker.page_trades_async(since=since, limit=limit, cursor=cursor)
+        return web.json_response({
+            "symbol": trader.symbol,
+            "trades": trades,
+            "next_cursor": _encode_cursor(next_cursor)
+        })
     except Exception as e:
-        logging.error(f"获取状态数据失败: {str(e)}", exc_info=True)
+        logging.error(f"查询成交记录失败: {str(e)}", exc_info=True)
         return web.json_response({"error": str(e)}, status=500)
 
+@auth_required
+async def handle_trades_export(request):
+    """流式导出全部成交记录（含归档）: /api/trades/export?symbol=&format=csv|jsonl&since=&until="""
+    trader = _get_trader(request)
+    fmt = 'csv' if request.query.get('format', 'csv') == 'csv' else 'jsonl'
+    try:
+        since = float(request.query['since']) if request.query.get('since') else None
+        until = float(request.query['until']) if request.query.get('until') else None
+    except ValueError as e:
+        return web.json_response({"error": f"参数无效: {e}"}, status=400)
+
+    # 导出范围在请求开始时确定，导出过程中新增或归档的成交不会造成漏行或重复
+    trades = await trader.order_tracker.snapshot_trades(since, until)
+    filename = f"trades_{trader.symbol.replace('/', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8',
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    async for chunk in trader.order_tracker.export_chunks_async(trades, fmt):
+        await response.write(chunk.encode('utf-8'))
+    await response.write_eof()
+    return response
+
+def _sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+@auth_required
+async def handle_stream(request):
+    """SSE推送通道: /api/stream?symbol= ，推送状态差异、新成交和新日志行"""
+    trader = _get_trader(request)
+    symbol = trader.symbol
+    broadcaster = request.app['broadcaster']
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+
+    queue = broadcaster.subscribe()
+    try:
+        # 连接建立时先发送一次完整状态，之后只推送变化
+        service = request.app['status_service']
+        snapshot = await service.get(symbol)
+        if snapshot:
+            full = {**snapshot['data'], **service.uptime(symbol)}
+            await response.write(_sse_message('status', {'symbol': symbol, 'full': full}))
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=15)
+            except asyncio.TimeoutError:
+                await response.write(b': ping\n\n')  # 心跳，防止代理断开空闲连接
+                continue
+            if event in ('status', 'trade') and data.get('symbol') != symbol:
+                continue
+            await response.write(_sse_message(event, data))
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        broadcaster.unsubscribe(queue)
+    return response
+
+def _publish_trade(symbol, trade):
+    event_broadcaster.publish('trade', {'symbol': symbol, 'trade': {
+        'timestamp': datetime.fromtimestamp(trade['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
+        'side': trade.get('side', '--'),
+        'price': trade.get('price', 0),
+        'amount': trade.get('amount', 0),
+        'profit': trade.get('profit', 0)
+    }})
+
+@auth_required
+async def handle_system(request):
+    """系统指标API: /api/system?limit= ，返回最近采样、历史曲线及内部组件指标"""
+    try:
+        limit = int(request.query.get('limit', 60))
+    except ValueError:
+        return web.json_response({"error": "参数无效"}, status=400)
+    return web.json_response({
+        "latest": system_metrics.latest(),
+        "history": system_metrics.history(limit),
+        "components": {
+            "state_persistence": state_persistence.get_metrics(),
+            "order_governor": order_governor.get_metrics(),
+            "notifier": notifier.get_metrics(),
+            "status_snapshots": request.app['status_service'].metrics,
+            "event_stream": request.app['broadcaster'].metrics,
+            "logging": LogConfig.get_metrics(),
+            "loop_watchdog": loop_watchdog.get_metrics(),
+            "portfolio_risk": portfolio_risk.get_metrics(),
+            "savings_rebalancer": _savings_metrics(request.app['traders'])
+        }
+    })
+
+def _savings_metrics(traders):
+    """汇总各交易所客户端的再平衡服务指标（共享同一客户端的交易对只计一次）"""
+    rebalancers = {id(t.savings_rebalancer): t.savings_rebalancer
+                   for t in traders.values() if getattr(t, 'savings_rebalancer', None) is not None}
+    result = {}
+    for rebalancer in rebalancers.values():
+        for key, value in rebalancer.get_metrics().items():
+            result[key] = (result.get(key, False) or value) if key == 'pending' else result.get(key, 0) + value
+    return result
+
 @auth_required
 async def handle_symbols(request):
     """获取所有可用的交易对"""
@@ -664,6 +788,16 @@ async def start_web_server(traders):
     app.middlewares.append(error_middleware)
     app['traders'] = traders  # 存储所有trader实例
     app['ip_logger'] = IPLogger()
+    # 后台构建状态快照，/api/status 只读内存；变化通过 /api/stream 推送
+    app['broadcaster'] = event_broadcaster
+    app['status_service'] = StatusSnapshotService(traders, broadcaster=event_broadcaster)
+    app['status_service'].start()
+    system_metrics.start()
+    for trader in traders.values():
+        trader.order_tracker.add_listener(_publish_trade)
+    log_handler = BroadcastLogHandler(event_broadcaster)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s [%(name)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    logging.getLogger().addHandler(log_handler)
     
     # 禁用访问日志
     logging.getLogger('aiohttp.access').setLevel(logging.WARNING)
@@ -674,6 +808,10 @@ async def start_web_server(traders):
     app.router.add_get('/api/logs', handle_log_content)
     app.router.add_get('/api/status', handle_status)
     app.router.add_get('/api/symbols', handle_symbols)
+    app.router.add_get('/api/trades', handle_trades)
+    app.router.add_get('/api/trades/export', handle_trades_export)
+    app.router.add_get('/api/stream', handle_stream)
+    app.router.add_get('/api/system', handle_system)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', 58181)
@@ -687,12 +825,30 @@ async def start_web_server(traders):
 
 @auth_required
 async def handle_log_content(request):
-    """只返回日志内容的API端点"""
+    """
+    日志内容API: /api/logs?lines=&since=&inode=
+    不带 since 时返回最近 lines 行；带 since（字节偏移）时只返回之后新增的行。
+    响应头 X-Log-Offset / X-Log-Inode 供下次增量请求使用，文件轮转时 X-Log-Reset 为 1。
+    """
     try:
-        content = await _read_log_content()
-        if content is None:
+        log_path = _log_path()
+        if not os.path.exists(log_path):
             return web.Response(text="", status=404)
-            
-        return web.Response(text=content)
+
+        try:
+            max_lines = min(int(request.query.get('lines', 500)), 5000)
+            since = int(request.query['since']) if request.query.get('since') else None
+            inode = int(request.query['inode']) if request.query.get('inode') else None
+        except ValueError:
+            return web.Response(text="参数无效", status=400)
+
+        delta = await asyncio.to_thread(read_log_delta, log_path, since, inode, max_lines)
+        lines = delta['lines']
+        lines.reverse()  # 与页面一致，最新的在前
+        return web.Response(text='\n'.join(lines), headers={
+            'X-Log-Offset': str(delta['offset']),
+            'X-Log-Inode': str(delta['inode']),
+            'X-Log-Reset': '1' if delta['reset'] else '0'
+        })
     except Exception as e:
-        return web.Response(text="", status=500) 
+        return web.Response(text="", status=500)